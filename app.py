@@ -1,7 +1,10 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
 from datetime import datetime, timedelta
+import hmac
 import json
 import os
+import time
+from collections import Counter
 
 # Import all feature modules
 from backend.pricing_engine import PricingEngine
@@ -19,6 +22,7 @@ from backend.elearning_courses import ELearningCourses
 from backend.success_stories import SuccessStories
 from backend.voice_assistant import VoiceAssistant
 from backend.soil_knowledge import SoilKnowledge
+from backend.soil_batch import analyze_upload
 from backend.micro_loans import MicroLoans
 from backend.crop_insurance import CropInsurance
 from backend.digital_wallet import DigitalWallet
@@ -45,7 +49,17 @@ from backend.admin_dashboard import AdminDashboard
 from backend.fraud_detection import FraudDetection
 from backend.multilanguage import MultiLanguageSupport
 from backend.offline_sms import OfflineSMSSupport
+from backend.real_weather_service import RealWeatherService
 from backend.users import UserManager
+from backend.price_alert_matcher import PriceAlertMatcher
+from backend.sync_api import ChangeFeed, register_sync_routes
+from backend.asset_pipeline import register_asset_pipeline
+from backend.fragment_cache import register_fragment_cache
+from backend.ui_integration import add_ui_context_processor
+from backend.response_cache import ResponseCache
+from backend.record_store import document_path, register_record_store
+from backend.metrics import register_metrics
+from backend.health import register_health
 
 app = Flask(__name__,
             template_folder='templates',
@@ -54,11 +68,21 @@ app.secret_key = 'agrisuper_secret_key_2024'
 app.config['JSON_SORT_KEYS'] = False
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 
+# Fingerprinted, precompressed static assets (built with: python -m backend.asset_pipeline)
+register_asset_pipeline(app)
+
+# {% cache %} fragments for static panels; FLASK_ENV=production also disables template auto-reload
+fragment_cache = register_fragment_cache(app)
+add_ui_context_processor(app)
+
+# Manager data may be stored as memory-mapped .jsonl records (python -m backend.record_store data/)
+register_record_store(app)
+
 data_folder = 'data'
 pricing_engine = PricingEngine()
 subscription_model = SubscriptionModel()
 contract_farming_engine = ContractFarmingEngine()
-bulk_deals = BulkDealsEngine()
+bulk_deals = BulkDealsEngine(data_folder)
 yield_prediction = YieldPredictionEngine()
 crop_rotation = CropRotationEngine()
 market_comparison = MarketComparisonEngine()
@@ -97,6 +121,150 @@ fraud_detection = FraudDetection(data_folder)
 multilanguage = MultiLanguageSupport(data_folder)
 offline_sms = OfflineSMSSupport(data_folder)
 user_manager = UserManager(data_folder)
+# Forecasts for SMS and voice replies; served from cache, refreshed in the background
+weather_service = RealWeatherService({'OPENWEATHER_API_KEY': os.environ.get('OPENWEATHER_API_KEY', 'YOUR_API_KEY')})
+
+engines = {
+    'pricing_engine': pricing_engine,
+    'subscription_model': subscription_model,
+    'contract_farming': contract_farming_engine,
+    'bulk_deals': bulk_deals,
+    'yield_prediction': yield_prediction,
+    'crop_rotation': crop_rotation,
+    'market_comparison': market_comparison,
+    'profit_analyzer': profit_analyzer,
+    'disaster_alerts': disaster_alerts,
+    'sowing_calendar': sowing_calendar,
+    'pest_alerts': pest_alerts,
+    'elearning_courses': elearning_courses,
+    'success_stories': success_stories,
+    'voice_assistant': voice_assistant,
+    'soil_knowledge': soil_knowledge,
+    'micro_loans': micro_loans,
+    'crop_insurance': crop_insurance,
+    'digital_wallet': digital_wallet,
+    'emi_purchase': emi_purchase,
+    'shared_logistics': shared_logistics,
+    'storage_booking': storage_booking,
+    'route_optimization': route_optimization,
+    'export_gateway': export_gateway,
+    'equipment_rental': equipment_rental,
+    'fertilizer_price_comparison': fertilizer_price_comparison,
+    'secondhand_marketplace': secondhand_marketplace,
+    'organic_marketplace': organic_marketplace,
+    'farmer_to_farmer_trade': farmer_to_farmer_trade,
+    'farmer_groups': farmer_groups,
+    'qa_forum': qa_forum,
+    'mentorship': mentorship,
+    'id_verification': id_verification,
+    'smart_contracts': smart_contracts,
+    'buyer_ratings': buyer_ratings,
+    'organic_farming': organic_farming,
+    'water_conservation': water_conservation,
+    'carbon_credits': carbon_credits,
+    'admin_dashboard': admin_dashboard,
+    'fraud_detection': fraud_detection,
+    'multilanguage': multilanguage,
+    'offline_sms': offline_sms
+}
+
+# Cached read APIs; each engine's mutations bump its namespace so ETags change
+response_cache = ResponseCache()
+app.extensions['response_cache'] = response_cache
+response_cache.invalidate_on(elearning_courses, 'courses', 'enroll_course', 'update_progress', 'submit_quiz')
+response_cache.invalidate_on(success_stories, 'stories', 'submit_story', 'vote_story')
+response_cache.invalidate_on(disaster_alerts, 'disaster_alerts', 'create_custom_alert', 'ingest_alert')
+response_cache.invalidate_on(carbon_credits, 'carbon_marketplace', 'sell_credits')
+
+# Request and engine latency histograms, /metrics, and X-Profile sampling (AGRISUPER_PROFILING=1)
+metrics = register_metrics(app, engines)
+admin_dashboard.attach_metrics(metrics)
+# Admin analytics: existing records seeded once into a shared event log, then kept current event by event
+admin_dashboard.attach_event_sources(user_manager=user_manager, digital_wallet=digital_wallet,
+                                     farmer_trade=farmer_to_farmer_trade, contract_farming=contract_farming_engine,
+                                     qa_forum=qa_forum, subscription_model=subscription_model)
+crop_rotation.attach_market_data(pricing_engine, yield_prediction)
+
+# /health (liveness) and /ready (readiness, engine load state); ready once startup completes
+health = register_health(app, engines)
+
+# Price alerts fan out to the SMS path as soon as a price update crosses them. Crop alerts
+# are shared by every worker through an event log and fire on exactly one of them
+crop_price_alerts = PriceAlertMatcher(notify=offline_sms.send_price_alert,
+                                      log_path=os.path.join(data_folder, 'events', 'crop_price_alerts.jsonl'))
+fertilizer_price_comparison.alert_matcher.add_listener(offline_sms.send_price_alert)
+
+# SMS commands answer from live engine data; replies and alerts leave through the rate-limited queue
+offline_sms.attach_sources(pricing_engine=pricing_engine, weather_service=weather_service,
+                           disaster_alerts=disaster_alerts, yield_engine=yield_prediction,
+                           user_manager=user_manager)
+
+# Voice queries: cached intent parsing, answered from the price, mandi and alert engines
+voice_assistant.attach_sources(pricing_engine=pricing_engine, market_comparison=market_comparison,
+                               weather_service=weather_service, disaster_alerts=disaster_alerts)
+
+# Disaster alerts reach every subscribed farmer inside the alert area, one SMS batch at a time
+disaster_alerts.add_notification_listener(offline_sms.send_disaster_alert_batch)
+
+# Change feed for offline clients: forum questions, courses, prices and alerts.
+# Backed by a shared event log, so cursors are valid on every worker and across restarts;
+# re-publishing unchanged records at boot appends nothing.
+sync_feed = ChangeFeed(os.path.join(data_folder, 'events', 'sync_feed.jsonl'))
+sync_feed.publish_many('forum_questions', qa_forum.data.get('questions', []))
+sync_feed.publish_many('courses', elearning_courses.courses_data['courses'])
+sync_feed.publish_many('alerts', disaster_alerts.active_alerts)
+for product in fertilizer_price_comparison.price_index.products.values():
+    sync_feed.publish('prices', f"{product['category']}:{product['normalized']}", {
+        'product_name': product['product_name'],
+        'category': product['category'],
+        'min_price': product['min_price'],
+        'max_price': product['max_price']
+    })
+
+# Crop market prices reach the feed from the price history, not from each quote: quotes vary per
+# call, while the 30-day average only moves when the history does. Re-published at most every
+# CROP_PRICE_FEED_INTERVAL seconds; unchanged prices append nothing.
+CROP_PRICE_FEED_INTERVAL = 15 * 60
+crop_price_feed_state = {'published_at': None}
+
+def publish_crop_prices():
+    now = time.monotonic()
+    published_at = crop_price_feed_state['published_at']
+    if published_at is not None and now - published_at < CROP_PRICE_FEED_INTERVAL:
+        return
+    crop_price_feed_state['published_at'] = now
+    sync_feed.publish_many('prices', pricing_engine.market_prices())
+
+publish_crop_prices()
+
+def publish_forum_question(manager, question_id):
+    question = manager.get_question_by_id(question_id)
+    if question:
+        sync_feed.publish('forum_questions', question_id, question)
+
+def publish_trade_offer(offer_id):
+    offer = next((o for o in farmer_to_farmer_trade.data.get('peer_offers', []) if o['offer_id'] == offer_id), None)
+    if offer:
+        sync_feed.publish('trade_listings', offer_id, offer)
+
+def sync_forum_question(payload):
+    result = qa_forum.ask_question(payload)
+    if result.get('status') == 'success':
+        publish_forum_question(qa_forum, result['question_id'])
+        result['record_id'] = result['question_id']
+    return result
+
+def sync_trade_listing(payload):
+    result = farmer_to_farmer_trade.post_trade(payload)
+    if result.get('status') == 'success':
+        publish_trade_offer(result['offer_id'])
+        result['record_id'] = result['offer_id']
+    return result
+
+register_sync_routes(app, sync_feed, {
+    'forum_question': sync_forum_question,
+    'trade_listing': sync_trade_listing
+})
 
 @app.route('/')
 def dashboard():
@@ -137,25 +305,32 @@ def equipment_management():
 
 @app.route('/community-forum')
 def community_forum():
-    # Initialize QA forum manager
+    # Every worker writes the forum file, so its stat is the forum's data version
     from backend.qa_forum import QAForumManager
-    qa_manager = QAForumManager()
-    
-    # Get forum data
-    questions = qa_manager.get_all_questions()
-    categories = qa_manager.get_categories()
-    forum_stats = qa_manager.get_forum_stats()
-    
-    # Count questions per category
-    category_counts = {}
-    for category in categories:
-        category_counts[category] = len(qa_manager.get_all_questions(category=category))
-    
-    return render_template('features/community_forum.html', 
-                           questions=questions, 
-                           categories=categories, 
-                           forum_stats=forum_stats,
-                           category_counts=category_counts)
+    try:
+        # Converted forums are saved to the .jsonl sibling; stat whichever file saves go to
+        stat = os.stat(document_path(os.path.join(data_folder, 'qa_forum_data.json')))
+        forum_version = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        forum_version = (0, 0)
+
+    def load_forum():
+        qa_manager = QAForumManager()
+        questions = qa_manager.get_all_questions()
+        categories = qa_manager.get_categories()
+        # Count questions per category in one pass
+        counts = Counter(question.get("category") for question in questions)
+        return {
+            'questions': questions,
+            'categories': categories,
+            'forum_stats': qa_manager.get_forum_stats(),
+            'category_counts': {category: counts[category] for category in categories}
+        }
+
+    # The page body is cached per forum version too ({% cache 'community_forum' %});
+    # on a hit only the flash messages are rendered
+    forum = fragment_cache.get_or_render('community_forum_data', forum_version, load_forum)
+    return render_template('features/community_forum.html', forum_version=forum_version, **forum)
 
 @app.route('/submit-question', methods=['POST'])
 def submit_question():
@@ -181,9 +356,10 @@ def submit_question():
         return redirect(url_for('community_forum'))
     
     # Add the question
-    success = qa_manager.add_question(title, category, question_text, user_id, username, tags_list)
+    question_id = qa_manager.add_question(title, category, question_text, user_id, username, tags_list)
     
-    if success:
+    if question_id:
+        publish_forum_question(qa_manager, question_id)
         flash('Your question has been posted successfully!', 'success')
     else:
         flash('There was an error posting your question. Please try again.', 'error')
@@ -235,6 +411,7 @@ def submit_answer(question_id):
     success = qa_manager.add_answer(question_id, answer_text, user_id, username)
     
     if success:
+        publish_forum_question(qa_manager, question_id)
         flash('Your answer has been posted successfully!', 'success')
     else:
         flash('There was an error posting your answer. Please try again.', 'error')
@@ -430,7 +607,42 @@ def pricing_engine_page():
 def get_crop_price():
     data = request.json
     result = pricing_engine.get_dynamic_price(data['crop'], data['location'], data['quantity'])
-    return jsonify(result)
+    if result.get('success'):
+        crop_price_alerts.on_price_update(data['crop'], result['data']['recommended_price'])
+        publish_crop_prices()
+    return jsonify(result)
+
+@app.route('/api/pricing-engine/alerts', methods=['POST'])
+def set_crop_price_alert():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'status': 'error', 'message': 'Request body must be a JSON object'}), 400
+    crop = data.get('crop')
+    if not isinstance(crop, str) or not crop.strip():
+        return jsonify({'status': 'error', 'message': 'crop is required'}), 400
+    try:
+        target_price = float(data.get('target_price'))
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'target_price must be a number'}), 400
+    if not 0 < target_price < float('inf'):
+        return jsonify({'status': 'error', 'message': 'target_price must be a positive number'}), 400
+    alert_type = data.get('alert_type', PriceAlertMatcher.DROP)
+    if alert_type not in (PriceAlertMatcher.DROP, PriceAlertMatcher.RISE):
+        return jsonify({'status': 'error', 'message': 'alert_type must be price_drop or price_rise'}), 400
+    phone = data.get('phone') or offline_sms.user_phone(data.get('user_id'))
+    if not phone:
+        return jsonify({'status': 'error', 'message': 'phone is required (none on the user account)'}), 400
+    alert = crop_price_alerts.add_alert({
+        'alert_id': f"CPA{datetime.now().strftime('%Y%m%d%H%M%S%f')}",
+        'user_id': data.get('user_id'),
+        'phone': phone,
+        'product_name': crop.strip(),
+        'target_price': target_price,
+        'alert_type': alert_type,
+        'status': 'active',
+        'created_date': datetime.now().isoformat()
+    })
+    return jsonify({'status': 'success', 'alert_id': alert['alert_id'], 'alert_status': alert['status']})
 
 # Feature 2: Subscription Model
 @app.route('/subscription-model')
@@ -450,8 +662,12 @@ def contract_farming_page():
 
 @app.route('/api/contract-farming/create', methods=['POST'])
 def create_contract():
-    data = request.json
-    result = contract_farming_engine.create_contract(data)
+    data = request.get_json(silent=True) or {}
+    farmer_id = data.get('farmer_id') or session.get('user_id')
+    if not farmer_id:
+        return jsonify({'status': 'error', 'message': 'farmer_id is required'}), 400
+    contract_data = {key: value for key, value in data.items() if key != 'farmer_id'}
+    result = contract_farming_engine.create_contract(farmer_id, contract_data)
     return jsonify(result)
 
 # Feature 4: Bulk Deals
@@ -461,8 +677,11 @@ def bulk_deals_page():
 
 @app.route('/api/bulk-deals/join-pool', methods=['POST'])
 def join_deal_pool():
-    data = request.json
-    result = bulk_deals.join_pool(data)
+    data = request.get_json(silent=True) or {}
+    try:
+        result = bulk_deals.join_pool(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     return jsonify(result)
 
 # Feature 5: Yield Prediction
@@ -487,6 +706,26 @@ def suggest_rotation():
     result = crop_rotation.suggest_rotation(data)
     return jsonify(result)
 
+@app.route('/api/crop-rotation/optimize', methods=['POST'])
+def optimize_rotation():
+    data = request.get_json(silent=True) or {}
+    try:
+        result = crop_rotation.optimize_rotation(data.get('current_crop'), data.get('field_size', 1),
+                                                 data.get('soil_type'), data.get('location'),
+                                                 years=data.get('years', 3), nitrogen=data.get('nitrogen'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+@app.route('/api/crop-rotation/optimize-batch', methods=['POST'])
+def optimize_rotations():
+    data = request.get_json(silent=True) or {}
+    try:
+        result = crop_rotation.optimize_rotations(data.get('plots', []))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
 # Feature 7: Market Comparison
 @app.route('/market-comparison')
 def market_comparison_page():
@@ -519,11 +758,51 @@ def quality_certification():
     return render_template('features/quality_certification.html')
 
 @app.route('/api/disaster-alerts/get-alerts', methods=['GET'])
+@response_cache.cached('disaster_alerts', ttl=60)
 def get_disaster_alerts():
     location = request.args.get('location', 'all')
     result = disaster_alerts.get_alerts(location)
     return jsonify(result)
 
+@app.route('/api/disaster-alerts/create', methods=['POST'])
+def create_disaster_alert():
+    # Community alerts fan out to every subscriber nearby, so only signed-in users may raise one
+    if not session.get('user_id'):
+        return jsonify({'status': 'error', 'message': 'You must be logged in to create an alert'}), 401
+    data = request.get_json(silent=True) or {}
+    result = disaster_alerts.create_custom_alert(data, created_by=session.get('username', 'farmer'))
+    return jsonify(result)
+
+def alert_ingest_authorized():
+    """Upstream feeds send X-Ingest-Token (AGRISUPER_ALERT_INGEST_TOKEN); admins may ingest from a session"""
+    token = os.environ.get('AGRISUPER_ALERT_INGEST_TOKEN')
+    if token and hmac.compare_digest(request.headers.get('X-Ingest-Token', ''), token):
+        return True
+    return session.get('role') == 'admin'
+
+@app.route('/api/disaster-alerts/ingest', methods=['POST'])
+def ingest_disaster_alert():
+    if not alert_ingest_authorized():
+        return jsonify({'status': 'error', 'message': 'Not authorized to ingest alerts'}), 403
+    result = disaster_alerts.ingest_alert(request.get_json(silent=True) or {})
+    return jsonify(result)
+
+@app.route('/api/disaster-alerts/subscribe', methods=['POST'])
+def subscribe_disaster_alerts():
+    data = request.get_json(silent=True) or {}
+    if 'subscriptions' in data:
+        result = disaster_alerts.subscribe_many(data['subscriptions'])
+    else:
+        result = disaster_alerts.subscribe(data.get('subscriber_id') or data.get('user_id'), data.get('lat'),
+                                           data.get('lon'), location=data.get('location'), phone=data.get('phone'),
+                                           language=data.get('language', 'en'))
+    return jsonify(result), 200 if result['status'] == 'success' else 400
+
+@app.route('/api/disaster-alerts/unsubscribe', methods=['POST'])
+def unsubscribe_disaster_alerts():
+    data = request.json or {}
+    return jsonify(disaster_alerts.unsubscribe(data.get('subscriber_id') or data.get('user_id')))
+
 # Feature 10: Sowing Calendar
 @app.route('/sowing-calendar')
 def sowing_calendar_page():
@@ -541,6 +820,7 @@ def pest_alerts_page():
     return render_template('features/pest_alerts.html')
 
 @app.route('/api/pest-alerts/get-alerts', methods=['GET'])
+@response_cache.cached('pest_alerts', ttl=300)
 def get_pest_alerts():
     location = request.args.get('location', 'all')
     result = pest_alerts.get_alerts(location)
@@ -552,6 +832,7 @@ def elearning_courses_page():
     return render_template('features/elearning_courses.html')
 
 @app.route('/api/elearning/courses', methods=['GET'])
+@response_cache.cached('courses', ttl=300)
 def get_courses():
     filters = request.args.to_dict()
     result = elearning_courses.get_courses(filters)
@@ -586,12 +867,23 @@ def generate_certificate(course_id):
     result = elearning_courses.generate_certificate(course_id, user_id)
     return jsonify(result)
 
+@app.route('/api/elearning/quiz/<course_id>/<module_id>', methods=['GET'])
+def get_course_quiz(course_id, module_id):
+    result = elearning_courses.get_quiz(course_id, module_id)
+    return jsonify(result)
+
+@app.route('/api/elearning/progress/<user_id>', methods=['GET'])
+def get_learner_progress(user_id):
+    result = elearning_courses.get_learner_progress(user_id)
+    return jsonify(result)
+
 # Feature 13: Success Stories
 @app.route('/success-stories')
 def success_stories_page():
     return render_template('features/success_stories.html')
 
 @app.route('/api/success-stories/stories', methods=['GET'])
+@response_cache.cached('stories', ttl=120)
 def get_stories():
     filters = request.args.to_dict()
     result = success_stories.get_stories(filters)
@@ -647,6 +939,23 @@ def get_soil_recommendations():
     result = soil_knowledge.get_recommendations(data)
     return jsonify(result)
 
+@app.route('/api/soil/analyze-batch', methods=['POST'])
+def analyze_soil_batch():
+    """Bulk Soil Health Card analysis: a lab CSV upload or a JSON list of samples"""
+    upload = request.files.get('file')
+    if upload is not None:
+        try:
+            return jsonify(analyze_upload(upload))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object with a samples list'}), 400
+    try:
+        return jsonify(soil_knowledge.analyze_batch(data.get('samples', [])))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/soil/upload-report', methods=['POST'])
 def upload_soil_report():
     data = request.json
@@ -896,13 +1205,25 @@ def fertilizer_price_comparison_page():
 @app.route('/api/fertilizer/compare', methods=['POST'])
 def compare_fertilizer_prices():
     data = request.json
-    result = fertilizer_price_comparison.compare_prices(data)
+    result = fertilizer_price_comparison.compare_prices(
+        data.get('product_name') or data.get('fertilizer_type', ''),
+        data.get('category', 'all'),
+        data.get('location', 'all'))
     return jsonify(result)
 
 @app.route('/api/fertilizer/alerts', methods=['POST'])
 def set_price_alert():
     data = request.json
-    result = fertilizer_price_comparison.set_price_alert(data)
+    result = fertilizer_price_comparison.set_price_alert(
+        data.get('user_id'),
+        data.get('product_name') or data.get('fertilizer_type', ''),
+        data.get('target_price'))
+    return jsonify(result), 200 if result['status'] == 'success' else 400
+
+@app.route('/api/fertilizer/price-update', methods=['POST'])
+def record_fertilizer_price():
+    data = request.json
+    result = fertilizer_price_comparison.record_price(data['product_name'], data['price'])
     return jsonify(result)
 
 # Feature 26: Secondhand Marketplace
@@ -964,9 +1285,8 @@ def get_farmer_trade_listings():
 
 @app.route('/api/farmer-trade/post', methods=['POST'])
 def post_farmer_trade():
-    data = request.json
-    result = farmer_to_farmer_trade.post_trade(data)
-    return jsonify(result)
+    result = sync_trade_listing(request.get_json(silent=True) or {})
+    return jsonify(result), 200 if result.get('status') == 'success' else 400
 
 @app.route('/api/farmer-trade/negotiate', methods=['POST'])
 def negotiate_trade():
@@ -993,10 +1313,27 @@ def join_farmer_group():
 
 @app.route('/api/groups/create', methods=['POST'])
 def create_farmer_group():
-    data = request.json
+    data = request.get_json(silent=True) or {}
     result = farmer_groups.create_group(data)
+    return jsonify(result), 200 if result['success'] else 400
+
+@app.route('/api/groups/leave', methods=['POST'])
+def leave_farmer_group():
+    data = request.json
+    result = farmer_groups.leave_group(data)
     return jsonify(result)
 
+@app.route('/api/groups/stats', methods=['GET'])
+def get_farmer_group_stats():
+    return jsonify(farmer_groups.get_group_stats())
+
+@app.route('/api/groups/<group_id>', methods=['GET'])
+def get_farmer_group(group_id):
+    group = farmer_groups.get_group_by_id(group_id)
+    if group is None:
+        return jsonify({'success': False, 'message': 'Group not found'}), 404
+    return jsonify({'success': True, 'group': group})
+
 # Feature 30: Q&A Forum with Experts
 @app.route('/qa-forum')
 def qa_forum_page():
@@ -1010,9 +1347,8 @@ def get_forum_questions():
 
 @app.route('/api/forum/ask', methods=['POST'])
 def ask_question():
-    data = request.json
-    result = qa_forum.ask_question(data)
-    return jsonify(result)
+    result = sync_forum_question(request.get_json(silent=True) or {})
+    return jsonify(result), 200 if result.get('status') == 'success' else 400
 
 @app.route('/api/forum/answer', methods=['POST'])
 def answer_question():
@@ -1029,7 +1365,7 @@ def mentorship_page():
 def get_mentors():
     filters = request.args.to_dict()
     result = mentorship.get_mentors(filters)
-    return jsonify(result)
+    return jsonify(result), 200 if result['success'] else 400
 
 @app.route('/api/mentorship/request', methods=['POST'])
 def request_mentorship():
@@ -1043,6 +1379,51 @@ def get_mentorship_sessions():
     result = mentorship.get_sessions(user_id)
     return jsonify(result)
 
+@app.route('/api/mentorship/matches/<mentee_id>', methods=['GET'])
+def get_mentor_matches(mentee_id):
+    filters = dict(request.args.to_dict(), mentee_id=mentee_id)
+    result = mentorship.get_mentors(filters)
+    if not result['success']:
+        return jsonify(result), 400
+    if result.get('mentee_id') is None:
+        return jsonify({'success': False, 'message': 'Mentee not found'}), 404
+    return jsonify(result)
+
+def mentorship_admin_error():
+    """401/403 response unless an admin is logged in; cohort-wide mentee changes are admin-only"""
+    if not session.get('user_id'):
+        return jsonify({'success': False, 'message': 'You must be logged in to manage mentees'}), 401
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Only admins can manage mentees'}), 403
+    return None
+
+@app.route('/api/mentorship/mentees', methods=['POST'])
+def add_mentees():
+    error = mentorship_admin_error()
+    if error:
+        return error
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Request body must be a JSON object'}), 400
+    profiles = data.get('mentees', [data] if data else [])
+    result = mentorship.add_mentees(profiles)
+    return jsonify(result), 200 if result['success'] else 400
+
+@app.route('/api/mentorship/assign', methods=['POST'])
+def assign_mentorship_cohort():
+    error = mentorship_admin_error()
+    if error:
+        return error
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Request body must be a JSON object'}), 400
+    try:
+        capacity = int(data.get('capacity', 5))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'capacity must be an integer'}), 400
+    result = mentorship.assign_cohort(data.get('mentee_ids'), max(capacity, 1), apply=bool(data.get('apply', True)))
+    return jsonify(result), 200 if result['success'] else 400
+
 # Feature 32: ID Verification
 @app.route('/id-verification')
 def id_verification_page():
@@ -1050,7 +1431,8 @@ def id_verification_page():
 
 @app.route('/api/verification/submit', methods=['POST'])
 def submit_verification():
-    data = request.json
+    # The verification page posts multipart form data (documents + fields)
+    data = request.get_json(silent=True) or request.form.to_dict()
     result = id_verification.submit_verification(data)
     return jsonify(result)
 
@@ -1059,6 +1441,65 @@ def get_verification_status(user_id):
     result = id_verification.get_status(user_id)
     return jsonify(result)
 
+@app.route('/api/verification/pending', methods=['GET'])
+def get_pending_verifications():
+    return jsonify(id_verification.get_pending_verifications(request.args.get('limit', 50, type=int)))
+
+@app.route('/api/verification/stats', methods=['GET'])
+def get_verification_stats():
+    return jsonify(id_verification.get_verification_stats())
+
+VERIFICATION_REVIEWER_ROLES = ('admin', 'reviewer')
+
+def verification_reviewer():
+    """(reviewer_id, None) for a logged-in admin or reviewer, else (None, error response)"""
+    if not session.get('user_id'):
+        return None, (jsonify({'success': False, 'message': 'You must be logged in to review verifications'}), 401)
+    if session.get('role') not in VERIFICATION_REVIEWER_ROLES:
+        return None, (jsonify({'success': False, 'message': 'Not authorized to review verifications'}), 403)
+    return session['user_id'], None
+
+@app.route('/api/verification/claim', methods=['POST'])
+def claim_verifications():
+    reviewer_id, error = verification_reviewer()
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    try:
+        result = id_verification.claim_verifications(reviewer_id, data.get('limit', 20),
+                                                     data.get('lease_seconds', 900))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify(result), 200 if result['success'] else 400
+
+@app.route('/api/verification/<verification_id>/renew', methods=['POST'])
+def renew_verification_lease(verification_id):
+    reviewer_id, error = verification_reviewer()
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    try:
+        return jsonify(id_verification.renew_verification_lease(verification_id, reviewer_id,
+                                                                data.get('lease_seconds', 900)))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@app.route('/api/verification/<verification_id>/release', methods=['POST'])
+def release_verification(verification_id):
+    reviewer_id, error = verification_reviewer()
+    if error:
+        return error
+    return jsonify(id_verification.release_verification(verification_id, reviewer_id))
+
+@app.route('/api/verification/<verification_id>/decision', methods=['POST'])
+def decide_verification(verification_id):
+    reviewer_id, error = verification_reviewer()
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    return jsonify(id_verification.complete_verification(verification_id, reviewer_id,
+                                                         data.get('decision'), data.get('notes', '')))
+
 # Feature 33: Smart Contract Payments
 @app.route('/smart-contracts')
 def smart_contracts_page():
@@ -1143,6 +1584,7 @@ def calculate_carbon_credits():
     return jsonify(result)
 
 @app.route('/api/carbon/marketplace', methods=['GET'])
+@response_cache.cached('carbon_marketplace', ttl=300)
 def get_carbon_marketplace():
     result = carbon_credits.get_marketplace()
     return jsonify(result)
@@ -1159,10 +1601,22 @@ def admin_dashboard_page():
     return render_template('features/admin_dashboard.html')
 
 @app.route('/api/admin/analytics', methods=['GET'])
+@response_cache.cached('admin_analytics', ttl=30, private=True)
 def get_admin_analytics():
     result = admin_dashboard.get_analytics()
     return jsonify(result)
 
+@app.route('/api/admin/performance', methods=['GET'])
+def get_admin_performance():
+    return jsonify(admin_dashboard.get_performance_stats())
+
+@app.route('/api/admin/activity', methods=['GET'])
+def get_admin_activity():
+    try:
+        return jsonify(admin_dashboard.get_activity(request.args.get('start'), request.args.get('end')))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'start and end must be YYYY-MM-DD dates'}), 400
+
 @app.route('/api/admin/users', methods=['GET'])
 def get_admin_users():
     filters = request.args.to_dict()
@@ -1230,9 +1684,41 @@ def get_sms_commands():
     result = offline_sms.get_commands()
     return jsonify(result)
 
+@app.route('/api/sms/inbound', methods=['POST'])
+def receive_sms():
+    """Gateway webhook for an incoming SMS; the reply is queued, not sent inline"""
+    data = request.get_json(silent=True) or request.form
+    reply = offline_sms.process_sms_command(data.get('from') or data.get('phone'), data.get('text') or data.get('message'))
+    return jsonify({'status': 'queued', 'reply': reply})
+
+@app.route('/api/sms/broadcast', methods=['POST'])
+def broadcast_sms():
+    data = request.json or {}
+    if not data.get('message'):
+        return jsonify({'status': 'error', 'message': 'message is required'}), 400
+    return jsonify(offline_sms.broadcast(data['message'], data.get('phones')))
+
+@app.route('/api/sms/receipt', methods=['POST'])
+def sms_delivery_receipt():
+    data = request.get_json(silent=True) or request.form
+    return jsonify(offline_sms.delivery_receipt(data))
+
+@app.route('/api/sms/status/<message_id>', methods=['GET'])
+def get_sms_status(message_id):
+    result = offline_sms.get_message_status(message_id)
+    if result is None:
+        return jsonify({'status': 'error', 'message': 'Unknown message'}), 404
+    return jsonify(result)
+
+@app.route('/api/sms/stats', methods=['GET'])
+def get_sms_stats():
+    return jsonify(offline_sms.get_sms_statistics())
+
+
 
 
 
+health.mark_ready()
 
 if __name__ == '__main__':
     try:
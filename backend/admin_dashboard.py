@@ -1,17 +1,43 @@
-import json
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import random
+from backend.record_store import load_document
+from backend.analytics_rollups import AnalyticsRollups, to_date
+
+TREND_DAYS = 30
+TOP_KEYS = 10
+
+
+def _state_of(location):
+    """State from {'state': ...} or a 'District, State' string"""
+    if isinstance(location, dict):
+        return location.get("state")
+    if isinstance(location, str) and location.strip():
+        return location.split(",")[-1].strip()
+    return None
+
+
+def _backfill(events, event_type, records, to_event):
+    """Collect (event type, event) pairs for existing rows, skipping ones without a usable date"""
+    for record in records:
+        try:
+            event = to_event(record)
+            to_date(event.get("when"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        events.append((event_type, event))
+
 
 class AdminDashboard:
     def __init__(self, data_folder='data'):
         self.data_file = os.path.join(data_folder, 'admin_dashboard_data.json')
         self.load_data()
+        # Registrations, trades, payments, forum posts... by day, state and crop, from a log every worker reads
+        self.rollups = AnalyticsRollups(os.path.join(data_folder, 'events', 'analytics_events.jsonl'))
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
     
@@ -48,14 +74,174 @@ class AdminDashboard:
             }
         }
     
+    def attach_event_sources(self, user_manager=None, digital_wallet=None, farmer_trade=None, contract_farming=None,
+                             qa_forum=None, subscription_model=None):
+        """Seed the rollups from the engines' current data once, then count their new events as they happen"""
+        rollups = self.rollups
+        seed = []
+        if user_manager is not None:
+            _backfill(seed, "registration", user_manager.data.get("users", []),
+                      lambda user: {"when": user["created_at"], "state": user.get("state")})
+            rollups.track(user_manager, "register_user", "registration",
+                          lambda result, *args, **kwargs: {"when": result["user"]["created_at"]}
+                          if result.get("success") else None)
+        if digital_wallet is not None:
+            _backfill(seed, "payment", [t for t in digital_wallet.data.get("transactions", [])
+                                        if t.get("status") == "Completed"],
+                      lambda txn: {"when": txn["timestamp"], "amount": float(txn["amount"])})
+            rollups.track(digital_wallet, "process_payment", "payment",
+                          lambda result, *args, **kwargs: {"when": result["transaction"]["timestamp"],
+                                                           "amount": float(result["transaction"]["amount"])}
+                          if result.get("success") else None)
+        if farmer_trade is not None:
+            listings = farmer_trade.data.get("peer_offers", []) + farmer_trade.data.get("trade_listings", [])
+            _backfill(seed, "listing", listings,
+                      lambda offer: {"when": offer["posted_date"], "state": _state_of(offer.get("location")),
+                                     "crop": offer.get("product") or offer.get("item_type")})
+            _backfill(seed, "trade", farmer_trade.data.get("successful_trades", []),
+                      lambda trade: {"when": trade["trade_date"], "state": _state_of(trade.get("location")),
+                                     "crop": trade.get("product"),
+                                     "amount": float(trade.get("quantity", 0)) * float(trade.get("final_price", 0))})
+            rollups.track(farmer_trade, "create_trade_offer", "listing",
+                          lambda result, offer, *args, **kwargs: {"state": _state_of(offer.get("location")),
+                                                                  "crop": offer.get("item_type")}
+                          if result.get("status") == "success" else None)
+        if contract_farming is not None:
+            # A new contract is a pending offer, not a completed trade
+            rollups.track(contract_farming, "create_contract", "contract",
+                          lambda contract, *args, **kwargs: {
+                              "when": contract["created_date"], "state": _state_of(contract.get("location")),
+                              "crop": str(contract.get("crop", "")).title() or None,
+                              "amount": float(contract.get("price_per_quintal") or 0) * float(contract.get("quantity") or 0)})
+        if qa_forum is not None:
+            questions = qa_forum.data.get("questions", [])
+            answers = qa_forum.data.get("answers") or [a for q in questions for a in q.get("answers", [])]
+            _backfill(seed, "forum_post", questions,
+                      lambda question: {"when": question.get("posted_date") or question["asked_date"]})
+            _backfill(seed, "forum_post", answers,
+                      lambda answer: {"when": answer.get("answer_date") or answer["answered_date"]})
+            for method in ("add_question", "add_answer"):
+                rollups.track(qa_forum, method, "forum_post", lambda result, *args, **kwargs: {} if result else None)
+        if subscription_model is not None:
+            _backfill(seed, "subscription", subscription_model.subscriptions.get("active_subscriptions", []),
+                      lambda sub: {"when": sub["start_date"], "crop": sub.get("crops"), "amount": float(sub["total_value"])})
+            rollups.track(subscription_model, "create_subscription", "subscription",
+                          lambda result, data, *args, **kwargs: {"crop": data.get("crops"),
+                                                                 "amount": result["data"]["plan_details"]["final_amount"]}
+                          if result.get("success") else None)
+        rollups.seed(seed)
+
     def get_dashboard_stats(self):
-        return self.data.get("platform_stats", {})
+        stats = dict(self.data.get("platform_stats", self.data.get("platform_statistics", {})))
+        self.rollups.refresh()
+        if not self.rollups.events:
+            return stats
+        today = date.today()
+        recent = (today - timedelta(days=TREND_DAYS - 1), today)
+        previous = (recent[0] - timedelta(days=TREND_DAYS), recent[0] - timedelta(days=1))
+        users = self.rollups.totals("registration")
+        new_users = self.rollups.totals("registration", *recent)["count"]
+        earlier_users = self.rollups.totals("registration", *previous)["count"]
+        payments = self.rollups.totals("payment")
+        stats.update({
+            "total_users": users["count"],
+            "new_registrations_monthly": new_users,
+            "monthly_growth": round(100.0 * (new_users - earlier_users) / earlier_users, 1) if earlier_users else None,
+            "listings_posted": self.rollups.totals("listing")["count"],
+            "total_trades": self.rollups.totals("trade")["count"],
+            "contracts_created": self.rollups.totals("contract")["count"],
+            "total_transactions": payments["count"],
+            "total_revenue": payments["amount"],
+            "transaction_value_monthly": self.rollups.totals("payment", *recent)["amount"],
+            "forum_posts": self.rollups.totals("forum_post")["count"],
+            "subscriptions": self.rollups.totals("subscription")["count"]
+        })
+        return stats
+    
+    def get_user_analytics(self, months=6):
+        self.rollups.refresh()
+        if not self.rollups.events:
+            return self.data.get("user_analytics", [])
+        month_starts = [date.today().replace(day=1)]
+        for _ in range(months - 1):
+            month_starts.insert(0, (month_starts[0] - timedelta(days=1)).replace(day=1))
+        rows = []
+        for start in month_starts:
+            end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            rows.append({
+                "month": start.strftime("%b %Y"),
+                "new_users": self.rollups.totals("registration", start, end)["count"],
+                "total_users": self.rollups.totals("registration", None, end)["count"],
+                "forum_posts": self.rollups.totals("forum_post", start, end)["count"],
+                "payments": self.rollups.totals("payment", start, end)["count"]
+            })
+        return {
+            "monthly": rows,
+            "geographic_distribution": self.rollups.breakdown("listing", "state", limit=TOP_KEYS)
+        }
     
-    def get_user_analytics(self):
-        return self.data.get("user_analytics", [])
+    def get_activity(self, start=None, end=None):
+        """Event totals, state and crop breakdowns and daily series for any date range"""
+        end_date = to_date(end)
+        start_date = to_date(start) if start else end_date - timedelta(days=TREND_DAYS - 1)
+        return {
+            "status": "success",
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "totals": self.rollups.summary(start_date, end_date),
+            "by_state": {event: self.rollups.breakdown(event, "state", start_date, end_date, limit=TOP_KEYS)
+                         for event in ("listing", "trade", "contract")},
+            "by_crop": {event: self.rollups.breakdown(event, "crop", start_date, end_date, limit=TOP_KEYS)
+                        for event in ("listing", "trade", "contract", "subscription")},
+            "daily": {event: self.rollups.daily(event, start_date, end_date)
+                      for event in ("registration", "payment", "trade")},
+            "rollups": self.rollups.get_stats()
+        }
     
     def get_system_health(self):
-        return self.data.get("system_health", {})
+        health = dict(self.data.get("system_health", {}))
+        metrics = getattr(self, "metrics", None)
+        if metrics is None:
+            return health
+        by_status = metrics.counter_totals("agrisuper_http_requests_total", "status")
+        requests = sum(by_status.values())
+        if requests:
+            errors = sum(count for status, count in by_status.items() if status.startswith("5"))
+            latency = metrics.totals("agrisuper_http_request_duration_seconds", "method")
+            count = sum(c for c, _ in latency.values())
+            seconds = sum(s for _, s in latency.values())
+            health.update({
+                "requests_served": int(requests),
+                "error_rate": round(100.0 * errors / requests, 3),
+                "api_response_time": f"{1000 * seconds / count:.0f}ms" if count else health.get("api_response_time")
+            })
+        return health
+
+    def get_analytics(self):
+        stats = self.get_dashboard_stats()
+        return {
+            "status": "success",
+            "success": True,
+            "analytics": stats,
+            "platform_stats": stats,
+            "user_analytics": self.get_user_analytics(),
+            "financial_metrics": self.data.get("financial_metrics", {}),
+            "system_health": self.get_system_health(),
+            "performance": self.get_performance_stats()
+        }
+
+    def attach_metrics(self, metrics):
+        """Read live latency data from the app's MetricsRegistry"""
+        self.metrics = metrics
+
+    def get_performance_stats(self):
+        metrics = getattr(self, "metrics", None)
+        if metrics is None:
+            return {}
+        return {
+            "slowest_endpoints": metrics.summary("agrisuper_http_request_duration_seconds", "endpoint")[:10],
+            "engines": metrics.summary("agrisuper_engine_call_duration_seconds", "engine")
+        }
 
     def test_connection(self):
         """Test if the module is working"""
@@ -0,0 +1,294 @@
+"""
+Analytics Rollups
+Incremental daily counters for admin analytics
+
+Domain events (registrations, listings, trades, payments, forum posts,
+subscriptions) are folded into per-day counters as they happen, by event
+type, state and crop. Each (event type, dimension) pair is one dense day x key matrix of
+counts and amounts. Cumulative sums over days are rebuilt lazily from the
+first day written since the last query, so totals and breakdowns over any
+date range are two row lookups and a subtraction, however many events or
+days are stored.
+
+Events reach the rollups through `track`, which wraps an engine method the
+way ResponseCache.invalidate_on does, so every route or job that calls it
+is counted.
+
+Given a log path, events go through a shared EventLog instead of straight
+into this process's counters: every worker folds the same log, so the admin
+pages show the same totals whichever worker answers. Existing records are
+seeded into the log once, while it is still empty, so neither restarts nor
+other workers count them twice.
+
+Usage:
+    rollups = AnalyticsRollups('data/events/analytics_events.jsonl')
+    rollups.publish('payment', when='2024-03-02', state='Punjab', amount=1500)
+    rollups.record('payment', when='2024-03-02', state='Punjab', amount=1500)
+    rollups.totals('payment', start='2024-03-01', end='2024-03-31')
+    rollups.breakdown('trade', 'state', start='2024-03-01', limit=5)
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.event_log import EventLog
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('registration', 'listing', 'trade', 'contract', 'payment', 'forum_post', 'subscription')
+DIMENSIONS = ('total', 'state', 'crop')
+TOTAL_KEY = 'all'
+INITIAL_DAYS = 64
+INITIAL_KEYS = 8
+
+
+def to_date(value) -> date:
+    """date from a date, datetime, 'YYYY-MM-DD...' string, or None (today)"""
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class DailyCounter:
+    """Counts and amounts per (day, key) with cumulative sums over days"""
+
+    def __init__(self, origin: date):
+        self.origin = origin
+        self.days = 0
+        self.keys: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.counts = np.zeros((INITIAL_DAYS, INITIAL_KEYS), dtype=np.int64)
+        self.amounts = np.zeros((INITIAL_DAYS, INITIAL_KEYS), dtype=np.float64)
+        self._prefix_counts = np.zeros((INITIAL_DAYS + 1, INITIAL_KEYS), dtype=np.int64)
+        self._prefix_amounts = np.zeros((INITIAL_DAYS + 1, INITIAL_KEYS), dtype=np.float64)
+        self._dirty_from: Optional[int] = None
+
+    def add(self, day: date, key: str, count: int = 1, amount: float = 0.0):
+        row = self._row(day)
+        column = self.keys.get(key)
+        if column is None:
+            column = self._add_key(key)
+        self.counts[row, column] += count
+        self.amounts[row, column] += amount
+        self.days = max(self.days, row + 1)
+        self._dirty_from = row if self._dirty_from is None else min(self._dirty_from, row)
+
+    def _row(self, day: date) -> int:
+        offset = (day - self.origin).days
+        if offset < 0:
+            # Backfilled history older than anything seen so far: shift rows down
+            self._resize(self.counts.shape[0] - offset, self.counts.shape[1], shift=-offset)
+            self.origin = day
+            self.days -= offset
+            offset = 0
+        if offset >= self.counts.shape[0]:
+            self._resize(max(2 * self.counts.shape[0], offset + 1), self.counts.shape[1])
+        return offset
+
+    def _add_key(self, key: str) -> int:
+        if len(self.names) == self.counts.shape[1]:
+            self._resize(self.counts.shape[0], 2 * self.counts.shape[1])
+        self.keys[key] = len(self.names)
+        self.names.append(key)
+        return self.keys[key]
+
+    def _resize(self, rows: int, columns: int, shift: int = 0):
+        for name in ('counts', 'amounts'):
+            old = getattr(self, name)
+            new = np.zeros((rows, columns), dtype=old.dtype)
+            new[shift:shift + old.shape[0], :old.shape[1]] = old
+            setattr(self, name, new)
+        self._prefix_counts = np.zeros((rows + 1, columns), dtype=np.int64)
+        self._prefix_amounts = np.zeros((rows + 1, columns), dtype=np.float64)
+        self._dirty_from = 0
+
+    def _refresh(self):
+        start = self._dirty_from
+        if start is None:
+            return
+        end = self.days
+        self._prefix_counts[start + 1:end + 1] = self._prefix_counts[start] + np.cumsum(self.counts[start:end], axis=0)
+        self._prefix_amounts[start + 1:end + 1] = self._prefix_amounts[start] + np.cumsum(self.amounts[start:end], axis=0)
+        self._dirty_from = None
+
+    def window(self, start: Optional[date], end: Optional[date]) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-key (counts, amounts) summed over [start, end], inclusive"""
+        self._refresh()
+        first = 0 if start is None else min(max((start - self.origin).days, 0), self.days)
+        last = self.days if end is None else min(max((end - self.origin).days + 1, 0), self.days)
+        width = len(self.names)
+        if first >= last:
+            return np.zeros(width, dtype=np.int64), np.zeros(width, dtype=np.float64)
+        return (self._prefix_counts[last, :width] - self._prefix_counts[first, :width],
+                self._prefix_amounts[last, :width] - self._prefix_amounts[first, :width])
+
+    def daily(self, start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+        """Day-by-day (counts, amounts) over all keys for [start, end]"""
+        length = (end - start).days + 1
+        counts = np.zeros(max(length, 0), dtype=np.int64)
+        amounts = np.zeros(max(length, 0), dtype=np.float64)
+        first = max((start - self.origin).days, 0)
+        last = min((end - self.origin).days + 1, self.days)
+        if first < last:
+            offset = (self.origin - start).days + first
+            counts[offset:offset + last - first] = self.counts[first:last, :len(self.names)].sum(axis=1)
+            amounts[offset:offset + last - first] = self.amounts[first:last, :len(self.names)].sum(axis=1)
+        return counts, amounts
+
+
+class AnalyticsRollups:
+    """Daily rollups of domain events by type, state and crop"""
+
+    def __init__(self, log_path: Optional[str] = None):
+        self._counters: Dict[Tuple[str, str], DailyCounter] = {}
+        self._lock = threading.Lock()
+        self.events = 0
+        self.log = EventLog(log_path, self._apply, reset=self._clear) if log_path else None
+
+    def _apply(self, event: Dict, end_offset: int):
+        event = dict(event)
+        self.record(event.pop('type'), **event)
+
+    def _clear(self):
+        with self._lock:
+            self._counters = {}
+            self.events = 0
+
+    def refresh(self):
+        """Fold in events other workers appended to the shared log"""
+        if self.log is not None:
+            self.log.refresh()
+
+    @staticmethod
+    def _event(event_type: str, when=None, **fields) -> Dict:
+        return {'type': event_type, 'when': to_date(when).isoformat(), **fields}
+
+    def publish(self, event_type: str, **event):
+        """Record one event; with a log, append it so every worker counts it"""
+        if self.log is None:
+            self.record(event_type, **event)
+        else:
+            self.log.append(lambda: [self._event(event_type, **event)])
+
+    def seed(self, events: Iterable[Tuple[str, Dict]]):
+        """
+        Backfill (event type, record() kwargs) pairs from existing records.
+        With a log they are appended only while the log is empty; afterwards
+        the log already holds them and new events arrive through publish().
+        """
+        events = list(events)
+        if self.log is None:
+            for event_type, event in events:
+                self.record(event_type, **event)
+            return
+        self.log.append(lambda: [] if self.log.events else [self._event(event_type, **event)
+                                                             for event_type, event in events])
+
+    def record(self, event_type: str, when=None, state: Optional[str] = None, crop=None,
+               amount: float = 0.0, count: int = 1):
+        """
+        Count one event (or `count` of them). `crop` may be a list; each crop
+        is counted and the amount is split evenly between them.
+        """
+        day = to_date(when)
+        crops = [c for c in ([crop] if isinstance(crop, str) else crop or ()) if c]
+        with self._lock:
+            self._counter(event_type, 'total', day).add(day, TOTAL_KEY, count, amount)
+            if state:
+                self._counter(event_type, 'state', day).add(day, str(state), count, amount)
+            for name in crops:
+                self._counter(event_type, 'crop', day).add(day, str(name), count, amount / len(crops))
+            self.events += count
+
+    def record_many(self, event_type: str, events: Iterable[Dict]):
+        """Backfill: each event is a dict of record() keyword arguments"""
+        for event in events:
+            self.record(event_type, **event)
+
+    def _counter(self, event_type: str, dimension: str, day: date) -> DailyCounter:
+        counter = self._counters.get((event_type, dimension))
+        if counter is None:
+            counter = self._counters[(event_type, dimension)] = DailyCounter(day)
+        return counter
+
+    def totals(self, event_type: str, start=None, end=None) -> Dict:
+        breakdown = self.breakdown(event_type, 'total', start, end)
+        return breakdown[0] if breakdown else {'key': TOTAL_KEY, 'count': 0, 'amount': 0.0}
+
+    def breakdown(self, event_type: str, dimension: str, start=None, end=None, limit: Optional[int] = None) -> List[Dict]:
+        """[{'key', 'count', 'amount'}] for one dimension over a date range, most frequent first"""
+        start = to_date(start) if start is not None else None
+        end = to_date(end) if end is not None else None
+        self.refresh()
+        with self._lock:
+            counter = self._counters.get((event_type, dimension))
+            if counter is None:
+                return []
+            counts, amounts = counter.window(start, end)
+            names = list(counter.names)
+        order = np.argsort(-counts, kind='stable')
+        rows = [{'key': names[i], 'count': int(counts[i]), 'amount': round(float(amounts[i]), 2)}
+                for i in order if counts[i]]
+        return rows[:limit] if limit else rows
+
+    def daily(self, event_type: str, start, end) -> List[Dict]:
+        start, end = to_date(start), to_date(end)
+        self.refresh()
+        with self._lock:
+            counter = self._counters.get((event_type, 'total'))
+            if counter is None:
+                counts = np.zeros((end - start).days + 1, dtype=np.int64)
+                amounts = np.zeros_like(counts, dtype=np.float64)
+            else:
+                counts, amounts = counter.daily(start, end)
+        return [{'date': (start + timedelta(days=i)).isoformat(), 'count': int(counts[i]),
+                 'amount': round(float(amounts[i]), 2)} for i in range(len(counts))]
+
+    def summary(self, start=None, end=None) -> Dict[str, Dict]:
+        return {event_type: self.totals(event_type, start, end) for event_type in EVENT_TYPES}
+
+    def track(self, engine, method_name: str, event_type: str, extract: Callable):
+        """
+        Wrap an engine method so each successful call is recorded.
+        `extract(result, *args, **kwargs)` returns record() keyword arguments,
+        or None when the call did not produce an event (validation error etc).
+        A failing extract is logged; it never fails the domain write.
+        """
+        method = getattr(engine, method_name, None)
+        if method is None:
+            return
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            result = method(*args, **kwargs)
+            try:
+                event = extract(result, *args, **kwargs)
+                if event is not None:
+                    self.publish(event_type, **event)
+            except Exception:
+                logger.exception("Could not record %s event from %s.%s", event_type,
+                                 type(engine).__name__, method_name)
+            return result
+
+        setattr(engine, method_name, wrapper)
+
+    def get_stats(self) -> Dict:
+        self.refresh()
+        with self._lock:
+            return {
+                'events': self.events,
+                'series': len(self._counters),
+                'keys': sum(len(counter.names) for counter in self._counters.values()),
+                'days': max((counter.days for counter in self._counters.values()), default=0),
+                'bytes': sum(counter.counts.nbytes + counter.amounts.nbytes + counter._prefix_counts.nbytes
+                             + counter._prefix_amounts.nbytes for counter in self._counters.values())
+            }
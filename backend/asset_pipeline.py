@@ -0,0 +1,398 @@
+"""
+Static Asset Pipeline for app.py
+Builds minified, content-hashed and precompressed static assets, and serves
+the precompressed variants based on the client's Accept-Encoding.
+
+Build once per deploy:
+    python -m backend.asset_pipeline
+
+Output goes to static/dist/ together with static/dist/asset-manifest.json, which
+maps logical asset paths (e.g. 'css/main.css') to their fingerprinted files.
+"""
+
+from flask import request, send_from_directory
+import gzip
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always built
+    brotli = None
+
+
+STATIC_FOLDER = 'static'
+DIST_SUBDIR = 'dist'
+MANIFEST_NAME = 'asset-manifest.json'
+
+# All stylesheets in static/css as one file, shared styles first. Templates link it with
+# url_for('static', filename='css/bundle.css') like any other asset
+CSS_BUNDLE_NAME = 'css/bundle.css'
+CSS_BUNDLE_FIRST = ['css/main.css', 'css/navbar-fixes.css']
+
+# Files that must keep a stable URL (service worker scope, PWA manifest)
+STABLE_ASSETS = ['js/service-worker.js', 'manifest.json']
+
+HASHED_MAX_AGE = 365 * 24 * 3600
+STABLE_MAX_AGE = 0
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.html', '.svg', '.txt')
+
+
+def minify_css(source: str) -> str:
+    """Strip comments and redundant whitespace from a stylesheet"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    # Only a ':' inside a declaration block separates property and value; in a
+    # selector "a :hover" and "a:hover" match different elements
+    source = re.sub(r'\s*:\s*(?=[^{}]*})', ':', source)
+    source = source.replace(';}', '}')
+    return source.strip()
+
+
+# After one of these (or at the start of a statement) a '/' opens a regex, not a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+                   'case', 'do', 'else', 'yield', 'await'}
+
+
+def _regex_allowed(out) -> bool:
+    i = len(out) - 1
+    while i >= 0 and out[i] in ' \n':
+        i -= 1
+    if i < 0 or out[i][-1] in _REGEX_PRECEDERS:
+        return True
+    end = i + 1
+    while i >= 0 and (out[i].isalnum() or out[i] in '_$'):
+        i -= 1
+    return ''.join(out[i + 1:end]) in _REGEX_KEYWORDS
+
+
+def minify_js(source: str) -> str:
+    """
+    Token-aware JS minification: drops comments, indentation, blank lines and
+    runs of spaces in code. String, template and regex literals are copied
+    verbatim, so text inside them that looks like a comment or indentation is
+    kept. Line breaks in code are kept as well, so automatic semicolon
+    insertion behaves as in the source.
+    """
+    out = []
+    templates = []      # open ${ ... } depth per enclosing template literal
+    pending_space = False
+    i, n = 0, len(source)
+
+    def copy_literal(start, quote):
+        """Copy a '...' or "..." string; returns the index after it"""
+        j = start + 1
+        while j < n and source[j] != quote and source[j] != '\n':
+            j += 2 if source[j] == '\\' else 1
+        out.append(source[start:j + 1])
+        return j + 1
+
+    def copy_template(start):
+        """Copy template text from its opening ` or } to the closing ` or the next ${; returns (index, opened)"""
+        j = start + 1
+        while j < n:
+            if source[j] == '\\':
+                j += 2
+            elif source[j] == '`':
+                out.append(source[start:j + 1])
+                return j + 1, False
+            elif source.startswith('${', j):
+                out.append(source[start:j + 2])
+                return j + 2, True
+            else:
+                j += 1
+        out.append(source[start:])
+        return n, False
+
+    def copy_regex(start):
+        j, in_class = start + 1, False
+        while j < n and source[j] != '\n':
+            if source[j] == '\\':
+                j += 2
+                continue
+            if source[j] == '[':
+                in_class = True
+            elif source[j] == ']':
+                in_class = False
+            elif source[j] == '/' and not in_class:
+                break
+            j += 1
+        j += 1
+        while j < n and (source[j].isalnum() or source[j] == '_'):
+            j += 1
+        out.append(source[start:j])
+        return j
+
+    while i < n:
+        c = source[i]
+        if c in ' \t\r':
+            pending_space = True
+            i += 1
+            continue
+        if c == '\n':
+            pending_space = False
+            if out and out[-1] != '\n':
+                out.append('\n')
+            i += 1
+            continue
+        if source.startswith('//', i):
+            i = source.find('\n', i)
+            i = n if i == -1 else i
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            if '\n' in source[i:end]:
+                pending_space = False
+                if out and out[-1] != '\n':
+                    out.append('\n')
+            else:
+                pending_space = True
+            i = end
+            continue
+        if pending_space and out and out[-1] != '\n':
+            out.append(' ')
+        pending_space = False
+        if c in '\'"':
+            i = copy_literal(i, c)
+        elif c == '`':
+            i, opened = copy_template(i)
+            if opened:
+                templates.append(0)
+        elif c == '/' and _regex_allowed(out):
+            i = copy_regex(i)
+        elif c == '}' and templates and templates[-1] == 0:
+            templates.pop()
+            i, opened = copy_template(i)
+            if opened:
+                templates.append(0)
+        else:
+            if templates and c == '{':
+                templates[-1] += 1
+            elif templates and c == '}':
+                templates[-1] -= 1
+            out.append(c)
+            i += 1
+    text = ''.join(out).strip()
+    return text + '\n' if text else ''
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _fingerprinted_name(logical_path: str, digest: str) -> str:
+    root, ext = os.path.splitext(logical_path)
+    return f"{root}.{digest}{ext}"
+
+
+def _write_variants(path: str, data: bytes):
+    """Write a file plus its .gz (and .br when brotli is installed) siblings"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def _minify(logical_path: str, text: str) -> str:
+    if logical_path.endswith('.css'):
+        return minify_css(text)
+    if logical_path.endswith('.js'):
+        return minify_js(text)
+    return text
+
+
+def _rewrite_critical_assets(source: str, assets: Dict[str, str], build_id: str) -> str:
+    """Point the service worker's precache list and cache name at the current build"""
+    def rewrite(match):
+        url = match.group(1)
+        logical = url[len('/static/'):] if url.startswith('/static/') else None
+        if logical in assets:
+            return f"'/static/{assets[logical]}'"
+        return match.group(0)
+
+    start = source.find('const CRITICAL_ASSETS')
+    if start != -1:
+        end = source.find('];', start)
+        block = re.sub(r"'([^']+)'", rewrite, source[start:end])
+        source = source[:start] + block + source[end:]
+    return re.sub(r"const CACHE_NAME = '([^']+)';", rf"const CACHE_NAME = '\1-{build_id}';", source, count=1)
+
+
+def build_assets(static_folder: str = STATIC_FOLDER, extra_assets: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Minify, bundle, fingerprint and precompress static CSS/JS.
+
+    Args:
+        static_folder: Flask static folder to read from and write dist/ into
+        extra_assets: logical path -> text for generated assets (e.g. farmer-ui.css)
+
+    Returns:
+        The manifest that was written
+    """
+    dist_folder = os.path.join(static_folder, DIST_SUBDIR)
+    sources = {}
+    for subdir in ('css', 'js'):
+        folder = os.path.join(static_folder, subdir)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(('.css', '.js')):
+                with open(os.path.join(folder, name), 'r', encoding='utf-8') as f:
+                    sources[f"{subdir}/{name}"] = f.read()
+    # Only stylesheets shipped in static/css go into the bundle, not generated extras
+    css_order = [p for p in CSS_BUNDLE_FIRST if p in sources] + \
+        sorted(p for p in sources if p.endswith('.css') and p not in CSS_BUNDLE_FIRST)
+    sources.update(extra_assets or {})
+
+    minified = {path: _minify(path, text) for path, text in sources.items() if path not in STABLE_ASSETS}
+    minified[CSS_BUNDLE_NAME] = '\n'.join(minified[p] for p in css_order if minified[p])
+
+    assets = {}
+    for logical_path, text in minified.items():
+        data = text.encode('utf-8')
+        hashed = _fingerprinted_name(logical_path, _content_hash(data))
+        _write_variants(os.path.join(dist_folder, hashed), data)
+        assets[logical_path] = f"{DIST_SUBDIR}/{hashed}"
+
+    build_id = _content_hash(json.dumps(assets, sort_keys=True).encode('utf-8'))
+
+    stable = {}
+    for logical_path in STABLE_ASSETS:
+        source_path = os.path.join(static_folder, logical_path)
+        if not os.path.exists(source_path):
+            continue
+        with open(source_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        if logical_path == 'js/service-worker.js':
+            text = _rewrite_critical_assets(text, assets, build_id)
+        _write_variants(os.path.join(dist_folder, logical_path), text.encode('utf-8'))
+        stable[logical_path] = f"{DIST_SUBDIR}/{logical_path}"
+
+    manifest = {
+        'build_id': build_id,
+        'assets': assets,
+        'stable': stable,
+        'bundles': {CSS_BUNDLE_NAME: css_order}
+    }
+    with open(os.path.join(dist_folder, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """Runtime view of static/dist/asset-manifest.json"""
+
+    def __init__(self, static_folder: str = STATIC_FOLDER):
+        self.static_folder = static_folder
+        self.reload()
+
+    def reload(self):
+        path = os.path.join(self.static_folder, DIST_SUBDIR, MANIFEST_NAME)
+        try:
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+        self.build_id = manifest.get('build_id')
+        self.assets = manifest.get('assets', {})
+        self.stable = manifest.get('stable', {})
+
+    def resolve(self, filename: str) -> str:
+        """Fingerprinted path for a logical static filename, or the filename itself"""
+        return self.assets.get(filename, filename)
+
+    def stable_path(self, filename: str) -> Optional[str]:
+        return self.stable.get(filename)
+
+
+def _accepted_encodings() -> set:
+    header = request.headers.get('Accept-Encoding', '')
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def send_precompressed(directory: str, filename: str, mimetype: Optional[str] = None, max_age: int = STABLE_MAX_AGE):
+    """
+    Serve directory/filename, preferring a prebuilt .br or .gz sibling when the
+    client accepts that encoding.
+    """
+    accepted = _accepted_encodings()
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted and os.path.exists(os.path.join(directory, filename + suffix)):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, max_age=max_age)
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    if max_age >= HASHED_MAX_AGE:
+        response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    return response
+
+
+def _guess_mimetype(filename: str) -> Optional[str]:
+    if filename.endswith('.css'):
+        return 'text/css'
+    if filename.endswith('.js'):
+        return 'application/javascript'
+    if filename.endswith('.json'):
+        return 'application/json'
+    return None
+
+
+def register_asset_pipeline(app, static_folder: str = STATIC_FOLDER) -> AssetManifest:
+    """
+    Wire the asset manifest into the application:
+
+    - url_for('static', filename=...) resolves to fingerprinted dist/ files
+    - /static/dist/<path> serves precompressed variants with long-lived caching
+    """
+    manifest = AssetManifest(os.path.join(app.root_path, static_folder))
+    app.extensions['asset_manifest'] = manifest
+    dist_folder = os.path.join(app.root_path, static_folder, DIST_SUBDIR)
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = manifest.resolve(values['filename'])
+
+    @app.route('/static/dist/<path:filename>')
+    def serve_dist_asset(filename):
+        """Serve a built asset, precompressed when possible"""
+        max_age = STABLE_MAX_AGE if filename in STABLE_ASSETS else HASHED_MAX_AGE
+        return send_precompressed(dist_folder, filename, _guess_mimetype(filename), max_age)
+
+    return manifest
+
+
+if __name__ == '__main__':
+    from backend.farmer_friendly_ui import FARMER_UI_CSS
+
+    built = build_assets(extra_assets={'css/farmer-ui.css': FARMER_UI_CSS})
+    print("=" * 60)
+    print("STATIC ASSET BUILD")
+    print("=" * 60)
+    print(f"Build: {built['build_id']}  (brotli: {'yes' if brotli else 'not installed'})")
+    for logical, hashed in sorted(built['assets'].items()):
+        print(f"  {logical:35s} -> {hashed}")
+    for logical, path in sorted(built['stable'].items()):
+        print(f"  {logical:35s} -> {path}")
@@ -0,0 +1,387 @@
+"""
+Benchmark Suite
+Reproducible latency, throughput and memory benchmarks for engine hot paths
+and Flask routes
+
+    python -m backend.benchmarks                          # 1x/10x/100x, default iterations
+    python -m backend.benchmarks --scales 1 10 --iterations 500 --output bench.json
+    python -m backend.benchmarks --baseline bench.json --threshold 0.15
+
+Every dataset is generated from the seed (snapshots and the shared store are
+bypassed) and then replicated to the requested scale, so two runs with the
+same seed measure identical work. The run works on a copy of data/ in a
+temporary directory, with its own metrics and SMS rate-limit directories, so
+writes made by the measured code never touch the real data, event logs or
+node-wide metrics. Results are written as JSON; with
+--baseline the run is compared case by case and the exit code is 1 if any
+case's p95 regressed by more than the threshold.
+"""
+
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from backend.metrics import METRICS_DIR_ENV
+from backend.shared_reference import bypass_snapshots
+from backend.sms_gateway import RATE_LIMIT_DIR_ENV
+
+DEFAULT_SCALES = (1, 10, 100)
+DEFAULT_ITERATIONS = 200
+WARMUP_ITERATIONS = 10
+
+
+def _case_seed(seed: int, *parts) -> int:
+    return zlib.crc32(':'.join(str(p) for p in (seed,) + parts).encode('utf-8'))
+
+
+def _seed_all(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+@contextmanager
+def isolated_data_dir(data_folder: str = 'data'):
+    """
+    Run with the working directory in a temporary copy of data_folder (event
+    logs and snapshots excluded), and with metrics and SMS rate limits in
+    private directories. Everything is removed afterwards.
+    """
+    root = tempfile.mkdtemp(prefix='agrisuper-bench-')
+    previous_cwd = os.getcwd()
+    previous_env = {name: os.environ.get(name) for name in (METRICS_DIR_ENV, RATE_LIMIT_DIR_ENV)}
+    if os.path.isdir(data_folder):
+        shutil.copytree(data_folder, os.path.join(root, 'data'), ignore=shutil.ignore_patterns('events', 'snapshots'))
+    os.environ[METRICS_DIR_ENV] = os.path.join(root, 'metrics')
+    os.environ[RATE_LIMIT_DIR_ENV] = os.path.join(root, 'sms-rates')
+    os.chdir(root)
+    try:
+        yield root
+    finally:
+        os.chdir(previous_cwd)
+        for name, value in previous_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(root, ignore_errors=True)
+
+
+class _StaticReference:
+    """Stands in for a ReferenceHandle so a case's scaled data is never swapped for a rebuilt generation"""
+
+    def __init__(self, data):
+        self._data = data
+
+    def get(self):
+        return self._data
+
+
+def _replicate(records: List[Dict], scale: int, relabel: Callable[[Dict, int], None]) -> List[Dict]:
+    """records repeated `scale` times; copy k (k >= 1) is passed to relabel to get unique keys"""
+    scaled = list(records)
+    for k in range(1, scale):
+        for record in records:
+            clone = copy.deepcopy(record)
+            relabel(clone, k)
+            scaled.append(clone)
+    return scaled
+
+
+# ---------------------------------------------------------------- engine cases
+#
+# Each case factory takes (scale, rng) and returns a zero-argument callable
+# performing one operation. Engines are built and scaled outside the timing.
+
+def pricing_case(scale: int, rng: random.Random) -> Callable:
+    from backend.pricing_engine import PricingEngine
+    engine = PricingEngine()
+    history = {crop: dict(by_state) for crop, by_state in engine.historical_data.items()}
+    for by_state in history.values():
+        for state in list(by_state):
+            for k in range(1, scale):
+                by_state[f"{state} {k}"] = by_state[state]
+    engine._historical = _StaticReference(history)
+    queries = [(crop, state, rng.randint(50, 2000))
+               for crop in engine.historical_data for state in engine.historical_data[crop]]
+    rng.shuffle(queries)
+    it = iter(queries * 1000)
+    return lambda: engine.get_dynamic_price(*next(it))
+
+
+def market_comparison_case(scale: int, rng: random.Random) -> Callable:
+    from backend.market_comparison import MarketComparisonEngine
+    engine = MarketComparisonEngine()
+    markets = dict(engine.markets_data)
+    for k in range(1, scale):
+        for name, data in engine.markets_data.items():
+            markets[f"{name} #{k}"] = data
+    engine.markets_data = markets
+    crops = ["wheat", "rice", "tomato", "onion", "potato", "cotton", "sugarcane", "maize"]
+    queries = [(rng.choice(crops), rng.randint(1, 50), rng.choice(['Delhi', 'Pune', 'Jaipur'])) for _ in range(256)]
+    it = iter(queries * 1000)
+    return lambda: engine.compare_markets(*next(it))
+
+
+def equipment_search_case(scale: int, rng: random.Random) -> Callable:
+    from backend.equipment_rental import EquipmentRental
+    engine = EquipmentRental()
+
+    def relabel(item, k):
+        item['equipment_id'] = f"{item['equipment_id']}-{k}"
+    engine.equipment_listings = _replicate(engine.equipment_listings, scale, relabel)
+    categories = sorted({e['category'] for e in engine.equipment_listings}) + ['all']
+    locations = ['Punjab', 'Gujarat', 'Maharashtra', 'all']
+    queries = [(rng.choice(categories), rng.choice(locations)) for _ in range(256)]
+    it = iter(queries * 1000)
+    return lambda: engine.search_equipment(*next(it))
+
+
+def qa_related_case(scale: int, rng: random.Random) -> Callable:
+    from backend.qa_forum import QAForumManager
+    engine = QAForumManager()
+    engine.data = engine.generate_default_data()
+    base = max(q['id'] for q in engine.data['questions'])
+
+    def relabel(question, k):
+        question['id'] = question['id'] + k * base
+    engine.data['questions'] = _replicate(engine.data['questions'], scale, relabel)
+    ids = [q['id'] for q in engine.data['questions']]
+    queries = [rng.choice(ids) for _ in range(256)]
+    it = iter(queries * 1000)
+    return lambda: engine.get_related_questions(next(it))
+
+
+def route_optimization_case(scale: int, rng: random.Random) -> Callable:
+    from backend.route_optimization import RouteOptimizer
+    engine = RouteOptimizer()
+
+    def relabel(segment, k):
+        segment['from_city'] = f"{segment['from_city']} {k}"
+    engine.road_network = _replicate(engine.road_network, scale, relabel)
+    cities = sorted({r['from_city'] for r in engine.road_network[:50]} | {r['to_city'] for r in engine.road_network[:50]})
+    queries = [(rng.sample(cities, min(3, len(cities))), rng.choice(cities)) for _ in range(256)]
+    it = iter(queries * 1000)
+    return lambda: engine.optimize_route(*next(it))
+
+
+def wallet_payment_case(scale: int, rng: random.Random) -> Callable:
+    from backend.digital_wallet import DigitalWallet
+    engine = DigitalWallet()
+    engine.data = engine.get_default_data()
+
+    def relabel(wallet, k):
+        wallet['wallet_id'] = f"{wallet['wallet_id']}-{k}"
+    engine.data['wallets'] = _replicate(engine.data['wallets'], scale, relabel)
+    ids = [w['wallet_id'] for w in engine.data['wallets']]
+    queries = [(rng.choice(ids), rng.randint(10, 500), 'Benchmark payment', rng.choice(['Debit', 'Credit']))
+               for _ in range(256)]
+    it = iter(queries * 1000)
+    return lambda: engine.process_payment(*next(it))
+
+
+ENGINE_CASES = {
+    'pricing.get_dynamic_price': pricing_case,
+    'market_comparison.compare_markets': market_comparison_case,
+    'equipment_rental.search_equipment': equipment_search_case,
+    'qa_forum.get_related_questions': qa_related_case,
+    'route_optimization.optimize_route': route_optimization_case,
+    'digital_wallet.process_payment': wallet_payment_case,
+}
+
+# (method, path, json body) driven through the Flask test client at 1x
+ROUTE_CASES = {
+    'route.pricing_get_price': ('POST', '/api/pricing-engine/get-price',
+                                {'crop': 'Rice', 'location': 'Punjab', 'quantity': 500}),
+    'route.elearning_courses': ('GET', '/api/elearning/courses?category=Crop+Management', None),
+    'route.disaster_alerts': ('GET', '/api/disaster-alerts/get-alerts', None),
+    'route.pest_alerts': ('GET', '/api/pest-alerts/get-alerts', None),
+    'route.admin_analytics': ('GET', '/api/admin/analytics', None),
+    'route.metrics': ('GET', '/metrics', None),
+}
+
+
+def route_case_factory(client, method: str, path: str, body: Optional[Dict]) -> Callable:
+    # Measure the route itself, not a ResponseCache hit
+    headers = {'Cache-Control': 'no-cache'}
+
+    def call():
+        response = client.open(path, method=method, json=body, headers=headers)
+        if response.status_code >= 500:
+            raise RuntimeError(f"{method} {path} -> {response.status_code}")
+        return response
+    return call
+
+
+# --------------------------------------------------------------------- runner
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = q * (len(sorted_values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def measure(operation: Callable, iterations: int) -> Dict:
+    """Time `iterations` calls, then re-run a short pass under tracemalloc for peak memory"""
+    for _ in range(WARMUP_ITERATIONS):
+        operation()
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    timings = []
+    errors = 0
+    started = time.perf_counter()
+    try:
+        for _ in range(iterations):
+            t0 = time.perf_counter_ns()
+            try:
+                operation()
+            except Exception:
+                errors += 1
+            timings.append(time.perf_counter_ns() - t0)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for _ in range(min(iterations, 20)):
+        try:
+            operation()
+        except Exception:
+            pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings_ms = sorted(t / 1e6 for t in timings)
+    return {
+        'iterations': iterations,
+        'errors': errors,
+        'mean_ms': round(sum(timings_ms) / len(timings_ms), 4),
+        'p50_ms': round(_percentile(timings_ms, 0.50), 4),
+        'p90_ms': round(_percentile(timings_ms, 0.90), 4),
+        'p95_ms': round(_percentile(timings_ms, 0.95), 4),
+        'p99_ms': round(_percentile(timings_ms, 0.99), 4),
+        'max_ms': round(timings_ms[-1], 4),
+        'throughput_ops': round(iterations / elapsed, 1) if elapsed else 0.0,
+        'peak_alloc_kb': round(peak / 1024, 1)
+    }
+
+
+def run_benchmarks(seed: int = 42, scales=DEFAULT_SCALES, iterations: int = DEFAULT_ITERATIONS,
+                   cases: Optional[List[str]] = None, include_routes: bool = True) -> Dict:
+    results = []
+    with bypass_snapshots(), isolated_data_dir():
+        for name, factory in ENGINE_CASES.items():
+            if cases and name not in cases:
+                continue
+            for scale in scales:
+                case_seed = _case_seed(seed, name, scale)
+                _seed_all(case_seed)
+                operation = factory(scale, random.Random(case_seed))
+                _seed_all(case_seed)
+                results.append(dict(case=name, scale=scale, **measure(operation, iterations)))
+                print(f"  {name:38s} {scale:>4d}x  p50={results[-1]['p50_ms']:.3f}ms  "
+                      f"p95={results[-1]['p95_ms']:.3f}ms  {results[-1]['throughput_ops']:.0f} ops/s")
+
+        if include_routes:
+            _seed_all(_case_seed(seed, 'app'))
+            from app import app
+            client = app.test_client()
+            for name, (method, path, body) in ROUTE_CASES.items():
+                if cases and name not in cases:
+                    continue
+                _seed_all(_case_seed(seed, name))
+                results.append(dict(case=name, scale=1,
+                                    **measure(route_case_factory(client, method, path, body), iterations)))
+                print(f"  {name:38s}    1x  p50={results[-1]['p50_ms']:.3f}ms  "
+                      f"p95={results[-1]['p95_ms']:.3f}ms  {results[-1]['throughput_ops']:.0f} ops/s")
+
+    return {
+        'created': datetime.now().isoformat(),
+        'seed': seed,
+        'scales': list(scales),
+        'iterations': iterations,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results
+    }
+
+
+def compare_to_baseline(current: Dict, baseline: Dict, threshold: float = 0.10) -> List[Dict]:
+    """Per-case p50/p95 change against a baseline run; flags p95 regressions over threshold"""
+    previous = {(r['case'], r['scale']): r for r in baseline.get('results', [])}
+    rows = []
+    for result in current['results']:
+        before = previous.get((result['case'], result['scale']))
+        if before is None:
+            continue
+        p50_change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0.0
+        p95_change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        rows.append({
+            'case': result['case'],
+            'scale': result['scale'],
+            'p50_change': round(p50_change, 4),
+            'p95_change': round(p95_change, 4),
+            'regressed': p95_change > threshold
+        })
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the AgriSuper benchmark suite')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES))
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--cases', nargs='*', help='only run these cases')
+    parser.add_argument('--no-routes', action='store_true', help='skip Flask route cases')
+    parser.add_argument('--output', help='results JSON path (default logs/benchmarks/<timestamp>.json)')
+    parser.add_argument('--baseline', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed p95 regression (fraction)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARKS")
+    print("=" * 60)
+    report = run_benchmarks(args.seed, args.scales, args.iterations, args.cases, not args.no_routes)
+
+    output = args.output or os.path.join('logs', 'benchmarks', f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}  (peak RSS {report['peak_rss_kb']} KB)")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            comparison = compare_to_baseline(report, json.load(f), args.threshold)
+        print("-" * 60)
+        for row in comparison:
+            flag = 'REGRESSION' if row['regressed'] else ''
+            print(f"  {row['case']:38s} {row['scale']:>4d}x  p50 {row['p50_change']:+.1%}  "
+                  f"p95 {row['p95_change']:+.1%}  {flag}")
+        if any(row['regressed'] for row in comparison):
+            sys.exit(1)
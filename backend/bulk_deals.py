@@ -1,6 +1,14 @@
 import json
+import os
+import threading
 from datetime import datetime, timedelta
+from itertools import islice
 import random
+from backend.event_log import EventLog
+from backend.shared_reference import load_reference
+
+# Share of the full bulk discount unlocked at each fraction of the pool's target volume
+PRICE_TIER_STEPS = [(0.0, 0.25), (0.25, 0.5), (0.5, 0.75), (1.0, 1.0)]
 
 class BulkDealsEngine:
     def __init__(self, data_folder='data'):
@@ -19,7 +27,12 @@ class BulkDealsEngine:
             {"id": 4, "name": "Rural Equipment Ltd", "rating": 4.6, "deals_completed": 750}
         ]
         
-        self.active_deals = self._generate_bulk_deals()
+        self.active_deals = load_reference('bulk_deals', self._generate_bulk_deals, mutable=True)
+        self._build_deal_indexes()
+        # Joins go through a shared event log so every worker sees the same pools; each join
+        # is checked and appended under the log's cross-process lock
+        self.join_log = EventLog(os.path.join(data_folder, 'events', 'bulk_deal_joins.jsonl'),
+                                 self._apply_join, reset=self._reset_joins)
         
     def _generate_bulk_deals(self):
         deals = []
@@ -48,24 +61,138 @@ class BulkDealsEngine:
                 "deal_description": f"Bulk purchase opportunity for {product} with significant savings",
                 "terms_conditions": "Payment on delivery, Quality guarantee, Return policy applicable"
             }
+            deal["committed_quantity"] = deal["participants_joined"] * deal["minimum_quantity"]
+            deal["price_tiers"] = self._build_price_tiers(deal)
+            deal["current_tier"] = self._tier_for(deal, deal["committed_quantity"])
             deals.append(deal)
         return deals
     
+    def _build_price_tiers(self, deal):
+        """Volume thresholds at which progressively lower unit prices unlock"""
+        target_volume = deal["target_participants"] * deal["minimum_quantity"]
+        return [
+            {
+                "min_volume": int(target_volume * volume_share),
+                "unit_price": round(deal["original_price"] * (1 - deal["discount_percentage"] * discount_share / 100), 2)
+            }
+            for volume_share, discount_share in PRICE_TIER_STEPS
+        ]
+    
+    def _tier_for(self, deal, committed_quantity):
+        tier = 0
+        while tier + 1 < len(deal["price_tiers"]) and committed_quantity >= deal["price_tiers"][tier + 1]["min_volume"]:
+            tier += 1
+        return tier
+    
+    def _build_deal_indexes(self):
+        """Index deals by id and keep active deals per category in insertion order"""
+        self._index_lock = threading.Lock()
+        self._deals_by_id = {}
+        self._deal_members = {}
+        self._active_by_category = {category: {} for category in self.deal_categories}
+        self._active = {}
+        for deal in self.active_deals:
+            self._deals_by_id[deal["id"]] = deal
+            self._deal_members[deal["id"]] = {}
+            if deal["status"] == "active":
+                self._active[deal["id"]] = deal
+                self._active_by_category.setdefault(deal["category"], {})[deal["id"]] = deal
+    
+    def _deactivate(self, deal):
+        with self._index_lock:
+            self._active.pop(deal["id"], None)
+            self._active_by_category.get(deal["category"], {}).pop(deal["id"], None)
+    
+    def _reset_joins(self):
+        """Join log was replaced: start again from the generated pools and replay it"""
+        self.active_deals = load_reference('bulk_deals', self._generate_bulk_deals, mutable=True)
+        self._build_deal_indexes()
+    
+    def _apply_join(self, event, _offset):
+        deal = self._deals_by_id.get(event["deal_id"])
+        if deal is None:
+            return
+        members = self._deal_members[deal["id"]]
+        if event["farmer_id"] not in members:
+            deal["participants_joined"] += 1
+        members[event["farmer_id"]] = members.get(event["farmer_id"], 0) + event["quantity"]
+        deal["committed_quantity"] += event["quantity"]
+        deal["current_tier"] = self._tier_for(deal, deal["committed_quantity"])
+        if deal["participants_joined"] >= deal["target_participants"] and deal["status"] == "active":
+            deal["status"] = "completed"
+            self._deactivate(deal)
+    
+    def get_deal(self, deal_id):
+        self.join_log.refresh()
+        return self._deals_by_id.get(deal_id)
+    
     def get_active_deals(self, category=None):
-        if category:
-            return [deal for deal in self.active_deals if deal["category"] == category and deal["status"] == "active"]
-        return [deal for deal in self.active_deals if deal["status"] == "active"][:50]
+        self.join_log.refresh()
+        with self._index_lock:
+            if category:
+                return list(self._active_by_category.get(category, {}).values())
+            return list(islice(self._active.values(), 50))
     
     def join_bulk_deal(self, deal_id, farmer_id, quantity):
-        for deal in self.active_deals:
-            if deal["id"] == deal_id:
-                deal["participants_joined"] += 1
-                return {
-                    "success": True,
-                    "message": f"Successfully joined bulk deal {deal_id}",
-                    "estimated_savings": deal["savings_per_unit"] * quantity
-                }
-        return {"success": False, "message": "Deal not found"}
+        if not farmer_id:
+            return {"success": False, "message": "farmer_id is required"}
+        deal = self._deals_by_id.get(deal_id)
+        if deal is None:
+            return {"success": False, "message": "Deal not found"}
+        if quantity <= 0:
+            return {"success": False, "message": "quantity must be positive"}
+        
+        outcome = {}
+        
+        def build():
+            # Runs under the log's cross-process lock, after every earlier join is applied
+            deal = self._deals_by_id[deal_id]
+            if deal["status"] != "active":
+                outcome["error"] = f"Deal {deal_id} is no longer accepting participants"
+                return []
+            already_committed = self._deal_members[deal_id].get(farmer_id, 0)
+            # The minimum applies to a farmer's first commitment, not to a top-up
+            if not already_committed and quantity < deal["minimum_quantity"]:
+                outcome["error"] = f"Minimum quantity for this deal is {deal['minimum_quantity']}"
+                return []
+            if already_committed + quantity > deal["maximum_quantity"]:
+                outcome["error"] = f"Maximum quantity per farmer is {deal['maximum_quantity']}"
+                return []
+            outcome["previous_tier"] = deal["current_tier"]
+            return [{"type": "joined", "deal_id": deal_id, "farmer_id": farmer_id, "quantity": quantity,
+                     "ts": datetime.now().isoformat()}]
+        
+        with self.join_log.lock:
+            self.join_log.append(build)
+            if "error" in outcome:
+                return {"success": False, "message": outcome["error"]}
+            deal = self._deals_by_id[deal_id]
+            current_tier = deal["current_tier"]
+            unit_price = deal["price_tiers"][current_tier]["unit_price"]
+            pool_full = deal["status"] == "completed"
+            snapshot = {
+                "participants_joined": deal["participants_joined"],
+                "committed_quantity": deal["committed_quantity"]
+            }
+        
+        return {
+            "success": True,
+            "message": f"Successfully joined bulk deal {deal_id}",
+            "estimated_savings": round((deal["original_price"] - unit_price) * quantity, 2),
+            "unit_price": unit_price,
+            "tier_unlocked": current_tier > outcome["previous_tier"],
+            "current_tier": current_tier,
+            "pool_closed": pool_full,
+            **snapshot
+        }
+    
+    def join_pool(self, data):
+        """Route adapter for joining a bulk deal pool; raises ValueError on a non-numeric quantity"""
+        try:
+            quantity = int(data.get("quantity", 0))
+        except (TypeError, ValueError):
+            raise ValueError("quantity must be a whole number")
+        return self.join_bulk_deal(data.get("deal_id"), data.get("farmer_id"), quantity)
 
     def test_connection(self):
         """Test if the module is working"""
@@ -1,19 +1,139 @@
-import json
 import os
+import threading
+from bisect import bisect_left, insort
 from datetime import datetime, timedelta
 import random
+from backend.event_log import EventLog
+from backend.record_store import load_document, save_document
+
+# Per-criterion rating fields, in the order they are accumulated
+RATING_CRITERIA = ["payment", "communication", "quality", "delivery"]
+CRITERION_FIELDS = {
+    "payment": ("payment_rating", "payment_reliability"),
+    "communication": ("communication_rating",),
+    "quality": ("quality_standards_rating", "quality_standards"),
+    "delivery": ("delivery_rating",)
+}
+
+# Bayesian smoothing: a buyer's score is pulled towards the prior mean
+# as if it had PRIOR_WEIGHT extra ratings at that mean
+PRIOR_WEIGHT = 10
+
+
+class SortedIndex:
+    """Descending (score, id) index supporting O(log n) lookups and top-K slices"""
+    
+    def __init__(self):
+        self._keys = []
+    
+    def add(self, item_id, score):
+        insort(self._keys, (-score, item_id))
+    
+    def remove(self, item_id, score):
+        pos = bisect_left(self._keys, (-score, item_id))
+        if pos < len(self._keys) and self._keys[pos] == (-score, item_id):
+            del self._keys[pos]
+    
+    def top(self, limit=None):
+        keys = self._keys if limit is None else self._keys[:limit]
+        return [item_id for _, item_id in keys]
+    
+    def at_least(self, min_score):
+        """Ids with score >= min_score, highest first"""
+        end = bisect_left(self._keys, (-min_score, chr(0x10FFFF)))
+        return [item_id for _, item_id in self._keys[:end]]
+    
+    def __len__(self):
+        return len(self._keys)
+
 
 class BuyerRatingsManager:
     def __init__(self, data_folder='data'):
         self.data_file = os.path.join(data_folder, 'buyer_ratings_data.json')
+        self._lock = threading.Lock()
         self.load_data()
+        # New ratings are appended to a shared log and folded into the aggregates, so every
+        # worker converges on the same scores without rewriting the document per rating
+        self.rating_log = EventLog(os.path.join(data_folder, 'events', 'buyer_ratings.jsonl'),
+                                   self._apply_rating, reset=self.load_data)
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
+        self.build_rating_index()
+    
+    def save_data(self):
+        save_document(self.data_file, self.data, indent=2)
+    
+    @staticmethod
+    def _buyer_id(buyer):
+        return buyer.get("id") or buyer.get("buyer_id")
+    
+    @staticmethod
+    def _buyer_type(buyer):
+        return buyer.get("type") or buyer.get("buyer_type")
+    
+    @staticmethod
+    def _buyer_region(buyer):
+        # "Mumbai, Maharashtra" -> "Maharashtra"; plain city names are their own region
+        return buyer.get("location", "").split(",")[-1].strip()
+    
+    def _scopes(self, buyer):
+        return [("all", None), ("type", self._buyer_type(buyer)), ("region", self._buyer_region(buyer))]
+    
+    def build_rating_index(self):
+        """Seed running aggregates from stored ratings and build the sorted indexes"""
+        self.buyers_by_id = {self._buyer_id(b): b for b in self.data["buyers"]}
+        
+        review_counts = {}
+        for review in self.data.get("farmer_reviews", []):
+            review_counts[review["buyer_id"]] = review_counts.get(review["buyer_id"], 0) + 1
+        
+        self.aggregates = {}
+        for buyer_id, buyer in self.buyers_by_id.items():
+            count = len(buyer.get("reviews", [])) or review_counts.get(buyer_id, 0) or 1
+            self.aggregates[buyer_id] = {
+                "count": count,
+                "sum": buyer["overall_rating"] * count,
+                "criteria_sums": {
+                    criterion: self._criterion_value(buyer, criterion, buyer["overall_rating"]) * count
+                    for criterion in RATING_CRITERIA
+                }
+            }
+        
+        total_count = sum(a["count"] for a in self.aggregates.values())
+        self.prior_mean = sum(a["sum"] for a in self.aggregates.values()) / total_count if total_count else 0
+        
+        self.rating_index = {}
+        self.score_index = {}
+        for buyer_id, buyer in self.buyers_by_id.items():
+            self._refresh_derived(buyer_id)
+            self._index_buyer(buyer_id, buyer)
+    
+    @staticmethod
+    def _criterion_value(source, criterion, default):
+        for field in CRITERION_FIELDS[criterion]:
+            if source.get(field) is not None:
+                return float(source[field])
+        return default
+    
+    def _refresh_derived(self, buyer_id):
+        aggregate = self.aggregates[buyer_id]
+        aggregate["mean"] = aggregate["sum"] / aggregate["count"]
+        aggregate["bayesian_score"] = round(
+            (PRIOR_WEIGHT * self.prior_mean + aggregate["sum"]) / (PRIOR_WEIGHT + aggregate["count"]), 4)
+    
+    def _index_buyer(self, buyer_id, buyer):
+        for scope in self._scopes(buyer):
+            self.rating_index.setdefault(scope, SortedIndex()).add(buyer_id, buyer["overall_rating"])
+            self.score_index.setdefault(scope, SortedIndex()).add(buyer_id, self.aggregates[buyer_id]["bayesian_score"])
+    
+    def _unindex_buyer(self, buyer_id, buyer):
+        for scope in self._scopes(buyer):
+            self.rating_index[scope].remove(buyer_id, buyer["overall_rating"])
+            self.score_index[scope].remove(buyer_id, self.aggregates[buyer_id]["bayesian_score"])
     
     def generate_default_data(self):
         return {
@@ -78,24 +198,120 @@ class BuyerRatingsManager:
         }
     
     def get_all_buyers(self, min_rating=None, buyer_type=None):
-        buyers = self.data["buyers"]
-        if min_rating:
-            buyers = [b for b in buyers if b["overall_rating"] >= min_rating]
-        if buyer_type:
-            buyers = [b for b in buyers if b["type"] == buyer_type]
-        return sorted(buyers, key=lambda x: x["overall_rating"], reverse=True)
+        self.rating_log.refresh()
+        scope = ("type", buyer_type) if buyer_type else ("all", None)
+        index = self.rating_index.get(scope)
+        if index is None:
+            return []
+        with self._lock:
+            ids = index.at_least(min_rating) if min_rating else index.top()
+        return [self.buyers_by_id[buyer_id] for buyer_id in ids]
     
     def get_buyer_by_id(self, buyer_id):
-        return next((b for b in self.data["buyers"] if b["id"] == buyer_id), None)
+        self.rating_log.refresh()
+        return self.buyers_by_id.get(buyer_id)
     
     def get_rating_criteria(self):
         return self.data["rating_criteria"]
     
     def get_rating_stats(self):
-        return self.data["rating_stats"]
+        return self.data.get("rating_stats", {})
+    
+    def get_top_rated_buyers(self, limit=10, buyer_type=None, region=None):
+        """Leaderboard by Bayesian-smoothed score, optionally per buyer type or region"""
+        self.rating_log.refresh()
+        if buyer_type:
+            scope = ("type", buyer_type)
+        elif region:
+            scope = ("region", region)
+        else:
+            scope = ("all", None)
+        index = self.score_index.get(scope)
+        if index is None:
+            return []
+        with self._lock:
+            ids = index.top(limit)
+        return [self.buyers_by_id[buyer_id] for buyer_id in ids]
     
-    def get_top_rated_buyers(self, limit=10):
-        return sorted(self.data["buyers"], key=lambda x: x["overall_rating"], reverse=True)[:limit]
+    def get_ratings(self, buyer_id):
+        self.rating_log.refresh()
+        buyer = self.buyers_by_id.get(buyer_id)
+        if buyer is None:
+            return {"status": "error", "message": "Buyer not found"}
+        aggregate = self.aggregates[buyer_id]
+        return {
+            "status": "success",
+            "buyer": buyer,
+            "rating_count": aggregate["count"],
+            "average_rating": round(aggregate["mean"], 2),
+            "bayesian_score": aggregate["bayesian_score"],
+            "criteria_averages": {
+                criterion: round(total / aggregate["count"], 2)
+                for criterion, total in aggregate["criteria_sums"].items()
+            }
+        }
+    
+    def _apply_rating(self, event, _offset):
+        """Fold one logged rating into its buyer's aggregates and index position"""
+        buyer_id = event["buyer_id"]
+        buyer = self.buyers_by_id.get(buyer_id)
+        if buyer is None:
+            return
+        review = event["review"]
+        with self._lock:
+            self._unindex_buyer(buyer_id, buyer)
+            try:
+                aggregate = self.aggregates[buyer_id]
+                aggregate["count"] += 1
+                aggregate["sum"] += review["rating"]
+                for criterion, value in event["criteria"].items():
+                    aggregate["criteria_sums"][criterion] += value
+                self._refresh_derived(buyer_id)
+                buyer["overall_rating"] = round(aggregate["mean"], 1)
+            finally:
+                self._index_buyer(buyer_id, buyer)
+            
+            if "reviews" in buyer:
+                buyer["reviews"].append(review)
+            else:
+                self.data.setdefault("farmer_reviews", []).append(dict(review, buyer_id=buyer_id))
+    
+    def submit_rating(self, data):
+        """Record a farmer's rating and update the buyer's aggregates in O(1) plus index moves"""
+        try:
+            buyer_id = data.get("buyer_id")
+            buyer = self.buyers_by_id.get(buyer_id)
+            if buyer is None:
+                return {"status": "error", "message": "Buyer not found"}
+            try:
+                rating = float(data["rating"])
+                criteria = {criterion: self._criterion_value(data, criterion, rating) for criterion in RATING_CRITERIA}
+            except (KeyError, TypeError, ValueError):
+                return {"status": "error", "message": "rating and criterion ratings must be numbers"}
+            if not all(1 <= value <= 5 for value in [rating, *criteria.values()]):
+                return {"status": "error", "message": "Ratings must be between 1 and 5"}
+            
+            review = {
+                "farmer_id": data.get("farmer_id"),
+                "rating": rating,
+                "comment": data.get("comment", ""),
+                "date": datetime.now().strftime("%Y-%m-%d"),
+                "transaction_id": data.get("transaction_id")
+            }
+            
+            with self.rating_log.lock:
+                self.rating_log.append(lambda: [{"buyer_id": buyer_id, "criteria": criteria, "review": review}])
+                buyer = self.buyers_by_id[buyer_id]
+                aggregate = self.aggregates[buyer_id]
+                return {
+                    "status": "success",
+                    "message": "Rating submitted successfully",
+                    "overall_rating": buyer["overall_rating"],
+                    "bayesian_score": aggregate["bayesian_score"],
+                    "rating_count": aggregate["count"]
+                }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
 
     def test_connection(self):
         """Test if the module is working"""
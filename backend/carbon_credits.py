@@ -1,7 +1,7 @@
-import json
 import os
 from datetime import datetime, timedelta
 import random
+from backend.record_store import load_document
 
 class CarbonCredits:
     def __init__(self, data_folder='data'):
@@ -10,8 +10,7 @@ class CarbonCredits:
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
     
@@ -80,6 +79,36 @@ class CarbonCredits:
                 }
         return None
 
+    def get_marketplace(self):
+        market_data = self.data.get("market_data", {})
+        return {
+            "status": "success",
+            "market_data": market_data,
+            "buyers": self.data.get("carbon_buyers", market_data.get("major_buyers", [])),
+            "programs": self.data.get("carbon_credit_programs", self.data.get("carbon_projects", []))
+        }
+
+    def sell_credits(self, data):
+        try:
+            credits = float(data.get("credits", 0))
+        except (TypeError, ValueError):
+            credits = 0
+        if credits <= 0:
+            return {"status": "error", "message": "Credits to sell must be positive"}
+
+        market_data = self.data.setdefault("market_data", {})
+        market_data["total_credits_traded"] = market_data.get("total_credits_traded", 0) + credits
+        return {
+            "status": "success",
+            "sale": {
+                "sale_id": f"CS{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                "farmer_id": data.get("farmer_id"),
+                "buyer_id": data.get("buyer_id"),
+                "credits": credits,
+                "date": datetime.now().isoformat()
+            }
+        }
+
     def test_connection(self):
         """Test if the module is working"""
         try:
@@ -1,6 +1,7 @@
 import json
 from datetime import datetime, timedelta
 import random
+from backend.shared_reference import load_reference
 
 class ContractFarmingEngine:
     def __init__(self, data_folder='data'):
@@ -28,7 +29,7 @@ class ContractFarmingEngine:
             {"id": 4, "name": "Hotel Chain Group", "type": "hospitality", "rating": 4.6, "contracts_completed": 98}
         ]
         
-        self.active_contracts = self._generate_active_contracts()
+        self.active_contracts = load_reference('active_contracts', self._generate_active_contracts, mutable=True)
         
     def _generate_active_contracts(self):
         contracts = []
@@ -65,9 +66,9 @@ class ContractFarmingEngine:
     
     def create_contract(self, farmer_id, contract_data):
         new_contract = {
+            **contract_data,
             "id": f"CF{len(self.active_contracts) + 1000}",
             "farmer_id": farmer_id,
-            **contract_data,
             "status": "pending",
             "created_date": datetime.now().strftime("%Y-%m-%d")
         }
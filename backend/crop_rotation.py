@@ -1,6 +1,10 @@
 import json
 import random
+import time
 from datetime import datetime, timedelta
+from backend.rotation_optimizer import CROP_PROFILES, RotationOptimizer
+
+MAX_PLOTS = 500
 
 class CropRotationEngine:
     def __init__(self, data_folder='data'):
@@ -35,6 +39,46 @@ class CropRotationEngine:
         
         self.seasonal_recommendations = self._generate_seasonal_data()
         
+        # Multi-season planner; market inputs come from attach_market_data()
+        self.pricing_engine = None
+        self.yield_engine = None
+        self.optimizer = RotationOptimizer(market=self._market_inputs, market_version=self._market_version,
+                                           compatibility=self.crop_compatibility)
+    
+    def attach_market_data(self, pricing_engine=None, yield_engine=None):
+        """Score optimized rotations with mandi price and yield history instead of defaults"""
+        self.pricing_engine = pricing_engine
+        self.yield_engine = yield_engine
+    
+    def _market_version(self):
+        # Reloading either history swaps the object, which retires every memoized plan built on it
+        return (id(getattr(self.pricing_engine, 'historical_data', None)),
+                id(getattr(self.yield_engine, 'historical_yields', None)))
+    
+    def _market_inputs(self, crop, region):
+        profile = CROP_PROFILES[crop]
+        expected_yield = price = None
+        if self.yield_engine is not None and profile['yield_name']:
+            expected_yield = self.yield_engine.get_expected_yield(profile['yield_name'])
+        if self.pricing_engine is not None and profile['price_name'] and region:
+            # The mandi history moves the reference price with the region's current price level
+            index = self.pricing_engine.get_price_index(profile['price_name'], region)
+            if index:
+                price = profile['price'] * index
+        return expected_yield, price
+    
+    def _resolve_region(self, location):
+        """The state in the price history that a 'District, State' location refers to"""
+        if self.pricing_engine is None or not location:
+            return None
+        history = self.pricing_engine.historical_data
+        known = {state.lower(): state for crop in list(history)[:1] for state in history[crop]}
+        for part in str(location).split(','):
+            state = known.get(part.strip().lower())
+            if state:
+                return state
+        return None
+        
     def _generate_seasonal_data(self):
         seasons = ["kharif", "rabi", "summer"]
         crops_by_season = {
@@ -109,6 +153,55 @@ class CropRotationEngine:
             "recommendations": self._get_rotation_recommendations(soil_type, location)
         }
     
+    @staticmethod
+    def _plan_inputs(field_size, years, nitrogen):
+        """Coerce request values for the optimizer; ValueError names the bad field"""
+        try:
+            field_size = float(field_size if field_size is not None else 1)
+            years = int(years if years is not None else 3)
+            nitrogen = None if nitrogen in (None, "") else float(nitrogen)
+        except (TypeError, ValueError):
+            raise ValueError("field_size, years and nitrogen must be numbers")
+        if not 0 < field_size < float("inf") or years < 1:
+            raise ValueError("field_size and years must be positive")
+        return field_size, years, nitrogen
+    
+    def optimize_rotation(self, current_crop, field_size, soil_type, location, years=3, nitrogen=None):
+        """Profit-maximizing multi-season rotation (see backend.rotation_optimizer)"""
+        field_size, years, nitrogen = self._plan_inputs(field_size, years, nitrogen)
+        plan = self.optimizer.optimize(current_crop, field_size, soil_type, self._resolve_region(location),
+                                       years=years, available_nitrogen=nitrogen)
+        for step in plan["rotation_plan"]:
+            step["fertilizer_needs"] = self._get_fertilizer_needs(step["crop"])
+        plan["location"] = location
+        plan["recommendations"] = self._get_rotation_recommendations(plan["soil_type"], location)
+        return plan
+    
+    def optimize_rotations(self, plots):
+        """Batch planning for a cooperative; plots sharing soil type and region share subproblems"""
+        if not isinstance(plots, list) or not all(isinstance(plot, dict) for plot in plots):
+            raise ValueError("plots must be a list of objects")
+        if len(plots) > MAX_PLOTS:
+            raise ValueError(f"At most {MAX_PLOTS} plots per batch")
+        started = time.perf_counter()
+        plans = []
+        for i, plot in enumerate(plots):
+            try:
+                plan = self.optimize_rotation(plot.get("current_crop"), plot.get("field_size", 1),
+                                              plot.get("soil_type"), plot.get("location"),
+                                              years=plot.get("years", 3), nitrogen=plot.get("nitrogen"))
+            except ValueError as e:
+                raise ValueError(f"plots[{i}]: {e}")
+            plan["plot_id"] = plot.get("plot_id")
+            plans.append(plan)
+        return {
+            "plots": len(plans),
+            "plans": plans,
+            "total_profit": round(sum(plan["total_profit"] for plan in plans), 2),
+            "compute_ms": round(1000 * (time.perf_counter() - started), 3),
+            "optimizer": self.optimizer.get_stats()
+        }
+    
     def _get_fertilizer_needs(self, crop):
         fertilizer_data = {
             "wheat": {"nitrogen": 120, "phosphorus": 60, "potassium": 40},
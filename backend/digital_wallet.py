@@ -1,6 +1,6 @@
-import json
 import random
 from datetime import datetime, timedelta
+from backend.record_store import load_document
 
 class DigitalWallet:
     def __init__(self, data_folder='data'):
@@ -8,8 +8,7 @@ class DigitalWallet:
     
     def load_data(self):
         try:
-            with open('data/digital_wallet_data.json', 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document('data/digital_wallet_data.json')
         except FileNotFoundError:
             self.data = self.get_default_data()
     
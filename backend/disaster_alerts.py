@@ -1,15 +1,32 @@
 import json
+import os
 import random
 from datetime import datetime, timedelta
+from backend.event_log import EventLog
+from backend.shared_reference import load_reference
+from backend.geo_alerts import GeoAlertIndex, SubscriberIndex, resolve_location
+
+SEVERITY_WEIGHTS = {"Low": 10, "Medium": 20, "High": 35, "Critical": 50}
+ZONE_THREATS = {"drought_prone": "drought", "flood_prone": "flood", "cyclone_prone": "cyclone"}
 
 class DisasterAlertsEngine:
     def __init__(self, data_folder='data'):
         # Massive disaster alerts data
-        self.active_alerts = self._generate_active_alerts()
-        self.historical_disasters = self._generate_historical_data()
+        self.active_alerts = load_reference('disaster_active_alerts', self._generate_active_alerts, mutable=True)
+        self.historical_disasters = load_reference('disaster_history', self._generate_historical_data)
         self.risk_zones = self._generate_risk_zones()
         self.preparedness_measures = self._generate_preparedness_data()
         
+        # Alert areas and farmer subscriptions; new alerts fan out to listeners in batches
+        self.geo_index = GeoAlertIndex()
+        for alert in self.active_alerts:
+            self.geo_index.add_alert(alert)
+        # Subscriptions are shared by every worker through an append-only log
+        self.subscription_log = EventLog(os.path.join(data_folder, 'events', 'alert_subscriptions.jsonl'),
+                                         self._apply_subscription_event, reset=self._clear_subscriptions)
+        self.subscription_log.refresh()
+        self._history_by_state = self._summarize_history()
+        
     def _generate_active_alerts(self):
         alert_types = ["drought", "flood", "cyclone", "hailstorm", "frost", "heat_wave", "pest_outbreak"]
         severity_levels = ["Low", "Medium", "High", "Critical"]
@@ -107,7 +124,7 @@ class DisasterAlertsEngine:
         }
     
     def get_alerts_by_location(self, location, alert_type=None):
-        filtered_alerts = [alert for alert in self.active_alerts if location.lower() in alert["location"].lower()]
+        filtered_alerts = self._alerts_for_location(location)
         
         if alert_type:
             filtered_alerts = [alert for alert in filtered_alerts if alert["type"] == alert_type]
@@ -120,6 +137,14 @@ class DisasterAlertsEngine:
             "preparedness_status": self._get_preparedness_status(location)
         }
     
+    def _alerts_for_location(self, location):
+        """Alerts whose area covers the location; substring match for places not in the gazetteer"""
+        point = resolve_location(location)
+        if point is None:
+            return [alert for alert in self.active_alerts if location.lower() in alert["location"].lower()]
+        alert_ids = set(self.geo_index.alerts_at(point[0], point[1]))
+        return [alert for alert in self.active_alerts if alert["id"] in alert_ids]
+    
     def _get_recommended_actions(self, alert_type):
         action_map = {
             "drought": ["Implement water conservation", "Use drought-resistant varieties", "Apply mulching"],
@@ -132,15 +157,40 @@ class DisasterAlertsEngine:
         }
         return action_map.get(alert_type, ["Monitor situation", "Contact local authorities", "Follow official guidelines"])
     
+    def _summarize_history(self):
+        summary = {}
+        for disaster in self.historical_disasters:
+            state = disaster["location"].split()[-1].lower()
+            counts = summary.setdefault(state, {})
+            counts[disaster["type"]] = counts.get(disaster["type"], 0) + 1
+        return summary
+    
+    def _location_context(self, location):
+        text = str(location).lower()
+        zones = [zone for zone, data in self.risk_zones.items()
+                 if any(district.lower() in text for district in data["districts"])]
+        history = {}
+        for state, counts in self._history_by_state.items():
+            if state in text:
+                history = counts
+        point = resolve_location(location)
+        active = self._alerts_for_location(location)
+        return zones, history, point, active
+    
     def _assess_location_risk(self, location):
-        # Simulate risk assessment based on location
-        risk_factors = {
-            "drought_risk": random.randint(20, 80),
-            "flood_risk": random.randint(10, 70),
-            "cyclone_risk": random.randint(5, 60),
-            "pest_risk": random.randint(15, 50),
-            "overall_risk": random.randint(30, 75)
-        }
+        # Risk zone membership, the state's disaster history and the alerts currently covering it
+        zones, history, _, active = self._location_context(location)
+        total_history = sum(history.values()) or 1
+        risk_factors = {}
+        for threat in ("drought", "flood", "cyclone", "pest"):
+            score = 10
+            score += 40 if any(ZONE_THREATS.get(zone) == threat for zone in zones) else 0
+            score += round(30 * history.get(threat, 0) / total_history)
+            score += sum(SEVERITY_WEIGHTS.get(alert.get("severity"), 10) for alert in active
+                         if str(alert.get("type", "")).startswith(threat))
+            risk_factors[f"{threat}_risk"] = min(score, 95)
+        scores = list(risk_factors.values())
+        risk_factors["overall_risk"] = round((max(scores) + sum(scores) / len(scores)) / 2)
         
         risk_level = "Low"
         if risk_factors["overall_risk"] > 60:
@@ -148,38 +198,122 @@ class DisasterAlertsEngine:
         elif risk_factors["overall_risk"] > 40:
             risk_level = "Medium"
         
+        threats = sorted(("drought", "flood", "cyclone", "pest"), key=lambda t: risk_factors[f"{t}_risk"], reverse=True)
         return {
             "risk_factors": risk_factors,
             "overall_risk_level": risk_level,
-            "primary_threats": ["drought", "pest_outbreak"] if risk_factors["drought_risk"] > 50 else ["flood", "cyclone"],
-            "seasonal_vulnerability": "Monsoon season" if risk_factors["flood_risk"] > 40 else "Summer season"
+            "primary_threats": threats[:2],
+            "seasonal_vulnerability": "Monsoon season" if threats[0] in ("flood", "cyclone") else "Summer season"
         }
     
     def _get_preparedness_status(self, location):
+        zones, history, point, active = self._location_context(location)
+        self.subscription_log.refresh()
+        subscribers = self.geo_index.subscriptions.count_near(point[0], point[1], point[2]) if point else 0
+        severe_alerts = sum(1 for alert in active if alert.get("severity") in ("High", "Critical"))
         return {
-            "early_warning_systems": random.choice(["Excellent", "Good", "Needs Improvement"]),
-            "emergency_response_time": f"{random.randint(2, 24)} hours",
-            "resource_availability": random.choice(["Adequate", "Limited", "Insufficient"]),
-            "community_awareness": random.choice(["High", "Medium", "Low"]),
-            "insurance_coverage": f"{random.randint(30, 85)}% of farmers covered"
+            "early_warning_systems": "Excellent" if subscribers >= 1000 else "Good" if subscribers >= 100 else "Needs Improvement",
+            "subscribed_farmers": subscribers,
+            "emergency_response_time": "4 hours" if zones else "12 hours",
+            "resource_availability": "Limited" if severe_alerts >= 2 else "Adequate",
+            "community_awareness": "High" if sum(history.values()) >= 30 else "Medium" if history else "Low",
+            "active_severe_alerts": severe_alerts
         }
     
-    def create_custom_alert(self, alert_data):
+    def _apply_subscription_event(self, event, _offset):
+        if event["type"] == "subscribed":
+            self.geo_index.subscriptions.add_many(event["subscriptions"])
+        elif event["type"] == "unsubscribed":
+            self.geo_index.subscriptions.remove(event["subscriber_id"])
+    
+    def _clear_subscriptions(self):
+        self.geo_index.subscriptions = SubscriberIndex()
+    
+    @staticmethod
+    def _normalize_subscription(subscription):
+        if not isinstance(subscription, dict) or not subscription.get("subscriber_id"):
+            raise ValueError("each subscription needs a subscriber_id")
+        try:
+            lat, lon = float(subscription["lat"]), float(subscription["lon"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("lat and lon must be numbers")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("lat and lon are out of range")
+        return dict(subscription, subscriber_id=str(subscription["subscriber_id"]), lat=lat, lon=lon)
+    
+    def subscribe(self, subscriber_id, lat=None, lon=None, location=None, phone=None, language="en"):
+        """Register (or move) a farmer's alert subscription by coordinates or a known location"""
+        if lat is None or lon is None:
+            point = resolve_location(location)
+            if point is None:
+                return {"status": "error", "message": f"Unknown location: {location}"}
+            lat, lon = point[0], point[1]
+        result = self.subscribe_many([{
+            "subscriber_id": subscriber_id, "lat": lat, "lon": lon, "phone": phone, "language": language
+        }])
+        if result["status"] != "success":
+            return result
+        return {"status": "success", "subscriber_id": subscriber_id, "lat": float(lat), "lon": float(lon)}
+    
+    def subscribe_many(self, subscriptions):
+        """Bulk registration (e.g. a district's farmer roll); each needs subscriber_id, lat and lon"""
+        try:
+            if not isinstance(subscriptions, list):
+                raise ValueError("subscriptions must be a list")
+            subscriptions = [self._normalize_subscription(subscription) for subscription in subscriptions]
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        if subscriptions:
+            self.subscription_log.append(lambda: [{"type": "subscribed", "subscriptions": subscriptions}])
+        return {"status": "success", "registered": len(subscriptions)}
+    
+    def unsubscribe(self, subscriber_id):
+        def build():
+            if subscriber_id is None or subscriber_id not in self.geo_index.subscriptions:
+                return []
+            return [{"type": "unsubscribed", "subscriber_id": str(subscriber_id)}]
+        
+        return {"status": "success" if self.subscription_log.append(build) else "not_found"}
+    
+    def add_notification_listener(self, listener):
+        """listener(alert, recipients) receives every fan-out batch"""
+        self.geo_index.add_listener(listener)
+    
+    def create_custom_alert(self, alert_data, created_by="farmer"):
         new_alert = {
-            "id": f"CA{len(self.active_alerts) + 5000}",
             "type": "custom",
-            "created_by": "farmer",
             "created_date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            **alert_data
+            **alert_data,
+            "id": f"CA{len(self.active_alerts) + 5000}",
+            "created_by": created_by
         }
         self.active_alerts.append(new_alert)
+        self.geo_index.add_alert(new_alert)
+        self.subscription_log.refresh()
+        new_alert["dispatch"] = self.geo_index.fan_out(new_alert)
         return new_alert
+    
+    def ingest_alert(self, alert):
+        """Upstream alert (IMD, state agriculture department): index it, or re-index an update, and notify"""
+        alert = dict(alert)
+        alert.setdefault("id", f"EX{len(self.active_alerts) + 7000}")
+        alert.setdefault("issued_date", datetime.now().strftime("%Y-%m-%d"))
+        for i, existing in enumerate(self.active_alerts):
+            if existing["id"] == alert["id"]:
+                self.active_alerts[i] = alert
+                break
+        else:
+            self.active_alerts.append(alert)
+        self.geo_index.add_alert(alert)
+        self.subscription_log.refresh()
+        alert["dispatch"] = self.geo_index.fan_out(alert)
+        return alert
         
     def get_alerts(self, location='all'):
         if location.lower() == 'all':
             return self.active_alerts
         else:
-            return [alert for alert in self.active_alerts if location.lower() in alert["location"].lower()]
+            return self._alerts_for_location(location)
 
     def test_connection(self):
         """Test if the module is working"""
@@ -1,13 +1,30 @@
 import json
+import os
 import random
 from datetime import datetime, timedelta
 import uuid
+from backend.shared_reference import load_reference
+from backend.progress_log import ProgressLog
+
+PASS_SCORE = 70
+CERTIFICATE_NAMESPACE = uuid.UUID('6f1c2a4e-8d3b-5e7f-9a0c-1b2d3e4f5a6b')
 
 class ELearningCourses:
     def __init__(self, data_folder='data'):
-        self.courses_data = self._load_massive_course_data()
-        self.user_progress = {}
-        self.certificates = {}
+        self.courses_data = load_reference('course_library', self._load_massive_course_data, mutable=True)
+        self.course_index = {c["id"]: c for c in self.courses_data["courses"]}
+        self.progress_log = ProgressLog(os.path.join(data_folder, 'events', 'elearning_progress.jsonl'))
+        self._quiz_keys = {}
+
+    @property
+    def user_progress(self):
+        self.progress_log.refresh()
+        return self.progress_log.users
+
+    @property
+    def certificates(self):
+        self.progress_log.refresh()
+        return self.progress_log.certificates
         
     def _load_massive_course_data(self):
         """Load comprehensive course catalog with 100+ courses"""
@@ -161,7 +178,7 @@ class ELearningCourses:
     
     def get_course_details(self, course_id):
         """Get detailed course information"""
-        course = next((c for c in self.courses_data["courses"] if c["id"] == course_id), None)
+        course = self.course_index.get(course_id)
         
         if not course:
             return {"success": False, "message": "Course not found"}
@@ -205,61 +222,82 @@ class ELearningCourses:
         return random.sample(related, min(4, len(related)))
     
     def enroll_course(self, data):
-        """Enroll user in a course"""
+        """Enroll user in a course; enrolling again keeps the existing progress"""
         user_id = data.get('user_id')
         course_id = data.get('course_id')
         
         if not user_id or not course_id:
             return {"success": False, "message": "Missing required fields"}
         
-        course = next((c for c in self.courses_data["courses"] if c["id"] == course_id), None)
+        course = self.course_index.get(course_id)
         if not course:
             return {"success": False, "message": "Course not found"}
         
-        # Initialize user progress
-        if user_id not in self.user_progress:
-            self.user_progress[user_id] = {}
-        
-        self.user_progress[user_id][course_id] = {
-            "enrolled_date": datetime.now().isoformat(),
-            "progress": 0,
-            "completed_modules": [],
-            "quiz_scores": {},
-            "certificate_issued": False
-        }
+        enrolled = self.progress_log.append(
+            {"type": "enrolled", "user_id": user_id, "course_id": course_id, "enrollment_id": str(uuid.uuid4())},
+            check=lambda log: log.progress(user_id, course_id))
         
         return {
             "success": True,
-            "message": "Successfully enrolled in course",
-            "enrollment_id": str(uuid.uuid4()),
+            "message": "Successfully enrolled in course" if enrolled.get("type") == "enrolled" else "Already enrolled in course",
+            "enrollment_id": enrolled.get("enrollment_id"),
             "course_title": course["title"]
         }
     
+    @staticmethod
+    def _module_ids(course):
+        """Each module's id, or its 1-based position for modules stored without one"""
+        return [module.get("id", position) if isinstance(module, dict) else position
+                for position, module in enumerate(course.get("modules", []), 1)]
+    
     def update_progress(self, data):
-        """Update user's course progress"""
+        """Record a completed module"""
         user_id = data.get('user_id')
         course_id = data.get('course_id')
         module_id = data.get('module_id')
         
-        if user_id in self.user_progress and course_id in self.user_progress[user_id]:
-            progress = self.user_progress[user_id][course_id]
-            
-            if module_id not in progress["completed_modules"]:
-                progress["completed_modules"].append(module_id)
-                
-                # Calculate progress percentage
-                course = next((c for c in self.courses_data["courses"] if c["id"] == course_id), None)
-                if course:
-                    total_modules = len(course["modules"])
-                    progress["progress"] = (len(progress["completed_modules"]) / total_modules) * 100
-            
-            return {
-                "success": True,
-                "progress": progress["progress"],
-                "completed_modules": len(progress["completed_modules"])
-            }
+        self.progress_log.refresh()
+        progress = self.progress_log.progress(user_id, course_id)
+        if progress is None:
+            return {"success": False, "message": "Enrollment not found"}
+        
+        course = self.course_index.get(course_id)
+        module_ids = {str(i): i for i in self._module_ids(course)} if course else {}
+        if module_id is None or str(module_id) not in module_ids:
+            return {"success": False, "message": "Module not found in this course"}
+        module_id = module_ids[str(module_id)]
         
-        return {"success": False, "message": "Enrollment not found"}
+        if module_id not in progress["completed_modules"]:
+            self.progress_log.append({
+                "type": "module_completed", "user_id": user_id, "course_id": course_id,
+                "module_id": module_id, "modules": len(course["modules"])
+            })
+        
+        return {
+            "success": True,
+            "progress": progress["progress"],
+            "completed_modules": len(progress["completed_modules"])
+        }
+    
+    def _quiz_key(self, course_id, module_id):
+        """Quiz questions and normalized answer key, compiled once per (course, module)"""
+        key = (course_id, str(module_id))
+        compiled = self._quiz_keys.get(key)
+        if compiled is None:
+            quiz_data = self._generate_quiz_questions(course_id, module_id)
+            compiled = {
+                "questions": quiz_data["questions"],
+                "answers": {q_id: str(answer).strip().casefold() for q_id, answer in quiz_data["correct_answers"].items()},
+                "total": len(quiz_data["questions"])
+            }
+            self._quiz_keys[key] = compiled
+        return compiled
+    
+    def get_quiz(self, course_id, module_id):
+        """Quiz questions for a module, without the answers"""
+        if course_id not in self.course_index:
+            return {"success": False, "message": "Course not found"}
+        return {"success": True, "questions": self._quiz_key(course_id, module_id)["questions"]}
     
     def submit_quiz(self, data):
         """Submit and grade quiz"""
@@ -268,27 +306,24 @@ class ELearningCourses:
         module_id = data.get('module_id')
         answers = data.get('answers', {})
         
-        # Generate quiz questions and correct answers
-        quiz_data = self._generate_quiz_questions(course_id, module_id)
+        quiz = self._quiz_key(course_id, module_id)
         
         # Grade the quiz
-        correct_answers = 0
-        total_questions = len(quiz_data["questions"])
-        
-        for q_id, user_answer in answers.items():
-            if quiz_data["correct_answers"].get(q_id) == user_answer:
-                correct_answers += 1
+        key = quiz["answers"]
+        correct_answers = sum(1 for q_id, user_answer in answers.items()
+                              if key.get(q_id) == str(user_answer).strip().casefold())
+        total_questions = quiz["total"]
         
         score = (correct_answers / total_questions) * 100
-        passed = score >= 70
+        passed = score >= PASS_SCORE
         
         # Update user progress
-        if user_id in self.user_progress and course_id in self.user_progress[user_id]:
-            self.user_progress[user_id][course_id]["quiz_scores"][module_id] = {
-                "score": score,
-                "passed": passed,
-                "date": datetime.now().isoformat()
-            }
+        self.progress_log.refresh()
+        if self.progress_log.progress(user_id, course_id) is not None:
+            self.progress_log.append({
+                "type": "quiz_submitted", "user_id": user_id, "course_id": course_id,
+                "module_id": module_id, "score": score, "passed": passed
+            })
         
         return {
             "success": True,
@@ -334,13 +369,10 @@ class ELearningCourses:
         }
     
     def generate_certificate(self, course_id, user_id):
-        """Generate course completion certificate"""
-        if user_id not in self.user_progress or course_id not in self.user_progress[user_id]:
-            return {"success": False, "message": "Course not completed"}
-        
-        progress = self.user_progress[user_id][course_id]
-        
-        if progress["progress"] < 100:
+        """Issue the course completion certificate; asking again returns the same certificate"""
+        self.progress_log.refresh()
+        progress = self.progress_log.progress(user_id, course_id)
+        if progress is None or progress["progress"] < 100:
             return {"success": False, "message": "Course not completed"}
         
         # Check if all quizzes passed
@@ -350,9 +382,10 @@ class ELearningCourses:
         if not all_passed:
             return {"success": False, "message": "All quizzes must be passed"}
         
-        course = next((c for c in self.courses_data["courses"] if c["id"] == course_id), None)
+        course = self.course_index[course_id]
         
-        certificate_id = str(uuid.uuid4())
+        certificate_id = str(uuid.uuid5(CERTIFICATE_NAMESPACE, f"{user_id}:{course_id}"))
+        average = sum(s["score"] for s in quiz_scores.values()) / len(quiz_scores) if quiz_scores else 100
         certificate_data = {
             "certificate_id": certificate_id,
             "user_id": user_id,
@@ -360,18 +393,23 @@ class ELearningCourses:
             "course_title": course["title"],
             "instructor": course["instructor"],
             "completion_date": datetime.now().strftime("%Y-%m-%d"),
-            "grade": "A" if sum(s["score"] for s in quiz_scores.values()) / len(quiz_scores) >= 90 else "B",
+            "grade": "A" if average >= 90 else "B",
             "certificate_url": f"/certificates/{certificate_id}.pdf"
         }
         
-        self.certificates[certificate_id] = certificate_data
-        progress["certificate_issued"] = True
+        self.progress_log.append(
+            {"type": "certificate_issued", "user_id": user_id, "course_id": course_id, "certificate": certificate_data},
+            check=lambda log: log.certificates.get(certificate_id))
         
         return {
             "success": True,
-            "certificate": certificate_data
+            "certificate": self.progress_log.certificates[certificate_id]
         }
 
+    def get_learner_progress(self, user_id):
+        self.progress_log.refresh()
+        return {"success": True, "user_id": user_id, "courses": self.progress_log.user_courses(user_id)}
+
     def test_connection(self):
         """Test if the module is working"""
         try:
@@ -0,0 +1,179 @@
+"""
+Event Log
+Durable, append-only JSON-lines log shared by every worker process
+
+Each event is one JSON line. A process folds the lines into its own view
+through an `apply(event, end_offset)` callback and remembers how far it has
+read, so a refresh only reads what other workers appended since. The byte
+offset just past an event is stable across restarts and increases across
+all processes, which makes it usable as a version or cursor.
+
+Reads take no lock and only consume complete, newline-terminated lines.
+Writers take an exclusive flock, cut off a torn last line left by a crashed
+writer, catch up, and then run a `build` callable that decides - seeing every
+earlier event from any process - which events to append. That makes a
+check-then-append (claim once, issue once, publish only if changed) atomic
+across workers.
+
+Nothing is created until the first append, so constructing a log has no
+side effect on the filesystem. A corrupt line is logged and skipped rather
+than failing every later read.
+
+compact(build) replaces the file with the events `build` returns, under the
+same lock. Readers see a new inode and replay; a writer that opened the old
+file before the swap notices after taking the lock and reopens.
+
+Usage:
+    log = EventLog('data/events/example.jsonl', apply=view.apply)
+    log.refresh()
+    log.append(lambda: [{'type': 'created', 'id': 'X1'}])
+"""
+
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+from backend.record_store import json_default
+
+logger = logging.getLogger(__name__)
+
+
+class EventLog:
+    """Append-only JSONL file with flock'd writes and incremental reads"""
+
+    def __init__(self, path: str, apply: Callable[[Dict, int], None],
+                 reset: Optional[Callable[[], None]] = None, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.offset = 0
+        self.events = 0
+        self.skipped = 0
+        self.lock = threading.RLock()
+        self._apply = apply
+        self._reset = reset
+        self._inode = None
+
+    # -------------------------------------------------------------------- reads
+
+    def refresh(self):
+        """Fold in events appended since the last read; cheap when nothing changed"""
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if stat.st_ino == self._inode and stat.st_size == self.offset:
+                return
+            with open(self.path, 'rb') as f:
+                self._consume(f)
+
+    def _consume(self, f):
+        stat = os.fstat(f.fileno())
+        if stat.st_ino != self._inode or stat.st_size < self.offset:
+            # First read, or the log was replaced (restored, compacted): replay it
+            if self._inode is not None and self._reset is not None:
+                self._reset()
+            self._inode, self.offset, self.events = stat.st_ino, 0, 0
+        if stat.st_size == self.offset:
+            return
+        f.seek(self.offset)
+        data = f.read(stat.st_size - self.offset)
+        end = data.rfind(b'\n') + 1
+        position = self.offset
+        for line in data[:end].split(b'\n')[:-1]:
+            position += len(line) + 1
+            if not line.strip():
+                continue
+            try:
+                self._apply(json.loads(line), position)
+                self.events += 1
+            except Exception as e:
+                self.skipped += 1
+                logger.warning("Skipping bad line ending at byte %d of %s: %s", position, self.path, e)
+        self.offset += end
+
+    # ------------------------------------------------------------------- writes
+
+    @staticmethod
+    def _repair(f):
+        """Drop a partial last line left by a crashed writer"""
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        f.seek(0)
+        data = f.read()
+        f.truncate(data.rfind(b'\n') + 1)
+
+    @contextmanager
+    def _locked(self):
+        """Open the current log file under the exclusive flock, caught up and repaired"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        while True:
+            with open(self.path, 'a+b') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # Compacted while we waited for the lock: this inode is no longer the log
+                    if os.fstat(f.fileno()).st_ino != os.stat(self.path).st_ino:
+                        continue
+                    self._repair(f)
+                    self._consume(f)
+                    yield f
+                    return
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def append(self, build: Callable[[], Iterable[Dict]]) -> List[Dict]:
+        """
+        Run `build` under the cross-process lock, after catching up with the
+        log, and durably append the events it returns (possibly none). Each
+        appended event is applied before this returns; returns the events.
+        """
+        with self.lock, self._locked() as f:
+            events = list(build() or ())
+            if not events:
+                return []
+            lines = [(json.dumps(event, default=json_default, separators=(',', ':')) + '\n').encode('utf-8')
+                     for event in events]
+            f.seek(0, os.SEEK_END)
+            f.write(b''.join(lines))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            for event, line in zip(events, lines):
+                self.offset += len(line)
+                self._apply(json.loads(line), self.offset)
+                self.events += 1
+            return events
+
+    def compact(self, build: Callable[[], Iterable[Dict]]):
+        """
+        Replace the log with the events `build` returns, run under the lock
+        after catching up. Every process, this one included, resets and
+        replays the new file on its next read.
+        """
+        with self.lock, self._locked():
+            events = list(build() or ())
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as tmp:
+                    for event in events:
+                        tmp.write((json.dumps(event, default=json_default, separators=(',', ':')) + '\n').encode('utf-8'))
+                    tmp.flush()
+                    os.fsync(tmp.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+        self.refresh()
+
+    def get_stats(self) -> Dict:
+        return {'events': self.events, 'skipped_lines': self.skipped, 'log_bytes': self.offset}
@@ -1,7 +1,51 @@
 import json
 import csv
+from bisect import bisect_right
+from functools import lru_cache
 from datetime import datetime, timedelta
 
+# Export price premium (%) over domestic prices, by destination country
+EXPORT_PREMIUMS = {
+    "UAE": {"rice": 15, "wheat": 12, "pulses": 18, "default": 10},
+    "Germany": {"rice": 25, "turmeric": 30, "spices": 35, "default": 20},
+    "Singapore": {"rice": 20, "tea": 28, "cashews": 22, "default": 15},
+    "Saudi Arabia": {"dates": 40, "rice": 18, "pulses": 16, "default": 12},
+    "South Africa": {"maize": 8, "sorghum": 10, "pulses": 14, "default": 8}
+}
+DEFAULT_PREMIUMS = {"default": 10}
+
+# Base export prices in USD per MT
+EXPORT_BASE_PRICES = {
+    "rice": 800, "wheat": 350, "pulses": 1200, "turmeric": 8000,
+    "spices": 5000, "tea": 3500, "cashews": 12000, "dates": 6000,
+    "maize": 300, "sorghum": 280
+}
+DEFAULT_BASE_PRICE = 500
+
+# Readiness score bonuses for (countries, crops) with established demand
+READINESS_BASE_SCORE = 70
+READINESS_BONUSES = [
+    ({"Germany"}, {"organic rice", "turmeric"}, 15),   # High demand for organic
+    ({"UAE", "Saudi Arabia"}, {"rice", "dates"}, 10)    # Traditional demand
+]
+
+
+@lru_cache(maxsize=4096)
+def export_valuation(crop, country):
+    """Memoized (premium %, export price per MT, readiness score) for a crop and destination"""
+    crop = crop.lower()
+    country_premiums = EXPORT_PREMIUMS.get(country, DEFAULT_PREMIUMS)
+    premium = country_premiums.get(crop, country_premiums["default"])
+    export_price = EXPORT_BASE_PRICES.get(crop, DEFAULT_BASE_PRICE) * (1 + premium / 100)
+
+    score = READINESS_BASE_SCORE
+    for countries, crops, bonus in READINESS_BONUSES:
+        if country in countries and crop in crops:
+            score += bonus
+            break
+    return premium, export_price, min(score, 100)
+
+
 class ExportGateway:
     def __init__(self, data_folder='data'):
         self.load_data()
@@ -18,6 +62,36 @@ class ExportGateway:
                 
         except FileNotFoundError:
             self.initialize_sample_data()
+        self.build_buyer_index()
+    
+    def build_buyer_index(self):
+        """Pre-parse buyers into a crop -> buyers index sorted by minimum quantity"""
+        self.buyers_by_id = {}
+        by_crop = {}
+        for buyer in self.export_buyers:
+            parsed = {
+                "buyer": buyer,
+                "min_qty": float(buyer["min_quantity_mt"]),
+                "max_qty": float(buyer["max_quantity_mt"]),
+                "rating": float(buyer["rating"])
+            }
+            self.buyers_by_id[buyer["buyer_id"]] = buyer
+            for crop in {c.strip().lower() for c in buyer["crops_interested"].split(",") if c.strip()}:
+                by_crop.setdefault(crop, []).append(parsed)
+        
+        # Each crop keeps buyers sorted by min quantity plus the parallel key list,
+        # so a quantity lookup bisects to the buyers whose range can start below it
+        self.crop_buyer_index = {}
+        for crop, buyers in by_crop.items():
+            buyers.sort(key=lambda b: b["min_qty"])
+            self.crop_buyer_index[crop] = ([b["min_qty"] for b in buyers], buyers)
+        self._next_steps_cache = {}
+    
+    def _buyers_for(self, crop, quantity_mt):
+        """Buyers interested in a crop whose [min, max] quantity range contains quantity_mt"""
+        min_keys, buyers = self.crop_buyer_index.get(crop, ([], []))
+        end = bisect_right(min_keys, quantity_mt)
+        return [b for b in buyers[:end] if quantity_mt <= b["max_qty"]]
     
     def initialize_sample_data(self):
         """Initialize with comprehensive export data"""
@@ -103,27 +177,25 @@ class ExportGateway:
     
     def get_export_opportunities(self, crop_type, quantity_mt, region="all"):
         """Get matching export opportunities for given crop and quantity"""
-        opportunities = []
+        crop = crop_type.lower()
+        matches = self._buyers_for(crop, quantity_mt)
+        if crop != "all":
+            # A buyer listing both the crop and "all" is still one opportunity
+            seen = {match["buyer"]["buyer_id"] for match in matches}
+            matches += [m for m in self._buyers_for("all", quantity_mt) if m["buyer"]["buyer_id"] not in seen]
         
-        for buyer in self.export_buyers:
-            crops_interested = [crop.strip().lower() for crop in buyer["crops_interested"].split(",")]
-            min_qty = float(buyer["min_quantity_mt"])
-            max_qty = float(buyer["max_quantity_mt"])
-            
-            if (crop_type.lower() in crops_interested or "all" in crops_interested) and \
-               min_qty <= quantity_mt <= max_qty:
-                
-                country_req = self.export_requirements.get(buyer["country"], {})
-                
-                opportunity = {
-                    "buyer_info": buyer,
-                    "requirements": country_req,
-                    "estimated_price_premium": self.calculate_export_premium(crop_type, buyer["country"]),
-                    "total_estimated_value": self.estimate_export_value(crop_type, quantity_mt, buyer["country"]),
-                    "readiness_score": self.calculate_readiness_score(crop_type, buyer["country"]),
-                    "next_steps": self.get_next_steps(buyer["country"])
-                }
-                opportunities.append(opportunity)
+        opportunities = []
+        for match in matches:
+            buyer = match["buyer"]
+            premium, export_price, readiness = export_valuation(crop, buyer["country"])
+            opportunities.append({
+                "buyer_info": buyer,
+                "requirements": self.export_requirements.get(buyer["country"], {}),
+                "estimated_price_premium": premium,
+                "total_estimated_value": round(export_price * quantity_mt, 2),
+                "readiness_score": readiness,
+                "next_steps": self.get_next_steps(buyer["country"])
+            })
         
         # Sort by estimated value and rating
         opportunities.sort(key=lambda x: (float(x["buyer_info"]["rating"]), x["total_estimated_value"]), reverse=True)
@@ -131,46 +203,21 @@ class ExportGateway:
     
     def calculate_export_premium(self, crop_type, country):
         """Calculate export price premium over domestic prices"""
-        premiums = {
-            "UAE": {"rice": 15, "wheat": 12, "pulses": 18, "default": 10},
-            "Germany": {"rice": 25, "turmeric": 30, "spices": 35, "default": 20},
-            "Singapore": {"rice": 20, "tea": 28, "cashews": 22, "default": 15},
-            "Saudi Arabia": {"dates": 40, "rice": 18, "pulses": 16, "default": 12},
-            "South Africa": {"maize": 8, "sorghum": 10, "pulses": 14, "default": 8}
-        }
-        
-        country_premiums = premiums.get(country, {"default": 10})
-        return country_premiums.get(crop_type.lower(), country_premiums["default"])
+        return export_valuation(crop_type, country)[0]
     
     def estimate_export_value(self, crop_type, quantity_mt, country):
         """Estimate total export value"""
-        base_prices = {
-            "rice": 800, "wheat": 350, "pulses": 1200, "turmeric": 8000,
-            "spices": 5000, "tea": 3500, "cashews": 12000, "dates": 6000,
-            "maize": 300, "sorghum": 280
-        }
-        
-        base_price = base_prices.get(crop_type.lower(), 500)  # USD per MT
-        premium = self.calculate_export_premium(crop_type, country)
-        export_price = base_price * (1 + premium/100)
-        
-        return round(export_price * quantity_mt, 2)
+        return round(export_valuation(crop_type, country)[1] * quantity_mt, 2)
     
     def calculate_readiness_score(self, crop_type, country):
         """Calculate export readiness score (0-100)"""
-        # Mock scoring based on various factors
-        base_score = 70
-        
-        # Adjust based on crop type and destination
-        if country in ["Germany"] and crop_type.lower() in ["organic rice", "turmeric"]:
-            base_score += 15  # High demand for organic
-        elif country in ["UAE", "Saudi Arabia"] and crop_type.lower() in ["rice", "dates"]:
-            base_score += 10  # Traditional demand
-        
-        return min(base_score, 100)
+        return export_valuation(crop_type, country)[2]
     
     def get_next_steps(self, country):
         """Get next steps for export preparation"""
+        if country in self._next_steps_cache:
+            return list(self._next_steps_cache[country])
+        
         requirements = self.export_requirements.get(country, {})
         
         steps = [
@@ -187,11 +234,12 @@ class ExportGateway:
         if "organic" in requirements.get("special_requirements", "").lower():
             steps.insert(1, "Obtain organic certification")
         
-        return steps
+        self._next_steps_cache[country] = steps
+        return list(steps)
     
     def submit_rfq(self, buyer_id, crop_details, farmer_info):
         """Submit Request for Quotation to buyer"""
-        buyer = next((b for b in self.export_buyers if b["buyer_id"] == buyer_id), None)
+        buyer = self.buyers_by_id.get(buyer_id)
         
         if not buyer:
             return {"success": False, "message": "Buyer not found"}
@@ -257,12 +305,12 @@ class ExportGateway:
         }
         return validity.get(document, 30)
 
-def get_export_gateway():
-    return ExportGateway()
-
     def test_connection(self):
         """Test if the module is working"""
         try:
             return {'status': 'success', 'message': 'Export Gateway is operational'}
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
+
+def get_export_gateway():
+    return ExportGateway()
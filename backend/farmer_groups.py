@@ -1,19 +1,45 @@
-import json
 import os
 from datetime import datetime, timedelta
 import random
+from backend.event_log import EventLog
+from backend.record_store import load_document
+from backend.group_index import GroupIndex, LEVELS, DEFAULT_LIMIT
 
 class FarmerGroupsManager:
     def __init__(self, data_folder='data'):
         self.data_file = os.path.join(data_folder, 'farmer_groups_data.json')
         self.load_data()
+        # New groups, joins and leaves, replayed by every worker
+        self.log = EventLog(os.path.join(data_folder, 'events', 'farmer_groups.jsonl'), self._apply,
+                            reset=self.load_data)
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
+        self.index = GroupIndex(self.data["groups"])
+        self.data.setdefault("memberships", [])
+        self.members = {}
+        for membership in self.data["memberships"]:
+            self.members.setdefault(str(membership["group_id"]), set()).add(str(membership["user_id"]))
+
+    def _apply(self, event, end_offset):
+        kind = event.get("type")
+        if kind == "created":
+            self.index.add(event["group"])
+            self.data["groups"].append(event["group"])
+        elif kind == "joined":
+            group_id, user_id = str(event["group_id"]), str(event["user_id"])
+            self.members.setdefault(group_id, set()).add(user_id)
+            self.data["memberships"].append({key: event[key] for key in ("group_id", "user_id", "joined_date")})
+            self.index.add_members(group_id, 1)
+        elif kind == "left":
+            group_id, user_id = str(event["group_id"]), str(event["user_id"])
+            self.members.get(group_id, set()).discard(user_id)
+            self.data["memberships"] = [m for m in self.data["memberships"]
+                                        if not (str(m["group_id"]) == group_id and str(m["user_id"]) == user_id)]
+            self.index.add_members(group_id, -1)
     
     def generate_default_data(self):
         return {
@@ -73,18 +99,127 @@ class FarmerGroupsManager:
         }
     
     def get_all_groups(self):
+        self.log.refresh()
         return self.data["groups"]
     
     def get_group_by_id(self, group_id):
-        return next((g for g in self.data["groups"] if g["id"] == group_id), None)
+        self.log.refresh()
+        return self.index.get(group_id)
     
     def search_groups(self, location=None, crop=None):
-        groups = self.data["groups"]
-        if location:
-            groups = [g for g in groups if location.lower() in g["location"].lower()]
-        if crop:
-            groups = [g for g in groups if crop.lower() in g["crop_focus"].lower()]
-        return groups
+        self.log.refresh()
+        return [group for group, _ in self.index.search(location=location, crop=crop, limit=None)["groups"]]
+
+    def get_groups(self, filters=None):
+        """Ranked group discovery: location / crop / level filters, nearest and largest first"""
+        filters = filters or {}
+        try:
+            limit = max(1, min(int(filters.get("limit", DEFAULT_LIMIT)), 100))
+            offset = max(int(filters.get("offset", 0)), 0)
+            lat = float(filters["lat"]) if filters.get("lat") not in (None, "") else None
+            lon = float(filters["lon"]) if filters.get("lon") not in (None, "") else None
+        except ValueError:
+            return {"success": False, "message": "limit, offset, lat and lon must be numbers"}
+        self.log.refresh()
+        result = self.index.search(location=filters.get("location"), crop=filters.get("crop"),
+                                   levels={level: filters.get(level) for level in LEVELS},
+                                   near=filters.get("near"), lat=lat, lon=lon, limit=limit, offset=offset)
+        groups = [dict(group, distance_km=distance) if distance is not None else group
+                  for group, distance in result["groups"]]
+        return {"success": True, "total": result["total"], "count": len(groups), "offset": offset, "groups": groups}
+
+    def _max_members(self):
+        guidelines = self.data.get("formation_guidelines")
+        return guidelines.get("maximum_members", 500) if isinstance(guidelines, dict) else 500
+
+    def _join_event(self, group_id, user_id):
+        """The joined event for user_id, or an error message; call under the log lock"""
+        group = self.index.get(group_id)
+        if group is None:
+            return None, "Group not found"
+        if str(user_id) in self.members.get(str(group["id"]), ()):
+            return None, "Already a member of this group"
+        if self.index.member_count(group["id"]) >= self._max_members():
+            return None, "Group has reached its maximum membership"
+        return {"type": "joined", "group_id": group["id"], "user_id": user_id,
+                "joined_date": datetime.now().strftime("%Y-%m-%d")}, None
+
+    def join_group(self, data):
+        data = data or {}
+        group_id, user_id = data.get("group_id"), data.get("user_id")
+        if not group_id or not user_id:
+            return {"success": False, "message": "group_id and user_id are required"}
+        outcome = {}
+
+        def build():
+            event, outcome["error"] = self._join_event(group_id, user_id)
+            return [event] if event else []
+
+        with self.log.lock:
+            joined = self.log.append(build)
+            if not joined:
+                return {"success": False, "message": outcome["error"]}
+            group_id = joined[0]["group_id"]
+            return {"success": True, "group_id": group_id, "members_count": self.index.member_count(group_id)}
+
+    def leave_group(self, data):
+        data = data or {}
+        group_id, user_id = str(data.get("group_id")), str(data.get("user_id"))
+
+        def build():
+            if user_id not in self.members.get(group_id, ()):
+                return []
+            return [{"type": "left", "group_id": group_id, "user_id": user_id}]
+
+        with self.log.lock:
+            if not self.log.append(build):
+                return {"success": False, "message": "Not a member of this group"}
+            return {"success": True, "group_id": group_id, "members_count": self.index.member_count(group_id)}
+
+    def create_group(self, data):
+        data = data or {}
+        if not data.get("name") or not data.get("location"):
+            return {"success": False, "message": "name and location are required"}
+        try:
+            coords = {key: float(data[key]) for key in ("lat", "lon") if data.get(key) not in (None, "")}
+        except (TypeError, ValueError):
+            return {"success": False, "message": "lat and lon must be numbers"}
+        if not (-90 <= coords.get("lat", 0) <= 90 and -180 <= coords.get("lon", 0) <= 180):
+            return {"success": False, "message": "lat and lon are out of range"}
+        group = {
+            "name": data["name"],
+            "location": data["location"],
+            "crop_focus": data.get("crop_focus", ""),
+            "members_count": 0,
+            "established_date": datetime.now().strftime("%Y-%m-%d"),
+            "leader": data.get("leader", ""),
+            "contact": data.get("contact", ""),
+            "activities": data.get("activities", [])
+        }
+        group.update({key: data[key] for key in LEVELS if data.get(key) not in (None, "")})
+        group.update(coords)
+
+        def build():
+            # The id is picked after catching up with every worker's groups
+            group_id = f"FG{len(self.data['groups']) + 1:04d}"
+            while self.index.get(group_id) is not None:
+                group_id = f"FG{int(group_id[2:]) + 1:04d}"
+            events = [{"type": "created", "group": dict(group, id=group_id)}]
+            if data.get("user_id"):
+                events.append({"type": "joined", "group_id": group_id, "user_id": data["user_id"],
+                               "joined_date": group["established_date"]})
+            return events
+
+        with self.log.lock:
+            group_id = self.log.append(build)[0]["group"]["id"]
+            group = self.index.get(group_id)
+        if group is None:
+            return {"success": False, "message": "Group could not be indexed"}
+        return {"success": True, "group": group}
+
+    def get_group_stats(self):
+        self.log.refresh()
+        return self.index.get_stats()
     
     def get_formation_guide(self):
         return self.data["formation_guidelines"]
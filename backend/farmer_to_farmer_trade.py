@@ -1,7 +1,7 @@
-import json
 import os
 from datetime import datetime, timedelta
 import random
+from backend.record_store import load_document, save_document
 
 class FarmerToFarmerTrade:
     def __init__(self, data_folder):
@@ -12,16 +12,14 @@ class FarmerToFarmerTrade:
     def load_data(self):
         """Load farmer-to-farmer trade data"""
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_sample_data()
             self.save_data()
     
     def save_data(self):
         """Save data to file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        save_document(self.data_file, self.data, indent=2)
     
     def generate_sample_data(self):
         """Generate comprehensive farmer-to-farmer trade data"""
@@ -226,6 +224,25 @@ class FarmerToFarmerTrade:
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
+    def post_trade(self, data):
+        """API entry point for listing an item; validates fields, then creates the trade offer"""
+        data = data or {}
+        missing = [field for field in ("farmer_id", "item_name", "quantity", "trade_type") if not data.get(field)]
+        if missing:
+            return {"status": "error", "message": f"Missing required fields: {', '.join(missing)}"}
+        offer = {
+            "farmer_name": "Anonymous",
+            "location": "",
+            "item_type": "produce",
+            "description": "",
+            "unit": "kg",
+            "condition": "good",
+            **data
+        }
+        # Data files in the older listings schema have no peer offers yet
+        self.data.setdefault("peer_offers", [])
+        return self.create_trade_offer(offer)
+
     def initiate_barter_trade(self, offer_id, interested_farmer_id, barter_items):
         """Initiate a barter trade"""
         try:
@@ -1,27 +1,183 @@
-import json
 import os
+import re
+import heapq
+from bisect import bisect_left
+from itertools import islice
 from datetime import datetime, timedelta
 import random
+from backend.price_alert_matcher import PriceAlertMatcher
+from backend.record_store import load_document, save_document
+
+
+def _unit_price(row):
+    """Comparable unit price of a vendor row (per kg for fertilizers, per ml for pesticides)"""
+    return row.get("price_per_kg", row.get("price_per_ml", 0))
+
+
+def _normalize_name(name):
+    """Lowercase a product name and collapse punctuation to single spaces"""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(name).lower()).split())
+
+
+def _trigrams(text):
+    """Word-padded trigrams of a normalized string, as used for fuzzy matching"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class ProductPriceIndex:
+    """Trigram index over product names with presorted per-product vendor prices.
+
+    Each product keeps its vendor rows sorted by unit price together with the
+    min/max/sum of those prices, so a comparison is a dictionary lookup plus a
+    lazy merge of the matching products instead of a scan over every row.
+    """
+
+    FUZZY_THRESHOLD = 0.3
+
+    def __init__(self, rows=()):
+        self.products = {}
+        self.trigram_index = {}
+        for row in rows:
+            self._add_row(row)
+        for entry in self.products.values():
+            entry["rows"].sort(key=_unit_price)
+            entry["prices"] = [_unit_price(r) for r in entry["rows"]]
+            entry["min_price"] = entry["prices"][0]
+            entry["max_price"] = entry["prices"][-1]
+            entry["sum_price"] = sum(entry["prices"])
+
+    def _add_row(self, row):
+        key = (row.get("category", "fertilizer"), _normalize_name(row.get("product_name", "")))
+        entry = self.products.get(key)
+        if entry is None:
+            entry = {"product_name": row.get("product_name", ""), "category": key[0],
+                     "normalized": key[1], "trigrams": _trigrams(key[1]), "rows": []}
+            self.products[key] = entry
+            for gram in entry["trigrams"]:
+                self.trigram_index.setdefault(gram, set()).add(key)
+        entry["rows"].append(row)
+
+    def _candidates(self, normalized, category):
+        """Product keys sharing at least one trigram with the query"""
+        counts = {}
+        for gram in _trigrams(normalized):
+            for key in self.trigram_index.get(gram, ()):
+                if category == "all" or key[0] == category:
+                    counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def match(self, product_name, category="all"):
+        """Return (match_type, [product entries]) for a possibly misspelled name"""
+        normalized = _normalize_name(product_name)
+        if not normalized:
+            return "none", []
+
+        exact = [self.products[(cat, normalized)] for cat in ("fertilizer", "pesticide")
+                 if (category == "all" or cat == category) and (cat, normalized) in self.products]
+        if exact:
+            return "exact", exact
+
+        counts = self._candidates(normalized, category)
+        substring = [self.products[key] for key in counts if normalized in key[1]]
+        if not substring and len(normalized) < 3:
+            # Short queries ("ss") have no full interior trigram to filter on
+            substring = [e for key, e in self.products.items()
+                         if (category == "all" or key[0] == category) and normalized in key[1]]
+        if substring:
+            return "substring", substring
+
+        query_grams = len(_trigrams(normalized))
+        scored = []
+        for key, shared in counts.items():
+            entry = self.products[key]
+            similarity = shared / float(query_grams + len(entry["trigrams"]) - shared)
+            if similarity >= self.FUZZY_THRESHOLD:
+                scored.append((similarity, entry))
+        if not scored:
+            return "none", []
+        best = max(similarity for similarity, _ in scored)
+        # Keep only the closest products so "urea 46" does not pull in every 46-grade
+        return "fuzzy", [entry for similarity, entry in scored if similarity >= best - 0.05]
+
+    def compare(self, product_name, category="all", limit=10):
+        """Cheapest vendor rows and precomputed price range for matching products"""
+        match_type, entries = self.match(product_name, category)
+        total = sum(len(e["rows"]) for e in entries)
+        if len(entries) == 1:
+            best = entries[0]["rows"][:limit]
+        else:
+            best = list(islice(heapq.merge(*(e["rows"] for e in entries), key=_unit_price), limit))
+        return {
+            "match_type": match_type,
+            "matched_products": [e["product_name"] for e in entries],
+            "total_vendors": total,
+            "price_comparison": best,
+            "price_range": {
+                "min_price": min(e["min_price"] for e in entries) if entries else 0,
+                "max_price": max(e["max_price"] for e in entries) if entries else 0,
+                "avg_price": sum(e["sum_price"] for e in entries) / total if total else 0
+            }
+        }
+
+    def vendors_below(self, product_name, max_price, category="all"):
+        """Number of vendors selling a product at or under max_price (binary search)"""
+        _, entries = self.match(product_name, category)
+        return sum(bisect_left(e["prices"], max_price + 1e-9) for e in entries)
+
 
 class FertilizerPriceComparison:
     def __init__(self, data_folder):
         self.data_folder = data_folder
         self.data_file = os.path.join(data_folder, 'fertilizer_price_comparison_data.json')
+        self.alert_matcher = PriceAlertMatcher()
         self.load_data()
     
     def load_data(self):
         """Load fertilizer price comparison data"""
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_sample_data()
             self.save_data()
+        self.build_price_index()
+        for alert in self.data.setdefault("price_alerts", []):
+            self.alert_matcher.add_alert(alert)
+
+    def _iter_price_rows(self):
+        """Yield flat vendor price rows from either data layout"""
+        for row in self.data.get("fertilizer_prices", []):
+            yield row
+        for row in self.data.get("pesticide_prices", []):
+            yield row
+        # Older data files nest brand prices under each fertilizer
+        for fertilizer in self.data.get("fertilizers", []):
+            for brand in fertilizer.get("brands", []):
+                weight = int(re.sub(r"[^0-9]", "", brand.get("bag_weight", "50")) or 50)
+                yield {
+                    "product_name": fertilizer.get("name", ""),
+                    "category": "fertilizer",
+                    "brand": brand.get("brand"),
+                    "vendor_name": brand.get("dealer"),
+                    "vendor_rating": brand.get("rating"),
+                    "price_per_bag": brand.get("price_per_bag", 0),
+                    "bag_weight": brand.get("bag_weight"),
+                    "price_per_kg": round(brand.get("price_per_bag", 0) / weight, 2),
+                    "availability": brand.get("availability"),
+                    "discount": brand.get("discount")
+                }
+
+    def build_price_index(self):
+        """(Re)build the product price index; call after any change to vendor prices"""
+        self.price_index = ProductPriceIndex(self._iter_price_rows())
     
     def save_data(self):
         """Save data to file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        save_document(self.data_file, self.data, indent=2)
     
     def generate_sample_data(self):
         """Generate comprehensive fertilizer price comparison data"""
@@ -125,32 +281,11 @@ class FertilizerPriceComparison:
     def compare_prices(self, product_name, category="all", location="all"):
         """Compare prices across vendors for a specific product"""
         try:
-            all_prices = []
-            
-            if category == "all" or category == "fertilizer":
-                all_prices.extend(self.data["fertilizer_prices"])
-            if category == "all" or category == "pesticide":
-                all_prices.extend(self.data["pesticide_prices"])
-            
-            # Filter by product name
-            filtered_prices = [
-                price for price in all_prices 
-                if product_name.lower() in price["product_name"].lower()
-            ]
-            
-            # Sort by price
-            filtered_prices.sort(key=lambda x: x.get("price_per_kg", x.get("price_per_ml", 0)))
-            
+            result = self.price_index.compare(product_name, category)
             return {
                 "status": "success",
                 "product_name": product_name,
-                "total_vendors": len(filtered_prices),
-                "price_comparison": filtered_prices[:10],  # Top 10 best prices
-                "price_range": {
-                    "min_price": min([p.get("price_per_kg", p.get("price_per_ml", 0)) for p in filtered_prices]) if filtered_prices else 0,
-                    "max_price": max([p.get("price_per_kg", p.get("price_per_ml", 0)) for p in filtered_prices]) if filtered_prices else 0,
-                    "avg_price": sum([p.get("price_per_kg", p.get("price_per_ml", 0)) for p in filtered_prices]) / len(filtered_prices) if filtered_prices else 0
-                }
+                **result
             }
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -171,6 +306,14 @@ class FertilizerPriceComparison:
     
     def set_price_alert(self, user_id, product_name, target_price):
         """Set price alert for a product"""
+        if not product_name:
+            return {"status": "error", "message": "product_name is required"}
+        try:
+            target_price = float(target_price)
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "target_price must be a number"}
+        if not 0 < target_price < float("inf"):
+            return {"status": "error", "message": "target_price must be a positive number"}
         try:
             alert = {
                 "alert_id": f"PA{len(self.data['price_alerts'])+1:03d}",
@@ -182,17 +325,36 @@ class FertilizerPriceComparison:
                 "created_date": datetime.now().isoformat()
             }
             
+            self.alert_matcher.add_alert(alert)
             self.data["price_alerts"].append(alert)
             self.save_data()
             
             return {
                 "status": "success",
                 "message": "Price alert set successfully",
-                "alert_id": alert["alert_id"]
+                "alert_id": alert["alert_id"],
+                "alert_status": alert["status"]
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+    
+    def record_price(self, product_name, price):
+        """Feed a price update for a product and fire the alerts it crosses"""
+        try:
+            triggered = self.alert_matcher.on_price_update(product_name, price)
+            if triggered:
+                self.save_data()
+            
+            return {
+                "status": "success",
+                "product_name": product_name,
+                "price": price,
+                "triggered_alerts": [alert["alert_id"] for alert in triggered],
+                "pending_alerts": self.alert_matcher.pending_count(product_name)
             }
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     def test_connection(self):
         """Test the module connection"""
-        return {"status": "connected", "module": "FertilizerPriceComparison", "data_loaded": len(self.data.get("fertilizer_prices", [])) > 0}
+        return {"status": "connected", "module": "FertilizerPriceComparison", "data_loaded": len(self.price_index.products) > 0}
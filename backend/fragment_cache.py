@@ -0,0 +1,132 @@
+"""
+Template Fragment Cache for app.py
+Caches rendered template fragments keyed by name, language, role and data version
+
+Usage in templates:
+    {% cache 'categorized_dashboard', ui_language, ui_role %}
+        ... static markup ...
+    {% endcache %}
+
+Invalidation is version based: bump the fragment's version (or the global
+version) when its underlying data changes and old entries simply stop
+matching; they age out of the LRU.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+import os
+import threading
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """Bounded LRU of rendered fragments with per-fragment data versions"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._global_version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, name: str) -> tuple:
+        return (self._global_version, self._versions.get(name, 0))
+
+    def invalidate(self, name: Optional[str] = None):
+        """Bump the version of one fragment, or of every fragment when name is None"""
+        with self._lock:
+            if name is None:
+                self._global_version += 1
+            else:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def get_or_render(self, name: str, key_parts: Iterable[Any], render: Callable[[], Any]) -> Any:
+        """Return the cached fragment for (name, version, *key_parts), rendering it on a miss"""
+        key = (name, self.version(name)) + tuple(key_parts)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Render outside the lock; two concurrent misses just render twice
+        value = render()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def get_stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja2 `{% cache name, key... %}...{% endcache %}` tag backed by FragmentCache"""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return cache.get_or_render(str(key_parts[0]), key_parts[1:], caller)
+
+
+def is_production() -> bool:
+    return os.environ.get('FLASK_ENV', '').lower() == 'production'
+
+
+def register_fragment_cache(app, production: Optional[bool] = None, max_entries: int = 2048) -> FragmentCache:
+    """
+    Install the {% cache %} tag and a shared FragmentCache on the app.
+
+    In production mode template auto-reload is switched off so Jinja keeps
+    compiled templates instead of stat()-ing every template on each render.
+    """
+    if production is None:
+        production = is_production()
+    if production:
+        app.config['TEMPLATES_AUTO_RELOAD'] = False
+        app.jinja_env.auto_reload = False
+
+    cache = FragmentCache(max_entries)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = cache
+    app.extensions['fragment_cache'] = cache
+
+    @app.context_processor
+    def inject_fragment_keys():
+        from flask import session
+        return {
+            'ui_language': session.get('language', 'en'),
+            'ui_role': session.get('user_type', 'farmer')
+        }
+
+    return cache
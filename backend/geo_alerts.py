@@ -0,0 +1,320 @@
+"""
+Geo Alerts
+Spatial index of disaster alerts and farmer subscriptions, and batched
+fan-out of an alert to every subscriber inside its area
+
+Geometry: an alert may carry
+    "bbox":    [min_lat, min_lon, max_lat, max_lon]
+    "polygon": [[lat, lon], ...]
+    "center":  [lat, lon] with "radius_km"
+and otherwise its location ("District Pune", "Nashik, Maharashtra") is
+resolved through a district/state gazetteer to a circle of DEFAULT_RADIUS_KM.
+
+Subscriptions are points held column-wise (NumPy arrays, not one dict per
+farmer) and bucketed on a fixed lat/lon grid. The buckets are kept in CSR
+form, rows sorted by cell id, so the cells of one grid row covered by an
+alert's bounding box are a single contiguous slice. A spatial join is then
+one slice per grid row, a concatenate, and a vectorized exact containment
+test on the candidates. Alerts, which are few but large, sit in a plain
+cell -> alert id map used for point lookups.
+"""
+
+import math
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+CELL_DEGREES = 0.25
+GRID_COLUMNS = int(360 / CELL_DEGREES)
+DEFAULT_RADIUS_KM = 40.0
+FANOUT_BATCH_SIZE = 1000
+KM_PER_DEGREE = 111.32
+
+# District and state centroids (lat, lon) for locations used by alerts and farmer profiles
+GAZETTEER = {
+    'pune': (18.52, 73.86), 'mumbai': (19.08, 72.88), 'nashik': (20.00, 73.79), 'aurangabad': (19.88, 75.34),
+    'nagpur': (21.15, 79.09), 'ahmednagar': (19.09, 74.74), 'beed': (18.99, 75.76), 'osmanabad': (18.18, 76.04),
+    'latur': (18.40, 76.56), 'solapur': (17.66, 75.91), 'kolhapur': (16.70, 74.24), 'sangli': (16.85, 74.58),
+    'satara': (17.68, 74.02), 'thane': (19.22, 72.98), 'raigad': (18.52, 73.18), 'ratnagiri': (16.99, 73.30),
+    'sindhudurg': (16.35, 73.56), 'ludhiana': (30.90, 75.85), 'amritsar': (31.63, 74.87), 'jaipur': (26.91, 75.79),
+    'ahmedabad': (23.02, 72.57), 'bengaluru': (12.97, 77.59), 'mysuru': (12.30, 76.64),
+    'maharashtra': (19.66, 75.30), 'karnataka': (15.32, 75.71), 'gujarat': (22.26, 71.19),
+    'rajasthan': (27.02, 74.22), 'punjab': (31.15, 75.34), 'haryana': (29.06, 76.09),
+    'uttar pradesh': (26.85, 80.95), 'tamil nadu': (11.13, 78.66)
+}
+STATE_RADIUS_KM = 250.0
+STATES = {'maharashtra', 'karnataka', 'gujarat', 'rajasthan', 'punjab', 'haryana', 'uttar pradesh', 'tamil nadu'}
+
+
+def resolve_location(location: Optional[str]) -> Optional[Tuple[float, float, float]]:
+    """(lat, lon, radius_km) of the most specific gazetteer place named in a location string"""
+    if not location:
+        return None
+    text = str(location).lower()
+    for name, (lat, lon) in GAZETTEER.items():
+        if name not in STATES and re.search(rf'\b{name}\b', text):
+            return lat, lon, DEFAULT_RADIUS_KM
+    for name in STATES:
+        if re.search(rf'\b{name}\b', text):
+            lat, lon = GAZETTEER[name]
+            return lat, lon, STATE_RADIUS_KM
+    return None
+
+
+def _cell(lat: float, lon: float) -> Tuple[int, int]:
+    return int((lat + 90) // CELL_DEGREES), int((lon + 180) // CELL_DEGREES)
+
+
+class Geometry:
+    """An alert area: bounding box plus an exact vectorized containment test"""
+
+    def __init__(self, kind: str, bbox: Tuple[float, float, float, float], polygon=None, center=None, radius_km=None):
+        self.kind = kind
+        self.bbox = bbox
+        self.polygon = np.asarray(polygon, dtype=np.float64) if polygon is not None else None
+        self.center = center
+        self.radius_km = radius_km
+
+    @classmethod
+    def circle(cls, lat: float, lon: float, radius_km: float) -> 'Geometry':
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        return cls('circle', (lat - dlat, lon - dlon, lat + dlat, lon + dlon), center=(lat, lon), radius_km=radius_km)
+
+    @classmethod
+    def from_alert(cls, alert: Dict) -> Optional['Geometry']:
+        if alert.get('polygon'):
+            points = [(float(lat), float(lon)) for lat, lon in alert['polygon']]
+            lats, lons = zip(*points)
+            return cls('polygon', (min(lats), min(lons), max(lats), max(lons)), polygon=points)
+        if alert.get('bbox'):
+            min_lat, min_lon, max_lat, max_lon = (float(v) for v in alert['bbox'])
+            return cls('bbox', (min_lat, min_lon, max_lat, max_lon))
+        if alert.get('center'):
+            lat, lon = (float(v) for v in alert['center'])
+            return cls.circle(lat, lon, float(alert.get('radius_km', DEFAULT_RADIUS_KM)))
+        resolved = resolve_location(alert.get('location')) or resolve_location(alert.get('state'))
+        if resolved:
+            lat, lon, radius = resolved
+            return cls.circle(lat, lon, float(alert.get('radius_km', radius)))
+        return None
+
+    def contains(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        inside = (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+        if self.kind == 'circle':
+            lat0, lon0 = self.center
+            dy = (lats - lat0) * KM_PER_DEGREE
+            dx = (lons - lon0) * KM_PER_DEGREE * math.cos(math.radians(lat0))
+            inside &= dx * dx + dy * dy <= self.radius_km * self.radius_km
+        elif self.kind == 'polygon':
+            # Ray casting, one pass per polygon edge over all candidate points
+            crossings = np.zeros(len(lats), dtype=bool)
+            vertices = self.polygon
+            for (lat_a, lon_a), (lat_b, lon_b) in zip(vertices, np.roll(vertices, -1, axis=0)):
+                spans = (lats < lat_a) != (lats < lat_b)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    lon_cross = lon_a + (lats - lat_a) * (lon_b - lon_a) / (lat_b - lat_a)
+                crossings ^= spans & (lons < lon_cross)
+            inside &= crossings
+        return inside
+
+    def cells(self) -> Iterable[Tuple[int, int]]:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        row0, col0 = _cell(min_lat, min_lon)
+        row1, col1 = _cell(max_lat, max_lon)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                yield row, col
+
+    def to_dict(self) -> Dict:
+        data = {'kind': self.kind, 'bbox': [round(v, 4) for v in self.bbox]}
+        if self.kind == 'circle':
+            data.update(center=list(self.center), radius_km=self.radius_km)
+        return data
+
+
+class SubscriberIndex:
+    """Farmer subscription points on a grid, stored column-wise"""
+
+    def __init__(self, capacity: int = 1024):
+        self._lats = np.empty(capacity, dtype=np.float64)
+        self._lons = np.empty(capacity, dtype=np.float64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._ids: List[str] = []
+        self._contacts: List[Dict] = []
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        self._csr = None            # (order, sorted cell ids), rebuilt lazily after writes
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, subscriber_id) -> bool:
+        return str(subscriber_id) in self._rows
+
+    def _grow(self, needed: int):
+        capacity = len(self._lats)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('_lats', '_lons', '_active'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add_many(self, subscriptions: Iterable[Dict]) -> int:
+        """Register or move subscriptions: dicts with subscriber_id, lat, lon and contact fields"""
+        added = 0
+        with self._lock:
+            for subscription in subscriptions:
+                subscriber_id = str(subscription['subscriber_id'])
+                previous = self._rows.get(subscriber_id)
+                if previous is not None:
+                    self._active[previous] = False
+                self._grow(self._size + 1)
+                row = self._size
+                self._lats[row] = float(subscription['lat'])
+                self._lons[row] = float(subscription['lon'])
+                self._active[row] = True
+                self._ids.append(subscriber_id)
+                self._contacts.append({k: v for k, v in subscription.items() if k not in ('lat', 'lon')})
+                self._rows[subscriber_id] = row
+                self._size += 1
+                added += 1
+            self._csr = None
+        return added
+
+    def remove(self, subscriber_id: str) -> bool:
+        with self._lock:
+            row = self._rows.pop(str(subscriber_id), None)
+            if row is None:
+                return False
+            self._active[row] = False
+            return True
+
+    def _index(self):
+        csr = self._csr
+        if csr is None:
+            size = self._size
+            rows = ((self._lats[:size] + 90) // CELL_DEGREES).astype(np.int64)
+            cols = ((self._lons[:size] + 180) // CELL_DEGREES).astype(np.int64)
+            cell_ids = rows * GRID_COLUMNS + cols
+            order = np.argsort(cell_ids, kind='stable')
+            csr = self._csr = (order, cell_ids[order])
+        return csr
+
+    def within(self, geometry: Geometry) -> np.ndarray:
+        """Row numbers of active subscriptions inside the geometry (the spatial join)"""
+        with self._lock:
+            order, sorted_cells = self._index()
+            lats, lons, active = self._lats, self._lons, self._active
+        min_lat, min_lon, max_lat, max_lon = geometry.bbox
+        row0, col0 = _cell(min_lat, min_lon)
+        row1, col1 = _cell(max_lat, max_lon)
+        slices = []
+        for row in range(row0, row1 + 1):
+            start = np.searchsorted(sorted_cells, row * GRID_COLUMNS + col0, side='left')
+            end = np.searchsorted(sorted_cells, row * GRID_COLUMNS + col1, side='right')
+            if end > start:
+                slices.append(order[start:end])
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate(slices)
+        candidates = candidates[active[candidates]]
+        return candidates[geometry.contains(lats[candidates], lons[candidates])]
+
+    def count_near(self, lat: float, lon: float, radius_km: float) -> int:
+        return int(len(self.within(Geometry.circle(lat, lon, radius_km))))
+
+    def subscribers(self, rows: np.ndarray) -> List[Dict]:
+        return [self._contacts[row] for row in rows.tolist()]
+
+
+class GeoAlertIndex:
+    """Alerts on a grid for point lookups, subscriptions for fan-out"""
+
+    def __init__(self, batch_size: int = FANOUT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.subscriptions = SubscriberIndex()
+        self._geometries: Dict[str, Geometry] = {}
+        self._cells: Dict[Tuple[int, int], set] = {}
+        self._listeners: List[Callable[[Dict, List[Dict]], None]] = []
+        self._lock = threading.Lock()
+        self.stats = {'alerts_indexed': 0, 'alerts_unlocated': 0, 'fanouts': 0, 'notifications': 0, 'batches': 0}
+
+    def add_listener(self, listener: Callable[[Dict, List[Dict]], None]):
+        """Register a callback invoked as listener(alert, recipients) for every batch"""
+        self._listeners.append(listener)
+
+    def add_alert(self, alert: Dict) -> Optional[Geometry]:
+        geometry = Geometry.from_alert(alert)
+        with self._lock:
+            if geometry is None:
+                self.stats['alerts_unlocated'] += 1
+                return None
+            self._remove_locked(alert['id'])
+            self._geometries[alert['id']] = geometry
+            for cell in geometry.cells():
+                self._cells.setdefault(cell, set()).add(alert['id'])
+            self.stats['alerts_indexed'] += 1
+        return geometry
+
+    def _remove_locked(self, alert_id: str):
+        geometry = self._geometries.pop(alert_id, None)
+        if geometry is not None:
+            for cell in geometry.cells():
+                self._cells.get(cell, set()).discard(alert_id)
+
+    def remove_alert(self, alert_id: str):
+        with self._lock:
+            self._remove_locked(alert_id)
+
+    def alerts_at(self, lat: float, lon: float) -> List[str]:
+        """Ids of indexed alerts whose area contains the point"""
+        with self._lock:
+            candidates = list(self._cells.get(_cell(lat, lon), ()))
+            geometries = [self._geometries[alert_id] for alert_id in candidates]
+        point_lat, point_lon = np.array([lat]), np.array([lon])
+        return [alert_id for alert_id, geometry in zip(candidates, geometries)
+                if geometry.contains(point_lat, point_lon)[0]]
+
+    def geometry(self, alert_id: str) -> Optional[Geometry]:
+        return self._geometries.get(alert_id)
+
+    def fan_out(self, alert: Dict) -> Dict:
+        """Join the alert area against all subscriptions and push recipients out in batches"""
+        started = time.perf_counter()
+        geometry = self._geometries.get(alert['id']) or self.add_alert(alert)
+        if geometry is None:
+            return {'subscribers': 0, 'batches': 0, 'geometry': None}
+        rows = self.subscriptions.within(geometry)
+        join_ms = 1000 * (time.perf_counter() - started)
+
+        batches = 0
+        for start in range(0, len(rows), self.batch_size):
+            recipients = self.subscriptions.subscribers(rows[start:start + self.batch_size])
+            for listener in self._listeners:
+                listener(alert, recipients)
+            batches += 1
+        with self._lock:
+            self.stats['fanouts'] += 1
+            self.stats['notifications'] += len(rows)
+            self.stats['batches'] += batches
+        return {
+            'subscribers': int(len(rows)),
+            'batches': batches,
+            'geometry': geometry.to_dict(),
+            'join_ms': round(join_ms, 3),
+            'total_ms': round(1000 * (time.perf_counter() - started), 3)
+        }
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, alerts=len(self._geometries), subscriptions=len(self.subscriptions))
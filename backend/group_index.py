@@ -0,0 +1,278 @@
+"""
+Group Index
+Token index and ranked discovery for farmer groups and FPOs
+
+Every group is indexed by the tokens of its location hierarchy (state,
+district, block, village) and of its crop focus. A search intersects the
+posting sets of the query tokens, smallest first; the last token of a query
+also matches as a prefix, using a sorted vocabulary, so "Lud" finds
+Ludhiana as the farmer types. Matches are ranked by distance band from the
+farmer (when a place or coordinates are given) and then by size.
+
+Coordinates and member counts live in numpy arrays aligned with group
+positions. Joins and leaves update a group's member count and the per-state
+and per-crop totals in place, so stats never rescan the groups.
+
+Usage:
+    index = GroupIndex(groups)
+    index.search(location='Ludhiana', crop='wheat', near='Khanna, Punjab', limit=20)
+    index.add_members('FG0042', 1)
+    index.get_stats()
+"""
+
+import bisect
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.geo_alerts import resolve_location
+
+LEVELS = ('state', 'district', 'block', 'village')
+STATE_ALIASES = {'up': 'uttar pradesh', 'mp': 'madhya pradesh', 'tn': 'tamil nadu', 'ap': 'andhra pradesh'}
+DISTANCE_BAND_KM = 25.0
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_LIMIT = 20
+INITIAL_CAPACITY = 256
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+# FPOs share a few thousand place names; resolve each once
+_resolve = lru_cache(maxsize=4096)(resolve_location)
+
+
+def tokenize(text) -> List[str]:
+    tokens = _TOKEN.findall(str(text or '').lower())
+    expanded = []
+    for token in tokens:
+        expanded.extend(STATE_ALIASES.get(token, token).split())
+    return expanded
+
+
+def location_levels(group: Dict) -> Dict[str, str]:
+    """{level: name} from a location dict, explicit level fields, or 'Village, Block, District, State' text"""
+    location = group.get('location')
+    if isinstance(location, dict):
+        levels = {level: location[level] for level in LEVELS if location.get(level)}
+    else:
+        parts = [part.strip() for part in str(location or '').split(',') if part.strip()]
+        levels = dict(zip(LEVELS, reversed(parts)))
+    levels.update({level: group[level] for level in LEVELS if group.get(level)})
+    return levels
+
+
+def members_of(group: Dict) -> int:
+    value = group.get('members_count', group.get('members', 0))
+    return len(value) if isinstance(value, list) else int(value or 0)
+
+
+def crop_focus(group: Dict) -> str:
+    """Crop focus, falling back to the group name ('Punjab Wheat Growers Cooperative')"""
+    focus = group.get('crop_focus') or group.get('crops')
+    if isinstance(focus, list):
+        focus = ' '.join(focus)
+    return str(focus or group.get('name') or '')
+
+
+class GroupIndex:
+    """Id map, location/crop token postings and ranking arrays for farmer groups"""
+
+    def __init__(self, groups: Iterable[Dict] = ()):
+        self.groups: Dict[str, Dict] = {}
+        self.positions: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.location_postings: Dict[str, set] = {}
+        self.level_postings: Dict[Tuple[str, str], set] = {}
+        self.crop_postings: Dict[str, set] = {}
+        self._location_vocab: List[str] = []
+        self._crop_vocab: List[str] = []
+        self._coords = np.full((INITIAL_CAPACITY, 2), np.nan)
+        self._members = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self._keys: Dict[str, Tuple[Optional[str], Tuple[str, ...]]] = {}
+        self.state_counts: Counter = Counter()
+        self.state_members: Counter = Counter()
+        self.crop_counts: Counter = Counter()
+        self.crop_members: Counter = Counter()
+        self._lock = threading.Lock()
+        for group in groups:
+            self.add(group)
+
+    # ------------------------------------------------------------------ indexing
+
+    def add(self, group: Dict) -> Dict:
+        """Index a new group; every field is parsed first, so a bad group raises ValueError and adds nothing"""
+        group_id = str(group['id'])
+        levels = location_levels(group)
+        level_tokens = {level: tokenize(name) for level, name in levels.items()}
+        crops = tuple(dict.fromkeys(tokenize(crop_focus(group))))
+        if group.get('lat') is not None and group.get('lon') is not None:
+            try:
+                point = (float(group['lat']), float(group['lon']))
+            except (TypeError, ValueError):
+                raise ValueError("lat and lon must be numbers")
+            if not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180):
+                raise ValueError("lat and lon are out of range")
+        else:
+            resolved = _resolve(' '.join(tokenize(', '.join(levels.values()))))
+            point = resolved[:2] if resolved else None
+        try:
+            members = members_of(group)
+        except (TypeError, ValueError):
+            raise ValueError("members_count must be a number")
+        state = ' '.join(tokenize(levels.get('state'))).title() or None
+        crop_key = tuple(token for token in crops if token in tokenize(group.get('crop_focus') or ''))
+
+        with self._lock:
+            if group_id in self.groups:
+                raise ValueError(f"group {group_id} already exists")
+            position = len(self.ids)
+            if position == len(self._members):
+                self._coords = np.vstack([self._coords, np.full_like(self._coords, np.nan)])
+                self._members = np.concatenate([self._members, np.zeros_like(self._members)])
+            self.groups[group_id] = group
+            self.positions[group_id] = position
+            self.ids.append(group_id)
+
+            for level, tokens in level_tokens.items():
+                for token in tokens:
+                    self._post(self.location_postings, self._location_vocab, token, group_id)
+                    self.level_postings.setdefault((level, token), set()).add(group_id)
+            for token in crops:
+                self._post(self.crop_postings, self._crop_vocab, token, group_id)
+
+            if point:
+                self._coords[position] = point
+            self._members[position] = members
+
+            self._keys[group_id] = (state, crop_key)
+            if state:
+                self.state_counts[state] += 1
+                self.state_members[state] += members
+            for crop in crop_key:
+                self.crop_counts[crop] += 1
+                self.crop_members[crop] += members
+        return group
+
+
+    @staticmethod
+    def _post(postings: Dict[str, set], vocab: List[str], token: str, group_id: str):
+        if token not in postings:
+            postings[token] = set()
+            bisect.insort(vocab, token)
+        postings[token].add(group_id)
+
+    def add_members(self, group_id: str, delta: int) -> Optional[int]:
+        """Apply a join (+) / leave (-) to a group's member count and the rollups; returns the new count"""
+        group_id = str(group_id)
+        with self._lock:
+            group = self.groups.get(group_id)
+            if group is None:
+                return None
+            position = self.positions[group_id]
+            count = max(0, int(self._members[position]) + delta)
+            delta = count - int(self._members[position])
+            self._members[position] = count
+            group['members_count' if 'members_count' in group or 'members' not in group else 'members'] = count
+            state, crops = self._keys[group_id]
+            if state:
+                self.state_members[state] += delta
+            for crop in crops:
+                self.crop_members[crop] += delta
+            return count
+
+    # --------------------------------------------------------------------- reads
+
+    def get(self, group_id) -> Optional[Dict]:
+        return self.groups.get(str(group_id))
+
+    def member_count(self, group_id) -> int:
+        position = self.positions.get(str(group_id))
+        return 0 if position is None else int(self._members[position])
+
+    def _lookup(self, postings: Dict[str, set], vocab: List[str], text) -> Optional[set]:
+        """Ids matching every token of `text`, the last one as a prefix; None when text has no tokens"""
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+        sets = [postings.get(token, set()) for token in tokens[:-1]]
+        last = tokens[-1]
+        prefixed = set()
+        start = bisect.bisect_left(vocab, last)
+        for token in vocab[start:]:
+            if not token.startswith(last):
+                break
+            prefixed |= postings[token]
+        sets.append(prefixed)
+        sets.sort(key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+            if not result:
+                break
+        return result
+
+    def search(self, location=None, crop=None, levels: Optional[Dict[str, str]] = None,
+               near=None, lat: Optional[float] = None, lon: Optional[float] = None,
+               limit: Optional[int] = DEFAULT_LIMIT, offset: int = 0) -> Dict:
+        """
+        Groups matching every given filter, nearest distance band first and
+        largest first within a band. `near` (a place) or lat/lon set the
+        origin; otherwise the searched location is used. Returns
+        {'total', 'groups': [(group, distance_km or None)]}.
+        """
+        with self._lock:
+            candidates = [self._lookup(self.location_postings, self._location_vocab, location),
+                          self._lookup(self.crop_postings, self._crop_vocab, crop)]
+            for level, name in (levels or {}).items():
+                if name and level in LEVELS:
+                    tokens = tokenize(name)
+                    candidates.append(set.intersection(*[self.level_postings.get((level, t), set()) for t in tokens])
+                                      if tokens else None)
+            candidates = sorted((c for c in candidates if c is not None), key=len)
+            if candidates:
+                matched = set(candidates[0]).intersection(*candidates[1:])
+                positions = np.fromiter((self.positions[i] for i in matched), dtype=np.int64, count=len(matched))
+                positions.sort()
+            else:
+                positions = np.arange(len(self.ids))
+
+            origin = (lat, lon) if lat is not None and lon is not None else None
+            if origin is None:
+                point = _resolve(' '.join(tokenize(near or location)))
+                origin = point[:2] if point else None
+            members = self._members[positions]
+            if origin is not None:
+                distance = self._distance_km(self._coords[positions], origin)
+                band = np.where(np.isnan(distance), np.inf, np.floor(distance / DISTANCE_BAND_KM))
+                order = np.lexsort((-members, band))
+            else:
+                distance = None
+                order = np.argsort(-members, kind='stable')
+            end = None if limit is None else offset + int(limit)
+            page = order[offset:end]
+            rows = [(self.groups[self.ids[positions[i]]],
+                     None if distance is None or np.isnan(distance[i]) else round(float(distance[i]), 1))
+                    for i in page]
+        return {'total': len(positions), 'groups': rows}
+
+    @staticmethod
+    def _distance_km(coords: np.ndarray, origin) -> np.ndarray:
+        lat1, lon1 = np.radians(origin[0]), np.radians(origin[1])
+        lat2, lon2 = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'total_groups': len(self.ids),
+                'total_members': int(self._members[:len(self.ids)].sum()),
+                'groups_by_state': dict(self.state_counts.most_common()),
+                'members_by_state': dict(self.state_members.most_common()),
+                'groups_by_crop': dict(self.crop_counts.most_common()),
+                'members_by_crop': dict(self.crop_members.most_common()),
+                'location_tokens': len(self._location_vocab),
+                'crop_tokens': len(self._crop_vocab)
+            }
@@ -0,0 +1,167 @@
+"""
+Health and Readiness Probes for app.py
+
+    GET /health   liveness: the process is up and serving (never touches engines)
+    GET /ready    readiness: per-engine load state, dataset version, load and
+                  refresh times and cache hit rates; 503 until startup has
+                  finished or while any engine failed to (re)load
+
+Both are built from state recorded when engines load, so a probe costs a
+dictionary copy rather than 41 engine calls. Load times are the ones the data
+sources recorded: when load_document last read the engine's data file and
+when each ReferenceHandle attached its current generation. A probe reads no
+files; per-engine call counts are on /metrics. The readiness body is cached
+for READY_CACHE_SECONDS to keep probe storms during deploys cheap.
+"""
+
+from functools import wraps
+from typing import Dict, Optional
+import os
+import threading
+import time
+
+from flask import jsonify
+
+from backend.record_store import document_loaded_at, records_path
+from backend.shared_reference import ReferenceHandle, current_snapshot_dir
+
+READY_CACHE_SECONDS = 1.0
+PROBE_ENDPOINTS = {'health_live', 'health_ready'}
+
+
+def _dataset_version(engine) -> Optional[str]:
+    """mtime-size of the engine's data file (or its .jsonl records), if it has one"""
+    data_file = getattr(engine, 'data_file', None)
+    if not data_file:
+        return None
+    for path in (records_path(data_file), data_file):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        return f"{int(stat.st_mtime)}-{stat.st_size}"
+    return 'generated'
+
+
+def _dataset_load_times(engine) -> Dict[str, float]:
+    """Load time per data source: the engine's data file and its reference handles"""
+    times = {}
+    data_file = getattr(engine, 'data_file', None)
+    if data_file and document_loaded_at(data_file) is not None:
+        times[os.path.basename(data_file)] = document_loaded_at(data_file)
+    for value in vars(engine).values():
+        if isinstance(value, ReferenceHandle) and value.loaded_at is not None:
+            times[value.name] = value.loaded_at
+    return times
+
+
+class HealthMonitor:
+    """Engine load state recorded at startup and on every load_data()"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.ready = False
+        self._engines: Dict[str, Dict] = {}
+        self._engine_objects: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._cached_body = None
+        self._cached_at = 0.0
+
+    def track(self, name: str, engine):
+        """Record an engine as loaded and follow its future load_data() refreshes"""
+        self._engine_objects[name] = engine
+        self._engines[name] = {
+            'state': 'ready',
+            'last_refresh': None,
+            'dataset_version': _dataset_version(engine),
+            'error': None
+        }
+        load_data = getattr(engine, 'load_data', None)
+        if load_data is None:
+            return
+
+        @wraps(load_data)
+        def tracked_load_data(*args, **kwargs):
+            try:
+                result = load_data(*args, **kwargs)
+            except Exception as e:
+                self._update(name, state='error', error=str(e))
+                raise
+            self._update(name, state='ready', error=None, last_refresh=time.time(),
+                         dataset_version=_dataset_version(engine))
+            return result
+
+        engine.load_data = tracked_load_data
+
+    def _update(self, name: str, **fields):
+        with self._lock:
+            self._engines[name].update(fields)
+            self._cached_body = None
+
+    def mark_ready(self, ready: bool = True):
+        self.ready = ready
+        self._cached_body = None
+
+    def readiness(self, app) -> Dict:
+        now = time.time()
+        with self._lock:
+            if self._cached_body is not None and now - self._cached_at < READY_CACHE_SECONDS:
+                return self._cached_body
+            engines = {name: dict(state) for name, state in self._engines.items()}
+
+        for name, state in engines.items():
+            datasets = _dataset_load_times(self._engine_objects[name])
+            refreshes = list(datasets.values()) + ([state['last_refresh']] if state['last_refresh'] else [])
+            state['datasets'] = datasets
+            state['loaded_at'] = min(datasets.values()) if datasets else None
+            state['last_refresh'] = max(refreshes) if refreshes else None
+
+        caches = {}
+        for cache_name in ('response_cache', 'fragment_cache'):
+            cache = app.extensions.get(cache_name)
+            if cache is not None:
+                stats = cache.get_stats()
+                caches[cache_name] = {'hit_rate': stats.get('hit_rate', 0.0), 'entries': stats.get('entries', 0)}
+
+        failed = sorted(name for name, state in engines.items() if state['state'] != 'ready')
+        manifest = app.extensions.get('asset_manifest')
+        snapshot = current_snapshot_dir()
+        body = {
+            'status': 'ready' if self.ready and not failed else 'not_ready',
+            'uptime_seconds': round(now - self.started_at, 1),
+            'pid': os.getpid(),
+            'snapshot': os.path.basename(snapshot) if snapshot else None,
+            'asset_build': getattr(manifest, 'build_id', None),
+            'engines_ready': len(engines) - len(failed),
+            'engines_total': len(engines),
+            'failed_engines': failed,
+            'caches': caches,
+            'engines': engines
+        }
+        with self._lock:
+            self._cached_body = body
+            self._cached_at = now
+        return body
+
+
+def register_health(app, engines: Dict[str, object]) -> HealthMonitor:
+    """Install /health and /ready and start tracking the given engines"""
+    monitor = HealthMonitor()
+    for name, engine in engines.items():
+        monitor.track(name, engine)
+    app.extensions['health'] = monitor
+    # Probes arrive every few seconds; keep them out of the latency histograms
+    app.config.setdefault('METRICS_EXCLUDED_ENDPOINTS', set()).update(PROBE_ENDPOINTS)
+
+    @app.route('/health')
+    def health_live():
+        """Liveness probe"""
+        return jsonify({'status': 'ok'})
+
+    @app.route('/ready')
+    def health_ready():
+        """Readiness probe"""
+        body = monitor.readiness(app)
+        return jsonify(body), 200 if body['status'] == 'ready' else 503
+
+    return monitor
@@ -1,19 +1,25 @@
-import json
 import os
+import re
 from datetime import datetime, timedelta
 import random
+from backend.record_store import load_document
+from backend.verification_queue import DECISIONS, DEFAULT_LEASE_SECONDS, VerificationQueue
 
 class IDVerificationManager:
     def __init__(self, data_folder='data'):
         self.data_file = os.path.join(data_folder, 'id_verification_data.json')
+        self.log_path = os.path.join(data_folder, 'events', 'verification_queue.jsonl')
         self.load_data()
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
+        # Requests indexed by id and status, with a claim queue for reviewers; submissions, leases
+        # and decisions are events in a log shared by every worker
+        self.queue = VerificationQueue(self.data.setdefault("verification_requests", []), log_path=self.log_path)
+        self.verified_users = {user["user_id"]: user for user in self.data.get("verified_users", [])}
     
     def generate_default_data(self):
         return {
@@ -81,16 +87,74 @@ class IDVerificationManager:
         }
     
     def get_verification_status(self, user_id):
-        return next((v for v in self.data["verification_requests"] if v["id"] == user_id), None)
+        return self.queue.get(user_id)
+    
+    def get_status(self, user_id):
+        request = self.queue.get(user_id)
+        if request is not None:
+            return {"success": True, "verification": request}
+        if user_id in self.verified_users:
+            return {"success": True, "verification": dict(self.verified_users[user_id], status="Verified")}
+        return {"success": False, "message": f"No verification found for {user_id}"}
     
     def get_verification_criteria(self):
         return self.data["verification_criteria"]
     
     def get_verification_stats(self):
-        return self.data["verification_stats"]
+        stats = self.data.get("verification_stats", self.data.get("verification_statistics", {}))
+        return dict(stats, **self.queue.get_stats())
+    
+    def get_pending_verifications(self, limit=50):
+        return self.queue.pending(limit)
+    
+    def submit_verification(self, data):
+        data = data or {}
+        name = data.get("fullName") or data.get("farmer_name") or data.get("name")
+        aadhaar = re.sub(r"\D", "", str(data.get("aadhaarNumber") or data.get("aadhar_number") or ""))
+        if not name or len(aadhaar) != 12:
+            return {"success": False, "message": "Full name and a 12-digit Aadhaar number are required"}
+        pan = str(data.get("panNumber") or data.get("pan_number") or "").upper()
+        documents = ["Aadhar Card"] + (["PAN Card"] if pan else []) + list(data.get("documents_submitted", []))
+        request = self.queue.submit({
+            "id": f"VER{datetime.now().strftime('%Y%m%d%H%M%S%f')}",
+            "farmer_name": name,
+            "phone": data.get("phone", ""),
+            "email": data.get("email", ""),
+            "aadhar_number": f"****-****-{aadhaar[-4:]}",
+            "pan_number": f"*****{pan[-5:]}" if pan else None,
+            "status": "Pending",
+            "submitted_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "verified_date": None,
+            "documents_submitted": documents,
+            "verification_method": data.get("verification_method", "Document Upload")
+        })
+        return {"success": True, "verification_id": request["id"], "status": request["status"]}
+    
+    def claim_verifications(self, reviewer_id, limit=20, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Lease a batch of the oldest / riskiest pending requests to one reviewer; ValueError on a bad limit"""
+        if not reviewer_id:
+            return {"success": False, "message": "reviewer_id is required"}
+        batch = self.queue.claim(reviewer_id, limit, lease_seconds)
+        return {"success": True, "reviewer_id": reviewer_id, "count": len(batch), "verifications": batch}
+    
+    def renew_verification_lease(self, verification_id, reviewer_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        expires = self.queue.renew(verification_id, reviewer_id, lease_seconds)
+        if expires is None:
+            return {"success": False, "message": "Lease expired or held by another reviewer"}
+        return {"success": True, "verification_id": verification_id, "lease_expires": expires}
+    
+    def release_verification(self, verification_id, reviewer_id):
+        if not self.queue.release(verification_id, reviewer_id):
+            return {"success": False, "message": "Lease expired or held by another reviewer"}
+        return {"success": True, "verification_id": verification_id, "status": "Pending"}
     
-    def get_pending_verifications(self):
-        return [v for v in self.data["verification_requests"] if v["status"] == "Pending"]
+    def complete_verification(self, verification_id, reviewer_id, decision, notes=""):
+        if decision not in DECISIONS:
+            return {"success": False, "message": f"decision must be one of {', '.join(DECISIONS)}"}
+        request = self.queue.complete(verification_id, reviewer_id, decision, notes)
+        if request is None:
+            return {"success": False, "message": "Lease expired or held by another reviewer"}
+        return {"success": True, "verification": request}
 
     def test_connection(self):
         """Test if the module is working"""
@@ -1,13 +1,18 @@
 import json
 import random
 from datetime import datetime, timedelta
+from backend.shared_reference import ReferenceHandle
 
 class MarketComparisonEngine:
     def __init__(self, data_folder='data'):
         # Massive market comparison data
         self.markets_data = self._generate_markets_data()
-        self.price_history = self._generate_price_history()
+        self._price_history = ReferenceHandle('market_price_history', self._generate_price_history, max_age=6 * 3600)
         self.transportation_costs = self._generate_transport_costs()
+
+    @property
+    def price_history(self):
+        return self._price_history.get()
         
     def _generate_markets_data(self):
         markets = {}
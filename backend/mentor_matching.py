@@ -0,0 +1,382 @@
+"""
+Mentor Matching
+Vectorized mentor-mentee compatibility scoring and capacity-constrained
+cohort assignment
+
+Mentor profiles are encoded once into a feature matrix: multi-hot
+specializations, languages, crops and availability slots, plus location
+coordinates and a rating prior. A mentee (or a block of up to BLOCK_SIZE
+mentees) is scored against every mentor with a few matrix products and one
+pairwise distance computation:
+
+    specialization  share of the mentee's wanted specializations the mentor covers
+    language        the two share a language
+    distance        exp(-km / DISTANCE_SCALE_KM), 0.5 when either location is unknown
+    crop            the mentor works with the mentee's crop
+    availability    their availability slots overlap
+
+Top-K lists are cached per mentee until mentor or mentee profiles change.
+Cohort assignment is greedy on the global score order: each pass takes every
+unassigned mentee's best mentor that still has room, assigns the strongest
+pairs first, and re-scores the losers against the mentors with capacity
+left.
+
+Usage:
+    matcher = MentorMatcher(mentors)
+    matcher.top_matches(mentee, k=5)
+    matcher.assign(mentees, capacity=5)
+
+    python -m backend.mentor_matching data/mentorship_data.json --capacity 5
+"""
+
+import argparse
+import json
+import math
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.geo_alerts import resolve_location
+
+WEIGHTS = {'specialization': 0.35, 'language': 0.2, 'distance': 0.2, 'crop': 0.15, 'availability': 0.1}
+RATING_WEIGHT = 0.05
+DISTANCE_SCALE_KM = 300.0
+UNKNOWN_DISTANCE_SCORE = 0.5
+DEFAULT_TOP_K = 5
+DEFAULT_CAPACITY = 5
+BLOCK_SIZE = 1024
+CANDIDATES = 8
+EARTH_RADIUS_KM = 6371.0
+
+SLOTS = ('weekdays', 'weekends', 'evenings')
+STATE_ALIASES = {'up': 'uttar pradesh', 'u.p.': 'uttar pradesh'}
+STATE_LANGUAGES = {'punjab': 'Punjabi', 'haryana': 'Hindi', 'uttar pradesh': 'Hindi', 'rajasthan': 'Hindi',
+                   'maharashtra': 'Marathi', 'gujarat': 'Gujarati', 'karnataka': 'Kannada', 'tamil nadu': 'Tamil'}
+# What a mentee growing / interested in a crop wants a mentor to know
+CROP_SPECIALIZATIONS = {
+    'wheat': ('Crop Management', 'Crop Rotation'),
+    'rice': ('Crop Management', 'Crop Rotation'),
+    'vegetables': ('Horticulture', 'Organic Vegetables', 'Crop Management'),
+    'fruits': ('Horticulture',),
+    'organic': ('Organic Farming', 'Organic Vegetables'),
+    'dairy': ('Dairy Farming', 'Livestock'),
+    'livestock': ('Livestock', 'Dairy Farming'),
+}
+GOAL_SPECIALIZATIONS = {
+    'organic': 'Organic Farming',
+    'market': 'Agribusiness',
+    'soil': 'Crop Rotation',
+    'yield': 'Crop Management',
+    'dairy': 'Dairy Farming',
+}
+
+
+def as_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(',') if part.strip()]
+    return [str(part) for part in value]
+
+
+def parse_slots(text) -> set:
+    text = str(text or '').lower()
+    if not text or re.search(r'\b(flexible|any)', text):
+        return set(SLOTS)
+    slots = {slot for slot in SLOTS if slot.rstrip('s') in text}
+    return slots or set(SLOTS)
+
+
+@lru_cache(maxsize=4096)
+def _locate(text: str) -> Tuple[float, float]:
+    for alias, state in STATE_ALIASES.items():
+        text = re.sub(rf'(^|[\s,]){re.escape(alias)}($|[\s,])', rf'\1{state}\2', text)
+    point = resolve_location(text)
+    return (point[0], point[1]) if point else (math.nan, math.nan)
+
+
+def locate(location) -> Tuple[float, float]:
+    """(lat, lon) of a profile location, NaN when it is not in the gazetteer"""
+    return _locate(str(location or '').strip().lower())
+
+
+def state_of(location) -> Optional[str]:
+    text = str(location or '').lower()
+    text = STATE_ALIASES.get(text.strip(), text)
+    return next((state for state in STATE_LANGUAGES if state in text), None)
+
+
+def mentor_crops(specializations: Iterable[str]) -> set:
+    wanted = set(specializations)
+    return {crop for crop, specs in CROP_SPECIALIZATIONS.items() if wanted.intersection(specs)}
+
+
+def mentee_wants(mentee: Dict) -> Dict:
+    """Normalized preferences of a mentee profile"""
+    crops = [crop.lower() for crop in as_list(mentee.get('crop_interest') or mentee.get('crops'))]
+    specializations = set(as_list(mentee.get('specialization') or mentee.get('interests')))
+    for crop in crops:
+        specializations.update(CROP_SPECIALIZATIONS.get(crop, ()))
+    for goal in as_list(mentee.get('goals')):
+        specializations.update(spec for keyword, spec in GOAL_SPECIALIZATIONS.items() if keyword in goal.lower())
+    languages = set(as_list(mentee.get('languages')))
+    if not languages:
+        state = state_of(mentee.get('location'))
+        languages = {'Hindi', STATE_LANGUAGES.get(state, 'Hindi')}
+    return {
+        'specializations': specializations,
+        'languages': languages,
+        'crops': set(crops),
+        'slots': parse_slots(mentee.get('availability')),
+        'point': locate(mentee.get('location')),
+    }
+
+
+class MentorMatcher:
+    """Mentor feature matrix with cached top-K matches and batch assignment"""
+
+    def __init__(self, mentors: Sequence[Dict], top_k: int = DEFAULT_TOP_K):
+        self.top_k = top_k
+        self.version = 0
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[int, int, List[Dict]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.update_mentors(mentors)
+
+    # ------------------------------------------------------------------ features
+
+    def update_mentors(self, mentors: Sequence[Dict]):
+        """Re-encode mentor profiles; every cached match is dropped"""
+        mentors = list(mentors)
+        specializations = [set(as_list(m.get('specialization'))) for m in mentors]
+        languages = [set(as_list(m.get('languages'))) for m in mentors]
+        crops = [set(c.lower() for c in as_list(m.get('crops'))) or mentor_crops(s)
+                 for m, s in zip(mentors, specializations)]
+        with self._lock:
+            self.mentors = mentors
+            self.ids = [str(m['id']) for m in mentors]
+            self.positions = {mentor_id: i for i, mentor_id in enumerate(self.ids)}
+            self.vocab = {
+                'specialization': sorted(set().union(*specializations)) if mentors else [],
+                'language': sorted(set().union(*languages)) if mentors else [],
+                'crop': sorted(set().union(*crops)) if mentors else [],
+                'slot': list(SLOTS),
+            }
+            self.columns = {name: {value: i for i, value in enumerate(values)} for name, values in self.vocab.items()}
+            self.features = {
+                'specialization': self._multi_hot('specialization', specializations),
+                'language': self._multi_hot('language', languages),
+                'crop': self._multi_hot('crop', crops),
+                'slot': self._multi_hot('slot', [parse_slots(m.get('availability')) for m in mentors]),
+            }
+            points = np.array([locate(m.get('location')) for m in mentors], dtype=np.float64).reshape(-1, 2)
+            self.lat = np.radians(points[:, 0])
+            self.lon = np.radians(points[:, 1])
+            ratings = np.array([float(m.get('rating') or 0) for m in mentors], dtype=np.float32)
+            self.prior = RATING_WEIGHT * np.clip(ratings / 5.0, 0, 1)
+            self.version += 1
+            self._cache.clear()
+
+    def _multi_hot(self, name: str, rows: List[set]) -> np.ndarray:
+        matrix = np.zeros((len(rows), len(self.vocab[name])), dtype=np.float32)
+        columns = self.columns[name]
+        for i, values in enumerate(rows):
+            for value in values:
+                if value in columns:
+                    matrix[i, columns[value]] = 1.0
+        return matrix
+
+    def _encode(self, wants: List[Dict]) -> Dict[str, np.ndarray]:
+        encoded = {}
+        for name, key in (('specialization', 'specializations'), ('language', 'languages'),
+                          ('crop', 'crops'), ('slot', 'slots')):
+            encoded[name] = self._multi_hot(name, [want[key] for want in wants])
+        encoded['points'] = np.radians(np.array([want['point'] for want in wants], dtype=np.float64).reshape(-1, 2))
+        return encoded
+
+    # ------------------------------------------------------------------- scoring
+
+    def score_block(self, mentees: Sequence[Dict]) -> np.ndarray:
+        """(mentees x mentors) compatibility in [0, 1 + RATING_WEIGHT]"""
+        wants = [mentee_wants(mentee) for mentee in mentees]
+        q = self._encode(wants)
+        f = self.features
+        wanted = np.array([max(len(want['specializations']), 1) for want in wants], dtype=np.float32)[:, None]
+        scores = WEIGHTS['specialization'] * (q['specialization'] @ f['specialization'].T) / wanted
+        scores += WEIGHTS['language'] * ((q['language'] @ f['language'].T) > 0)
+        scores += WEIGHTS['availability'] * ((q['slot'] @ f['slot'].T) > 0)
+        # A mentee with no stated crop matches any crop
+        crop_match = (q['crop'] @ f['crop'].T) > 0
+        crop_match |= (q['crop'].sum(axis=1) == 0)[:, None]
+        scores += WEIGHTS['crop'] * crop_match
+        # Mentees share a handful of places: score each distinct place once
+        places, place_of = np.unique(q['points'], axis=0, return_inverse=True)
+        scores += WEIGHTS['distance'] * self._distance_score(places)[place_of.reshape(-1)]
+        scores += self.prior[None, :]
+        return scores.astype(np.float32)
+
+    def _distance_km(self, points: np.ndarray) -> np.ndarray:
+        """Haversine distance from each (lat, lon) in radians to every mentor; NaN if either is unknown"""
+        lat1, lon1 = points[:, 0:1], points[:, 1:2]
+        a = (np.sin((self.lat[None, :] - lat1) / 2) ** 2
+             + np.cos(lat1) * np.cos(self.lat[None, :]) * np.sin((self.lon[None, :] - lon1) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+    def _distance_score(self, points: np.ndarray) -> np.ndarray:
+        score = np.exp(-self._distance_km(points) / DISTANCE_SCALE_KM)
+        return np.where(np.isnan(score), UNKNOWN_DISTANCE_SCORE, score)
+
+    def _explain(self, mentee_want: Dict, mentor_index: int) -> List[str]:
+        mentor = self.mentors[mentor_index]
+        reasons = []
+        shared = mentee_want['specializations'].intersection(as_list(mentor.get('specialization')))
+        if shared:
+            reasons.append(f"Specializes in {', '.join(sorted(shared))}")
+        languages = mentee_want['languages'].intersection(as_list(mentor.get('languages')))
+        if languages:
+            reasons.append(f"Speaks {', '.join(sorted(languages))}")
+        km = self._distance_km(np.radians(np.array([mentee_want['point']])))[0, mentor_index]
+        if not np.isnan(km):
+            reasons.append('Same area' if km < 50 else f"About {km:.0f} km away")
+        return reasons
+
+    def top_matches(self, mentee: Dict, k: Optional[int] = None, exclude: Iterable[str] = ()) -> List[Dict]:
+        """Best-scoring mentors for one mentee, cached by mentee id until a profile changes"""
+        k = k or self.top_k
+        mentee_id = str(mentee['id']) if mentee.get('id') is not None else None
+        exclude = set(exclude)
+        if mentee_id is not None and not exclude:
+            with self._lock:
+                cached = self._cache.get(mentee_id)
+            if cached is not None and cached[0] == self.version and cached[1] >= k:
+                self.hits += 1
+                return cached[2][:k]
+        self.misses += 1
+        if not self.ids:
+            return []
+        scores = self.score_block([mentee])[0]
+        for mentor_id in exclude:
+            if mentor_id in self.positions:
+                scores[self.positions[mentor_id]] = -np.inf
+        count = min(k, len(self.ids))
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        want = mentee_wants(mentee)
+        matches = [{
+            'mentor_id': self.mentors[i]['id'],
+            'name': self.mentors[i].get('name'),
+            'score': round(float(scores[i]), 4),
+            'reasons': self._explain(want, i),
+        } for i in best if np.isfinite(scores[i])]
+        if mentee_id is not None and not exclude:
+            with self._lock:
+                self._cache[mentee_id] = (self.version, k, matches)
+        return matches
+
+    def forget(self, mentee_id):
+        """Drop a mentee's cached matches after their profile changed"""
+        with self._lock:
+            self._cache.pop(str(mentee_id), None)
+
+    # ---------------------------------------------------------------- assignment
+
+    def assign(self, mentees: Sequence[Dict], capacity: int = DEFAULT_CAPACITY,
+               load: Optional[Dict[str, int]] = None) -> Dict:
+        """
+        Give each mentee one mentor, no mentor above `capacity` mentees in
+        total (counting `load`, their current mentees). Returns
+        {'assignments': {mentee_id: {'mentor_id', 'score'}}, 'unassigned': [...]}.
+        """
+        room = np.array([capacity - (load or {}).get(mentor_id, 0) for mentor_id in self.ids], dtype=np.int64)
+        room = np.maximum(room, 0)
+        mentee_ids = [str(mentee['id']) for mentee in mentees]
+        scores = np.full((len(mentees), len(self.ids)), -np.inf, dtype=np.float32)
+        for start in range(0, len(mentees), BLOCK_SIZE):
+            scores[start:start + BLOCK_SIZE] = self.score_block(mentees[start:start + BLOCK_SIZE])
+
+        assignments = {}
+        pending = np.arange(len(mentees))
+        while len(pending) and room.any():
+            # Global greedy over each pending mentee's best CANDIDATES mentors with room left;
+            # mentees whose candidates all fill up go round again against the remaining mentors
+            open_mentors = np.flatnonzero(room > 0)
+            block = scores[np.ix_(pending, open_mentors)]
+            width = min(CANDIDATES, len(open_mentors))
+            top = np.argpartition(-block, width - 1, axis=1)[:, :width]
+            top_scores = np.take_along_axis(block, top, axis=1)
+            rows, columns = np.unravel_index(np.argsort(-top_scores, axis=None, kind='stable'), top.shape)
+            done = np.zeros(len(pending), dtype=bool)
+            remaining = len(pending)
+            for row, column in zip(rows.tolist(), columns.tolist()):
+                if done[row]:
+                    continue
+                mentor = open_mentors[top[row, column]]
+                if room[mentor] > 0:
+                    room[mentor] -= 1
+                    done[row] = True
+                    assignments[mentee_ids[pending[row]]] = {'mentor_id': self.mentors[mentor]['id'],
+                                                             'score': round(float(top_scores[row, column]), 4)}
+                    remaining -= 1
+                    if not remaining:
+                        break
+            pending = pending[~done]
+        return {
+            'assignments': assignments,
+            'unassigned': [mentee_ids[i] for i in pending],
+        }
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'mentors': len(self.ids),
+            'profile_version': self.version,
+            'features': {name: len(values) for name, values in self.vocab.items()},
+            'cached_mentees': len(self._cache),
+            'cache_hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Assign a mentee cohort to mentors')
+    parser.add_argument('data', help='mentorship data JSON with "mentors" and "mentees"')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help='maximum mentees per mentor')
+    parser.add_argument('--all', action='store_true', help='reassign mentees that already have a mentor')
+    parser.add_argument('--output', default=None, help='write the assignments as JSON')
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        data = json.load(f)
+    mentors, mentees = data.get('mentors', []), data.get('mentees', [])
+    cohort = mentees if args.all else [m for m in mentees if not m.get('mentor_id')]
+    load: Dict[str, int] = {}
+    if not args.all:
+        for mentee in mentees:
+            if mentee.get('mentor_id'):
+                load[str(mentee['mentor_id'])] = load.get(str(mentee['mentor_id']), 0) + 1
+
+    print("=" * 60)
+    print("MENTOR COHORT ASSIGNMENT")
+    print("=" * 60)
+    if not mentors:
+        print("Error: no mentors in data file")
+        sys.exit(1)
+    started = time.perf_counter()
+    matcher = MentorMatcher(mentors)
+    result = matcher.assign(cohort, args.capacity, load)
+    elapsed = time.perf_counter() - started
+    scores = [a['score'] for a in result['assignments'].values()]
+    print(f"Mentors: {len(mentors)}  Cohort: {len(cohort)}  Capacity: {args.capacity}")
+    print(f"Assigned: {len(result['assignments'])}  Unassigned: {len(result['unassigned'])}")
+    if scores:
+        print(f"Mean score: {sum(scores) / len(scores):.3f}  Min: {min(scores):.3f}")
+    print(f"Time: {elapsed:.2f}s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Assignments written to {args.output}")
@@ -1,20 +1,86 @@
-import json
 import os
 from datetime import datetime, timedelta
 import random
+from collections import Counter
+from backend.event_log import EventLog
+from backend.record_store import load_document
+from backend.mentor_matching import MentorMatcher, DEFAULT_CAPACITY, DEFAULT_TOP_K, as_list, state_of
+
+MAX_TOP_K = 100
 
 class MentorshipManager:
     def __init__(self, data_folder='data'):
         self.data_file = os.path.join(data_folder, 'mentorship_data.json')
         self.load_data()
+        # Mentee profiles, mentor assignments and requests, replayed by every worker
+        self.log = EventLog(os.path.join(data_folder, 'events', 'mentorship.jsonl'), self._apply,
+                            reset=self.load_data)
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
-    
+        self.data.setdefault("mentees", [])
+        self.data.setdefault("mentorship_requests", [])
+        self.mentee_index = {str(m["id"]): m for m in self.data["mentees"]}
+        self.load = Counter(str(m["mentor_id"]) for m in self.data["mentees"] if m.get("mentor_id"))
+        self.requests_by_user = {}
+        for request in self.data["mentorship_requests"]:
+            self._index_request(request)
+        self.matcher = MentorMatcher(self.data["mentors"])
+        self._index_mentors()
+        self._mentee_version = 0
+        self._previews = {}
+
+    def _index_mentors(self):
+        self.mentor_index = {str(m["id"]): m for m in self.data["mentors"]}
+        self.by_specialization = {}
+        self.by_state = {}
+        for mentor in self.data["mentors"]:
+            for specialization in as_list(mentor.get("specialization")):
+                self.by_specialization.setdefault(specialization.lower(), []).append(mentor)
+            self.by_state.setdefault(self._location_key(mentor.get("location")), []).append(mentor)
+
+    def _apply(self, event, end_offset):
+        kind = event.get("type")
+        if kind == "mentee":
+            self._upsert_mentee(event["profile"])
+        elif kind == "assigned":
+            self._set_mentor(self.mentee_index[str(event["mentee_id"])], event["mentor_id"], event["start_date"])
+            self._mentee_version += 1
+        elif kind == "request":
+            self._record_request(event["request"])
+
+    def _upsert_mentee(self, profile):
+        mentee_id = str(profile["id"])
+        existing = self.mentee_index.get(mentee_id)
+        if existing is not None:
+            existing.update(profile)
+        else:
+            self.data["mentees"].append(profile)
+            self.mentee_index[mentee_id] = profile
+        self.matcher.forget(mentee_id)
+        self._mentee_version += 1
+
+    def _record_request(self, request):
+        mentee = self.mentee_index.get(str(request["mentee_id"]))
+        if mentee is not None:
+            self._set_mentor(mentee, request["mentor_id"], request["requested_date"][:10])
+            self._mentee_version += 1
+        else:
+            self.load[str(request["mentor_id"])] += 1
+        self.data["mentorship_requests"].append(request)
+        self._index_request(request)
+
+    def _index_request(self, request):
+        for user_id in (request.get("mentee_id"), request.get("mentor_id")):
+            self.requests_by_user.setdefault(str(user_id), []).append(request)
+
+    @staticmethod
+    def _location_key(location):
+        return state_of(location) or str(location or "").strip().lower()
+
     def generate_default_data(self):
         return {
             "mentors": [
@@ -102,16 +168,220 @@ class MentorshipManager:
         }
     
     def get_all_mentors(self, specialization=None, location=None):
-        mentors = self.data["mentors"]
+        candidates = []
         if specialization:
-            mentors = [m for m in mentors if m["specialization"] == specialization]
+            candidates.append(self.by_specialization.get(specialization.strip().lower(), []))
         if location:
-            mentors = [m for m in mentors if m["location"] == location]
-        return mentors
-    
+            candidates.append(self.by_state.get(self._location_key(location), []))
+        if not candidates:
+            return self.data["mentors"]
+        smallest = min(candidates, key=len)
+        others = [{id(m) for m in mentors} for mentors in candidates if mentors is not smallest]
+        return [m for m in smallest if all(id(m) in ids for ids in others)]
+
     def get_mentor_by_id(self, mentor_id):
-        return next((m for m in self.data["mentors"] if m["id"] == mentor_id), None)
-    
+        return self.mentor_index.get(str(mentor_id))
+
+    def _mentee_profile(self, data):
+        """Stored mentee for data["mentee_id"], else an ad-hoc profile from the request fields"""
+        mentee = self.mentee_index.get(str(data.get("mentee_id") or data.get("user_id")))
+        if mentee is not None:
+            return mentee
+        if any(data.get(key) for key in ("crop_interest", "crops", "interests", "goals")):
+            return {key: value for key, value in data.items() if key not in ("mentee_id", "user_id", "limit")}
+        return None
+
+    def _has_room(self, mentor_id):
+        return self.load[str(mentor_id)] < DEFAULT_CAPACITY
+
+    def _available_matches(self, mentee, count):
+        """Best matches among mentors with open mentee slots"""
+        k = DEFAULT_TOP_K
+        while True:
+            matches = [m for m in self.matcher.top_matches(mentee, k) if self._has_room(m["mentor_id"])]
+            if len(matches) >= count or k >= len(self.data["mentors"]):
+                return matches[:count]
+            k *= 4
+
+    def get_mentors(self, filters=None):
+        """Ranked matches when a mentee is given (mentee_id or profile fields), otherwise filtered mentors"""
+        filters = filters or {}
+        try:
+            limit = max(1, min(int(filters.get("limit") or DEFAULT_TOP_K), MAX_TOP_K))
+        except ValueError:
+            return {"success": False, "message": "limit must be a number"}
+        self.log.refresh()
+        mentee = self._mentee_profile(filters)
+        if mentee is not None:
+            matches = [dict(m, available=self._has_room(m["mentor_id"]))
+                       for m in self.matcher.top_matches(mentee, limit)]
+            return {"success": True, "mentee_id": mentee.get("id"), "count": len(matches), "matches": matches}
+        mentors = self.get_all_mentors(filters.get("specialization"), filters.get("location"))
+        if filters.get("language"):
+            language = filters["language"].lower()
+            mentors = [m for m in mentors if language in (l.lower() for l in as_list(m.get("languages")))]
+        return {"success": True, "count": len(mentors), "mentors": mentors}
+
+    def add_mentees(self, profiles):
+        """Register or update mentee profiles; their cached matches are dropped"""
+        if not isinstance(profiles, list) or not all(isinstance(profile, dict) for profile in profiles):
+            return {"success": False, "message": "mentees must be a list of profile objects"}
+        counts = {"added": 0, "updated": 0}
+
+        def build():
+            events, taken = [], set()
+            next_number = len(self.data["mentees"]) + 1
+            for profile in profiles:
+                profile = dict(profile)
+                if "id" not in profile:
+                    while f"MEE{next_number:03d}" in self.mentee_index or f"MEE{next_number:03d}" in taken:
+                        next_number += 1
+                    profile["id"] = f"MEE{next_number:03d}"
+                mentee_id = str(profile["id"])
+                counts["updated" if mentee_id in self.mentee_index or mentee_id in taken else "added"] += 1
+                taken.add(mentee_id)
+                events.append({"type": "mentee", "profile": profile})
+            return events
+
+        with self.log.lock:
+            self.log.append(build)
+            return {"success": True, **counts, "total_mentees": len(self.data["mentees"])}
+
+    def update_mentor(self, mentor_id, changes):
+        mentor = self.get_mentor_by_id(mentor_id)
+        if mentor is None:
+            return {"success": False, "message": "Mentor not found"}
+        mentor.update({k: v for k, v in (changes or {}).items() if k != "id"})
+        self.matcher.update_mentors(self.data["mentors"])
+        self._index_mentors()
+        return {"success": True, "mentor": mentor}
+
+    def _set_mentor(self, mentee, mentor_id, start_date):
+        if mentee.get("mentor_id"):
+            self.load[str(mentee["mentor_id"])] -= 1
+        mentee["mentor_id"] = mentor_id
+        mentee["start_date"] = start_date
+        self.load[str(mentor_id)] += 1
+
+    def request_mentorship(self, data):
+        """Match a mentee with the requested mentor, or the best-scoring mentor with an open slot"""
+        data = data or {}
+        mentee_id = data.get("mentee_id") or data.get("user_id")
+        if not mentee_id:
+            return {"success": False, "message": "mentee_id is required"}
+        outcome = {}
+
+        def build():
+            # Slots are checked against every worker's assignments, under the log lock
+            events = []
+            mentee = self._mentee_profile(data)
+            if mentee is not None and str(mentee_id) not in self.mentee_index:
+                mentee = dict(mentee, id=mentee_id)
+                events.append({"type": "mentee", "profile": mentee})
+            mentor_id = data.get("mentor_id")
+            if mentor_id:
+                mentor = self.get_mentor_by_id(mentor_id)
+                if mentor is None:
+                    outcome["error"] = {"success": False, "message": "Mentor not found"}
+                    return []
+                if not self._has_room(mentor["id"]):
+                    alternatives = self._available_matches(mentee, 3) if mentee is not None else []
+                    outcome["error"] = {"success": False, "message": "Mentor has no open mentee slots",
+                                        "alternatives": alternatives}
+                    return []
+                score = None
+            else:
+                if mentee is None:
+                    outcome["error"] = {"success": False,
+                                        "message": "mentor_id or a mentee profile (crop_interest, goals) is required"}
+                    return []
+                matches = self._available_matches(mentee, 1)
+                if not matches:
+                    outcome["error"] = {"success": False, "message": "No mentor has an open mentee slot"}
+                    return []
+                mentor, score = self.get_mentor_by_id(matches[0]["mentor_id"]), matches[0]["score"]
+            outcome["request"] = {
+                "id": f"MREQ{datetime.now().strftime('%Y%m%d%H%M%S%f')}",
+                "mentee_id": mentee_id,
+                "mentor_id": mentor["id"],
+                "mentor_name": mentor.get("name"),
+                "topic": data.get("topic", ""),
+                "preferred_time": data.get("preferred_time", ""),
+                "match_score": score,
+                "status": "Matched",
+                "requested_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            return events + [{"type": "request", "request": outcome["request"]}]
+
+        with self.log.lock:
+            self.log.append(build)
+        if "error" in outcome:
+            return outcome["error"]
+        return {"success": True, "request": outcome["request"]}
+
+    def get_sessions(self, user_id):
+        if not user_id:
+            return {"success": False, "message": "user_id is required"}
+        self.log.refresh()
+        sessions = self.requests_by_user.get(str(user_id), [])
+        return {"success": True, "user_id": user_id, "count": len(sessions), "sessions": sessions}
+
+    def _plan_cohort(self, mentee_ids, capacity, preview):
+        if mentee_ids:
+            cohort = [self.mentee_index[str(i)] for i in mentee_ids if str(i) in self.mentee_index]
+        else:
+            cohort = [m for m in self.data["mentees"] if not m.get("mentor_id")]
+        key = (self.matcher.version, self._mentee_version, tuple(str(m["id"]) for m in cohort), capacity)
+        result = self._previews.get(key) if preview else None
+        if result is None:
+            load = self.load.copy()
+            for mentee in cohort:
+                if mentee.get("mentor_id"):
+                    load[str(mentee["mentor_id"])] -= 1
+            result = self.matcher.assign(cohort, capacity, load)
+            if preview:
+                self._previews = {key: result}
+        return result
+
+    def assign_cohort(self, mentee_ids=None, capacity=DEFAULT_CAPACITY, apply=True):
+        """
+        Batch-assign mentees (default: everyone without a mentor) so that no
+        mentor ends up above `capacity` mentees. Previews (apply=False) are
+        cached until a mentor or mentee profile changes.
+        """
+        if mentee_ids is not None and not isinstance(mentee_ids, list):
+            return {"success": False, "message": "mentee_ids must be a list of mentee ids"}
+        if apply:
+            planned = {}
+
+            def build():
+                # Planned against every worker's assignments, under the log lock
+                result = planned["result"] = self._plan_cohort(mentee_ids, capacity, preview=False)
+                start_date = datetime.now().strftime("%Y-%m-%d")
+                return [{"type": "assigned", "mentee_id": mentee_id, "mentor_id": assignment["mentor_id"],
+                         "start_date": start_date} for mentee_id, assignment in result["assignments"].items()]
+
+            with self.log.lock:
+                self.log.append(build)
+            result = planned["result"]
+        else:
+            with self.log.lock:
+                self.log.refresh()
+                result = self._plan_cohort(mentee_ids, capacity, preview=True)
+        return {
+            "success": True,
+            "applied": apply,
+            "capacity": capacity,
+            "assigned": len(result["assignments"]),
+            "unassigned": result["unassigned"],
+            "assignments": result["assignments"]
+        }
+
+    def get_matching_stats(self):
+        self.log.refresh()
+        return dict(self.matcher.get_stats(), mentees=len(self.data["mentees"]),
+                    mentors_at_capacity=sum(1 for mentor_id in self.mentor_index if not self._has_room(mentor_id)))
+
     def get_mentorship_programs(self):
         return self.data["mentorship_programs"]
     
@@ -0,0 +1,497 @@
+"""
+Metrics and Profiling for app.py
+Request timing, per-engine method histograms, a /metrics endpoint in the
+Prometheus text format and an opt-in sampling profiler
+
+Usage:
+    metrics = register_metrics(app, engines={'pricing_engine': pricing_engine, ...})
+
+Under gunicorn every worker writes its counters and histogram buckets to its
+own memory-mapped file in a shared directory (AGRISUPER_METRICS_DIR, by
+default under /dev/shm). A scrape, or an admin health read, sums the files
+of all workers, so totals don't depend on which worker answers and counters
+don't appear to reset between scrapes.
+
+Profiling a single request (requires AGRISUPER_PROFILING=1 or
+app.config['PROFILING_ENABLED']):
+    curl -H 'X-Profile: 1' http://localhost:5000/api/...
+
+The sampled stacks are written in folded format (one "frame;frame;frame count"
+line per stack) to logs/profiles/, ready for flamegraph.pl or speedscope.
+"""
+
+from bisect import bisect_left
+from functools import lru_cache, wraps
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import inspect
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from flask import Response, g, request
+
+# Latency buckets in seconds: sub-millisecond engine calls up to slow page renders
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_DIR = os.path.join('logs', 'profiles')
+PROFILE_INTERVAL = 0.001
+
+METRICS_DIR_ENV = 'AGRISUPER_METRICS_DIR'
+
+
+def default_metrics_dir() -> str:
+    if os.environ.get(METRICS_DIR_ENV):
+        return os.environ[METRICS_DIR_ENV]
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'agrisuper-metrics')
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram for one label set"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Bucket-interpolated quantile estimate, as Prometheus' histogram_quantile does"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class ValueFile:
+    """
+    One process's metric values in a memory-mapped file: an append-only
+    table of (key, float64) slots behind a used-length word. Only the owning
+    process writes, updating slots in place; any process can read all files.
+    """
+
+    INITIAL_SIZE = 1 << 16
+    _USED = struct.Struct('<Q')
+    _LENGTH = struct.Struct('<I')
+    _VALUE = struct.Struct('<d')
+
+    def __init__(self, path: str):
+        self.path = path
+        # A file left by an earlier process with the same pid is stale: start over
+        with open(path, 'w+b') as f:
+            f.truncate(self.INITIAL_SIZE)
+            self._map = mmap.mmap(f.fileno(), self.INITIAL_SIZE)
+        self._used = self._USED.size
+        self._USED.pack_into(self._map, 0, self._used)
+        self._positions: Dict[str, int] = {}
+
+    @classmethod
+    def _entries(cls, buffer, used: int) -> Iterator[Tuple[str, int]]:
+        pos = cls._USED.size
+        while pos < used:
+            (length,) = cls._LENGTH.unpack_from(buffer, pos)
+            key = bytes(buffer[pos + cls._LENGTH.size:pos + cls._LENGTH.size + length]).decode('utf-8')
+            value_pos = pos + cls._LENGTH.size + length
+            value_pos += -value_pos % 8
+            yield key, value_pos
+            pos = value_pos + cls._VALUE.size
+
+    def _append(self, key: str) -> int:
+        data = key.encode('utf-8')
+        value_pos = self._used + self._LENGTH.size + len(data)
+        value_pos += -value_pos % 8
+        end = value_pos + self._VALUE.size
+        if end > len(self._map):
+            self._map.resize(max(2 * len(self._map), end))
+        self._LENGTH.pack_into(self._map, self._used, len(data))
+        self._map[self._used + self._LENGTH.size:self._used + self._LENGTH.size + len(data)] = data
+        self._VALUE.pack_into(self._map, value_pos, 0.0)
+        # Publish the slot only once it is complete
+        self._used = end
+        self._USED.pack_into(self._map, 0, end)
+        self._positions[key] = value_pos
+        return value_pos
+
+    def add(self, key: str, amount: float):
+        pos = self._positions.get(key)
+        if pos is None:
+            pos = self._append(key)
+        (value,) = self._VALUE.unpack_from(self._map, pos)
+        self._VALUE.pack_into(self._map, pos, value + amount)
+
+    @classmethod
+    def read(cls, path: str) -> Iterator[Tuple[str, float]]:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < cls._USED.size:
+            return
+        used = min(cls._USED.unpack_from(data, 0)[0], len(data))
+        for key, pos in cls._entries(data, used):
+            if pos + cls._VALUE.size <= len(data):
+                yield key, cls._VALUE.unpack_from(data, pos)[0]
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of counters and histograms keyed by metric name and
+    labels. With a directory, every process also writes its values to its own
+    ValueFile there and reads (render, totals, summary) sum all of them.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, directory: Optional[str] = None):
+        self.buckets = buckets
+        self.directory = directory
+        self._histograms: Dict[str, Dict[tuple, Histogram]] = {}
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict, float]]]] = []
+        self._lock = threading.Lock()
+        self._file: Optional[ValueFile] = None
+        self._file_pid = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._remove_dead_files()
+
+    # ---------------------------------------------------------- shared files
+
+    def _remove_dead_files(self):
+        """Drop files of processes that no longer exist (an earlier run's workers)"""
+        for name in os.listdir(self.directory):
+            pid = name[len('metrics-'):-len('.db')]
+            if name.startswith('metrics-') and name.endswith('.db') and pid.isdigit() and not _pid_alive(int(pid)):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def _value_file(self) -> Optional[ValueFile]:
+        """This process's file; a forked worker opens its own on first use"""
+        if not self.directory:
+            return None
+        pid = os.getpid()
+        if self._file_pid != pid:
+            self._file_pid = pid
+            self._file = ValueFile(os.path.join(self.directory, f'metrics-{pid}.db'))
+        return self._file
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _key(name: str, labels: tuple, field: str) -> str:
+        return json.dumps([name, labels, field], separators=(',', ':'))
+
+    def _series(self) -> Tuple[Dict[str, Dict[tuple, float]], Dict[str, Dict[tuple, Histogram]]]:
+        """(counters, histograms) summed over every process, or this process's own without a directory"""
+        if not self.directory:
+            with self._lock:
+                return ({name: dict(series) for name, series in self._counters.items()},
+                        {name: dict(series) for name, series in self._histograms.items()})
+        counters: Dict[str, Dict[tuple, float]] = {}
+        histograms: Dict[str, Dict[tuple, Histogram]] = {}
+        for file_name in os.listdir(self.directory):
+            if not (file_name.startswith('metrics-') and file_name.endswith('.db')):
+                continue
+            try:
+                values = list(ValueFile.read(os.path.join(self.directory, file_name)))
+            except (FileNotFoundError, ValueError, struct.error):
+                continue
+            for key, value in values:
+                name, labels, field = json.loads(key)
+                labels = tuple(tuple(item) for item in labels)
+                if field == 'value':
+                    series = counters.setdefault(name, {})
+                    series[labels] = series.get(labels, 0) + value
+                    continue
+                histogram = histograms.setdefault(name, {}).get(labels)
+                if histogram is None:
+                    histogram = histograms[name][labels] = Histogram(self.buckets)
+                if field == 'sum':
+                    histogram.sum += value
+                elif field == 'count':
+                    histogram.count += int(value)
+                else:
+                    histogram.counts[int(field)] += int(value)
+        return counters, histograms
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+            shared = self._value_file()
+            if shared is not None:
+                shared.add(self._key(name, key, str(bisect_left(self.buckets, value))), 1)
+                shared.add(self._key(name, key, 'count'), 1)
+                shared.add(self._key(name, key, 'sum'), value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+            shared = self._value_file()
+            if shared is not None:
+                shared.add(self._key(name, key, 'value'), amount)
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, Dict, float]]]):
+        """Register a callable yielding (name, type, labels, value) samples at scrape time"""
+        self._collectors.append(collector)
+
+    def time(self, name: str, **labels):
+        """Decorator timing a function into a histogram"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        counters, histograms = self._series()
+        for name, series in sorted(counters.items()):
+            lines.append(f'# HELP {name} {self._help.get(name, name)}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, value in sorted(series.items()):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        for name, series in sorted(histograms.items()):
+            lines.append(f'# HELP {name} {self._help.get(name, name)}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels, ("le", repr(bound)))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels, ("le", "+Inf"))} {histogram.count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+
+        declared = set()
+        for collector in self._collectors:
+            for name, metric_type, labels, value in collector():
+                if name not in declared:
+                    declared.add(name)
+                    lines.append(f'# HELP {name} {self._help.get(name, name)}')
+                    lines.append(f'# TYPE {name} {metric_type}')
+                lines.append(f'{name}{_format_labels(tuple(sorted(labels.items())))} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def totals(self, name: str, group_by: str) -> Dict[str, Tuple[int, float]]:
+        """(count, sum) per value of one label, without computing quantiles"""
+        totals: Dict[str, Tuple[int, float]] = {}
+        for labels, histogram in self._series()[1].get(name, {}).items():
+            label = dict(labels).get(group_by, '')
+            count, total = totals.get(label, (0, 0.0))
+            totals[label] = (count + histogram.count, total + histogram.sum)
+        return totals
+
+    def counter_totals(self, name: str, group_by: str) -> Dict[str, float]:
+        """Counter value summed per value of one label"""
+        totals: Dict[str, float] = {}
+        for labels, value in self._series()[0].get(name, {}).items():
+            label = dict(labels).get(group_by, '')
+            totals[label] = totals.get(label, 0) + value
+        return totals
+
+    def summary(self, name: str, group_by: str) -> List[Dict]:
+        """Per-label latency summary (count, mean, p50/p95/p99 in ms), slowest p95 first"""
+        series = self._series()[1].get(name, {})
+        groups: Dict[str, Histogram] = {}
+        for labels, histogram in series.items():
+            label = dict(labels).get(group_by, '')
+            merged = groups.setdefault(label, Histogram(self.buckets))
+            merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+            merged.count += histogram.count
+            merged.sum += histogram.sum
+        rows = [{
+            group_by: label,
+            'count': h.count,
+            'mean_ms': round(1000 * h.sum / h.count, 3) if h.count else 0.0,
+            'p50_ms': round(1000 * h.quantile(0.50), 3),
+            'p95_ms': round(1000 * h.quantile(0.95), 3),
+            'p99_ms': round(1000 * h.quantile(0.99), 3)
+        } for label, h in groups.items()]
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+
+def instrument_engine(registry: MetricsRegistry, engine_name: str, engine,
+                      metric: str = 'agrisuper_engine_call_duration_seconds'):
+    """Wrap every public method of an engine instance with a latency timer"""
+    for name, member in inspect.getmembers(type(engine), inspect.isfunction):
+        if name.startswith('_'):
+            continue
+        bound = getattr(engine, name)
+        setattr(engine, name, registry.time(metric, engine=engine_name, method=name)(bound))
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack at a fixed interval from a background
+    thread and aggregates the stacks in folded (flamegraph) form.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            folded = ';'.join(reversed(stack))
+            self.stacks[folded] = self.stacks.get(folded, 0) + 1
+            self.samples += 1
+
+    def write_folded(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def register_metrics(app, engines: Optional[Dict[str, object]] = None,
+                     registry: Optional[MetricsRegistry] = None) -> MetricsRegistry:
+    """
+    Install request timing, engine method timers, the per-request profiler
+    and the /metrics endpoint. Returns the registry (also in app.extensions).
+    """
+    if registry is None:
+        try:
+            registry = MetricsRegistry(directory=default_metrics_dir())
+        except OSError:
+            # No writable shared directory: per-process metrics only
+            registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+    registry.describe('agrisuper_http_request_duration_seconds', 'Request latency by endpoint')
+    registry.describe('agrisuper_http_requests_total', 'Requests by endpoint and status')
+    registry.describe('agrisuper_engine_call_duration_seconds', 'Engine method latency')
+
+    for engine_name, engine in (engines or {}).items():
+        instrument_engine(registry, engine_name, engine)
+
+    profiling_enabled = app.config.get('PROFILING_ENABLED',
+                                       os.environ.get('AGRISUPER_PROFILING', '').lower() in ('1', 'true', 'yes'))
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        if profiling_enabled and request.headers.get(PROFILE_HEADER):
+            g.profiler = SamplingProfiler(threading.get_ident()).start()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        if endpoint != 'prometheus_metrics' and endpoint not in app.config.get('METRICS_EXCLUDED_ENDPOINTS', ()):
+            registry.observe('agrisuper_http_request_duration_seconds', time.perf_counter() - started,
+                             method=request.method, endpoint=endpoint)
+            registry.inc('agrisuper_http_requests_total', method=request.method, endpoint=endpoint,
+                         status=str(response.status_code))
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+            path = os.path.join(app.root_path, PROFILE_DIR,
+                                f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{os.getpid()}.folded")
+            profiler.write_folded(path)
+            response.headers['X-Profile-File'] = os.path.relpath(path, app.root_path)
+            response.headers['X-Profile-Samples'] = str(profiler.samples)
+        return response
+
+    @app.teardown_request
+    def stop_abandoned_profiler(exc):
+        # after_request does not run when a view raises; never leave a sampler thread behind
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+
+    def collect_cache_stats():
+        for cache_name in ('response_cache', 'fragment_cache'):
+            cache = app.extensions.get(cache_name)
+            if cache is None:
+                continue
+            for key, value in cache.get_stats().items():
+                if isinstance(value, (int, float)):
+                    # Caches are per process: label with the worker that answered the scrape
+                    yield f'agrisuper_cache_{key}', 'gauge', {'cache': cache_name, 'pid': os.getpid()}, value
+
+    registry.add_collector(collect_cache_stats)
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Prometheus scrape endpoint"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
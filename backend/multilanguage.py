@@ -1,5 +1,5 @@
-import json
 import os
+from backend.record_store import load_document
 
 class MultiLanguageSupport:
     def __init__(self, data_folder='data'):
@@ -8,8 +8,7 @@ class MultiLanguageSupport:
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
     
@@ -1,16 +1,50 @@
-import json
+import logging
 import os
 from datetime import datetime, timedelta
+from backend.record_store import load_document
+from backend.geo_alerts import resolve_location
+from backend.sms_gateway import (PRIORITY_ALERT, PRIORITY_BROADCAST, PRIORITY_REPLY, SMSDispatcher,
+                                 default_rate_limit_dir, normalize_phone)
+
+CROP_ALIASES = {"PADDY": "Rice", "CORN": "Maize", "CHILLI": "Chili", "CHILLY": "Chili", "SOYABEAN": "Soybean"}
+ACRES_PER_HECTARE = 2.471
+MAX_SMS_LENGTH = 160
+SEVERITY_ORDER = {"Low": 1, "Medium": 2, "High": 3, "Critical": 4}
+
+logger = logging.getLogger(__name__)
 
 class OfflineSMSSupport:
-    def __init__(self, data_folder='data'):
+    def __init__(self, data_folder='data', gateway=None, rate_limits=None):
         self.data_file = os.path.join(data_folder, 'offline_sms_data.json')
         self.load_data()
+        # Outbound queue; a local fake gateway until a provider gateway is passed in. The operator
+        # rate limits are shared by every worker process through default_rate_limit_dir()
+        self.dispatcher = SMSDispatcher(gateway, rate_limits=rate_limits, rate_limit_dir=default_rate_limit_dir())
+        self.pricing_engine = None
+        self.weather_service = None
+        self.disaster_alerts = None
+        self.yield_engine = None
+        self.user_manager = None
+    
+    def attach_sources(self, pricing_engine=None, weather_service=None, disaster_alerts=None, yield_engine=None,
+                       user_manager=None):
+        """Answer PRICE / WEATHER / YIELD from the app's in-memory engines instead of placeholders"""
+        self.pricing_engine = pricing_engine
+        self.weather_service = weather_service
+        self.disaster_alerts = disaster_alerts
+        self.yield_engine = yield_engine
+        self.user_manager = user_manager
+    
+    def user_phone(self, user_id):
+        """Phone number on a user's account, or None"""
+        if not user_id or self.user_manager is None:
+            return None
+        user = self.user_manager.get_user_by_id(user_id)
+        return (user or {}).get("phone") or None
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
     
@@ -67,22 +101,177 @@ class OfflineSMSSupport:
         }
     
     def process_sms_command(self, phone_number, message):
-        # Process incoming SMS command
-        message = message.upper().strip()
+        # Process incoming SMS command and queue the reply
+        message = str(message or "").upper().strip()
+        words = message.split()
+        command, args = (words[0], words[1:]) if words else ("", [])
         
-        if message.startswith("PRICE"):
-            crop = message.replace("PRICE", "").strip()
-            return f"{crop}: Rs.{random.randint(2000, 3000)}/quintal (Market: Delhi)"
-        elif message.startswith("WEATHER"):
-            location = message.replace("WEATHER", "").strip()
-            return f"{location}: {random.randint(20, 35)}°C, Partly cloudy"
+        if command == "PRICE" and args:
+            response = self._price_reply(args)
+        elif command == "WEATHER" and args:
+            response = self._weather_reply(" ".join(args))
+        elif command == "YIELD" and args:
+            response = self._yield_reply(args)
+        elif command == "ALERT" and args and args[0] in ("ON", "OFF"):
+            response = self._set_alerts(phone_number, args[0] == "ON")
         elif message == "HELP":
-            return "Commands: PRICE [CROP], WEATHER [CITY], ALERT ON/OFF. Reply HELP for more info."
+            response = "Commands: PRICE [CROP] [STATE], WEATHER [CITY], YIELD [CROP] [ACRES], ALERT ON/OFF."
         else:
-            return "Invalid command. Reply HELP for available commands."
+            response = "Invalid command. Reply HELP for available commands."
+        response = response[:MAX_SMS_LENGTH]
+        
+        message_id = self.dispatcher.enqueue(phone_number, response, priority=PRIORITY_REPLY, ref=command or None)
+        self.data.setdefault("sms_logs", []).append({
+            "phone": phone_number,
+            "message": message,
+            "response": response,
+            "message_id": message_id,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "Queued"
+        })
+        return response
+    
+    def _price_reply(self, args):
+        if self.pricing_engine is None:
+            return "Price service unavailable. Please try again later."
+        history = self.pricing_engine.historical_data
+        states = {state.upper(): state for crop in list(history)[:1] for state in history[crop]}
+        state_words = [i for i in range(len(args)) if " ".join(args[i:]) in states]
+        crop_words = args[:state_words[0]] if state_words else args
+        state = states.get(" ".join(args[state_words[0]:])) if state_words else None
+        crop_key = " ".join(crop_words)
+        crop = CROP_ALIASES.get(crop_key, crop_key.title())
+        if crop not in history:
+            return f"No price data for {crop_key}. Try: {', '.join(c.upper() for c in list(history)[:5])}"
+        if state:
+            price = self.pricing_engine.get_average_price(crop, state, days=1)
+            week = self.pricing_engine.get_average_price(crop, state, days=7)
+            return f"{crop}: Rs.{price:,.0f}/quintal ({state} Mandi), 7-day avg Rs.{week:,.0f}"
+        latest = sorted((self.pricing_engine.get_average_price(crop, market, days=1), market) for market in history[crop])
+        average = sum(price for price, _ in latest) / len(latest)
+        return (f"{crop}: avg Rs.{average:,.0f}/quintal. Best {latest[-1][1]} Rs.{latest[-1][0]:,.0f}, "
+                f"lowest {latest[0][1]} Rs.{latest[0][0]:,.0f}")
+    
+    def _weather_reply(self, location):
+        place = location.title()
+        point = resolve_location(location)
+        cached = None
+        if point is not None and self.weather_service is not None:
+            cached = self.weather_service.get_cached_weather(point[0], point[1])
+        parts = []
+        if cached and cached.get("current_weather"):
+            current = cached["current_weather"]
+            parts.append(f"{place}: {current['temperature']:.0f}C, {current['description']}")
+            if cached.get("forecast"):
+                tomorrow = cached["forecast"][1] if len(cached["forecast"]) > 1 else cached["forecast"][0]
+                parts.append(f"Tomorrow {tomorrow['temperature']['min']:.0f}-{tomorrow['temperature']['max']:.0f}C, "
+                             f"{tomorrow['condition']}")
+        else:
+            parts.append(f"{place}: forecast not available right now")
+        if self.disaster_alerts is not None:
+            alerts = self.disaster_alerts.get_alerts(location)
+            if alerts:
+                worst = max(alerts, key=lambda alert: SEVERITY_ORDER.get(alert.get("severity"), 0))
+                parts.append(f"{len(alerts)} active alert(s), worst: {worst.get('severity')} "
+                             f"{str(worst.get('type', '')).replace('_', ' ')}")
+            else:
+                parts.append("No active alerts")
+        return ". ".join(parts)
+    
+    def _yield_reply(self, args):
+        crop = args[0].lower()
+        try:
+            acres = float(args[1]) if len(args) > 1 else 1.0
+        except ValueError:
+            return "Usage: YIELD [CROP] [ACRES], e.g. YIELD WHEAT 5"
+        per_hectare = self.yield_engine.get_expected_yield(crop) if self.yield_engine is not None else None
+        if not per_hectare:
+            return f"No yield data for {args[0]}."
+        quintals = per_hectare * acres / ACRES_PER_HECTARE / 100
+        return f"{crop.title()} {acres:g} acres: Expected {quintals:,.0f} quintals"
+    
+    def _set_alerts(self, phone_number, enabled):
+        subscribers = self.data.setdefault("alert_subscribers", [])
+        phone = normalize_phone(phone_number)
+        if enabled and phone not in subscribers:
+            subscribers.append(phone)
+        elif not enabled and phone in subscribers:
+            subscribers.remove(phone)
+        return "Price alerts activated for your crops" if enabled else "Price alerts turned off"
     
+    def send_sms(self, data):
+        """Queue a single outbound SMS: {'phone', 'message'}"""
+        if not data.get("phone") or not data.get("message"):
+            return {"status": "error", "message": "phone and message are required"}
+        message_id = self.dispatcher.enqueue(data["phone"], data["message"][:MAX_SMS_LENGTH], priority=PRIORITY_REPLY)
+        return {"status": "queued", "message_id": message_id}
+    
+    def subscribe(self, data):
+        return {"status": "success", "message": self._set_alerts(data.get("phone"), data.get("enabled", True))}
+    
+    def get_commands(self):
+        return self.data.get("sms_commands", [])
+    
+    def broadcast(self, message, phones=None):
+        """Advisory to many numbers (default: every ALERT ON subscriber), sent at the operators' rate limits"""
+        phones = phones if phones is not None else self.data.get("alert_subscribers", [])
+        job_id = f"BC{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        message_ids = self.dispatcher.enqueue_many(phones, message[:MAX_SMS_LENGTH], priority=PRIORITY_BROADCAST, ref=job_id)
+        self.data.setdefault("sms_batches", []).append({
+            "job_id": job_id,
+            "recipients": len(message_ids),
+            "message": message,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "Queued"
+        })
+        return {"status": "queued", "job_id": job_id, "recipients": len(message_ids)}
+    
+    def delivery_receipt(self, data):
+        """Gateway DLR webhook: {'gateway_id', 'status'}"""
+        result = self.dispatcher.on_delivery_receipt(str(data.get("gateway_id")), str(data.get("status", "")))
+        return result or {"status": "unknown", "gateway_id": data.get("gateway_id")}
+    
+    def get_message_status(self, message_id):
+        return self.dispatcher.status(message_id)
+    
+    def send_price_alert(self, alert):
+        """Queue an SMS for a triggered price alert; alerts without a phone number are skipped"""
+        phone = alert.get("phone") or self.user_phone(alert.get("user_id"))
+        if not phone:
+            logger.warning("Price alert %s has no phone number; not sent", alert.get("alert_id"))
+            return None
+        message = (f"AgriSuper: {alert['product_name']} is now Rs.{alert.get('current_price')} "
+                   f"(your target Rs.{alert['target_price']}). Reply PRICE {alert['product_name'].upper()} for details.")
+        entry = {
+            "phone": phone,
+            "message": message,
+            "alert_id": alert.get("alert_id"),
+            "message_id": self.dispatcher.enqueue(phone, message[:MAX_SMS_LENGTH], priority=PRIORITY_ALERT,
+                                                  ref=alert.get("alert_id")),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "Queued"
+        }
+        self.data.setdefault("sms_logs", []).append(entry)
+        return entry
+    
+    def send_disaster_alert_batch(self, alert, recipients):
+        """Queue one batch of a disaster alert fan-out as a single bulk SMS job"""
+        message = (f"AgriSuper ALERT: {alert.get('severity', '')} {str(alert.get('type', 'weather')).replace('_', ' ')} "
+                   f"for {alert.get('location', 'your area')}. Reply ALERT for safety steps.")
+        phones = [recipient.get("phone") or recipient.get("subscriber_id") for recipient in recipients]
+        self.dispatcher.enqueue_many(phones, message[:MAX_SMS_LENGTH], priority=PRIORITY_ALERT, ref=alert.get("id"))
+        entry = {
+            "recipients": len(phones),
+            "message": message,
+            "alert_id": alert.get("id"),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "Queued"
+        }
+        self.data.setdefault("sms_batches", []).append(entry)
+        return entry
+
     def get_sms_statistics(self):
-        return self.data.get("usage_statistics", {})
+        return dict(self.data.get("usage_statistics", {}), pipeline=self.dispatcher.get_stats())
 
     def test_connection(self):
         """Test if the module is working"""
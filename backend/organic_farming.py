@@ -1,7 +1,7 @@
-import json
 import os
 from datetime import datetime, timedelta
 import random
+from backend.record_store import load_document
 
 class OrganicFarmingAdvisory:
     def __init__(self, data_folder='data'):
@@ -10,8 +10,7 @@ class OrganicFarmingAdvisory:
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
     
@@ -1,7 +1,7 @@
-import json
 import os
 from datetime import datetime, timedelta
 import random
+from backend.record_store import load_document, save_document
 
 class OrganicMarketplace:
     def __init__(self, data_folder):
@@ -12,16 +12,14 @@ class OrganicMarketplace:
     def load_data(self):
         """Load organic marketplace data"""
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_sample_data()
             self.save_data()
     
     def save_data(self):
         """Save data to file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        save_document(self.data_file, self.data, indent=2)
     
     def generate_sample_data(self):
         """Generate comprehensive organic marketplace data"""
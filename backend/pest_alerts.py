@@ -1,13 +1,14 @@
 import json
 import random
 from datetime import datetime, timedelta
+from backend.shared_reference import load_reference
 
 class PestAlertsEngine:
     def __init__(self, data_folder='data'):
         # Massive pest alerts data
-        self.pest_database = self._generate_pest_database()
+        self.pest_database = load_reference('pest_database', self._generate_pest_database)
         self.active_outbreaks = self._generate_active_outbreaks()
-        self.treatment_database = self._generate_treatment_database()
+        self.treatment_database = load_reference('pest_treatments', self._generate_treatment_database)
         self.seasonal_patterns = self._generate_seasonal_patterns()
         
     def get_alerts(self, location='all'):
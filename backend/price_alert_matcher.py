@@ -0,0 +1,202 @@
+"""
+Price Alert Matcher
+Event-driven matching of standing price alerts against incoming price updates
+"""
+
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from backend.event_log import EventLog
+
+
+def _product_key(product_name: str) -> str:
+    return " ".join(str(product_name).lower().split())
+
+
+class PriceAlertMatcher:
+    """
+    Keeps alerts in per-product heaps keyed by target price so that a price
+    tick only touches the alerts it actually crosses:
+
+    - price_drop alerts live in a max-heap on target price and fire once the
+      price falls to or below the target
+    - price_rise alerts live in a min-heap and fire once the price reaches
+      or exceeds the target
+
+    Cancelled alerts are dropped lazily when they surface at the top of a heap.
+
+    With a log_path, alerts are shared by every worker through an event log
+    (added, triggered, cancelled). A price tick on any worker sees every
+    worker's alerts, and an alert is claimed in the log before its listeners
+    run, so it fires on exactly one worker.
+    """
+
+    DROP = 'price_drop'
+    RISE = 'price_rise'
+
+    def __init__(self, notify: Optional[Callable[[Dict], None]] = None, log_path: Optional[str] = None):
+        self._drop_heaps: Dict[str, list] = {}
+        self._rise_heaps: Dict[str, list] = {}
+        self._alerts: Dict[str, Dict] = {}
+        self._last_price: Dict[str, float] = {}
+        self._active_per_product: Dict[str, int] = {}
+        self._listeners: List[Callable[[Dict], None]] = [notify] if notify else []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.triggered_count = 0
+        self._closed = set()
+        self._log = EventLog(log_path, self._apply, reset=self._clear) if log_path else None
+
+    def _clear(self):
+        """Log was replaced: drop every alert and replay it"""
+        with self._lock:
+            self._drop_heaps, self._rise_heaps, self._alerts = {}, {}, {}
+            self._active_per_product = {}
+            self._closed = set()
+            self.triggered_count = 0
+
+    def _apply(self, event: Dict, _offset: int):
+        kind = event['type']
+        if kind == 'added':
+            if event['alert']['alert_id'] not in self._closed:
+                self._index(event['alert'])
+            return
+        with self._lock:
+            self._closed.add(event['alert_id'])
+            alert = self._alerts.pop(event['alert_id'], None)
+            if alert is not None:
+                self._active_per_product[_product_key(alert['product_name'])] -= 1
+            if kind == 'triggered':
+                self.triggered_count += 1
+
+    def refresh(self):
+        """Fold in alerts added, triggered or cancelled by other workers"""
+        if self._log is not None:
+            self._log.refresh()
+
+    def add_listener(self, listener: Callable[[Dict], None]):
+        """Register a callback invoked with every triggered alert"""
+        self._listeners.append(listener)
+
+    def add_alert(self, alert: Dict) -> Dict:
+        """
+        Register a standing alert. Only alerts with status 'active' are indexed.
+        If a price for the product is already known and crosses the target,
+        the alert fires immediately.
+        """
+        if alert.get('status', 'active') != 'active':
+            return alert
+
+        float(alert['target_price'])  # a bad target fails here, before it reaches the log
+        if self._log is not None:
+            self._log.append(lambda: [{'type': 'added', 'alert': alert}])
+            with self._lock:
+                alert = self._alerts.get(alert['alert_id'], alert)
+        else:
+            self._index(alert)
+        with self._lock:
+            last_price = self._last_price.get(_product_key(alert['product_name']))
+
+        if last_price is not None:
+            self.on_price_update(alert['product_name'], last_price)
+        return alert
+
+    def _index(self, alert: Dict):
+        key = _product_key(alert['product_name'])
+        target = float(alert['target_price'])
+        with self._lock:
+            if alert['alert_id'] in self._alerts:
+                return
+            self._alerts[alert['alert_id']] = alert
+            self._active_per_product[key] = self._active_per_product.get(key, 0) + 1
+            if alert.get('alert_type', self.DROP) == self.RISE:
+                heapq.heappush(self._rise_heaps.setdefault(key, []), (target, next(self._seq), alert['alert_id']))
+            else:
+                heapq.heappush(self._drop_heaps.setdefault(key, []), (-target, next(self._seq), alert['alert_id']))
+
+    def cancel_alert(self, alert_id: str) -> bool:
+        """Cancel an alert; its heap entry is discarded the next time it surfaces"""
+        if self._log is not None:
+            self.refresh()
+            with self._lock:
+                alert = self._alerts.get(alert_id)
+            if alert is None or not self._log.append(
+                    lambda: [] if alert_id in self._closed else [{'type': 'cancelled', 'alert_id': alert_id}]):
+                return False
+            alert['status'] = 'cancelled'
+            return True
+        with self._lock:
+            alert = self._alerts.pop(alert_id, None)
+            if alert is None:
+                return False
+            self._active_per_product[_product_key(alert['product_name'])] -= 1
+        alert['status'] = 'cancelled'
+        return True
+
+    def on_price_update(self, product_name: str, price: float) -> List[Dict]:
+        """Feed a new price for a product and return the alerts it triggered"""
+        key = _product_key(product_name)
+        price = float(price)
+        triggered = []
+        self.refresh()
+        with self._lock:
+            self._last_price[key] = price
+
+            drop_heap = self._drop_heaps.get(key)
+            while drop_heap and -drop_heap[0][0] >= price:
+                _, _, alert_id = heapq.heappop(drop_heap)
+                alert = self._alerts.pop(alert_id, None)
+                if alert is not None:
+                    triggered.append(alert)
+
+            rise_heap = self._rise_heaps.get(key)
+            while rise_heap and rise_heap[0][0] <= price:
+                _, _, alert_id = heapq.heappop(rise_heap)
+                alert = self._alerts.pop(alert_id, None)
+                if alert is not None:
+                    triggered.append(alert)
+
+            if triggered:
+                self._active_per_product[key] -= len(triggered)
+            if self._log is None:
+                self.triggered_count += len(triggered)
+
+        now = datetime.now().isoformat()
+        if self._log is not None and triggered:
+            # Claim each alert in the shared log; alerts another worker already fired are dropped
+            claimed = self._log.append(lambda: [
+                {'type': 'triggered', 'alert_id': alert['alert_id'], 'price': price, 'ts': now}
+                for alert in triggered if alert['alert_id'] not in self._closed])
+            claimed_ids = {event['alert_id'] for event in claimed}
+            triggered = [alert for alert in triggered if alert['alert_id'] in claimed_ids]
+
+        for alert in triggered:
+            alert['status'] = 'triggered'
+            alert['current_price'] = price
+            alert['triggered_date'] = now
+
+        # Listeners run outside the lock so a slow SMS path never blocks ticks
+        for alert in triggered:
+            for listener in self._listeners:
+                listener(alert)
+        return triggered
+
+    def pending_count(self, product_name: Optional[str] = None) -> int:
+        """Number of active alerts, optionally for a single product"""
+        self.refresh()
+        with self._lock:
+            if product_name is None:
+                return len(self._alerts)
+            return self._active_per_product.get(_product_key(product_name), 0)
+
+    def get_stats(self) -> Dict:
+        self.refresh()
+        with self._lock:
+            return {
+                'active_alerts': len(self._alerts),
+                'products_watched': len(set(self._drop_heaps) | set(self._rise_heaps)),
+                'triggered_alerts': self.triggered_count
+            }
@@ -2,12 +2,19 @@ import json
 import random
 from datetime import datetime, timedelta
 import numpy as np
+from backend.shared_reference import ReferenceHandle
 
 class PricingEngine:
     def __init__(self, data_folder='data'):
-        self.historical_data = self._load_historical_data()
+        # Built once per node and memory-mapped by every worker; dates are relative to today,
+        # so the handle swaps in a rebuilt generation once it is 6 hours old
+        self._historical = ReferenceHandle('pricing_history', self._load_historical_data, max_age=6 * 3600)
         self.market_factors = self._load_market_factors()
         self.crop_database = self._load_crop_database()
+
+    @property
+    def historical_data(self):
+        return self._historical.get()
     
     def _load_historical_data(self):
         """Load comprehensive historical pricing data"""
@@ -156,11 +163,43 @@ class PricingEngine:
                 'message': f'Error calculating price: {str(e)}'
             }
     
+    def _price_column(self, crop, location):
+        """Daily prices for a crop/location, zero-copy when the history is shared"""
+        series = self.historical_data[crop][location]
+        if hasattr(series, 'column'):
+            return series.column('price')
+        return [p['price'] for p in series]
+
+    def get_average_price(self, crop, location, days=90):
+        """Mean price over the last `days` days, or None without history"""
+        if crop in self.historical_data and location in self.historical_data[crop]:
+            recent_prices = self._price_column(crop, location)[-days:]
+            return sum(recent_prices) / len(recent_prices)
+        return None
+
+    def market_prices(self, days=30):
+        """Average market price of every crop in every market over the last `days` days"""
+        return [
+            {'id': f"crop:{crop}:{location}", 'crop': crop, 'location': location,
+             'price': round(self.get_average_price(crop, location, days), 2)}
+            for crop, markets in self.historical_data.items()
+            for location in markets
+        ]
+
+    def get_price_index(self, crop, location, days=90):
+        """Recent regional price relative to the crop's long-run average across all markets"""
+        recent = self.get_average_price(crop, location, days)
+        if recent is None:
+            return None
+        markets = self.historical_data[crop]
+        long_run = [sum(self._price_column(crop, market)) / len(markets[market]) for market in markets]
+        return recent / (sum(long_run) / len(long_run))
+
     def _get_base_price(self, crop, location):
         """Get base price from historical data"""
         if crop in self.historical_data and location in self.historical_data[crop]:
-            recent_prices = self.historical_data[crop][location][-30:]  # Last 30 days
-            return sum(p['price'] for p in recent_prices) / len(recent_prices)
+            recent_prices = self._price_column(crop, location)[-30:]  # Last 30 days
+            return sum(recent_prices) / len(recent_prices)
         return random.randint(2000, 4000)  # Fallback price
     
     def _calculate_fpi(self, crop, location, quantity):
@@ -191,7 +230,7 @@ class PricingEngine:
     def _analyze_trends(self, crop, location):
         """Analyze price trends"""
         if crop in self.historical_data and location in self.historical_data[crop]:
-            prices = [p['price'] for p in self.historical_data[crop][location][-90:]]  # Last 90 days
+            prices = list(self._price_column(crop, location)[-90:])  # Last 90 days
             
             # Calculate trends
             recent_avg = sum(prices[-7:]) / 7  # Last week
@@ -224,7 +263,7 @@ class PricingEngine:
     def _calculate_volatility(self, crop, location):
         """Calculate price volatility score"""
         if crop in self.historical_data and location in self.historical_data[crop]:
-            prices = [p['price'] for p in self.historical_data[crop][location][-30:]]
+            prices = list(self._price_column(crop, location)[-30:])
             
             if len(prices) > 1:
                 mean_price = sum(prices) / len(prices)
@@ -0,0 +1,121 @@
+"""
+Progress Log
+Durable, append-only learner progress shared by every worker
+
+Each enrollment, completed module, quiz attempt and certificate is one JSON
+line in a backend.event_log.EventLog. A process keeps a materialized view:
+per user, per course progress. Before every read it folds in whatever other
+workers appended since its last offset, so all gunicorn workers agree and a
+restart simply replays the log.
+
+Appends run under the log's exclusive flock after catching up. A
+check-then-append, such as issuing a certificate only once, therefore sees
+every earlier event from any process. The log file and its directory are
+created on the first append, not when the log is constructed, and a corrupt
+line is logged and skipped during catch-up.
+
+Usage:
+    log = ProgressLog('data/events/elearning_progress.jsonl')
+    log.append({'type': 'enrolled', 'user_id': 'u1', 'course_id': 'ORG001'})
+    log.append({'type': 'module_completed', 'user_id': 'u1', 'course_id': 'ORG001', 'module_id': 1, 'modules': 5})
+    log.progress('u1', 'ORG001')
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from backend.event_log import EventLog
+
+EVENT_TYPES = ('enrolled', 'module_completed', 'quiz_submitted', 'certificate_issued')
+
+
+def new_progress(event: Dict) -> Dict:
+    return {
+        "enrollment_id": event.get("enrollment_id"),
+        "enrolled_date": event["ts"],
+        "progress": 0,
+        "completed_modules": [],
+        "quiz_scores": {},
+        "certificate_issued": False,
+        "certificate_id": None
+    }
+
+
+class ProgressLog:
+    """Append-only event log with a per-user materialized view"""
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.users: Dict[str, Dict[str, Dict]] = {}
+        self.certificates: Dict[str, Dict] = {}
+        self.log = EventLog(path, lambda event, _offset: self._apply(event), reset=self._clear, fsync=fsync)
+
+    @property
+    def path(self) -> str:
+        return self.log.path
+
+    def _clear(self):
+        """Log was replaced (restored from backup, compacted): replay it from scratch"""
+        self.users, self.certificates = {}, {}
+
+    def refresh(self):
+        """Fold in events other workers appended; cheap when nothing changed"""
+        self.log.refresh()
+
+    # ------------------------------------------------------------------- writes
+
+    def append(self, event: Dict, check: Optional[Callable[['ProgressLog'], Optional[Dict]]] = None) -> Dict:
+        """
+        Durably append one event and apply it. `check` runs under the lock
+        after catching up; if it returns a dict, nothing is appended and that
+        dict is returned instead (used for idempotent writes).
+        """
+        if event.get('type') not in EVENT_TYPES:
+            raise ValueError(f"event type must be one of {', '.join(EVENT_TYPES)}")
+        existing = {}
+
+        def build():
+            if check is not None:
+                existing['result'] = check(self)
+                if existing['result'] is not None:
+                    return []
+            return [dict(event, ts=event.get('ts') or datetime.now().isoformat())]
+
+        appended = self.log.append(build)
+        return appended[0] if appended else existing['result']
+
+    def _apply(self, event: Dict):
+        kind = event['type']
+        courses = self.users.setdefault(str(event['user_id']), {})
+        course_id = event['course_id']
+        if kind == 'enrolled':
+            courses.setdefault(course_id, new_progress(event))
+            return
+        progress = courses.get(course_id)
+        if progress is None:
+            return
+        if kind == 'module_completed':
+            if event['module_id'] not in progress['completed_modules']:
+                progress['completed_modules'].append(event['module_id'])
+                progress['progress'] = len(progress['completed_modules']) / max(event['modules'], 1) * 100
+        elif kind == 'quiz_submitted':
+            progress['quiz_scores'][str(event['module_id'])] = {
+                "score": event['score'], "passed": event['passed'], "date": event['ts']
+            }
+        elif kind == 'certificate_issued':
+            progress['certificate_issued'] = True
+            progress['certificate_id'] = event['certificate']['certificate_id']
+            self.certificates[event['certificate']['certificate_id']] = event['certificate']
+
+    # -------------------------------------------------------------------- reads
+
+    def progress(self, user_id, course_id) -> Optional[Dict]:
+        return self.users.get(str(user_id), {}).get(course_id)
+
+    def user_courses(self, user_id) -> Dict[str, Dict]:
+        return self.users.get(str(user_id), {})
+
+    def get_stats(self) -> Dict:
+        return dict(self.log.get_stats(),
+                    learners=len(self.users),
+                    enrollments=sum(len(courses) for courses in self.users.values()),
+                    certificates=len(self.certificates))
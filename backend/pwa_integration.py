@@ -4,6 +4,7 @@ This module integrates Progressive Web App features into the main Flask applicat
 """
 
 from flask import send_from_directory, jsonify
+from backend.asset_pipeline import send_precompressed
 import os
 
 
@@ -18,14 +19,21 @@ def register_pwa_routes(app):
     - /api/pwa/install: Track PWA installations
     """
     
+    dist_folder = os.path.join(app.root_path, 'static', 'dist')
+    
     @app.route('/manifest.json')
     def serve_manifest():
-        """Serve PWA manifest file"""
+        """Serve PWA manifest file (precompressed build when available)"""
+        if os.path.exists(os.path.join(dist_folder, 'manifest.json')):
+            return send_precompressed(dist_folder, 'manifest.json', mimetype='application/json')
         return send_from_directory('static', 'manifest.json', mimetype='application/json')
     
     @app.route('/service-worker.js')
     def serve_service_worker():
-        """Serve service worker JavaScript file"""
+        """Serve service worker JavaScript file (precompressed build when available)"""
+        if os.path.exists(os.path.join(dist_folder, 'js', 'service-worker.js')):
+            return send_precompressed(os.path.join(dist_folder, 'js'), 'service-worker.js',
+                                      mimetype='application/javascript')
         return send_from_directory('static/js', 'service-worker.js', mimetype='application/javascript')
     
     @app.route('/offline')
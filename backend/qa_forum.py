@@ -1,7 +1,8 @@
-import json
 import os
 from datetime import datetime, timedelta
 import random
+from backend.record_store import load_document, save_document
+from backend.shared_reference import load_reference
 
 class QAForumManager:
     def __init__(self, data_folder='data'):
@@ -10,10 +11,9 @@ class QAForumManager:
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
-            self.data = self.generate_default_data()
+            self.data = load_reference('qa_forum_default', self.generate_default_data, mutable=True)
     
     def generate_default_data(self):
         categories = ["Crop Diseases", "Pest Control", "Soil Health", "Irrigation", "Fertilizers", "Weather", "Market Prices", "Government Schemes"]
@@ -97,10 +97,10 @@ class QAForumManager:
         return self.data["forum_stats"]
         
     def add_question(self, title, category, question_text, user_id, username, tags=None):
-        """Add a new question to the forum"""
+        """Add a new question to the forum; returns the new question id, or None on failure"""
         try:
-            # Generate a new question ID
-            last_id = max([int(q["id"].replace('Q', '')) for q in self.data["questions"] if q["id"].startswith('Q')], default=0)
+            # Generate a new question ID (seeded questions may carry plain integer ids)
+            last_id = max([int(str(q["id"]).replace('Q', '')) for q in self.data["questions"] if str(q["id"]).startswith('Q')], default=0)
             new_id = f"Q{str(last_id + 1).zfill(4)}"
             
             # Create new question object
@@ -124,16 +124,31 @@ class QAForumManager:
             self.data["questions"].insert(0, new_question)
             
             # Update forum stats
-            self.data["forum_stats"]["total_questions"] += 1
+            stats = self.data.setdefault("forum_stats", {})
+            stats["total_questions"] = stats.get("total_questions", 0) + 1
             
             # Save data to file
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f, indent=4)
+            save_document(self.data_file, self.data, indent=4)
                 
-            return True
+            return new_id
         except Exception as e:
             print(f"Error adding question: {e}")
-            return False
+            return None
+
+    def ask_question(self, data):
+        """API entry point for posting a question; returns the new question id"""
+        data = data or {}
+        missing = [field for field in ("title", "question", "user_id") if not data.get(field)]
+        if missing:
+            return {"status": "error", "message": f"Missing required fields: {', '.join(missing)}"}
+        tags = data.get("tags") or []
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
+        question_id = self.add_question(data["title"], data.get("category", "General"), data["question"],
+                                        data["user_id"], data.get("username", "Anonymous"), tags)
+        if question_id is None:
+            return {"status": "error", "message": "Could not post question"}
+        return {"status": "success", "message": "Question posted successfully", "question_id": question_id}
             
     def increment_view_count(self, question_id):
         """Increment the view count for a question"""
@@ -143,8 +158,7 @@ class QAForumManager:
                 question["views"] += 1
                 
                 # Save data to file
-                with open(self.data_file, 'w') as f:
-                    json.dump(self.data, f, indent=4)
+                save_document(self.data_file, self.data, indent=4)
                 return True
             return False
         except Exception as e:
@@ -231,8 +245,7 @@ class QAForumManager:
             self.data["forum_stats"]["answered_questions"] += 1
             
             # Save data to file
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f, indent=4)
+            save_document(self.data_file, self.data, indent=4)
                 
             return True
         except Exception as e:
@@ -268,8 +281,7 @@ class QAForumManager:
             answer["voted_by"].append(user_id)
             
             # Save data to file
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f, indent=4)
+            save_document(self.data_file, self.data, indent=4)
                 
             return True
         except Exception as e:
@@ -298,8 +310,7 @@ class QAForumManager:
             question["voted_by"].append(user_id)
             
             # Save data to file
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f, indent=4)
+            save_document(self.data_file, self.data, indent=4)
                 
             return True
         except Exception as e:
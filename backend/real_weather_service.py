@@ -5,11 +5,11 @@ Connects with IMD, NASA POWER, and other meteorological services
 
 import requests
 import json
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -53,6 +53,11 @@ class RealWeatherService:
         # Cache
         self.cache = {}
         self.cache_duration = timedelta(minutes=30)
+        self.retry_interval = timedelta(minutes=5)
+        self._cache_times = {}
+        self._refreshing = set()
+        self._last_attempt = {}
+        self._refresh_lock = threading.Lock()
     
     def get_farm_weather(self, latitude: float, longitude: float, 
                         days: int = 7, location_name: str = None) -> Dict:
@@ -86,6 +91,7 @@ class RealWeatherService:
             
             # Cache result
             self.cache[cache_key] = result
+            self._cache_times[cache_key] = datetime.now()
             
             return result
             
@@ -93,6 +99,40 @@ class RealWeatherService:
             logger.error(f"Error fetching weather data: {str(e)}")
             return self._get_fallback_weather(latitude, longitude, location_name, days)
     
+    def get_cached_weather(self, latitude: float, longitude: float, days: int = 7,
+                           refresh: bool = True) -> Optional[Dict]:
+        """
+        Cached forecast for a point, or None; never waits on the external APIs.
+        On a miss (with refresh) the forecast is fetched on a background thread,
+        so SMS and voice replies can answer from cache on the next request.
+        """
+        cache_key = f"{latitude}_{longitude}_{days}"
+        if self._is_cache_valid(cache_key):
+            return self.cache[cache_key]
+        if refresh:
+            self._refresh_in_background(latitude, longitude, days)
+        return None
+    
+    def _refresh_in_background(self, latitude: float, longitude: float, days: int):
+        cache_key = f"{latitude}_{longitude}_{days}"
+        now = datetime.now()
+        with self._refresh_lock:
+            # One fetch per point at a time, and no hammering a failing API
+            last_attempt = self._last_attempt.get(cache_key)
+            if cache_key in self._refreshing or (last_attempt and now - last_attempt < self.retry_interval):
+                return
+            self._refreshing.add(cache_key)
+            self._last_attempt[cache_key] = now
+        
+        def fetch():
+            try:
+                self.get_farm_weather(latitude, longitude, days)
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+        
+        threading.Thread(target=fetch, name='weather-refresh', daemon=True).start()
+    
     def _fetch_nasa_power_data(self, lat: float, lon: float, days: int) -> Dict:
         """Fetch agricultural weather data from NASA POWER"""
         try:
@@ -515,7 +555,7 @@ class RealWeatherService:
         if cache_key not in self.cache:
             return False
         
-        cache_time = self.cache[cache_key].get('_cache_time')
+        cache_time = self._cache_times.get(cache_key)
         if not cache_time:
             return False
         
@@ -543,6 +583,8 @@ class RealWeatherService:
 
 # Example usage and testing
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
     # Initialize service
     config = {
         'OPENWEATHER_API_KEY': 'your_api_key_here'
@@ -0,0 +1,343 @@
+"""
+Record Store
+Record-oriented storage shared by every manager's load_data/save_data
+
+A manager data file such as data/qa_forum_data.json can be converted to a
+JSON-lines sibling, data/qa_forum_data.jsonl:
+
+    line 1:  header {"format", "keys", "document", "collections"}
+    line 2+: one JSON record per line, each top-level list stored contiguously
+
+The header holds the small non-list sections (stats, settings), the byte
+range of every top-level list and its record offsets (packed little-endian
+uint64, base64). Opening a .jsonl file only parses the header;
+the body is memory-mapped read-only, so its pages live in the OS page cache
+and are shared by every worker process, and individual records are parsed
+the first time they are accessed. A list is copied into a plain Python list
+only when a manager mutates it.
+
+Convert once per deploy (or whenever a reference table is regenerated):
+    python -m backend.record_store data/
+"""
+
+from array import array
+from collections.abc import Mapping, MutableSequence, Sequence
+import base64
+import copy
+import json
+import mmap
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+RECORD_FORMAT = 'agrisuper-records/1'
+RECORDS_SUFFIX = '.jsonl'
+
+
+def records_path(path: str) -> str:
+    """The .jsonl sibling of a .json data file"""
+    root, ext = os.path.splitext(path)
+    return root + RECORDS_SUFFIX if ext == '.json' else path
+
+
+class LazyRecordList(MutableSequence):
+    """
+    A list of JSON records backed by a memory-mapped byte range.
+
+    Reads parse records on demand and keep them, so in-place edits of a
+    record dict stick. Structural changes (insert, delete, sort, ...) first
+    materialize the whole list and from then on it behaves as a plain list.
+    """
+
+    def __init__(self, buffer, offsets: array):
+        self._buffer = buffer
+        self._offsets = offsets       # record start offsets plus the end offset
+        self._parsed: Dict[int, Any] = {}
+        self._items: Optional[list] = None
+
+    @property
+    def materialized(self) -> bool:
+        return self._items is not None
+
+    def _load(self, index: int):
+        record = self._parsed.get(index)
+        if record is None:
+            start, end = self._offsets[index], self._offsets[index + 1]
+            record = self._parsed[index] = json.loads(self._buffer[start:end])
+        return record
+
+    def _materialize(self) -> list:
+        if self._items is None:
+            self._items = [self._load(i) for i in range(len(self._offsets) - 1)]
+            self._parsed = {}
+            self._buffer = None
+        return self._items
+
+    def to_list(self) -> list:
+        return list(self._materialize()) if self._items is None else list(self._items)
+
+    # Sequence protocol
+
+    def __len__(self):
+        return len(self._items) if self._items is not None else len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if self._items is not None:
+            return self._items[index]
+        if isinstance(index, slice):
+            return [self._load(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        return self._load(index)
+
+    def __iter__(self):
+        if self._items is not None:
+            return iter(self._items)
+        return (self._load(i) for i in range(len(self)))
+
+    # MutableSequence protocol: copy on first write
+
+    def __setitem__(self, index, value):
+        self._materialize()[index] = value
+
+    def __delitem__(self, index):
+        del self._materialize()[index]
+
+    def insert(self, index, value):
+        self._materialize().insert(index, value)
+
+    def append(self, value):
+        self._materialize().append(value)
+
+    def sort(self, *args, **kwargs):
+        self._materialize().sort(*args, **kwargs)
+
+    # list conveniences used by managers
+
+    def copy(self) -> list:
+        return list(self)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, LazyRecordList)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(list(self), memo)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def __repr__(self):
+        state = 'materialized' if self._items is not None else f'{len(self._parsed)} parsed'
+        return f'<LazyRecordList {len(self)} records, {state}>'
+
+
+def json_default(obj):
+    """json `default` hook so documents holding lazy lists serialize as lists"""
+    if isinstance(obj, LazyRecordList):
+        return obj.to_list()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _open_records(path: str) -> Dict:
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != RECORD_FORMAT:
+            raise ValueError(f'{path}: unsupported record format {header.get("format")!r}')
+        size = os.fstat(f.fileno()).st_size
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    document = dict(header.get('document', {}))
+    for name, span in header.get('collections', {}).items():
+        offsets = array('Q')
+        if 'offsets' in span:
+            offsets.frombytes(base64.b64decode(span['offsets']))
+            if sys.byteorder != 'little':
+                offsets.byteswap()
+        else:
+            # Files converted before offsets were recorded: find the record boundaries
+            pos, end = span['start'], span['end']
+            while pos < end:
+                offsets.append(pos)
+                newline = buffer.find(b'\n', pos, end)
+                pos = end if newline == -1 else newline + 1
+            offsets.append(end)
+        document[name] = LazyRecordList(buffer, offsets)
+    return {key: document[key] for key in header.get('keys', document)}
+
+
+def document_path(path: str) -> str:
+    """The file save_document writes for a manager data file: its .jsonl sibling once converted"""
+    records = records_path(path)
+    if records != path and os.path.exists(records):
+        return records
+    return path
+
+
+# data file path -> wall time this process last loaded it
+_load_times: Dict[str, float] = {}
+
+
+def document_loaded_at(path: str) -> Optional[float]:
+    """When this process last loaded a manager data file through load_document, if ever"""
+    return _load_times.get(path)
+
+
+def load_document(path: str, encoding: str = 'utf-8') -> Dict:
+    """
+    Load a manager data file, preferring its record-oriented .jsonl sibling.
+
+    Raises FileNotFoundError when neither exists, so managers keep their
+    generate-defaults fallback unchanged.
+    """
+    records = records_path(path)
+    if records != path and os.path.exists(records):
+        document = _open_records(records)
+    elif path.endswith(RECORDS_SUFFIX):
+        document = _open_records(path)
+    else:
+        with open(path, 'r', encoding=encoding) as f:
+            document = json.load(f)
+    _load_times[path] = time.time()
+    return document
+
+
+def _write_records(path: str, document: Dict):
+    keys = list(document)
+    plain = {k: v for k, v in document.items() if not isinstance(v, (list, LazyRecordList))}
+    lists = {k: v for k, v in document.items() if isinstance(v, (list, LazyRecordList))}
+
+    body = []
+    collections = {}
+    offset = 0
+    starts = {}
+    for name, records in lists.items():
+        start = offset
+        starts[name] = record_starts = array('Q')
+        for record in records:
+            line = json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=json_default)
+            encoded = (line + '\n').encode('utf-8')
+            body.append(encoded)
+            record_starts.append(offset)
+            offset += len(encoded)
+        record_starts.append(offset)
+        collections[name] = {'start': start, 'end': offset, 'count': len(records)}
+
+    def packed_offsets(name, base):
+        absolute = array('Q', (pos + base for pos in starts[name]))
+        if sys.byteorder != 'little':
+            absolute.byteswap()
+        return base64.b64encode(absolute.tobytes()).decode('ascii')
+
+    def header_bytes(base):
+        header = {'format': RECORD_FORMAT, 'keys': keys, 'document': plain,
+                  'collections': {n: dict(s, start=s['start'] + base, end=s['end'] + base,
+                                          offsets=packed_offsets(n, base))
+                                  for n, s in collections.items()}}
+        return (json.dumps(header, ensure_ascii=False, separators=(',', ':'), default=json_default) + '\n').encode('utf-8')
+
+    # Offsets are absolute; the header length depends on them, so settle it first
+    base = 0
+    header = header_bytes(base)
+    while len(header) != base:
+        base = len(header)
+        header = header_bytes(base)
+
+    _replace_file(path, [header] + body)
+
+
+def _replace_file(path: str, chunks: Iterable[bytes]):
+    """
+    Write a file through a uniquely named temp file in the same directory and
+    rename it into place, so concurrent saves from several workers never
+    share a temp file and readers only ever see a complete file.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.writelines(chunks)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def save_document(path: str, document: Dict, indent: int = 2, encoding: str = 'utf-8'):
+    """Persist a manager document in whichever format it is stored as"""
+    stored = document_path(path)
+    if stored.endswith(RECORDS_SUFFIX):
+        _write_records(stored, document)
+        return
+    _replace_file(path, [json.dumps(document, indent=indent, default=json_default).encode(encoding)])
+
+
+def convert_to_records(path: str) -> str:
+    """Write the .jsonl sibling of a .json data file and return its path"""
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    if not isinstance(document, dict):
+        raise ValueError(f'{path}: only object documents can be stored as records')
+    target = records_path(path)
+    _write_records(target, document)
+    return target
+
+
+def register_record_store(app):
+    """Let jsonify() serialize lazy record lists and shared reference tables"""
+    provider_default = app.json.default
+
+    def default(obj):
+        if isinstance(obj, LazyRecordList):
+            return obj.to_list()
+        # Shared read-only reference tables (backend.shared_reference.ColumnTable)
+        if isinstance(obj, Sequence) and not isinstance(obj, (str, bytes)):
+            return list(obj)
+        # ...and their lazily parsed sections (backend.shared_reference.ReferenceMapping)
+        if isinstance(obj, Mapping):
+            return dict(obj)
+        if isinstance(obj, memoryview):
+            return obj.tolist()
+        return provider_default(obj)
+
+    app.json.default = default
+
+
+def _iter_json_files(paths: Iterable[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.json'))
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("RECORD STORE CONVERSION")
+    print("=" * 60)
+    for source in _iter_json_files(sys.argv[1:] or ['data']):
+        try:
+            target = convert_to_records(source)
+        except ValueError as e:
+            print(f"  skipped {source}: {e}")
+            continue
+        print(f"  {source:45s} -> {target} ({os.path.getsize(target)} bytes)")
@@ -0,0 +1,189 @@
+"""
+Response Cache for app.py
+Declarative caching of read-only JSON routes with conditional GET support
+
+Usage:
+    response_cache = ResponseCache()
+
+    @app.route('/api/elearning/courses')
+    @response_cache.cached('courses', ttl=300)
+    def get_courses(): ...
+
+    # Invalidate whenever the owning engine mutates
+    response_cache.invalidate_on(elearning_courses, 'courses', 'enroll_course')
+
+ETags are a hash of the body alone, so every worker (and a restarted one)
+hands out the same tag for the same data, and a client's If-None-Match is
+answered with 304 straight from the cache without calling the view again.
+A request sent with "Cache-Control: no-cache" bypasses the stored entry and
+refreshes it. Routes with admin or per-user data pass private=True and are sent
+"private, no-store" so no shared cache or browser keeps them.
+"""
+
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from functools import wraps
+from typing import Dict
+import hashlib
+import threading
+import time
+
+from flask import Response, request
+
+# Query args that never change the response (client cache-busters, analytics tags)
+IGNORED_ARGS = {'_', 'utm_source', 'utm_medium', 'utm_campaign'}
+
+
+class _Entry:
+    __slots__ = ('body', 'status', 'mimetype', 'etag', 'expires_at')
+
+    def __init__(self, body, status, mimetype, etag, expires_at):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """Per-process response cache with namespace versions for invalidation"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._last_modified: Dict[str, float] = {}
+        self._started = time.time()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    # ------------------------------------------------------------------ versions
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def last_modified(self, namespace: str) -> float:
+        return self._last_modified.get(namespace, self._started)
+
+    def invalidate(self, namespace: str):
+        """Bump a namespace's data version; its cached responses stop matching"""
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            self._last_modified[namespace] = time.time()
+
+    def invalidate_on(self, engine, namespace: str, *method_names: str):
+        """
+        Wrap mutating methods of an engine instance so every call invalidates
+        the namespace, whichever route (or background job) makes it.
+        """
+        for name in method_names:
+            method = getattr(engine, name, None)
+            if method is None:
+                continue
+
+            def make_wrapper(method):
+                @wraps(method)
+                def wrapper(*args, **kwargs):
+                    try:
+                        return method(*args, **kwargs)
+                    finally:
+                        self.invalidate(namespace)
+                return wrapper
+
+            setattr(engine, name, make_wrapper(method))
+
+    # ---------------------------------------------------------------------- keys
+
+    @staticmethod
+    def normalized_args(args) -> tuple:
+        """
+        Order-independent view of the query args without cache-busters.
+        Values are kept verbatim: several engines filter case-sensitively.
+        """
+        return tuple(sorted(
+            (key, tuple(sorted(args.getlist(key))))
+            for key in args.keys() if key not in IGNORED_ARGS
+        ))
+
+    # ---------------------------------------------------------------- decorator
+
+    def cached(self, namespace: str, ttl: int = 60, private: bool = False):
+        """
+        Cache a GET route's 200 responses for ttl seconds under namespace.
+        private=True keeps the server-side cache but marks responses
+        "private, no-store" for admin and per-user data.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                key = (request.path, self.normalized_args(request.args), namespace, self.version(namespace))
+                now = time.time()
+                # A client's "Cache-Control: no-cache" asks for a fresh response
+                revalidate = 'no-cache' in request.headers.get('Cache-Control', '')
+                with self._lock:
+                    entry = None if revalidate else self._entries.get(key)
+                    if entry is not None and entry.expires_at > now:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                    else:
+                        entry = None
+                        self.misses += 1
+
+                if entry is None:
+                    response = view(*args, **kwargs)
+                    if not isinstance(response, Response) or response.status_code != 200:
+                        return response
+                    body = response.get_data()
+                    digest = hashlib.sha1(body).hexdigest()[:16]
+                    entry = _Entry(body, response.status_code, response.mimetype,
+                                   f'"{digest}"', now + ttl)
+                    with self._lock:
+                        self._entries[key] = entry
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+
+                return self._conditional_response(entry, namespace, ttl, private)
+            return wrapper
+        return decorator
+
+    def _conditional_response(self, entry: _Entry, namespace: str, ttl: int, private: bool = False) -> Response:
+        last_modified = self.last_modified(namespace)
+        if_none_match = request.headers.get('If-None-Match')
+        if_modified_since = request.headers.get('If-Modified-Since')
+
+        fresh = False
+        if if_none_match:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            fresh = entry.etag in tags or '*' in tags
+        elif if_modified_since:
+            try:
+                fresh = int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                fresh = False
+
+        if fresh:
+            self.not_modified += 1
+            response = Response(status=304)
+        else:
+            response = Response(entry.body, status=entry.status, mimetype=entry.mimetype)
+
+        response.headers['ETag'] = entry.etag
+        response.headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+        response.headers['Cache-Control'] = 'private, no-store' if private else f'public, max-age={ttl}'
+        return response
+
+    def get_stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'versions': dict(self._versions)
+        }
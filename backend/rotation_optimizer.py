@@ -0,0 +1,311 @@
+"""
+Rotation Optimizer
+Multi-season crop rotation planning by dynamic programming
+
+A plan is a sequence of crops (or fallow) over kharif / rabi / summer seasons.
+The optimizer maximizes per-hectare profit over the horizon plus the value of
+the soil nitrogen left at the end, over the state
+
+    (season, seasons remaining, previous crop, soil nitrogen level)
+
+Each crop moves the nitrogen level (legumes fix, cereals and vegetables
+draw down), and its yield depends on that level, on the previous crop
+(same-family and compatibility effects) and on soil type suitability.
+Yields and prices come from the engines passed in (yield prediction history,
+mandi price history for the plot's region) with agronomic defaults as a
+fallback.
+
+Subproblem values depend only on soil type, region and market data, so they
+are memoized per (soil type, region, market version) and shared by every
+request, and every plot in a batch, with that context. Horizons and start
+seasons share subproblems too, because the state counts seasons remaining
+rather than absolute time.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+SEASONS = ('kharif', 'rabi', 'summer')
+SEASON_START_MONTH = {'kharif': 6, 'rabi': 10, 'summer': 3}
+SEASON_MONTHS = 4
+MAX_YEARS = 5
+MAX_CONTEXTS = 128
+
+FALLOW = 'fallow'
+NITROGEN_LEVELS = ('Very Low', 'Low', 'Medium', 'High', 'Very High')
+NITROGEN_BINS = (140, 280, 420, 560)        # available N, kg/ha
+NITROGEN_YIELD_FACTOR = (0.65, 0.8, 0.92, 1.0, 1.04)
+LEGUME_YIELD_FACTOR = (0.9, 0.95, 1.0, 1.0, 1.0)
+NITROGEN_LEVEL_VALUE = 4000                 # Rs/ha of fertilizer a nitrogen level saves the next crop
+SAME_CROP_FACTOR = 0.75
+SAME_FAMILY_FACTOR = 0.85
+GOOD_AFTER_FACTOR = 1.05
+AVOID_AFTER_FACTOR = 0.8
+SUITABLE_SOIL_FACTOR = 1.1
+
+# family, seasons it can be sown in, seasons occupied, nitrogen level change,
+# default yield (kg/ha), default price (Rs/kg), cultivation cost (Rs/ha), water (mm),
+# name in the price history, name in the yield history
+CROP_PROFILES = {
+    'rice': {'family': 'cereal', 'seasons': ('kharif',), 'span': 1, 'nitrogen': -1, 'yield': 2800, 'price': 21.0,
+             'cost': 35000, 'water': 1200, 'price_name': 'Rice', 'yield_name': 'rice'},
+    'maize': {'family': 'cereal', 'seasons': ('kharif', 'rabi'), 'span': 1, 'nitrogen': -1, 'yield': 4500, 'price': 19.0,
+              'cost': 28000, 'water': 600, 'price_name': 'Maize', 'yield_name': 'corn'},
+    'cotton': {'family': 'fibre', 'seasons': ('kharif',), 'span': 2, 'nitrogen': -1, 'yield': 1800, 'price': 62.0,
+               'cost': 45000, 'water': 700, 'price_name': 'Cotton', 'yield_name': None},
+    'soybean': {'family': 'legume', 'seasons': ('kharif',), 'span': 1, 'nitrogen': 1, 'yield': 1200, 'price': 42.0,
+                'cost': 22000, 'water': 450, 'price_name': 'Soybean', 'yield_name': None},
+    'green_gram': {'family': 'legume', 'seasons': ('kharif', 'summer'), 'span': 1, 'nitrogen': 1, 'yield': 800,
+                   'price': 72.0, 'cost': 18000, 'water': 350, 'price_name': None, 'yield_name': None},
+    'sugarcane': {'family': 'cash', 'seasons': ('summer',), 'span': 3, 'nitrogen': -2, 'yield': 70000, 'price': 3.2,
+                  'cost': 95000, 'water': 2000, 'price_name': 'Sugarcane', 'yield_name': None},
+    'wheat': {'family': 'cereal', 'seasons': ('rabi',), 'span': 1, 'nitrogen': -1, 'yield': 3200, 'price': 22.0,
+              'cost': 30000, 'water': 450, 'price_name': 'Wheat', 'yield_name': 'wheat'},
+    'gram': {'family': 'legume', 'seasons': ('rabi',), 'span': 1, 'nitrogen': 1, 'yield': 1000, 'price': 55.0,
+             'cost': 20000, 'water': 300, 'price_name': None, 'yield_name': None},
+    'lentil': {'family': 'legume', 'seasons': ('rabi',), 'span': 1, 'nitrogen': 1, 'yield': 900, 'price': 60.0,
+               'cost': 18000, 'water': 250, 'price_name': None, 'yield_name': None},
+    'mustard': {'family': 'oilseed', 'seasons': ('rabi',), 'span': 1, 'nitrogen': 0, 'yield': 1200, 'price': 55.0,
+                'cost': 20000, 'water': 250, 'price_name': None, 'yield_name': None},
+    'potato': {'family': 'vegetable', 'seasons': ('rabi',), 'span': 1, 'nitrogen': -1, 'yield': 18000, 'price': 12.0,
+               'cost': 80000, 'water': 500, 'price_name': 'Potato', 'yield_name': 'potato'},
+    'onion': {'family': 'vegetable', 'seasons': ('rabi',), 'span': 1, 'nitrogen': -1, 'yield': 20000, 'price': 15.0,
+              'cost': 70000, 'water': 450, 'price_name': 'Onion', 'yield_name': 'onion'},
+    'tomato': {'family': 'vegetable', 'seasons': ('summer', 'rabi'), 'span': 1, 'nitrogen': -1, 'yield': 25000,
+               'price': 12.0, 'cost': 90000, 'water': 600, 'price_name': 'Tomato', 'yield_name': 'tomato'},
+    'watermelon': {'family': 'fruit', 'seasons': ('summer',), 'span': 1, 'nitrogen': 0, 'yield': 25000, 'price': 8.0,
+                   'cost': 60000, 'water': 400, 'price_name': None, 'yield_name': None},
+    'fodder': {'family': 'fodder', 'seasons': ('summer', 'kharif'), 'span': 1, 'nitrogen': 0, 'yield': 40000,
+               'price': 1.5, 'cost': 15000, 'water': 500, 'price_name': None, 'yield_name': None},
+    FALLOW: {'family': FALLOW, 'seasons': SEASONS, 'span': 1, 'nitrogen': 0, 'yield': 0, 'price': 0.0,
+             'cost': 0, 'water': 0, 'price_name': None, 'yield_name': None}
+}
+
+CROP_ALIASES = {'chickpea': 'gram', 'bengal_gram': 'gram', 'corn': 'maize', 'moong': 'green_gram',
+                'paddy': 'rice', 'rapeseed': 'mustard', 'soyabean': 'soybean'}
+
+# Soil types from SoilKnowledge: starting nitrogen level and crops that do well on them
+SOIL_PROFILES = {
+    'alluvial': {'nitrogen': 2, 'suitable': ('rice', 'wheat', 'sugarcane', 'cotton', 'potato', 'mustard')},
+    'black': {'nitrogen': 2, 'suitable': ('cotton', 'sugarcane', 'wheat', 'soybean', 'gram')},
+    'red': {'nitrogen': 1, 'suitable': ('rice', 'wheat', 'cotton', 'green_gram', 'lentil', 'maize')},
+    'laterite': {'nitrogen': 1, 'suitable': ('rice', 'green_gram')},
+    'sandy': {'nitrogen': 0, 'suitable': ('watermelon', 'green_gram', 'mustard')},
+    'loamy': {'nitrogen': 2, 'suitable': ('wheat', 'maize', 'tomato', 'potato', 'onion', 'sugarcane')}
+}
+DEFAULT_SOIL = 'loamy'
+
+
+def normalize_crop(crop: Optional[str]) -> Optional[str]:
+    if not crop:
+        return None
+    key = str(crop).strip().lower().replace(' ', '_')
+    key = CROP_ALIASES.get(key, key)
+    return key if key in CROP_PROFILES else None
+
+
+def normalize_soil(soil_type: Optional[str]) -> str:
+    key = str(soil_type or '').strip().lower()
+    for name in SOIL_PROFILES:
+        if key.startswith(name):
+            return name
+    return DEFAULT_SOIL
+
+
+def nitrogen_level(available_n: Optional[float], soil: str) -> int:
+    """Discretize a soil test's available nitrogen (kg/ha), else the soil type default"""
+    if available_n is None:
+        return SOIL_PROFILES[soil]['nitrogen']
+    return sum(1 for bound in NITROGEN_BINS if float(available_n) >= bound)
+
+
+def season_for(date: datetime) -> str:
+    if 6 <= date.month <= 9:
+        return 'kharif'
+    if 3 <= date.month <= 5:
+        return 'summer'
+    return 'rabi'
+
+
+def next_season_start(date: datetime) -> Tuple[str, datetime]:
+    """The first season starting strictly after the given date's season"""
+    season = SEASONS[(SEASONS.index(season_for(date)) + 1) % len(SEASONS)]
+    year = date.year + (1 if SEASON_START_MONTH[season] <= date.month else 0)
+    return season, datetime(year, SEASON_START_MONTH[season], 1)
+
+
+class RotationOptimizer:
+    """
+    Memoized rotation DP. `market(crop, region)` returns (yield kg/ha or None,
+    price Rs/kg or None); `market_version()` changes whenever the underlying
+    data is reloaded so stale subproblems are never reused.
+    """
+
+    def __init__(self, market: Optional[Callable[[str, Optional[str]], Tuple[Optional[float], Optional[float]]]] = None,
+                 market_version: Optional[Callable[[], Hashable]] = None,
+                 compatibility: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 max_contexts: int = MAX_CONTEXTS):
+        self.market = market
+        self.market_version = market_version or (lambda: 0)
+        self.compatibility = compatibility or {}
+        self.max_contexts = max_contexts
+        self._contexts: 'OrderedDict[tuple, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'contexts_built': 0, 'context_hits': 0, 'subproblems_solved': 0, 'subproblem_hits': 0}
+
+    # context: per-crop economics and the shared memo for one soil type + region
+
+    def _context(self, soil: str, region: Optional[str]) -> Dict:
+        key = (soil, region, self.market_version())
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is not None:
+                self._contexts.move_to_end(key)
+                self.stats['context_hits'] += 1
+                return context
+
+        economics = {}
+        suitable = set(SOIL_PROFILES[soil]['suitable'])
+        for crop, profile in CROP_PROFILES.items():
+            yield_kg, price, sources = profile['yield'], profile['price'], {'yield': 'default', 'price': 'default'}
+            if self.market is not None and crop != FALLOW:
+                market_yield, market_price = self.market(crop, region)
+                if market_yield:
+                    yield_kg, sources['yield'] = market_yield, 'history'
+                if market_price:
+                    price, sources['price'] = market_price, 'market'
+            economics[crop] = {
+                'yield': yield_kg * (SUITABLE_SOIL_FACTOR if crop in suitable else 1.0),
+                'price': price,
+                'sources': sources
+            }
+        context = {'economics': economics, 'memo': {}}
+        with self._lock:
+            self._contexts[key] = context
+            self.stats['contexts_built'] += 1
+            while len(self._contexts) > self.max_contexts:
+                self._contexts.popitem(last=False)
+        return context
+
+    def _rotation_factor(self, crop: str, previous: Optional[str]) -> float:
+        if crop == FALLOW or previous in (None, FALLOW):
+            return 1.0
+        factor = 1.0
+        if crop == previous:
+            factor *= SAME_CROP_FACTOR
+        elif CROP_PROFILES[crop]['family'] == CROP_PROFILES[previous]['family']:
+            factor *= SAME_FAMILY_FACTOR
+        rules = self.compatibility.get(crop, {})
+        previous_names = {previous, CROP_PROFILES[previous]['family'], CROP_PROFILES[previous]['family'] + 's'}
+        if previous_names & set(rules.get('avoid_after', ())):
+            factor *= AVOID_AFTER_FACTOR
+        elif previous_names & set(rules.get('good_after', ())):
+            factor *= GOOD_AFTER_FACTOR
+        return factor
+
+    def _season_economics(self, economics: Dict, crop: str, previous: Optional[str], level: int) -> Dict:
+        """Per-hectare yield, revenue, cost and profit of growing crop after previous at a nitrogen level"""
+        profile = CROP_PROFILES[crop]
+        curve = LEGUME_YIELD_FACTOR if profile['family'] == 'legume' else NITROGEN_YIELD_FACTOR
+        yield_kg = economics[crop]['yield'] * curve[level] * self._rotation_factor(crop, previous)
+        revenue = yield_kg * economics[crop]['price']
+        return {'yield': yield_kg, 'revenue': revenue, 'cost': profile['cost'], 'profit': revenue - profile['cost']}
+
+    def _solve(self, context: Dict, season: int, remaining: int, previous: Optional[str], level: int) -> Tuple[float, str]:
+        """Best (value per hectare, first crop) from this state to the end of the horizon"""
+        if remaining == 0:
+            return level * NITROGEN_LEVEL_VALUE, None
+        memo = context['memo']
+        key = (season, remaining, previous, level)
+        cached = memo.get(key)
+        if cached is not None:
+            self.stats['subproblem_hits'] += 1
+            return cached
+
+        best = (float('-inf'), FALLOW)
+        season_name = SEASONS[season]
+        for crop, profile in CROP_PROFILES.items():
+            span = profile['span']
+            if season_name not in profile['seasons'] or span > remaining:
+                continue
+            gain = self._season_economics(context['economics'], crop, previous, level)['profit']
+            next_level = min(max(level + profile['nitrogen'], 0), len(NITROGEN_LEVELS) - 1)
+            future, _ = self._solve(context, (season + span) % len(SEASONS), remaining - span, crop, next_level)
+            if gain + future > best[0]:
+                best = (gain + future, crop)
+        memo[key] = best
+        self.stats['subproblems_solved'] += 1
+        return best
+
+    def optimize(self, current_crop: Optional[str], field_size: float, soil_type: Optional[str],
+                 region: Optional[str], years: int = 3, available_nitrogen: Optional[float] = None,
+                 start_date: Optional[datetime] = None) -> Dict:
+        started = time.perf_counter()
+        soil = normalize_soil(soil_type)
+        years = max(1, min(int(years), MAX_YEARS))
+        field_size = float(field_size or 1)
+        previous = normalize_crop(current_crop)
+        level = nitrogen_level(available_nitrogen, soil)
+        season_name, season_start = next_season_start(start_date or datetime.now())
+        season = SEASONS.index(season_name)
+        remaining = years * len(SEASONS)
+
+        context = self._context(soil, region)
+        economics = context['economics']
+        value, _ = self._solve(context, season, remaining, previous, level)
+
+        plan = []
+        starting_level = level
+        totals = {'revenue': 0.0, 'cost': 0.0, 'profit': 0.0, 'water': 0}
+        while remaining > 0:
+            _, crop = self._solve(context, season, remaining, previous, level)
+            profile = CROP_PROFILES[crop]
+            result = self._season_economics(economics, crop, previous, level)
+            next_level = min(max(level + profile['nitrogen'], 0), len(NITROGEN_LEVELS) - 1)
+            end_date = season_start + timedelta(days=profile['span'] * SEASON_MONTHS * 30)
+            plan.append({
+                'sequence': len(plan) + 1,
+                'season': SEASONS[season],
+                'crop': crop,
+                'start_date': season_start.strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d'),
+                'duration_months': profile['span'] * SEASON_MONTHS,
+                'expected_yield': round(result['yield'] * field_size, 1),
+                'price_per_kg': round(economics[crop]['price'], 2),
+                'estimated_revenue': round(result['revenue'] * field_size, 2),
+                'estimated_cost': round(result['cost'] * field_size, 2),
+                'estimated_profit': round(result['profit'] * field_size, 2),
+                'water_requirement': profile['water'],
+                'soil_nitrogen': {'before': NITROGEN_LEVELS[level], 'after': NITROGEN_LEVELS[next_level]},
+                'data_sources': economics[crop]['sources']
+            })
+            for key in ('revenue', 'cost', 'profit'):
+                totals[key] += result[key] * field_size
+            totals['water'] += profile['water']
+            season = (season + profile['span']) % len(SEASONS)
+            remaining -= profile['span']
+            season_start, previous, level = end_date, crop, next_level
+
+        return {
+            'current_crop': current_crop,
+            'soil_type': soil,
+            'region': region,
+            'field_size_hectares': field_size,
+            'years': years,
+            'rotation_plan': plan,
+            'total_revenue': round(totals['revenue'], 2),
+            'total_cost': round(totals['cost'], 2),
+            'total_profit': round(totals['profit'], 2),
+            'total_water_requirement': totals['water'],
+            'soil_nitrogen': {'start': NITROGEN_LEVELS[starting_level], 'end': NITROGEN_LEVELS[level]},
+            'objective_per_hectare': round(value, 2),
+            'compute_ms': round(1000 * (time.perf_counter() - started), 3)
+        }
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, contexts=len(self._contexts),
+                        memo_entries=sum(len(c['memo']) for c in self._contexts.values()))
@@ -0,0 +1,557 @@
+"""
+Shared Reference Data
+Read-mostly reference datasets built once per node and attached zero-copy by
+every gunicorn worker
+
+A dataset is built by the first process that needs it (the gunicorn master
+when running with --preload), written to a single file under the shared
+directory (/dev/shm by default) and memory-mapped read-only by everyone else.
+Lists of records (price series, catalog rows) are stored column by column:
+numeric columns are raw array buffers exposed as memoryviews (a float column
+that also held ints keeps a per-row int flag, so 5 stays 5), other columns
+are dictionary-encoded JSON. Nested sections of a dict that hold no record
+lists (per-pest profiles, say) are stored as JSON blobs in the body and
+parsed on first access. The header stays small and workers share the same
+physical pages instead of each holding a parsed copy.
+
+Publishing writes a new file and renames it over the old one, so a refresh is
+atomic: processes that already attached keep reading the previous generation
+until they call attach() again.
+
+When a seeded snapshot is installed (see backend/snapshots.py) datasets are
+mapped from it instead of being generated at all. Datasets the snapshot
+leaves out (those with dates relative to today) are still generated, but
+from a seed derived from the snapshot's seed, the dataset name and today's
+date, so every worker and every restart on the same day builds the same data.
+
+Datasets loaded with max_age are read through a ReferenceHandle, which
+re-checks the age periodically so long-running workers pick up a rebuilt
+generation.
+
+Usage:
+    self.pest_database = load_reference('pest_database', self._generate_pest_database)
+    self._history = ReferenceHandle('pricing_history', self._load_historical_data, max_age=6 * 3600)
+"""
+
+from array import array
+from collections.abc import Mapping, Sequence
+import copy
+import fcntl
+import json
+import mmap
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+REFERENCE_FORMAT = 'agrisuper-reference/2'
+READABLE_FORMATS = ('agrisuper-reference/1', REFERENCE_FORMAT)
+REFERENCE_SUFFIX = '.ref'
+SHARED_DIR_ENV = 'AGRISUPER_SHARED_DIR'
+
+_HEADER_LEN = struct.Struct('<Q')
+_ALIGN = 8
+
+
+def default_shared_dir() -> str:
+    if os.environ.get(SHARED_DIR_ENV):
+        return os.environ[SHARED_DIR_ENV]
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'agrisuper-reference')
+
+
+class _EncodedColumn:
+    """Dictionary-encoded column (strings, bools, nested values); the dictionary is parsed on first use"""
+
+    def __init__(self, codes: memoryview, dictionary: memoryview, nested: bool = False):
+        self.codes = codes
+        self.nested = nested
+        self._dictionary = dictionary
+        self._values = None
+
+    @property
+    def values(self) -> List:
+        if self._values is None:
+            self._values = json.loads(bytes(self._dictionary))
+        return self._values
+
+    def __getitem__(self, index):
+        return self.values[self.codes[index]]
+
+
+class _MixedNumberColumn:
+    """Float column with a per-row flag for values that were ints"""
+
+    def __init__(self, values: memoryview, ints: memoryview):
+        self.values = values
+        self.ints = ints
+
+    def __getitem__(self, index):
+        value = self.values[index]
+        return int(value) if self.ints[index] else value
+
+    def tolist(self) -> List:
+        return [self[i] for i in range(len(self.values))]
+
+
+class _Blob:
+    __slots__ = ('data',)
+
+    def __init__(self, data: memoryview):
+        self.data = data
+
+
+class ReferenceMapping(Mapping):
+    """Read-only dict whose nested sections are parsed from the shared buffer on first access"""
+
+    def __init__(self, items: Dict):
+        self._items = items
+
+    def __getitem__(self, key):
+        value = self._items[key]
+        if isinstance(value, _Blob):
+            value = self._items[key] = json.loads(bytes(value.data))
+        return value
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return f"<ReferenceMapping {len(self._items)} keys>"
+
+
+class ColumnTable(Sequence):
+    """
+    Read-only list of records stored as columns in a shared buffer.
+
+    Indexing and slicing return plain dicts, so code written against a list
+    of row dicts keeps working; hot paths can use column() to get a
+    zero-copy memoryview of one field instead.
+    """
+
+    def __init__(self, nrows: int, columns: Dict[str, Any]):
+        self._nrows = nrows
+        self._columns = columns      # name -> memoryview, _EncodedColumn or _MixedNumberColumn
+        self.nested = any(isinstance(c, _EncodedColumn) and c.nested for c in columns.values())
+
+    def column(self, name: str):
+        column = self._columns[name]
+        if isinstance(column, _EncodedColumn):
+            values = column.values
+            return [values[code] for code in column.codes]
+        if isinstance(column, _MixedNumberColumn):
+            return column.tolist()
+        return column
+
+    def _row(self, index: int) -> Dict:
+        return {name: column[index] for name, column in self._columns.items()}
+
+    def __len__(self):
+        return self._nrows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(self._nrows))]
+        if index < 0:
+            index += self._nrows
+        if not 0 <= index < self._nrows:
+            raise IndexError('row index out of range')
+        return self._row(index)
+
+    def __iter__(self):
+        return (self._row(i) for i in range(self._nrows))
+
+    def __repr__(self):
+        return f"<ColumnTable {self._nrows} rows: {', '.join(self._columns)}>"
+
+
+def _is_table(value) -> bool:
+    """A non-empty list of dicts sharing the same keys"""
+    if not isinstance(value, list) or not value or not isinstance(value[0], dict):
+        return False
+    keys = list(value[0])
+    return all(isinstance(row, dict) and list(row) == keys for row in value)
+
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _column_spec(values: List) -> tuple:
+    """(array typecode, holds ints among floats) for a column; typecode None means dictionary encoding"""
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return None, False
+    ints = [isinstance(v, int) for v in values]
+    if all(ints):
+        return ('q', False) if all(_INT64_MIN <= v <= _INT64_MAX for v in values) else (None, False)
+    return 'd', any(ints)
+
+
+class _Writer:
+    def __init__(self):
+        self.tables = []
+        self.chunks = []
+        self.offset = 0
+
+    def _add_buffer(self, buffer: bytes) -> int:
+        offset = self.offset
+        padding = -len(buffer) % _ALIGN
+        self.chunks.append(buffer + b'\0' * padding)
+        self.offset += len(buffer) + padding
+        return offset
+
+    def _add_blob(self, value) -> Dict:
+        data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        return {'__json__': [self._add_buffer(data), len(data)]}
+
+    def encode(self, value):
+        if _is_table(value):
+            columns = {}
+            for name in value[0]:
+                values = [row[name] for row in value]
+                typecode, mixed = _column_spec(values)
+                if typecode:
+                    data = array(typecode, values).tobytes()
+                    columns[name] = {'type': typecode, 'offset': self._add_buffer(data)}
+                    if mixed:
+                        columns[name]['ints'] = self._add_buffer(bytes(isinstance(v, int) for v in values))
+                else:
+                    # Keyed by JSON text: keeps 1, 1.0 and True apart and allows nested values
+                    index = {}
+                    keys = [json.dumps(v, separators=(',', ':')) for v in values]
+                    for key in keys:
+                        index.setdefault(key, len(index))
+                    codes = array('i', (index[key] for key in keys)).tobytes()
+                    dictionary = ('[' + ','.join(index) + ']').encode('utf-8')
+                    columns[name] = {'type': 'codes', 'offset': self._add_buffer(codes),
+                                     'dictionary': [self._add_buffer(dictionary), len(dictionary)]}
+                    if any(isinstance(v, (dict, list)) for v in values):
+                        columns[name]['nested'] = True
+            self.tables.append({'rows': len(value), 'columns': columns})
+            return {'__table__': len(self.tables) - 1}
+        if isinstance(value, dict):
+            encoded = {}
+            for key, item in value.items():
+                tables = len(self.tables)
+                encoded[key] = self.encode(item)
+                if isinstance(item, (dict, list)) and item and len(self.tables) == tables:
+                    # No record lists inside: keep it out of the header, parse on access
+                    encoded[key] = self._add_blob(item)
+            return encoded
+        if isinstance(value, list):
+            return [self.encode(v) for v in value]
+        return value
+
+
+def write_reference(path: str, data: Any):
+    """Serialize data to path atomically (write to a temp file, then rename)"""
+    writer = _Writer()
+    document = writer.encode(data)
+    header = json.dumps({'format': REFERENCE_FORMAT, 'document': document, 'tables': writer.tables},
+                        separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(len(header) + _HEADER_LEN.size) % _ALIGN)
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER_LEN.pack(len(header)))
+            f.write(header)
+            f.writelines(writer.chunks)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_reference(path: str) -> Any:
+    """Memory-map a reference file and rebuild its document around zero-copy columns"""
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buffer)
+    (header_len,) = _HEADER_LEN.unpack_from(view, 0)
+    body_start = _HEADER_LEN.size + header_len
+    header = json.loads(bytes(view[_HEADER_LEN.size:body_start]))
+    if header.get('format') not in READABLE_FORMATS:
+        raise ValueError(f'{path}: unsupported reference format {header.get("format")!r}')
+
+    tables = []
+    for spec in header['tables']:
+        nrows = spec['rows']
+        columns = {}
+        for name, column in spec['columns'].items():
+            start = body_start + column['offset']
+            if column['type'] == 'codes':
+                dict_offset, dict_length = column['dictionary']
+                dict_start = body_start + dict_offset
+                columns[name] = _EncodedColumn(view[start:start + nrows * 4].cast('i'),
+                                               view[dict_start:dict_start + dict_length],
+                                               column.get('nested', False))
+            else:
+                width = array(column['type']).itemsize
+                columns[name] = view[start:start + nrows * width].cast(column['type'])
+                if 'ints' in column:
+                    ints_start = body_start + column['ints']
+                    columns[name] = _MixedNumberColumn(columns[name], view[ints_start:ints_start + nrows])
+        tables.append(ColumnTable(nrows, columns))
+
+    def decode(value):
+        if isinstance(value, dict):
+            if len(value) == 1 and '__table__' in value:
+                return tables[value['__table__']]
+            if len(value) == 1 and '__json__' in value:
+                offset, length = value['__json__']
+                return _Blob(view[body_start + offset:body_start + offset + length])
+            items = {k: decode(v) for k, v in value.items()}
+            if any(isinstance(v, _Blob) for v in items.values()):
+                return ReferenceMapping(items)
+            return items
+        if isinstance(value, list):
+            return [decode(v) for v in value]
+        return value
+
+    return decode(header['document'])
+
+
+class ReferenceStore:
+    """Directory of published reference datasets, one file per name and version"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or default_shared_dir()
+        self._attached: Dict[str, tuple] = {}   # name -> (inode, data)
+        self._lock = threading.Lock()
+
+    def path(self, name: str, version: int = 1) -> str:
+        return os.path.join(self.root, f"{name}.v{version}{REFERENCE_SUFFIX}")
+
+    def publish(self, name: str, data: Any, version: int = 1) -> str:
+        """Atomically replace the published dataset"""
+        path = self.path(name, version)
+        write_reference(path, data)
+        return path
+
+    def attach(self, name: str, version: int = 1) -> Any:
+        """Map the currently published dataset, reusing this process's mapping if unchanged"""
+        path = self.path(name, version)
+        inode = os.stat(path).st_ino
+        with self._lock:
+            attached = self._attached.get(path)
+            if attached and attached[0] == inode:
+                return attached[1]
+            data = read_reference(path)
+            self._attached[path] = (inode, data)
+            return data
+
+    def _is_current(self, path: str, max_age: Optional[float]) -> bool:
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        return max_age is None or time.time() - mtime < max_age
+
+    def get_or_build(self, name: str, build: Callable[[], Any], version: int = 1,
+                     max_age: Optional[float] = None) -> Any:
+        """
+        Attach to a published dataset, building and publishing it first if no
+        process has yet (or the published one is older than max_age seconds).
+        A file lock makes concurrent workers build it once.
+        """
+        path = self.path(name, version)
+        if not self._is_current(path, max_age):
+            os.makedirs(self.root, exist_ok=True)
+            with open(path + '.lock', 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if not self._is_current(path, max_age):
+                        self.publish(name, build(), version)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return self.attach(name, version)
+
+
+def materialize(value: Any) -> Any:
+    """Plain, mutable Python copy of a decoded reference document"""
+    if isinstance(value, ColumnTable):
+        # Nested column values are shared by every row read; copy them
+        return copy.deepcopy(list(value)) if value.nested else list(value)
+    if isinstance(value, (dict, ReferenceMapping)):
+        return {k: materialize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [materialize(v) for v in value]
+    return value
+
+
+# ------------------------------------------------------------------ snapshots
+
+SNAPSHOT_DIR_ENV = 'AGRISUPER_SNAPSHOT_DIR'
+SNAPSHOT_ENV = 'AGRISUPER_SNAPSHOT'
+DEFAULT_SNAPSHOT_DIR = os.path.join('data', 'snapshots')
+CURRENT_POINTER = 'CURRENT'
+
+_bypass_depth = 0
+_snapshot_cache: Dict[str, Any] = {}
+
+
+def snapshot_root() -> str:
+    return os.environ.get(SNAPSHOT_DIR_ENV, DEFAULT_SNAPSHOT_DIR)
+
+
+def current_snapshot_dir() -> Optional[str]:
+    """Directory of the pinned (AGRISUPER_SNAPSHOT) or CURRENT snapshot, if any"""
+    root = snapshot_root()
+    snapshot_id = os.environ.get(SNAPSHOT_ENV)
+    if not snapshot_id:
+        try:
+            with open(os.path.join(root, CURRENT_POINTER), 'r') as f:
+                snapshot_id = f.read().strip()
+        except FileNotFoundError:
+            return None
+    path = os.path.join(root, snapshot_id)
+    return path if snapshot_id and os.path.isdir(path) else None
+
+
+def _snapshot_data(name: str) -> Any:
+    directory = current_snapshot_dir()
+    if directory is None:
+        return None
+    path = os.path.join(directory, name + REFERENCE_SUFFIX)
+    if path not in _snapshot_cache:
+        if not os.path.exists(path):
+            return None
+        _snapshot_cache[path] = read_reference(path)
+    return _snapshot_cache[path]
+
+
+def snapshot_seed() -> Optional[int]:
+    """Seed the current snapshot was generated from, if one is installed"""
+    directory = current_snapshot_dir()
+    if directory is None:
+        return None
+    path = os.path.join(directory, 'manifest.json')
+    if path not in _snapshot_cache:
+        try:
+            with open(path, 'r') as f:
+                _snapshot_cache[path] = json.load(f).get('seed')
+        except (FileNotFoundError, ValueError):
+            _snapshot_cache[path] = None
+    return _snapshot_cache[path]
+
+
+def seeded_build(name: str, build: Callable[[], Any]) -> Callable[[], Any]:
+    """
+    Wrap build() so it runs with random and numpy seeded from the snapshot
+    seed, the dataset name and today's date. The global generator state is
+    restored afterwards. Without a snapshot, build() is returned unchanged.
+    """
+    seed = snapshot_seed()
+    if seed is None:
+        return build
+
+    def build_seeded():
+        dataset_seed = zlib.crc32(f"{seed}:{name}:{date.today().isoformat()}".encode('utf-8'))
+        random_state, numpy_state = random.getstate(), np.random.get_state()
+        random.seed(dataset_seed)
+        np.random.seed(dataset_seed)
+        try:
+            return build()
+        finally:
+            random.setstate(random_state)
+            np.random.set_state(numpy_state)
+
+    return build_seeded
+
+
+class bypass_snapshots:
+    """Context manager: load_reference() calls build() directly (used while generating snapshots)"""
+
+    def __enter__(self):
+        global _bypass_depth
+        _bypass_depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        global _bypass_depth
+        _bypass_depth -= 1
+        return False
+
+
+_default_store: Optional[ReferenceStore] = None
+
+
+def get_reference_store() -> ReferenceStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = ReferenceStore()
+    return _default_store
+
+
+def load_reference(name: str, build: Callable[[], Any], version: int = 1,
+                   max_age: Optional[float] = None, mutable: bool = False) -> Any:
+    """
+    Load a generated dataset without regenerating it per process:
+
+    1. from the current snapshot (python -m backend.snapshots), if it has one
+    2. otherwise, for read-only data, from the node-wide shared store
+    3. otherwise by calling build(), seeded from the snapshot (see seeded_build)
+
+    mutable=True returns a private plain copy the engine may modify.
+    """
+    if _bypass_depth:
+        return build()
+
+    data = _snapshot_data(name)
+    if data is not None:
+        return materialize(data) if mutable else data
+    build = seeded_build(name, build)
+    if mutable:
+        return build()
+
+    try:
+        return get_reference_store().get_or_build(name, build, version, max_age)
+    except OSError:
+        return build()
+
+
+class ReferenceHandle:
+    """
+    A read-only dataset with a max_age, re-checked at most every
+    check_interval seconds. get() returns the current generation: once the
+    published file is older than max_age one worker rebuilds it and every
+    worker attaches the new one on its next check.
+    """
+
+    def __init__(self, name: str, build: Callable[[], Any], version: int = 1,
+                 max_age: Optional[float] = None, check_interval: float = 60):
+        self.name = name
+        self.build = build
+        self.version = version
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self._data = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[float] = None  # wall time the current generation was attached
+
+    def get(self) -> Any:
+        now = time.monotonic()
+        if self._data is None or (self.max_age is not None and now - self._checked >= self.check_interval):
+            with self._lock:
+                if self._data is None or now - self._checked >= self.check_interval:
+                    data = load_reference(self.name, self.build, self.version, self.max_age)
+                    if data is not self._data:
+                        self._data = data
+                        self.loaded_at = time.time()
+                    self._checked = now
+        return self._data
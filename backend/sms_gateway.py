@@ -0,0 +1,476 @@
+"""
+SMS Gateway Pipeline
+Outbound SMS queue for OfflineSMSSupport: priorities, per-operator rate
+limits, batch submission, retries and delivery-receipt tracking
+
+    dispatcher = SMSDispatcher(FakeGateway())
+    dispatcher.enqueue('9876543210', 'Rice: Rs.2,450/qtl', priority=PRIORITY_REPLY)
+    dispatcher.enqueue_many(phones, advisory_text, priority=PRIORITY_BROADCAST)
+
+Messages wait in one priority heap per operator (alerts before replies
+before broadcasts, FIFO within a priority). A background worker drains the
+heaps through a token bucket per operator, so a broadcast to lakhs of
+numbers goes out at the rate each operator route allows instead of all at
+once, and submits up to batch_size messages per gateway call. With a
+rate_limit_dir the bucket levels live in small flock'd files there, so all
+gunicorn workers together stay within one operator's limit. A failed
+submission is retried with exponential backoff up to max_attempts;
+messages the gateway rejects outright are failed immediately. Delivery
+receipts arrive through on_delivery_receipt() (the gateway's DLR webhook)
+or are polled from the gateway after each submission.
+
+FakeGateway is a local, in-process gateway with configurable failure,
+rejection and non-delivery rates. It is the default until a provider
+gateway is attached, and it drives the throughput demo:
+
+    python -m backend.sms_gateway --messages 100000 --rate 5000 --failure-rate 0.02
+"""
+
+import argparse
+import fcntl
+import heapq
+import itertools
+import os
+import random
+import re
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PRIORITY_ALERT = 0
+PRIORITY_REPLY = 1
+PRIORITY_BROADCAST = 2
+PRIORITY_NAMES = {PRIORITY_ALERT: 'alert', PRIORITY_REPLY: 'reply', PRIORITY_BROADCAST: 'broadcast'}
+
+# Messages per second each operator route accepts from us
+DEFAULT_RATE_LIMITS = {'jio': 200, 'airtel': 200, 'vi': 100, 'bsnl': 50, 'default': 50}
+# Number series to operator; ported numbers land on 'default' unless the caller knows better
+OPERATOR_PREFIXES = {'70': 'jio', '62': 'jio', '89': 'jio', '98': 'airtel', '99': 'airtel', '97': 'vi',
+                     '96': 'vi', '94': 'bsnl', '84': 'bsnl'}
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 2.0
+MAX_TRACKED = 500000
+IDLE_WAIT_SECONDS = 0.5
+RATE_LIMIT_DIR_ENV = 'AGRISUPER_SMS_RATE_DIR'
+
+
+def normalize_phone(phone) -> str:
+    """Last 10 digits of an Indian mobile number"""
+    return re.sub(r'\D', '', str(phone or ''))[-10:]
+
+
+def operator_for(phone: str) -> str:
+    return OPERATOR_PREFIXES.get(phone[:2], 'default')
+
+
+def default_rate_limit_dir() -> str:
+    if os.environ.get(RATE_LIMIT_DIR_ENV):
+        return os.environ[RATE_LIMIT_DIR_ENV]
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'agrisuper-sms-rates')
+
+
+class GatewayError(Exception):
+    """Transient submission failure (timeout, throttling, 5xx); the batch is retried"""
+
+
+class SMSMessage:
+    __slots__ = ('message_id', 'phone', 'text', 'priority', 'operator', 'ref', 'status', 'attempts',
+                 'error', 'gateway_id', 'created_at', 'submitted_at', 'finished_at')
+
+    def __init__(self, message_id: str, phone: str, text: str, priority: int, operator: str, ref: Optional[str]):
+        self.message_id = message_id
+        self.phone = phone
+        self.text = text
+        self.priority = priority
+        self.operator = operator
+        self.ref = ref
+        self.status = 'queued'
+        self.attempts = 0
+        self.error = None
+        self.gateway_id = None
+        self.created_at = time.time()
+        self.submitted_at = None
+        self.finished_at = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'message_id': self.message_id,
+            'phone': self.phone,
+            'priority': PRIORITY_NAMES.get(self.priority, self.priority),
+            'operator': self.operator,
+            'ref': self.ref,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'gateway_id': self.gateway_id,
+            'created_at': self.created_at,
+            'submitted_at': self.submitted_at,
+            'finished_at': self.finished_at
+        }
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        # `now` may predate a bucket created (or last updated by another worker) a moment ago
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def take(self, now: float, wanted: int, maximum: int) -> int:
+        """Take between `wanted` and `maximum` whole tokens, or none if fewer than `wanted` are available"""
+        self.refill(now)
+        if self.tokens < wanted:
+            return 0
+        count = min(int(self.tokens), maximum)
+        self.tokens -= count
+        return count
+
+    def seconds_until(self, tokens: float = 1.0) -> float:
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket whose level is kept in a file and updated under flock, so
+    every process using the same path draws from one budget. Timestamps are
+    time.monotonic(), which is host-wide on Linux.
+    """
+    __slots__ = ('path', '_fd', '_pid')
+    STATE = struct.Struct('<dd')
+
+    def __init__(self, path: str, rate: float, capacity: Optional[float] = None):
+        super().__init__(rate, capacity)
+        self.path = path
+        self._fd = None
+        self._pid = None
+
+    def _file(self) -> int:
+        # A forked child shares the parent's open file and so its flock: reopen per process
+        if self._fd is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    def take(self, now: float, wanted: int, maximum: int) -> int:
+        fd = self._file()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            state = os.pread(fd, self.STATE.size, 0)
+            if len(state) == self.STATE.size:
+                self.tokens, self.updated = self.STATE.unpack(state)
+                self.tokens = min(self.tokens, self.capacity)
+            count = super().take(now, wanted, maximum)
+            os.pwrite(fd, self.STATE.pack(self.tokens, self.updated), 0)
+            return count
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class FakeGateway:
+    """In-process bulk SMS gateway for local runs and tests"""
+
+    def __init__(self, failure_rate: float = 0.0, undeliverable_rate: float = 0.0, latency: float = 0.0,
+                 seed: Optional[int] = None):
+        self.failure_rate = failure_rate
+        self.undeliverable_rate = undeliverable_rate
+        self.latency = latency
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._receipts: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+        self.batches: Dict[str, int] = {}
+        self.accepted = 0
+
+    def submit_batch(self, operator: str, messages: List[Dict]) -> List[Dict]:
+        """Accept a batch; returns one {'status', 'gateway_id' | 'error'} per message"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise GatewayError(f'{operator} route timed out')
+            results = []
+            for message in messages:
+                if len(message['phone']) != 10:
+                    results.append({'status': 'rejected', 'error': 'invalid number'})
+                    continue
+                gateway_id = f"FG{next(self._ids)}"
+                delivered = self._random.random() >= self.undeliverable_rate
+                self._receipts.append((gateway_id, 'delivered' if delivered else 'undeliverable'))
+                results.append({'status': 'accepted', 'gateway_id': gateway_id})
+            self.batches[operator] = self.batches.get(operator, 0) + 1
+            self.accepted += sum(1 for result in results if result['status'] == 'accepted')
+        return results
+
+    def poll_receipts(self) -> List[Tuple[str, str]]:
+        with self._lock:
+            receipts, self._receipts = self._receipts, []
+        return receipts
+
+
+class SMSDispatcher:
+    """Priority queues per operator drained by a rate-limited background worker"""
+
+    def __init__(self, gateway=None, rate_limits: Optional[Dict[str, float]] = None, batch_size: int = BATCH_SIZE,
+                 max_attempts: int = MAX_ATTEMPTS, retry_base: float = RETRY_BASE_SECONDS,
+                 max_tracked: int = MAX_TRACKED, rate_limit_dir: Optional[str] = None, background: bool = True):
+        """
+        rate_limit_dir shares the per-operator buckets with every dispatcher
+        (in any process) using the same directory; without it the limits are
+        per dispatcher. background=False leaves draining to run_once() calls.
+        """
+        self.gateway = gateway or FakeGateway()
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS, **(rate_limits or {}))
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.max_tracked = max_tracked
+        self.rate_limit_dir = rate_limit_dir
+        self.background = background
+
+        self._queues: Dict[str, list] = {}
+        self._retries: list = []                   # (ready_at, seq, message)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._messages: Dict[str, SMSMessage] = {}
+        self._by_gateway_id: Dict[str, str] = {}
+        self._finished: deque = deque()
+        self._inflight = 0
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid = None
+        self._stopping = False
+        self.stats = {'enqueued': 0, 'submitted': 0, 'delivered': 0, 'failed': 0, 'rejected': 0,
+                      'retried': 0, 'batches': 0, 'gateway_errors': 0}
+
+    # producers
+
+    def enqueue(self, phone, text: str, priority: int = PRIORITY_REPLY, ref: Optional[str] = None,
+                operator: Optional[str] = None) -> str:
+        return self.enqueue_many([phone], text, priority, ref, operator)[0]
+
+    def enqueue_many(self, phones: Iterable, text: str, priority: int = PRIORITY_BROADCAST,
+                     ref: Optional[str] = None, operator: Optional[str] = None) -> List[str]:
+        """Queue the same text to many numbers; returns the message ids"""
+        ids = []
+        with self._lock:
+            for phone in phones:
+                number = normalize_phone(phone)
+                message = SMSMessage(f"SMS{os.getpid()}-{next(self._ids)}", number, text, priority,
+                                     operator or operator_for(number), ref)
+                self._messages[message.message_id] = message
+                heapq.heappush(self._queues.setdefault(message.operator, []),
+                               (priority, next(self._seq), message))
+                ids.append(message.message_id)
+            self.stats['enqueued'] += len(ids)
+            self._wakeup.notify()
+        self._ensure_worker()
+        return ids
+
+    # delivery receipts
+
+    def on_delivery_receipt(self, gateway_id: str, status: str) -> Optional[Dict]:
+        """Apply a DLR from the gateway ('delivered', or any failure status)"""
+        with self._lock:
+            message = self._messages.get(self._by_gateway_id.pop(gateway_id, None))
+            if message is None:
+                return None
+            delivered = status.lower() in ('delivered', 'delivrd', 'success')
+            self._finish(message, 'delivered' if delivered else 'failed', None if delivered else status)
+            return message.to_dict()
+
+    def status(self, message_id: str) -> Optional[Dict]:
+        with self._lock:
+            message = self._messages.get(message_id)
+            return message.to_dict() if message else None
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values()) + len(self._retries) + self._inflight
+
+    # draining
+
+    def _bucket(self, operator: str) -> TokenBucket:
+        bucket = self._buckets.get(operator)
+        if bucket is None:
+            rate = self.rate_limits.get(operator, self.rate_limits['default'])
+            if self.rate_limit_dir:
+                bucket = SharedTokenBucket(os.path.join(self.rate_limit_dir, f'{operator}.bucket'), rate)
+            else:
+                bucket = TokenBucket(rate)
+            self._buckets[operator] = bucket
+        return bucket
+
+    def _finish(self, message: SMSMessage, status: str, error: Optional[str] = None):
+        message.status = status
+        message.error = error
+        message.finished_at = time.time()
+        self.stats['delivered' if status == 'delivered' else 'failed'] += 1
+        self._finished.append(message.message_id)
+        while len(self._messages) > self.max_tracked and self._finished:
+            self._messages.pop(self._finished.popleft(), None)
+
+    def _take_batches(self, now: float) -> Tuple[List[Tuple[str, List[SMSMessage]]], float]:
+        """Pop what the buckets allow; returns the batches and how long until more is sendable"""
+        while self._retries and self._retries[0][0] <= now:
+            _, seq, message = heapq.heappop(self._retries)
+            heapq.heappush(self._queues.setdefault(message.operator, []), (message.priority, seq, message))
+
+        batches, wait = [], IDLE_WAIT_SECONDS
+        if self._retries:
+            wait = min(wait, self._retries[0][0] - now)
+        for operator, queue in self._queues.items():
+            if not queue:
+                continue
+            bucket = self._bucket(operator)
+            # Broadcasts wait for a full batch worth of tokens; alerts and replies go with what there is
+            wanted = min(self.batch_size, len(queue), int(bucket.capacity)) if queue[0][0] >= PRIORITY_BROADCAST else 1
+            count = bucket.take(now, wanted, min(self.batch_size, len(queue)))
+            if not count:
+                wait = min(wait, bucket.seconds_until(wanted))
+                continue
+            self._inflight += count
+            batches.append((operator, [heapq.heappop(queue)[2] for _ in range(count)]))
+            if queue:
+                wait = 0.0
+        return batches, max(wait, 0.0)
+
+    def _submit(self, operator: str, batch: List[SMSMessage]):
+        payload = [{'message_id': m.message_id, 'phone': m.phone, 'text': m.text} for m in batch]
+        try:
+            results = self.gateway.submit_batch(operator, payload)
+        except GatewayError as e:
+            with self._lock:
+                self._inflight -= len(batch)
+                self.stats['gateway_errors'] += 1
+                for message in batch:
+                    message.attempts += 1
+                    if message.attempts >= self.max_attempts:
+                        self._finish(message, 'failed', str(e))
+                    else:
+                        message.status = 'retrying'
+                        message.error = str(e)
+                        ready_at = time.monotonic() + self.retry_base * 2 ** (message.attempts - 1)
+                        heapq.heappush(self._retries, (ready_at, next(self._seq), message))
+                        self.stats['retried'] += 1
+            return
+
+        now = time.time()
+        with self._lock:
+            self._inflight -= len(batch)
+            self.stats['batches'] += 1
+            for message, result in zip(batch, results):
+                message.attempts += 1
+                if result.get('status') == 'accepted':
+                    message.status = 'submitted'
+                    message.gateway_id = result['gateway_id']
+                    message.submitted_at = now
+                    self._by_gateway_id[message.gateway_id] = message.message_id
+                    self.stats['submitted'] += 1
+                else:
+                    self.stats['rejected'] += 1
+                    self._finish(message, 'failed', result.get('error', 'rejected'))
+
+    def run_once(self) -> float:
+        """Submit every batch the rate limits allow right now; returns seconds until more can go"""
+        with self._lock:
+            batches, wait = self._take_batches(time.monotonic())
+        for operator, batch in batches:
+            self._submit(operator, batch)
+        poll = getattr(self.gateway, 'poll_receipts', None)
+        if poll is not None:
+            for gateway_id, status in poll():
+                self.on_delivery_receipt(gateway_id, status)
+        return 0.0 if batches else wait
+
+    def _run(self):
+        while True:
+            wait = self.run_once()
+            with self._lock:
+                if self._stopping:
+                    return
+                if wait > 0:
+                    self._wakeup.wait(wait)
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so each gunicorn worker starts its own on first use
+        if not self.background:
+            return
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            self._stopping = False
+        self._worker_pid = os.getpid()
+        self._worker = threading.Thread(target=self._run, name='sms-dispatcher', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._worker is not None:
+            self._worker.join()
+
+    def drain(self, timeout: float = 60.0) -> bool:
+        """Wait until nothing is queued, in flight or retrying (receipts may still be outstanding)"""
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self.pending()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            queued = {operator: len(queue) for operator, queue in self._queues.items() if queue}
+            return dict(self.stats, queued=sum(queued.values()), queued_by_operator=queued,
+                        retry_waiting=len(self._retries), awaiting_receipt=len(self._by_gateway_id),
+                        rate_limits=self.rate_limits)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Broadcast throughput against the local fake gateway')
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--rate', type=float, default=None, help='msgs/s per operator (default: DEFAULT_RATE_LIMITS)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--failure-rate', type=float, default=0.02, help='share of batch submissions that time out')
+    parser.add_argument('--undeliverable-rate', type=float, default=0.01)
+    parser.add_argument('--retry-base', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    limits = {operator: args.rate for operator in DEFAULT_RATE_LIMITS} if args.rate else None
+    gateway = FakeGateway(args.failure_rate, args.undeliverable_rate, seed=args.seed)
+    dispatcher = SMSDispatcher(gateway, rate_limits=limits, batch_size=args.batch_size, retry_base=args.retry_base)
+    rng = random.Random(args.seed)
+    prefixes = list(OPERATOR_PREFIXES) + ['63', '75']
+    phones = [rng.choice(prefixes) + f"{rng.randrange(10 ** 8):08d}" for _ in range(args.messages)]
+
+    print("=" * 60)
+    print("SMS GATEWAY BROADCAST")
+    print("=" * 60)
+    started = time.perf_counter()
+    dispatcher.enqueue_many(phones, 'AgriSuper advisory: heavy rain expected, delay spraying by 48 hours.')
+    dispatcher.drain(timeout=3600)
+    dispatcher.run_once()
+    elapsed = time.perf_counter() - started
+    stats = dispatcher.get_stats()
+    print(f"Messages: {args.messages}  Elapsed: {elapsed:.2f}s  Throughput: {args.messages / elapsed:,.0f} msg/s")
+    for key in ('submitted', 'delivered', 'failed', 'rejected', 'retried', 'batches', 'gateway_errors'):
+        print(f"  {key:16s} {stats[key]}")
+    print(f"  batches by operator: {gateway.batches}")
+    dispatcher.stop()
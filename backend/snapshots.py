@@ -0,0 +1,182 @@
+"""
+Data Snapshots
+Generates every synthetic engine dataset once, from a seed, into versioned
+snapshot files that engines map at startup instead of regenerating
+
+    python -m backend.snapshots --seed 42            # generate and make current
+    python -m backend.snapshots --seed 42 --no-activate
+    python -m backend.snapshots --list
+
+Layout (under data/snapshots/, or AGRISUPER_SNAPSHOT_DIR):
+
+    <snapshot_id>/manifest.json     seed, creation time, dataset sizes and hashes
+    <snapshot_id>/<dataset>.ref     one shared_reference file per dataset
+    CURRENT                         id of the snapshot engines load
+
+Set AGRISUPER_SNAPSHOT=<snapshot_id> to pin a specific snapshot (e.g. for
+reproducible benchmarks). With no snapshot installed, engines fall back to
+generating their data as before.
+
+Datasets whose dates are relative to today (price histories, live alerts,
+contracts, deals) are left out by default: a snapshot taken at image build
+time would freeze them and override their max_age refresh. They are still
+generated at process start, or through the shared store, but seeded from the
+current snapshot's seed, the dataset name and today's date
+(shared_reference.seeded_build), so they are as reproducible as the
+snapshotted ones for a given day. Name them with --only to freeze them
+anyway, e.g. for a pinned benchmark snapshot.
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import random
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.shared_reference import (CURRENT_POINTER, REFERENCE_SUFFIX, bypass_snapshots,
+                                      current_snapshot_dir, snapshot_root, write_reference)
+
+SNAPSHOT_FORMAT = 1
+
+# dataset name -> (module, engine class, attribute holding the data, or generator method to call).
+# Generator methods run on an uninitialised instance, so the engine's constructor (its data
+# files, event logs) never runs while snapshotting; attributes need a constructed engine.
+SNAPSHOT_DATASETS = {
+    'pricing_history': ('backend.pricing_engine', 'PricingEngine', 'historical_data'),
+    'market_price_history': ('backend.market_comparison', 'MarketComparisonEngine', 'price_history'),
+    'pest_database': ('backend.pest_alerts', 'PestAlertsEngine', 'pest_database'),
+    'pest_treatments': ('backend.pest_alerts', 'PestAlertsEngine', 'treatment_database'),
+    'active_contracts': ('backend.contract_farming', 'ContractFarmingEngine', 'active_contracts'),
+    'bulk_deals': ('backend.bulk_deals', 'BulkDealsEngine', 'active_deals'),
+    'disaster_active_alerts': ('backend.disaster_alerts', 'DisasterAlertsEngine', 'active_alerts'),
+    'disaster_history': ('backend.disaster_alerts', 'DisasterAlertsEngine', 'historical_disasters'),
+    'yield_history': ('backend.yield_prediction', 'YieldPredictionEngine', 'historical_yields'),
+    'course_library': ('backend.elearning_courses', 'ELearningCourses', '_load_massive_course_data()'),
+    'success_stories': ('backend.success_stories', 'SuccessStories', 'stories_data'),
+    'qa_forum_default': ('backend.qa_forum', 'QAForumManager', 'generate_default_data()'),
+}
+
+# Generated relative to datetime.now(); only snapshotted when asked for by name
+DATE_RELATIVE_DATASETS = {
+    'pricing_history', 'market_price_history', 'active_contracts', 'bulk_deals',
+    'disaster_active_alerts', 'disaster_history', 'success_stories', 'qa_forum_default'
+}
+
+
+def _seed_for(seed: int, label: str) -> int:
+    """Stable per-engine seed so adding a dataset never reshuffles the others"""
+    return zlib.crc32(f"{seed}:{label}".encode('utf-8'))
+
+
+def _seed_all(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def generate_datasets(seed: int, names: Optional[List[str]] = None) -> Dict[str, object]:
+    """Build the requested datasets (all date-independent ones by default) deterministically from seed"""
+    names = names or [name for name in SNAPSHOT_DATASETS if name not in DATE_RELATIVE_DATASETS]
+    by_engine: Dict[tuple, List[str]] = {}
+    for name in names:
+        module, cls, _ = SNAPSHOT_DATASETS[name]
+        by_engine.setdefault((module, cls), []).append(name)
+
+    datasets = {}
+    with bypass_snapshots():
+        for (module, cls), engine_datasets in by_engine.items():
+            _seed_all(_seed_for(seed, cls))
+            engine_class = getattr(importlib.import_module(module), cls)
+            sources = [SNAPSHOT_DATASETS[name][2] for name in engine_datasets]
+            if all(source.endswith('()') for source in sources):
+                engine = engine_class.__new__(engine_class)
+            else:
+                engine = engine_class()
+            for name, source in zip(engine_datasets, sources):
+                if source.endswith('()'):
+                    datasets[name] = getattr(engine, source[:-2])()
+                else:
+                    datasets[name] = getattr(engine, source)
+    return datasets
+
+
+def write_snapshot(seed: int, names: Optional[List[str]] = None, activate: bool = True,
+                   root: Optional[str] = None) -> Dict:
+    """Generate datasets into a new snapshot directory and return its manifest"""
+    root = root or snapshot_root()
+    created = datetime.now()
+    snapshot_id = f"{created.strftime('%Y%m%d%H%M%S')}-seed{seed}"
+    directory = os.path.join(root, snapshot_id)
+    os.makedirs(directory, exist_ok=True)
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'id': snapshot_id,
+        'seed': seed,
+        'created': created.isoformat(),
+        'datasets': {}
+    }
+    for name, data in generate_datasets(seed, names).items():
+        path = os.path.join(directory, name + REFERENCE_SUFFIX)
+        write_reference(path, data)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        manifest['datasets'][name] = {'bytes': os.path.getsize(path), 'sha256': digest}
+
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    if activate:
+        activate_snapshot(snapshot_id, root)
+    return manifest
+
+
+def activate_snapshot(snapshot_id: str, root: Optional[str] = None):
+    """Atomically point CURRENT at a snapshot"""
+    root = root or snapshot_root()
+    if not os.path.isdir(os.path.join(root, snapshot_id)):
+        raise FileNotFoundError(f"No snapshot {snapshot_id} in {root}")
+    tmp_path = os.path.join(root, CURRENT_POINTER + '.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(snapshot_id + '\n')
+    os.replace(tmp_path, os.path.join(root, CURRENT_POINTER))
+
+
+def list_snapshots(root: Optional[str] = None) -> List[Dict]:
+    root = root or snapshot_root()
+    snapshots = []
+    if not os.path.isdir(root):
+        return snapshots
+    for name in sorted(os.listdir(root)):
+        manifest_path = os.path.join(root, name, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                snapshots.append(json.load(f))
+    return snapshots
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate seeded engine data snapshots')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='*', choices=sorted(SNAPSHOT_DATASETS), help='datasets to include')
+    parser.add_argument('--no-activate', action='store_true', help='do not update CURRENT')
+    parser.add_argument('--list', action='store_true', help='list existing snapshots')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("DATA SNAPSHOTS")
+    print("=" * 60)
+    if args.list:
+        current = current_snapshot_dir()
+        for snapshot in list_snapshots():
+            marker = '*' if current and os.path.basename(current) == snapshot['id'] else ' '
+            print(f" {marker} {snapshot['id']}  seed={snapshot['seed']}  datasets={len(snapshot['datasets'])}")
+    else:
+        manifest = write_snapshot(args.seed, args.only, activate=not args.no_activate)
+        print(f"Snapshot: {manifest['id']}{'' if args.no_activate else '  (current)'}")
+        for name, info in manifest['datasets'].items():
+            print(f"  {name:25s} {info['bytes']:>10d} bytes  {info['sha256']}")
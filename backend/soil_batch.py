@@ -0,0 +1,376 @@
+"""
+Soil Health Card Batch Analysis
+Bulk counterpart of SoilKnowledge.analyze_soil for district lab files
+
+    python -m backend.soil_batch ludhiana_2024.csv nashik_2024.csv --workers 4
+    python -m backend.soil_batch labs/*.csv --samples-out logs/soil_batch --output villages.json
+
+Sample files are read in chunks of CHUNK_ROWS rows. Every chunk is classified
+column-wise with np.digitize against the same thresholds analyze_soil uses,
+recommendations are encoded as one bitmask per sample (REC_* bits) and the
+chunk is folded into per-village aggregates, so memory stays flat however
+large the file is. Multi-file jobs fan out over a process pool, one file per
+task, and the partial aggregates are merged at the end.
+
+Recognised columns (case-insensitive, common Soil Health Card spellings):
+sample_id, district, village, ph, organic_carbon, nitrogen, phosphorus,
+potassium. Rows with a missing or non-numeric reading are counted as invalid
+and left out of the averages.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from backend.soil_knowledge import (GYPSUM_ABOVE_PH, LIME_BELOW_PH, MIN_ORGANIC_CARBON, NUTRIENT_RANGES,
+                                    NUTRIENT_STATUSES, PH_BINS, PH_STATUSES)
+
+CHUNK_ROWS = 50000
+NUTRIENTS = ('nitrogen', 'phosphorus', 'potassium')
+READINGS = ('ph', 'organic_carbon') + NUTRIENTS
+NUTRIENT_BINS = {name: (ranges['low'], ranges['medium']) for name, ranges in NUTRIENT_RANGES.items()}
+
+# Recommendation codes: one bit per rule of SoilKnowledge.get_recommendations
+REC_LIME = 1 << 0
+REC_GYPSUM = 1 << 1
+REC_ORGANIC_MATTER = 1 << 2
+REC_NITROGEN = 1 << 3
+REC_PHOSPHORUS = 1 << 4
+REC_POTASSIUM = 1 << 5
+RECOMMENDATION_CODES = {
+    REC_LIME: "Apply lime to reduce acidity",
+    REC_GYPSUM: "Apply gypsum to reduce alkalinity",
+    REC_ORGANIC_MATTER: "Add organic matter like compost or FYM",
+    REC_NITROGEN: "Apply nitrogen fertilizer (Urea)",
+    REC_PHOSPHORUS: "Apply phosphorus fertilizer (DAP)",
+    REC_POTASSIUM: "Apply potassium fertilizer (MOP)"
+}
+REC_BITS = tuple(RECOMMENDATION_CODES)
+
+COLUMN_ALIASES = {
+    'sample_id': ('sample_id', 'sample no', 'sample_no', 'sample number', 'shc_no', 'test_id', 'id'),
+    'district': ('district',),
+    'village': ('village', 'village name', 'village_name', 'location'),
+    'ph': ('ph', 'ph_level', 'soil ph'),
+    'organic_carbon': ('organic_carbon', 'oc', 'oc (%)', 'organic carbon'),
+    'nitrogen': ('nitrogen', 'n', 'available n', 'n (kg/ha)'),
+    'phosphorus': ('phosphorus', 'p', 'available p', 'p (kg/ha)'),
+    'potassium': ('potassium', 'k', 'available k', 'k (kg/ha)')
+}
+
+
+def decode_recommendations(mask: int) -> List[str]:
+    """Recommendation texts for one sample's bitmask"""
+    return [text for bit, text in RECOMMENDATION_CODES.items() if mask & bit]
+
+
+def _resolve_columns(header: List[str]) -> Dict[str, int]:
+    normalized = {name.strip().lower(): i for i, name in enumerate(header)}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                columns[field] = normalized[alias]
+                break
+    missing = [field for field in READINGS if field not in columns]
+    if missing:
+        raise ValueError(f"Missing soil reading columns: {', '.join(missing)}")
+    return columns
+
+
+def _to_float(values: List) -> np.ndarray:
+    """Parse a column into float64, NaN where a reading is missing or malformed"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        parsed = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                parsed[i] = float(value)
+            except (TypeError, ValueError):
+                parsed[i] = np.nan
+        return parsed
+
+
+def classify(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Vectorized analyze_soil for one chunk. Status arrays hold indexes into
+    PH_STATUSES / NUTRIENT_STATUSES; 'valid' is False where any reading is NaN.
+    """
+    ph = columns['ph']
+    oc = columns['organic_carbon']
+    valid = np.ones(len(ph), dtype=bool)
+    for field in READINGS:
+        valid &= ~np.isnan(columns[field])
+
+    result = {'valid': valid, 'ph_status': np.digitize(ph, PH_BINS).astype(np.int8)}
+    for nutrient in NUTRIENTS:
+        result[nutrient] = np.digitize(columns[nutrient], NUTRIENT_BINS[nutrient]).astype(np.int8)
+
+    mask = np.zeros(len(ph), dtype=np.uint8)
+    mask |= np.where(ph < LIME_BELOW_PH, REC_LIME, np.where(ph > GYPSUM_ABOVE_PH, REC_GYPSUM, 0)).astype(np.uint8)
+    mask |= np.where(oc < MIN_ORGANIC_CARBON, REC_ORGANIC_MATTER, 0).astype(np.uint8)
+    for nutrient, bit in zip(NUTRIENTS, (REC_NITROGEN, REC_PHOSPHORUS, REC_POTASSIUM)):
+        mask |= np.where(columns[nutrient] < NUTRIENT_RANGES[nutrient]['low'], bit, 0).astype(np.uint8)
+    result['recommendations'] = np.where(valid, mask, 0).astype(np.uint8)
+    return result
+
+
+class VillageAggregates:
+    """Running per-village sums and status counts, mergeable across chunks and files"""
+
+    def __init__(self):
+        self.villages: Dict[str, Dict] = {}
+        self.samples = 0
+        self.invalid = 0
+
+    def _village(self, name: str) -> Dict:
+        village = self.villages.get(name)
+        if village is None:
+            village = self.villages[name] = {
+                'samples': 0,
+                'invalid': 0,
+                'sums': np.zeros(len(READINGS)),
+                'ph_status': np.zeros(len(PH_STATUSES), dtype=np.int64),
+                'nutrients': np.zeros((len(NUTRIENTS), len(NUTRIENT_STATUSES)), dtype=np.int64),
+                'recommendations': np.zeros(len(REC_BITS), dtype=np.int64)
+            }
+        return village
+
+    def add_chunk(self, villages: np.ndarray, columns: Dict[str, np.ndarray], classified: Dict[str, np.ndarray]):
+        if len(villages) == 0:
+            return
+        names, index = np.unique(villages, return_inverse=True)
+        count = len(names)
+        valid = classified['valid']
+        valid_index = index[valid]
+
+        samples = np.bincount(index, minlength=count)
+        valid_samples = np.bincount(valid_index, minlength=count)
+        sums = np.stack([np.bincount(valid_index, weights=columns[field][valid], minlength=count)
+                         for field in READINGS], axis=1)
+        ph_status = np.bincount(valid_index * len(PH_STATUSES) + classified['ph_status'][valid],
+                                minlength=count * len(PH_STATUSES)).reshape(count, -1)
+        nutrients = np.stack([
+            np.bincount(valid_index * len(NUTRIENT_STATUSES) + classified[nutrient][valid],
+                        minlength=count * len(NUTRIENT_STATUSES)).reshape(count, -1)
+            for nutrient in NUTRIENTS], axis=1)
+        masks = classified['recommendations']
+        recommendations = np.stack([np.bincount(index, weights=(masks & bit) > 0, minlength=count)
+                                    for bit in REC_BITS], axis=1).astype(np.int64)
+
+        for i, name in enumerate(names):
+            village = self._village(str(name))
+            village['samples'] += int(samples[i])
+            village['invalid'] += int(samples[i] - valid_samples[i])
+            village['sums'] += sums[i]
+            village['ph_status'] += ph_status[i]
+            village['nutrients'] += nutrients[i]
+            village['recommendations'] += recommendations[i]
+        self.samples += len(index)
+        self.invalid += int(len(index) - valid.sum())
+
+    def merge(self, other: 'VillageAggregates') -> 'VillageAggregates':
+        for name, theirs in other.villages.items():
+            ours = self._village(name)
+            for key in ('samples', 'invalid', 'sums', 'ph_status', 'nutrients', 'recommendations'):
+                ours[key] = ours[key] + theirs[key]
+        self.samples += other.samples
+        self.invalid += other.invalid
+        return self
+
+    def to_dict(self) -> Dict:
+        villages = {}
+        for name in sorted(self.villages):
+            village = self.villages[name]
+            analyzed = village['samples'] - village['invalid']
+            villages[name] = {
+                'samples': village['samples'],
+                'invalid': village['invalid'],
+                'averages': {field: round(float(total) / analyzed, 2) if analyzed else None
+                             for field, total in zip(READINGS, village['sums'])},
+                'ph_status': dict(zip(PH_STATUSES, village['ph_status'].tolist())),
+                'nutrient_status': {nutrient: dict(zip(NUTRIENT_STATUSES, counts.tolist()))
+                                    for nutrient, counts in zip(NUTRIENTS, village['nutrients'])},
+                'recommendations': {RECOMMENDATION_CODES[bit]: count
+                                    for bit, count in zip(REC_BITS, village['recommendations'].tolist()) if count}
+            }
+        return {'samples': self.samples, 'invalid': self.invalid, 'village_count': len(villages), 'villages': villages}
+
+
+def iter_chunks(stream: Iterable[str], chunk_rows: int = CHUNK_ROWS) -> Iterator[Dict[str, list]]:
+    """Read a lab CSV into column lists of at most chunk_rows rows"""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = _resolve_columns(header)
+    chunk = {field: [] for field in columns}
+    rows = 0
+    for row in reader:
+        if not row:
+            continue
+        for field, i in columns.items():
+            chunk[field].append(row[i].strip() if i < len(row) and row[i].strip() else None)
+        rows += 1
+        if rows == chunk_rows:
+            yield chunk
+            chunk = {field: [] for field in columns}
+            rows = 0
+    if rows:
+        yield chunk
+
+
+def _village_keys(chunk: Dict[str, list]) -> np.ndarray:
+    count = len(chunk['ph'])
+    villages = chunk.get('village') or ['Unknown'] * count
+    if 'district' in chunk:
+        keys = [f"{district or 'Unknown'} / {village or 'Unknown'}" for district, village in zip(chunk['district'], villages)]
+    else:
+        keys = [village or 'Unknown' for village in villages]
+    return np.array(keys)
+
+
+def analyze_stream(stream: Iterable[str], samples_writer=None, chunk_rows: int = CHUNK_ROWS) -> VillageAggregates:
+    """Classify every sample of one CSV stream; optionally write per-sample codes"""
+    aggregates = VillageAggregates()
+    for chunk in iter_chunks(stream, chunk_rows):
+        columns = {field: _to_float(chunk[field]) for field in READINGS}
+        classified = classify(columns)
+        villages = _village_keys(chunk)
+        aggregates.add_chunk(villages, columns, classified)
+        if samples_writer is not None:
+            sample_ids = chunk.get('sample_id') or [''] * len(villages)
+            samples_writer.writerows(zip(
+                sample_ids, villages, classified['valid'].astype(np.int8).tolist(),
+                classified['ph_status'].tolist(),
+                *(classified[nutrient].tolist() for nutrient in NUTRIENTS),
+                classified['recommendations'].tolist()))
+    return aggregates
+
+
+SAMPLE_COLUMNS = ('sample_id', 'village', 'valid', 'ph_status', 'nitrogen', 'phosphorus', 'potassium', 'recommendations')
+
+
+def analyze_file(path: str, samples_dir: Optional[str] = None, chunk_rows: int = CHUNK_ROWS) -> Dict:
+    """
+    Analyze one lab file. Returns its summary with the raw aggregates under
+    'aggregates' so a parent process can merge them.
+    """
+    started = time.perf_counter()
+    samples_path = None
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if samples_dir:
+            os.makedirs(samples_dir, exist_ok=True)
+            samples_path = os.path.join(samples_dir, os.path.splitext(os.path.basename(path))[0] + '.codes.csv')
+            with open(samples_path, 'w', newline='') as out:
+                writer = csv.writer(out)
+                writer.writerow(SAMPLE_COLUMNS)
+                aggregates = analyze_stream(f, writer, chunk_rows)
+        else:
+            aggregates = analyze_stream(f, None, chunk_rows)
+    return {
+        'file': path,
+        'samples': aggregates.samples,
+        'invalid': aggregates.invalid,
+        'seconds': round(time.perf_counter() - started, 3),
+        'samples_file': samples_path,
+        'aggregates': aggregates
+    }
+
+
+def analyze_files(paths: List[str], workers: Optional[int] = None, samples_dir: Optional[str] = None) -> Dict:
+    """Analyze several lab files, one per pool worker, and merge their village aggregates"""
+    workers = min(workers or os.cpu_count() or 1, len(paths)) or 1
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(analyze_file, paths, [samples_dir] * len(paths)))
+    else:
+        results = [analyze_file(path, samples_dir) for path in paths]
+
+    merged = VillageAggregates()
+    for result in results:
+        merged.merge(result.pop('aggregates'))
+    summary = merged.to_dict()
+    summary['files'] = results
+    summary['workers'] = workers
+    return summary
+
+
+def analyze_samples(samples: List[Dict]) -> Dict:
+    """
+    In-memory batch for the API: a list of sample dicts (same keys as the CSV
+    columns) in, per-sample codes and per-village aggregates out.
+    """
+    if not isinstance(samples, list) or not all(isinstance(sample, dict) for sample in samples):
+        raise ValueError("samples must be a list of objects")
+    chunk = {field: [sample.get(field) for sample in samples] for field in ('sample_id', 'district', 'village') + READINGS
+             if any(field in sample for sample in samples)}
+    for field in READINGS:
+        chunk.setdefault(field, [None] * len(samples))
+    columns = {field: _to_float(chunk[field]) for field in READINGS}
+    classified = classify(columns)
+    aggregates = VillageAggregates()
+    aggregates.add_chunk(_village_keys(chunk), columns, classified)
+
+    results = []
+    for i, sample in enumerate(samples):
+        if not classified['valid'][i]:
+            results.append({'sample_id': sample.get('sample_id'), 'valid': False})
+            continue
+        mask = int(classified['recommendations'][i])
+        results.append({
+            'sample_id': sample.get('sample_id'),
+            'valid': True,
+            'ph_status': PH_STATUSES[classified['ph_status'][i]],
+            'nutrient_status': {nutrient: NUTRIENT_STATUSES[classified[nutrient][i]] for nutrient in NUTRIENTS},
+            'recommendation_code': mask,
+            'recommendations': decode_recommendations(mask)
+        })
+    summary = aggregates.to_dict()
+    summary['results'] = results
+    return summary
+
+
+def analyze_upload(file_storage) -> Dict:
+    """Stream an uploaded CSV (werkzeug FileStorage) without buffering it whole"""
+    stream = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+    summary = analyze_stream(stream).to_dict()
+    summary['file'] = file_storage.filename
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batch Soil Health Card analysis')
+    parser.add_argument('files', nargs='+', help='lab CSV files')
+    parser.add_argument('--workers', type=int, default=None, help='process pool size (default: CPU count)')
+    parser.add_argument('--samples-out', default=None, help='directory for per-sample code files')
+    parser.add_argument('--output', default=None, help='write the village aggregates as JSON')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SOIL HEALTH CARD BATCH ANALYSIS")
+    print("=" * 60)
+    started = time.perf_counter()
+    try:
+        summary = analyze_files(args.files, args.workers, args.samples_out)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    for result in summary['files']:
+        print(f"  {result['file']:40s} {result['samples']:>9d} samples  {result['invalid']:>6d} invalid  {result['seconds']:.2f}s")
+    print(f"Villages: {summary['village_count']}  Samples: {summary['samples']}  Workers: {summary['workers']}")
+    print(f"Throughput: {summary['samples'] / elapsed if elapsed else 0:,.0f} samples/s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({k: v for k, v in summary.items() if k != 'files'}, f, indent=2)
+        print(f"Aggregates written to {args.output}")
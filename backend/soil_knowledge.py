@@ -1,6 +1,20 @@
-import json
 import random
+from bisect import bisect_right
 from datetime import datetime, timedelta
+from backend.record_store import load_document
+
+# Soil Health Card thresholds, shared with the bulk pipeline in backend.soil_batch
+PH_BINS = (5.5, 6.5, 7.5, 8.5)
+PH_STATUSES = ("Highly Acidic", "Moderately Acidic", "Neutral", "Moderately Alkaline", "Highly Alkaline")
+NUTRIENT_RANGES = {
+    "nitrogen": {"low": 280, "medium": 560, "high": 840},
+    "phosphorus": {"low": 11, "medium": 22, "high": 56},
+    "potassium": {"low": 108, "medium": 280, "high": 560}
+}
+NUTRIENT_STATUSES = ("Low", "Medium", "High")
+LIME_BELOW_PH = 6.0
+GYPSUM_ABOVE_PH = 8.0
+MIN_ORGANIC_CARBON = 0.5
 
 class SoilKnowledge:
     def __init__(self, data_folder='data'):
@@ -8,8 +22,7 @@ class SoilKnowledge:
     
     def load_data(self):
         try:
-            with open('data/soil_knowledge_data.json', 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document('data/soil_knowledge_data.json')
         except FileNotFoundError:
             self.data = self.get_default_data()
     
@@ -152,23 +165,10 @@ class SoilKnowledge:
         return analysis
     
     def get_ph_status(self, ph):
-        if ph < 5.5:
-            return "Highly Acidic"
-        elif ph < 6.5:
-            return "Moderately Acidic"
-        elif ph < 7.5:
-            return "Neutral"
-        elif ph < 8.5:
-            return "Moderately Alkaline"
-        else:
-            return "Highly Alkaline"
+        return PH_STATUSES[bisect_right(PH_BINS, ph)]
     
     def get_nutrient_status(self, value, nutrient):
-        ranges = {
-            "nitrogen": {"low": 280, "medium": 560, "high": 840},
-            "phosphorus": {"low": 11, "medium": 22, "high": 56},
-            "potassium": {"low": 108, "medium": 280, "high": 560}
-        }
+        ranges = NUTRIENT_RANGES
         
         if value < ranges[nutrient]["low"]:
             return "Low"
@@ -180,25 +180,30 @@ class SoilKnowledge:
     def get_recommendations(self, ph, organic_carbon, nitrogen, phosphorus, potassium):
         recommendations = []
         
-        if ph < 6.0:
+        if ph < LIME_BELOW_PH:
             recommendations.append("Apply lime to reduce acidity")
-        elif ph > 8.0:
+        elif ph > GYPSUM_ABOVE_PH:
             recommendations.append("Apply gypsum to reduce alkalinity")
         
-        if organic_carbon < 0.5:
+        if organic_carbon < MIN_ORGANIC_CARBON:
             recommendations.append("Add organic matter like compost or FYM")
         
-        if nitrogen < 280:
+        if nitrogen < NUTRIENT_RANGES["nitrogen"]["low"]:
             recommendations.append("Apply nitrogen fertilizer (Urea)")
         
-        if phosphorus < 11:
+        if phosphorus < NUTRIENT_RANGES["phosphorus"]["low"]:
             recommendations.append("Apply phosphorus fertilizer (DAP)")
         
-        if potassium < 108:
+        if potassium < NUTRIENT_RANGES["potassium"]["low"]:
             recommendations.append("Apply potassium fertilizer (MOP)")
         
         return recommendations
     
+    def analyze_batch(self, samples):
+        """Classify many samples at once (see backend.soil_batch)"""
+        from backend.soil_batch import analyze_samples
+        return analyze_samples(samples)
+    
     def get_soil_types(self):
         return self.data["soil_types"]
     
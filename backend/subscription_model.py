@@ -1,5 +1,6 @@
 import json
 import uuid
+from collections import Counter
 from datetime import datetime, timedelta
 import random
 
@@ -9,6 +10,19 @@ class SubscriptionModel:
         self.buyers = self._load_sample_buyers()
         self.subscription_plans = self._load_subscription_plans()
         self.loyalty_programs = self._load_loyalty_programs()
+        # Running totals over active subscriptions, so analytics never rescan them
+        self._buyer_categories = {buyer['id']: category for category, buyers in self.buyers.items() for buyer in buyers}
+        self._crop_counts = Counter()
+        self._buyer_counts = Counter()
+        self._monthly_revenue = 0
+        for subscription in self.subscriptions['active_subscriptions']:
+            self._count_subscription(subscription)
+    
+    def _count_subscription(self, subscription, sign=1):
+        """Add (sign=1) or remove (sign=-1) an active subscription from the running totals"""
+        self._crop_counts.update({crop: sign for crop in subscription['crops']})
+        self._buyer_counts[self._buyer_categories.get(subscription['buyer_id'], 'others')] += sign
+        self._monthly_revenue += sign * subscription['total_value']
     
     def _load_sample_subscriptions(self):
         """Load sample subscription data"""
@@ -205,7 +219,7 @@ class SubscriptionModel:
             delivery_schedule = self._generate_delivery_schedule(data.get('plan_type'), data.get('start_date'))
             
             # Apply loyalty benefits
-            loyalty_benefits = self._apply_loyalty_benefits(data.get('buyer_id'), subscription_details['total_value'])
+            loyalty_benefits = self._apply_loyalty_benefits(data.get('buyer_id'), subscription_details['final_amount'])
             
             subscription = {
                 'id': subscription_id,
@@ -400,7 +414,7 @@ class SubscriptionModel:
         """Get subscription analytics and insights"""
         analytics = {
             'total_active_subscriptions': len(self.subscriptions['active_subscriptions']),
-            'total_monthly_revenue': sum(sub['total_value'] for sub in self.subscriptions['active_subscriptions']),
+            'total_monthly_revenue': self._monthly_revenue,
             'average_subscription_value': 0,
             'top_crops': self._get_top_crops(),
             'buyer_distribution': self._get_buyer_distribution(),
@@ -422,20 +436,15 @@ class SubscriptionModel:
     
     def _get_top_crops(self):
         """Get most subscribed crops"""
-        crop_counts = {}
-        for sub in self.subscriptions['active_subscriptions']:
-            for crop in sub['crops']:
-                crop_counts[crop] = crop_counts.get(crop, 0) + 1
-        
-        return sorted(crop_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        return self._crop_counts.most_common(5)
     
     def _get_buyer_distribution(self):
-        """Get buyer type distribution"""
+        """Get buyer type distribution (percent of active subscriptions)"""
+        total = sum(self._buyer_counts.values())
+        categories = list(self.buyers) + ['others']
         return {
-            'restaurants': 45,
-            'retailers': 35,
-            'hotels': 15,
-            'others': 5
+            category: round(100.0 * self._buyer_counts[category] / total, 1) if total else 0.0
+            for category in categories
         }
     
     def test_connection(self):
@@ -2,6 +2,7 @@ import json
 import random
 from datetime import datetime, timedelta
 import uuid
+from backend.shared_reference import load_reference
 
 class SuccessStories:
     def __init__(self, data_folder='data'):
@@ -10,7 +11,7 @@ class SuccessStories:
             "Punjab", "Haryana", "Uttar Pradesh", "Maharashtra", "Karnataka", "Tamil Nadu",
             "Gujarat", "Rajasthan", "Madhya Pradesh", "West Bengal", "Andhra Pradesh", "Telangana"
         ]
-        self.stories_data = self._load_massive_stories_data()
+        self.stories_data = load_reference('success_stories', self._load_massive_stories_data, mutable=True)
         self.votes = {}
         self.comments = {}
         
@@ -0,0 +1,251 @@
+"""
+Offline Sync API
+Versioned change feeds and batched write replay for the service worker
+"""
+
+from flask import jsonify, request
+from bisect import bisect_right
+from collections import OrderedDict
+import hashlib
+import json
+import os
+
+from backend.event_log import EventLog
+from backend.record_store import json_default
+
+
+class ChangeFeed:
+    """
+    Append-only log of record changes per collection.
+
+    Changes are appended to a shared event log, and a change's version is its
+    byte offset in that log. Every worker reads the same log, so versions are
+    identical across workers and survive restarts: a client's cursor stays
+    valid wherever its next request lands. A publish whose record is unchanged
+    since its latest version appends nothing, so re-seeding the feed at boot
+    does not force clients into a full re-download. Superseded entries are
+    skipped on read and compacted out of the in-memory index once they
+    outnumber the live records.
+
+    The log file itself is compacted the same way: it is rewritten with only
+    the latest change per record, headed by a marker carrying the version it
+    was compacted at. Versions after a compaction are that base plus the
+    byte offset, so they keep increasing and old cursors stay valid; a client
+    merely re-receives the records it already had.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.log = EventLog(path, self._apply, reset=self._clear, fsync=fsync)
+        self._clear()
+
+    def _clear(self):
+        self._base = 0               # version the log was last compacted at
+        self._versions = []          # log versions, ascending
+        self._entries = []           # (collection, record_id) per log version
+        self._latest = {}            # collection -> {record_id: (version, record, deleted, digest)}
+
+    @property
+    def version(self):
+        return self._base + self.log.offset
+
+    @staticmethod
+    def _digest(record, deleted):
+        body = json.dumps([record, deleted], sort_keys=True, default=json_default, separators=(',', ':'))
+        return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+    def _apply(self, event, offset):
+        if 'compacted_at' in event:
+            self._base = event['compacted_at']
+            return
+        version = self._base + offset
+        collection, record_id = event['collection'], event['id']
+        self._latest.setdefault(collection, {})[record_id] = (
+            version, event.get('record'), event.get('deleted', False), event['digest'])
+        self._versions.append(version)
+        self._entries.append((collection, record_id))
+        if len(self._entries) > 2 * self._live_count() + 1024:
+            self._compact()
+
+    def _publish(self, changes):
+        def build():
+            events, pending = [], {}
+            for collection, record_id, record, deleted in changes:
+                digest = self._digest(record, deleted)
+                current = pending.get((collection, record_id))
+                if current is None:
+                    latest = self._latest.get(collection, {}).get(record_id)
+                    current = latest[3] if latest else None
+                if current != digest:
+                    pending[(collection, record_id)] = digest
+                    events.append({'collection': collection, 'id': record_id, 'record': record,
+                                   'deleted': deleted, 'digest': digest})
+            return events
+
+        self.log.append(build)
+        if self.log.events > 2 * self._live_count() + 1024:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with only the latest change of each record"""
+        def build():
+            live = sorted(
+                (version, collection, record_id, record, deleted, digest)
+                for collection, records in self._latest.items()
+                for record_id, (version, record, deleted, digest) in records.items()
+            )
+            return [{'compacted_at': self.version}] + [
+                {'collection': collection, 'id': record_id, 'record': record, 'deleted': deleted, 'digest': digest}
+                for _, collection, record_id, record, deleted, digest in live
+            ]
+
+        self.log.compact(build)
+
+    def publish(self, collection, record_id, record=None, deleted=False):
+        """Record a change (a no-op when nothing changed) and return the record's version"""
+        self._publish([(collection, record_id, record, deleted)])
+        with self.log.lock:
+            return self._latest[collection][record_id][0]
+
+    def publish_many(self, collection, records, id_field='id'):
+        """Publish several records under one lock and one fsync"""
+        self._publish([(collection, record[id_field], record, False) for record in records])
+
+    def _live_count(self):
+        return sum(len(records) for records in self._latest.values())
+
+    def _compact(self):
+        """Drop log entries superseded by a later change of the same record"""
+        live = sorted(
+            (version, collection, record_id)
+            for collection, records in self._latest.items()
+            for record_id, (version, _, _, _) in records.items()
+        )
+        self._versions = [version for version, _, _ in live]
+        self._entries = [(collection, record_id) for _, collection, record_id in live]
+
+    def changes_since(self, cursor=0, collections=None, limit=500):
+        """
+        Return changes with a version greater than cursor.
+
+        Only the latest state of each record is returned. When more than
+        `limit` changes are pending, `has_more` is set and the returned cursor
+        points at the last change included, so the client can page forward.
+        """
+        changes = {}
+        deleted = {}
+        count = 0
+        with self.log.lock:
+            self.log.refresh()
+            new_cursor = max(cursor, 0)
+            pos = bisect_right(self._versions, cursor)
+            has_more = False
+            for i in range(pos, len(self._entries)):
+                collection, record_id = self._entries[i]
+                version = self._versions[i]
+                if collections and collection not in collections:
+                    new_cursor = version
+                    continue
+                latest_version, record, is_deleted, _ = self._latest[collection][record_id]
+                if latest_version != version:
+                    continue
+                if count >= limit:
+                    has_more = True
+                    break
+                if is_deleted:
+                    deleted.setdefault(collection, []).append(record_id)
+                else:
+                    changes.setdefault(collection, []).append(
+                        {'id': record_id, 'version': version, 'record': record})
+                count += 1
+                new_cursor = version
+            if not has_more:
+                new_cursor = max(new_cursor, self.version)
+
+        return {
+            'cursor': new_cursor,
+            'has_more': has_more,
+            'changes': changes,
+            'deleted': deleted
+        }
+
+
+def register_sync_routes(app, feed, write_handlers=None, max_batch=100, writes_path=None):
+    """
+    Register the offline sync endpoint.
+
+    GET  /api/sync?cursor=N&collections=a,b   -> change feed since cursor
+    POST /api/sync {cursor, collections, writes: [...]}
+         -> replays queued offline writes, then returns the change feed
+
+    Each queued write is {client_write_id, type, payload}. write_handlers maps
+    a write type to a callable taking the payload and returning a result dict;
+    results are remembered per client_write_id, in an event log next to the
+    feed's (or at writes_path), so a replayed batch is not applied twice even
+    when the retry reaches another worker.
+    """
+    write_handlers = write_handlers or {}
+    applied_writes = OrderedDict()
+
+    def remember(event, _offset):
+        applied_writes[event['client_write_id']] = event['result']
+        while len(applied_writes) > 10000:
+            applied_writes.popitem(last=False)
+
+    # Replayed batches may land on any worker, so applied write ids are shared
+    writes_log = EventLog(writes_path or os.path.join(os.path.dirname(feed.log.path), 'sync_writes.jsonl'),
+                          remember, reset=applied_writes.clear)
+
+    def parse_collections(value):
+        if not value:
+            return None
+        if isinstance(value, str):
+            value = value.split(',')
+        return {c.strip() for c in value if c.strip()}
+
+    def run_handler(write):
+        handler = write_handlers.get(write.get('type'))
+        if handler is None:
+            return {'status': 'error', 'message': f"Unsupported write type: {write.get('type')}"}
+        try:
+            return handler(write.get('payload') or {})
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}
+
+    def apply_write(write):
+        client_write_id = write.get('client_write_id')
+        if not client_write_id:
+            return dict(run_handler(write), client_write_id=client_write_id)
+
+        outcome = {}
+
+        def build():
+            # Runs under the log's cross-process lock: a write id is applied once
+            if client_write_id in applied_writes:
+                outcome['result'] = applied_writes[client_write_id]
+                return []
+            outcome['result'] = dict(run_handler(write), client_write_id=client_write_id)
+            return [{'client_write_id': client_write_id, 'result': outcome['result']}]
+
+        writes_log.append(build)
+        return outcome['result']
+
+    @app.route('/api/sync', methods=['GET'])
+    def sync_changes():
+        """Return the change feed since a client cursor"""
+        cursor = request.args.get('cursor', 0, type=int)
+        limit = min(request.args.get('limit', 500, type=int), 2000)
+        return jsonify(feed.changes_since(cursor, parse_collections(request.args.get('collections')), limit))
+
+    @app.route('/api/sync', methods=['POST'])
+    def sync_replay():
+        """Replay a batch of offline writes and return the change feed"""
+        data = request.get_json(silent=True) or {}
+        writes = data.get('writes') or []
+        if len(writes) > max_batch:
+            return jsonify({'status': 'error', 'message': f'At most {max_batch} writes per batch'}), 413
+
+        results = [apply_write(write) for write in writes]
+        response = feed.changes_since(int(data.get('cursor') or 0), parse_collections(data.get('collections')),
+                                      min(int(data.get('limit') or 500), 2000))
+        response['write_results'] = results
+        return jsonify(response)
@@ -141,27 +141,37 @@ def add_ui_context_processor(app):
     """
     Add UI helper functions to all templates
     """
+    helpers = {
+        'generate_button': generate_large_button_component,
+        'generate_wizard': generate_wizard_component,
+        'action_icons': ui_system.action_icons,
+        'color_scheme': ui_system.color_scheme
+    }
+    
     @app.context_processor
     def inject_ui_helpers():
-        return {
-            'ui_system': ui_system,
-            'generate_button': generate_large_button_component,
-            'generate_wizard': generate_wizard_component,
-            'action_icons': ui_system.action_icons,
-            'color_scheme': ui_system.color_scheme
-        }
+        return helpers
 
 
 def add_custom_css_route(app):
     """
     Serve farmer-friendly CSS styles
+    
+    When the asset pipeline has been built, url_for('static', filename='css/farmer-ui.css')
+    already points at the fingerprinted, precompressed copy in static/dist; this
+    route only covers the unbuilt case and hard-coded links.
     """
+    from flask import Response, redirect
     from backend.farmer_friendly_ui import FARMER_UI_CSS
     
+    css_response_body = FARMER_UI_CSS.encode('utf-8')
+    
     @app.route('/static/css/farmer-ui.css')
     def serve_farmer_ui_css():
-        from flask import Response
-        return Response(FARMER_UI_CSS, mimetype='text/css')
+        manifest = app.extensions.get('asset_manifest')
+        if manifest is not None and manifest.resolve('css/farmer-ui.css') != 'css/farmer-ui.css':
+            return redirect('/static/' + manifest.resolve('css/farmer-ui.css'), code=301)
+        return Response(css_response_body, mimetype='text/css')
 
 
 # Usage instructions for app.py integration
@@ -1,7 +1,7 @@
-import json
 import os
 from datetime import datetime
 import hashlib
+from backend.record_store import load_document, save_document
 
 class UserManager:
     def __init__(self, data_folder='data'):
@@ -10,16 +10,14 @@ class UserManager:
     
     def load_data(self):
         try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+            self.data = load_document(self.data_file)
         except FileNotFoundError:
             self.data = self.generate_default_data()
             self.save_data()
     
     def save_data(self):
         os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=4)
+        save_document(self.data_file, self.data, indent=4)
     
     def generate_default_data(self):
         # Create a default admin user
@@ -0,0 +1,353 @@
+"""
+Verification Queue
+Indexed KYC work queue with reviewer leases
+
+Requests are indexed by id and by status, and the claimable ones
+(Pending, or legacy Under Review with no active lease) sit in a heap ordered
+by effective submission time: submission time minus RISK_DAYS per risk point.
+The key never changes as requests age, so a risky request simply counts
+as older and no re-sorting is needed.
+
+Reviewers claim a batch. Each claimed request gets a lease (reviewer, token,
+expiry), so concurrent reviewers pull disjoint batches. A lease that is not
+completed, released or renewed before it expires returns its request to the
+queue with its original priority. Status counts and processing times are
+updated on each transition instead of being recounted.
+
+Every transition (submit, claim, renew, release, decision) is an event.
+With a log_path the events go through a shared EventLog: each worker
+decides a claim under the log's lock after catching up with the others, and
+replays the log on start, so leases and decisions hold across gunicorn
+workers and restarts. The base records are never modified.
+
+Usage:
+    queue = VerificationQueue(records, log_path='data/events/verification_queue.jsonl')
+    batch = queue.claim('reviewer_7', limit=20)
+    queue.complete(batch[0]['id'], 'reviewer_7', 'Verified')
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from backend.event_log import EventLog
+
+PENDING = 'Pending'
+UNDER_REVIEW = 'Under Review'
+VERIFIED = 'Verified'
+REJECTED = 'Rejected'
+DECISIONS = (VERIFIED, REJECTED)
+CLAIMABLE = (PENDING, UNDER_REVIEW)
+
+DEFAULT_LEASE_SECONDS = 15 * 60
+MAX_LEASE_SECONDS = 2 * 3600
+MAX_BATCH = 100
+RISK_DAYS = 3.0
+SECONDS_PER_DAY = 86400.0
+MANDATORY_DOCUMENTS = (('aadhar card', 'aadhaar card', 'aadhaar', 'aadhar'),
+                       ('land records',),
+                       ('bank passbook', 'bank account'))
+
+
+def _timestamp(value) -> float:
+    """Epoch seconds from a 'YYYY-MM-DD[ HH:MM:SS]' / ISO string; now if missing or unparsable"""
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def risk_score(record: Dict) -> float:
+    """Risk points: low automated verification score, missing mandatory documents"""
+    risk = 0.0
+    score = record.get('verification_score')
+    if isinstance(score, (int, float)):
+        risk += max(0.0, (100 - score) / 10.0)
+    documents = {str(document).lower() for document in record.get('documents_submitted') or ()}
+    if documents:
+        risk += sum(1 for names in MANDATORY_DOCUMENTS if documents.isdisjoint(names))
+    return round(risk, 2)
+
+
+def _bounded(value, name: str, upper: int) -> int:
+    try:
+        return max(1, min(int(value), upper))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch).isoformat(timespec='seconds')
+
+
+class VerificationQueue:
+    """Verification requests with a status index, a priority heap and reviewer leases"""
+
+    def __init__(self, records: Iterable[Dict] = (), log_path: Optional[str] = None):
+        self._records = [dict(record) for record in records]
+        self.log = EventLog(log_path, self._apply, reset=self._rebuild) if log_path else None
+        self._lock = self.log.lock if self.log is not None else threading.RLock()
+        self._tokens = itertools.count(1)
+        self._rebuild()
+        if self.log is not None:
+            self.log.refresh()
+
+    def _rebuild(self):
+        """The view of the base records alone; logged events are applied on top"""
+        self.requests: Dict[str, Dict] = {}
+        self.by_status: Dict[str, set] = {}
+        self.leases: Dict[str, Dict] = {}
+        self._expiries: List[tuple] = []
+        self._processed = 0
+        self._processing_seconds = 0.0
+        self._decisions_by_reviewer: Counter = Counter()
+        for record in self._records:
+            self._add(dict(record), push=False)
+        self._queue = [self._entry(record) for record in self.requests.values() if record['status'] in CLAIMABLE]
+        heapq.heapify(self._queue)
+
+    # ------------------------------------------------------------------ indexing
+
+    def _add(self, record: Dict, push: bool = True):
+        record.setdefault('status', PENDING)
+        record.setdefault('risk_score', risk_score(record))
+        previous = self.requests.get(record['id'])
+        if previous is not None:
+            self.by_status[previous['status']].discard(record['id'])
+        self.requests[record['id']] = record
+        self.by_status.setdefault(record['status'], set()).add(record['id'])
+        if push and record['status'] in CLAIMABLE:
+            self._enqueue(record)
+
+    @staticmethod
+    def _entry(record: Dict) -> tuple:
+        priority = _timestamp(record.get('submitted_date')) - record['risk_score'] * RISK_DAYS * SECONDS_PER_DAY
+        return priority, record['id']
+
+    def _enqueue(self, record: Dict):
+        heapq.heappush(self._queue, self._entry(record))
+
+    def _set_status(self, record: Dict, status: str):
+        self.by_status[record['status']].discard(record['id'])
+        record['status'] = status
+        self.by_status.setdefault(status, set()).add(record['id'])
+
+    def _claimable(self, verification_id: str) -> bool:
+        record = self.requests.get(verification_id)
+        return record is not None and record['status'] in CLAIMABLE and verification_id not in self.leases
+
+    def _claimable_ids(self, count: int) -> List[str]:
+        """Ids of the first `count` claimable requests, in claim order, without popping the heap"""
+        queue = self._queue
+        # Best-first walk of the heap array: O(count log count), skipping stale entries
+        frontier = [(queue[0], 0)] if queue else []
+        seen, ids = set(), []
+        while frontier and len(ids) < count:
+            (_, verification_id), index = heapq.heappop(frontier)
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(queue):
+                    heapq.heappush(frontier, (queue[child], child))
+            if verification_id not in seen and self._claimable(verification_id):
+                seen.add(verification_id)
+                ids.append(verification_id)
+        return ids
+
+    def _expire_leases(self, now: float):
+        """Return requests whose lease ran out to the queue"""
+        while self._expiries and self._expiries[0][0] <= now:
+            _, verification_id, token = heapq.heappop(self._expiries)
+            lease = self.leases.get(verification_id)
+            if lease is None or lease['token'] != token:
+                continue  # completed, released or renewed since
+            del self.leases[verification_id]
+            record = self.requests[verification_id]
+            self._set_status(record, PENDING)
+            record.pop('reviewer_id', None)
+            self._enqueue(record)
+
+    def _lease_holder(self, verification_id: str, reviewer_id: str, now: float) -> Optional[Dict]:
+        self._expire_leases(now)
+        lease = self.leases.get(verification_id)
+        return lease if lease is not None and lease['reviewer_id'] == reviewer_id else None
+
+    def _lease(self, verification_id: str, reviewer_id: str, expires: float, token: int):
+        record = self.requests[verification_id]
+        self.leases[verification_id] = {'reviewer_id': reviewer_id, 'token': token, 'expires': expires}
+        heapq.heappush(self._expiries, (expires, verification_id, token))
+        if record['status'] != UNDER_REVIEW:
+            self._set_status(record, UNDER_REVIEW)
+        record['reviewer_id'] = reviewer_id
+
+    # ------------------------------------------------------------------- events
+
+    def _apply(self, event: Dict, offset: Optional[int]):
+        """
+        Fold one event into the view. Every event is decided by the writer,
+        so applying trusts it; a lease this view already let expire is
+        restored. The token is the event's log offset, the same in every
+        worker.
+        """
+        kind = event['type']
+        if kind == 'submitted':
+            self._add(dict(event['record']))
+            return
+        self._expire_leases(event['ts'])
+        token = offset if offset is not None else next(self._tokens)
+        if kind == 'claimed':
+            for verification_id in event['ids']:
+                if verification_id in self.requests:
+                    self._lease(verification_id, event['reviewer_id'], event['expires'], token)
+            while self._queue and not self._claimable(self._queue[0][1]):
+                heapq.heappop(self._queue)
+            return
+        verification_id = event['id']
+        record = self.requests.get(verification_id)
+        if record is None:
+            return
+        if kind == 'renewed':
+            self._lease(verification_id, event['reviewer_id'], event['expires'], token)
+        elif kind == 'released':
+            self.leases.pop(verification_id, None)
+            self._set_status(record, PENDING)
+            record.pop('reviewer_id', None)
+            self._enqueue(record)
+        elif kind == 'completed':
+            self.leases.pop(verification_id, None)
+            self._set_status(record, event['decision'])
+            record['verified_date'] = datetime.fromtimestamp(event['ts']).strftime('%Y-%m-%d')
+            record['reviewed_by'] = event['reviewer_id']
+            record.pop('reviewer_id', None)
+            if event.get('notes'):
+                record['review_notes'] = event['notes']
+            self._processed += 1
+            self._processing_seconds += max(0.0, event['ts'] - _timestamp(record.get('submitted_date')))
+            self._decisions_by_reviewer[event['reviewer_id']] += 1
+
+    def _commit(self, build) -> List[Dict]:
+        """Decide and apply events: through the shared log when there is one"""
+        if self.log is not None:
+            return self.log.append(build)
+        events = list(build() or ())
+        for event in events:
+            self._apply(event, None)
+        return events
+
+    def _refresh(self):
+        if self.log is not None:
+            self.log.refresh()
+
+    # -------------------------------------------------------------------- writes
+
+    def submit(self, record: Dict) -> Dict:
+        record = dict(record)
+        with self._lock:
+            self._commit(lambda: [{'type': 'submitted', 'record': record}])
+            return dict(self.requests[record['id']])
+
+    def claim(self, reviewer_id: str, limit: int = 20, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> List[Dict]:
+        """Lease up to `limit` of the highest-priority unclaimed requests to one reviewer"""
+        limit = _bounded(limit, 'limit', MAX_BATCH)
+        lease_seconds = _bounded(lease_seconds, 'lease_seconds', MAX_LEASE_SECONDS)
+
+        def build():
+            now = time.time()
+            self._expire_leases(now)
+            ids = self._claimable_ids(limit)
+            if not ids:
+                return []
+            return [{'type': 'claimed', 'ids': ids, 'reviewer_id': reviewer_id, 'ts': now,
+                     'expires': now + lease_seconds}]
+
+        with self._lock:
+            events = self._commit(build)
+            if not events:
+                return []
+            expires = _iso(events[0]['expires'])
+            return [dict(self.requests[verification_id], lease_expires=expires) for verification_id in events[0]['ids']]
+
+    def renew(self, verification_id: str, reviewer_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> Optional[str]:
+        """Extend a held lease; returns the new expiry, or None if the reviewer no longer holds it"""
+        lease_seconds = _bounded(lease_seconds, 'lease_seconds', MAX_LEASE_SECONDS)
+
+        def build():
+            now = time.time()
+            if self._lease_holder(verification_id, reviewer_id, now) is None:
+                return []
+            return [{'type': 'renewed', 'id': verification_id, 'reviewer_id': reviewer_id, 'ts': now,
+                     'expires': now + lease_seconds}]
+
+        with self._lock:
+            events = self._commit(build)
+            return _iso(events[0]['expires']) if events else None
+
+    def release(self, verification_id: str, reviewer_id: str) -> bool:
+        """Give a claimed request back to the queue unreviewed"""
+        def build():
+            now = time.time()
+            if self._lease_holder(verification_id, reviewer_id, now) is None:
+                return []
+            return [{'type': 'released', 'id': verification_id, 'reviewer_id': reviewer_id, 'ts': now}]
+
+        with self._lock:
+            return bool(self._commit(build))
+
+    def complete(self, verification_id: str, reviewer_id: str, decision: str, notes: str = '') -> Optional[Dict]:
+        """Record a reviewer's decision on a request they hold; None if the lease is gone"""
+        if decision not in DECISIONS:
+            raise ValueError(f"decision must be one of {', '.join(DECISIONS)}")
+
+        def build():
+            now = time.time()
+            if self._lease_holder(verification_id, reviewer_id, now) is None:
+                return []
+            return [{'type': 'completed', 'id': verification_id, 'reviewer_id': reviewer_id,
+                     'decision': decision, 'notes': notes, 'ts': now}]
+
+        with self._lock:
+            if not self._commit(build):
+                return None
+            return dict(self.requests[verification_id])
+
+    # --------------------------------------------------------------------- reads
+
+    def get(self, verification_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._refresh()
+            record = self.requests.get(verification_id)
+            return dict(record) if record is not None else None
+
+    def pending(self, limit: Optional[int] = 50) -> List[Dict]:
+        """Unclaimed requests in claim order, without claiming them"""
+        with self._lock:
+            self._refresh()
+            self._expire_leases(time.time())
+            count = len(self._queue) if limit is None else int(limit)
+            return [dict(self.requests[verification_id]) for verification_id in self._claimable_ids(count)]
+
+    def ids_with_status(self, status: str) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(self.by_status.get(status, ()))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            self._expire_leases(time.time())
+            counts = {status: len(ids) for status, ids in self.by_status.items()}
+            return {
+                'total_requests': len(self.requests),
+                'by_status': counts,
+                'verified_users': counts.get(VERIFIED, 0),
+                'pending_verification': counts.get(PENDING, 0) + counts.get(UNDER_REVIEW, 0) - len(self.leases),
+                'in_review': len(self.leases),
+                'rejected_requests': counts.get(REJECTED, 0),
+                'reviewed': self._processed,
+                'average_processing_days': round(self._processing_seconds / self._processed / SECONDS_PER_DAY, 2)
+                if self._processed else None,
+                'active_reviewers': len({lease['reviewer_id'] for lease in self.leases.values()}),
+                'decisions_by_reviewer': dict(self._decisions_by_reviewer)
+            }
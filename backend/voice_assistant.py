@@ -1,17 +1,93 @@
-import json
-import random
+import time
+from collections import deque
 from datetime import datetime, timedelta
+from backend.record_store import load_document
+from backend.geo_alerts import resolve_location
+from backend.voice_nlu import SUPPORTED_LANGUAGES, VoiceNLU
+
+HISTORY_LENGTH = 50
+DEFAULT_QUANTITY_TONS = 1.0
+KG_PER_QUINTAL = 100
+QUINTALS_PER_TON = 10
+SEVERITY_ORDER = {"Low": 1, "Medium": 2, "High": 3, "Critical": 4}
+# voice_commands categories that double as classifier training examples
+COMMAND_INTENTS = {"pricing": "price", "weather": "weather", "marketplace": "mandi"}
+
+# Spoken replies; languages without templates are answered in English
+RESPONSES = {
+    "en": {
+        "price_state": "{crop} is ₹{price:,.0f} per quintal in {state} mandis today, 7-day average ₹{week:,.0f}.",
+        "price_all": "{crop} averages ₹{average:,.0f} per quintal today. Best is {best} at ₹{best_price:,.0f}, lowest {low} at ₹{low_price:,.0f}.",
+        "mandi": "Best mandi for {quantity} of {crop}: {market}, ₹{price:,.0f} per quintal, {distance} km away, about ₹{net:,.0f} after transport and fees.",
+        "mandi_state": "Sell {crop} in {state}: ₹{price:,.0f} per quintal, the highest of all states today.",
+        "weather": "{place}: {temperature:.0f}°C, {description}. Tomorrow {low:.0f} to {high:.0f}°C, {condition}.",
+        "weather_unavailable": "The forecast for {place} is not available right now.",
+        "alerts": "{count} active alert(s), most severe: {severity} {type}.",
+        "no_alerts": "No active weather alerts.",
+        "ask_crop": "Which crop? For example: wheat price in Punjab.",
+        "ask_place": "Which place? For example: weather in Pune.",
+        "no_data": "Sorry, I have no market data for {crop} yet.",
+        "unavailable": "This service is not available right now. Please try again later.",
+        "help": "Ask me about crop prices, the best mandi to sell in, or the weather. For example: wheat price in Punjab.",
+        "unknown": "Sorry, I did not understand. Try: wheat price, where to sell onion, or weather in Pune.",
+    },
+    "hi": {
+        "price_state": "आज {state} की मंडियों में {crop} का भाव ₹{price:,.0f} प्रति क्विंटल है, 7 दिन का औसत ₹{week:,.0f}।",
+        "price_all": "आज {crop} का औसत भाव ₹{average:,.0f} प्रति क्विंटल है। सबसे अच्छा {best} में ₹{best_price:,.0f}, सबसे कम {low} में ₹{low_price:,.0f}।",
+        "mandi": "{quantity} {crop} के लिए सबसे अच्छी मंडी: {market}, ₹{price:,.0f} प्रति क्विंटल, {distance} किमी दूर, भाड़ा और शुल्क काटकर लगभग ₹{net:,.0f}।",
+        "mandi_state": "{crop} {state} में बेचें: ₹{price:,.0f} प्रति क्विंटल, आज सभी राज्यों में सबसे अधिक।",
+        "weather": "{place}: {temperature:.0f}°C, {description}। कल {low:.0f} से {high:.0f}°C, {condition}।",
+        "weather_unavailable": "{place} का मौसम अभी उपलब्ध नहीं है।",
+        "alerts": "{count} सक्रिय चेतावनी, सबसे गंभीर: {severity} {type}।",
+        "no_alerts": "कोई मौसम चेतावनी नहीं है।",
+        "ask_crop": "कौन सी फसल? जैसे: पंजाब में गेहूं का भाव।",
+        "ask_place": "कौन सी जगह? जैसे: पुणे का मौसम।",
+        "no_data": "माफ़ कीजिए, {crop} का मंडी डेटा अभी उपलब्ध नहीं है।",
+        "unavailable": "यह सेवा अभी उपलब्ध नहीं है। कृपया बाद में कोशिश करें।",
+        "help": "मुझसे फसल का भाव, बेचने के लिए सबसे अच्छी मंडी, या मौसम पूछिए। जैसे: पंजाब में गेहूं का भाव।",
+        "unknown": "माफ़ कीजिए, मैं समझ नहीं पाया। पूछिए: गेहूं का भाव, प्याज कहां बेचूं, या पुणे का मौसम।",
+    },
+}
+SUGGESTIONS = {
+    "price": ["Where should I sell it?", "Weather in my area"],
+    "mandi": ["Price in another state", "Weather forecast"],
+    "weather": ["Wheat price today", "Best mandi for onion"],
+    "help": ["Wheat price in Punjab", "Where to sell onion", "Weather in Pune"],
+    "unknown": ["Wheat price in Punjab", "Where to sell onion", "Weather in Pune"],
+}
 
 class VoiceAssistant:
     def __init__(self, data_folder='data'):
         self.load_data()
+        # Intent/slot parser; the app's own popular commands extend the classifier's examples
+        examples = {}
+        for command in self.data.get("voice_commands", []):
+            intent = COMMAND_INTENTS.get(command.get("category"))
+            if intent:
+                examples.setdefault(intent, []).append(command["command"])
+        self.nlu = VoiceNLU(extra_examples=examples)
+        self.pricing_engine = None
+        self.market_comparison = None
+        self.weather_service = None
+        self.disaster_alerts = None
+    
+    def attach_sources(self, pricing_engine=None, market_comparison=None, weather_service=None, disaster_alerts=None):
+        """Answer price / mandi / weather intents from the app's in-memory engines"""
+        self.pricing_engine = pricing_engine
+        self.market_comparison = market_comparison
+        self.weather_service = weather_service
+        self.disaster_alerts = disaster_alerts
     
     def load_data(self):
         try:
-            with open('data/voice_assistant_data.json', 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
+            self.data = load_document('data/voice_assistant_data.json')
         except FileNotFoundError:
             self.data = self.get_default_data()
+        # Per-user ring buffers of recent turns, oldest dropped first
+        self.histories = {
+            user["user_id"]: deque(user["conversations"], maxlen=HISTORY_LENGTH)
+            for user in self.data.get("conversation_history", [])
+        }
     
     def get_default_data(self):
         return {
@@ -77,28 +153,166 @@ class VoiceAssistant:
         }
     
     def process_voice_command(self, command, language="en", user_id=None):
-        # Simulate voice processing
-        response = {
+        started = time.perf_counter()
+        language = str(language or "en").split("-")[0].lower()
+        parsed = self.nlu.parse(command, language)
+        reply_language = language if language in RESPONSES else "en"
+        response, data = self._answer(parsed["intent"], parsed["slots"], reply_language)
+        result = {
             "command": command,
             "language": language,
+            "detected_language": parsed["detected_language"],
+            "response_language": reply_language,
             "timestamp": datetime.now().isoformat(),
-            "confidence": random.uniform(0.85, 0.98),
-            "response": f"Processing: {command}",
-            "suggestions": ["Try asking about weather", "Check crop prices", "Book storage"]
+            "intent": parsed["intent"],
+            "confidence": parsed["confidence"],
+            "method": parsed["method"],
+            "slots": parsed["slots"],
+            "response": response,
+            "data": data,
+            "suggestions": SUGGESTIONS.get(parsed["intent"], []),
+            "cached_parse": parsed["cached"],
+            "processing_ms": round((time.perf_counter() - started) * 1000, 2)
         }
-        return response
+        if user_id:
+            history = self.histories.get(user_id)
+            if history is None:
+                history = self.histories[user_id] = deque(maxlen=HISTORY_LENGTH)
+            history.append({
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "query": command,
+                "response": response,
+                "language": language,
+                "intent": parsed["intent"]
+            })
+        return result
+    
+    def process_query(self, data):
+        """Voice page entry point: {'query', 'language', 'user_id'}"""
+        data = data or {}
+        query = str(data.get("query") or data.get("command") or "").strip()
+        if not query:
+            return {"success": False, "message": "query is required"}
+        result = self.process_voice_command(query, data.get("language", "en"), data.get("user_id"))
+        return dict(result, success=True, audio_response=True)
+    
+    def get_supported_languages(self):
+        """Every language the parser understands, with its configured voice model where there is one"""
+        configured = {str(language["code"]).split("-")[0]: language
+                      for language in self.data.get("supported_languages", self.data.get("languages", []))}
+        names = {language["code"]: language["name"] for language in self.get_default_data()["languages"]}
+        return [
+            dict(configured.get(code, {"language": names.get(code, code), "code": code}),
+                 nlu=True, spoken_replies=code in RESPONSES)
+            for code in SUPPORTED_LANGUAGES
+        ]
+    
+    def _answer(self, intent, slots, language):
+        text = RESPONSES[language]
+        if intent == "price":
+            return self._price_answer(slots, language, text)
+        if intent == "mandi":
+            return self._mandi_answer(slots, language, text)
+        if intent == "weather":
+            return self._weather_answer(slots, text)
+        if intent == "help":
+            return text["help"], None
+        return text["unknown"], None
+    
+    def _price_answer(self, slots, language, text):
+        if "crop" not in slots:
+            return text["ask_crop"], None
+        if self.pricing_engine is None:
+            return text["unavailable"], None
+        crop = slots["crop"]
+        name = self.nlu.display_name(crop, language)
+        markets = self.pricing_engine.historical_data.get(crop)
+        if not markets:
+            return text["no_data"].format(crop=name), None
+        state = slots.get("state")
+        if state in markets:
+            price = self.pricing_engine.get_average_price(crop, state, days=1)
+            week = self.pricing_engine.get_average_price(crop, state, days=7)
+            data = {"crop": crop, "state": state, "price": round(price, 2), "week_average": round(week, 2)}
+            return text["price_state"].format(crop=name, state=state, price=price, week=week), data
+        latest = sorted((self.pricing_engine.get_average_price(crop, market, days=1), market) for market in markets)
+        average = sum(price for price, _ in latest) / len(latest)
+        data = {"crop": crop, "average": round(average, 2), "prices": {market: round(price, 2) for price, market in latest}}
+        return text["price_all"].format(crop=name, average=average, best=latest[-1][1], best_price=latest[-1][0],
+                                        low=latest[0][1], low_price=latest[0][0]), data
+    
+    def _mandi_answer(self, slots, language, text):
+        if "crop" not in slots:
+            return text["ask_crop"], None
+        crop = slots["crop"]
+        name = self.nlu.display_name(crop, language)
+        quintals = slots.get("quantity_quintals")
+        tons = quintals / QUINTALS_PER_TON if quintals else DEFAULT_QUANTITY_TONS
+        compared = self.market_comparison is not None and any(
+            crop.lower() in market for market in self.market_comparison.markets_data.values())
+        if compared:
+            comparison = self.market_comparison.compare_markets(crop.lower(), tons, slots.get("place") or slots.get("state"))
+            quantity = f"{slots['quantity']:g} {slots['unit']}" if "unit" in slots else f"{tons:g} ton"
+            
+            # market_comparison quotes per kg; replies are per quintal, so convert and redo the net
+            def per_quintal(market):
+                price_per_quintal = market["current_price_per_kg"] * KG_PER_QUINTAL
+                gross = price_per_quintal * tons * QUINTALS_PER_TON
+                fee_rate = market["market_fee"] / market["gross_revenue"] if market["gross_revenue"] else 0.0
+                return price_per_quintal, gross, gross * (1 - fee_rate) - market["transportation_cost"]
+            
+            best, (price_per_quintal, gross, net) = max(
+                ((market, per_quintal(market)) for market in comparison["all_markets"]), key=lambda item: item[1][2])
+            data = {"crop": crop, "quantity_tons": tons, "best_market": best["market_name"],
+                    "price_per_kg": best["current_price_per_kg"], "price_per_quintal": price_per_quintal,
+                    "distance_km": best["distance_km"], "gross_revenue": round(gross, 2),
+                    "net_revenue": round(net, 2), "markets_compared": comparison["markets_compared"]}
+            return text["mandi"].format(quantity=quantity, crop=name, market=best["market_name"],
+                                        price=price_per_quintal, distance=best["distance_km"], net=net), data
+        # Crops outside the mandi comparison: the state with the best price today
+        if self.pricing_engine is None:
+            return text["unavailable"], None
+        markets = self.pricing_engine.historical_data.get(crop)
+        if not markets:
+            return text["no_data"].format(crop=name), None
+        price, state = max((self.pricing_engine.get_average_price(crop, market, days=1), market) for market in markets)
+        return text["mandi_state"].format(crop=name, state=state, price=price), {"crop": crop, "state": state, "price": round(price, 2)}
+    
+    def _weather_answer(self, slots, text):
+        location = slots.get("place") or slots.get("state")
+        if not location:
+            return text["ask_place"], None
+        place = location.title()
+        parts = []
+        point = resolve_location(location)
+        cached = None
+        if point is not None and self.weather_service is not None:
+            cached = self.weather_service.get_cached_weather(point[0], point[1])
+        if cached and cached.get("current_weather") and cached.get("forecast"):
+            current = cached["current_weather"]
+            tomorrow = cached["forecast"][1] if len(cached["forecast"]) > 1 else cached["forecast"][0]
+            parts.append(text["weather"].format(place=place, temperature=current["temperature"],
+                                                description=current["description"], low=tomorrow["temperature"]["min"],
+                                                high=tomorrow["temperature"]["max"], condition=tomorrow["condition"]))
+        else:
+            parts.append(text["weather_unavailable"].format(place=place))
+        alerts = self.disaster_alerts.get_alerts(location) if self.disaster_alerts is not None else []
+        if alerts:
+            worst = max(alerts, key=lambda alert: SEVERITY_ORDER.get(alert.get("severity"), 0))
+            parts.append(text["alerts"].format(count=len(alerts), severity=worst.get("severity"),
+                                               type=str(worst.get("type", "")).replace("_", " ")))
+        elif self.disaster_alerts is not None:
+            parts.append(text["no_alerts"])
+        return " ".join(parts), {"location": location, "forecast": cached, "alerts": alerts}
     
     def get_language_stats(self):
         return self.data["languages"]
     
     def get_voice_analytics(self):
-        return self.data["voice_analytics"]
+        return dict(self.data.get("voice_analytics", {}), nlu=self.nlu.get_stats())
     
     def get_conversation_history(self, user_id):
-        for user in self.data["conversation_history"]:
-            if user["user_id"] == user_id:
-                return user["conversations"]
-        return []
+        return list(self.histories.get(user_id, ()))
 
     def test_connection(self):
         """Test if the module is working"""
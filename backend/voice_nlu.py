@@ -0,0 +1,434 @@
+"""
+Voice NLU
+CPU-only intent and slot extraction for voice queries
+
+Utterances (speech-to-text output in any of the ten supported languages,
+often code-mixed, e.g. "gehun ka bhav Punjab mandi") are matched against one
+compiled character trie built from per-language lexicons of intent keywords,
+crops, places and units. Matching starts at every token boundary and keeps
+the longest entry; native-script entries may be followed by inflection
+suffixes (கோதுமையின், गेहूँ का), romanized ones must end at a boundary.
+
+Intents are scored from the matched keywords. When no keyword fires, an
+optional hashed character n-gram centroid classifier (numpy, a few kB) picks
+the nearest intent from example utterances.
+
+Parses are kept in an LRU cache keyed by the normalized utterance, since
+farmers repeat the same handful of questions.
+
+Usage:
+    nlu = VoiceNLU()
+    nlu.parse("गेहूं का भाव पंजाब में")
+    # {'intent': 'price', 'slots': {'crop': 'Wheat', 'state': 'Punjab'}, ...}
+"""
+
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+INTENTS = ('price', 'mandi', 'weather', 'help')
+CACHE_SIZE = 4096
+MIN_CLASSIFIER_SCORE = 0.25
+HASH_DIMENSIONS = 4096
+NGRAM_SIZES = (2, 3, 4)
+
+# Intent keywords per language, with weights; selling words outweigh the bare
+# "market" that also appears in price questions ("market price")
+INTENT_LEXICON = {
+    'price': {
+        'en': ['price', 'prices', 'rate', 'rates', 'cost', 'how much', 'bhav', 'bhaav', 'daam', 'keemat', 'kimat'],
+        'hi': ['भाव', 'दाम', 'कीमत', 'क़ीमत', 'रेट'],
+        'mr': ['भाव', 'दर', 'किंमत'],
+        'pa': ['ਭਾਅ', 'ਕੀਮਤ', 'ਰੇਟ'],
+        'gu': ['ભાવ', 'કિંમત'],
+        'bn': ['দাম', 'দর'],
+        'te': ['ధర'],
+        'ta': ['விலை'],
+        'kn': ['ಬೆಲೆ', 'ದರ'],
+        'ml': ['വില'],
+    },
+    'mandi': {
+        'en': ['sell', 'selling', 'buyer', 'buyers', 'best market', 'which market', 'where to sell', 'which mandi',
+               'best mandi', 'bechna', 'bechu'],
+        'hi': ['बेच', 'खरीदार', 'कौन सी मंडी', 'सबसे अच्छी मंडी'],
+        'mr': ['विक', 'खरेदीदार'],
+        'pa': ['ਵੇਚ'],
+        'gu': ['વેચ'],
+        'bn': ['বিক্রি'],
+        'te': ['అమ్మ'],
+        'ta': ['விற்'],
+        'kn': ['ಮಾರಾಟ'],
+        'ml': ['വിൽക്ക', 'വിൽപ്പന'],
+    },
+    'weather': {
+        'en': ['weather', 'rain', 'rainfall', 'forecast', 'temperature', 'monsoon', 'mausam', 'barish'],
+        'hi': ['मौसम', 'बारिश', 'वर्षा', 'तापमान'],
+        'mr': ['हवामान', 'पाऊस'],
+        'pa': ['ਮੌਸਮ', 'ਮੀਂਹ'],
+        'gu': ['હવામાન', 'વરસાદ'],
+        'bn': ['আবহাওয়া', 'বৃষ্টি'],
+        'te': ['వాతావరణం', 'వర్షం'],
+        'ta': ['வானிலை', 'மழை'],
+        'kn': ['ಹವಾಮಾನ', 'ಮಳೆ'],
+        'ml': ['കാലാവസ്ഥ', 'മഴ'],
+    },
+    'help': {
+        'en': ['help', 'what can you do', 'madad'],
+        'hi': ['मदद', 'सहायता'],
+        'mr': ['मदत'],
+        'pa': ['ਮਦਦ'],
+        'gu': ['મદદ'],
+        'bn': ['সাহায্য'],
+        'te': ['సహాయం'],
+        'ta': ['உதவி'],
+        'kn': ['ಸಹಾಯ'],
+        'ml': ['സഹായം'],
+    },
+}
+INTENT_WEIGHTS = {'price': 1.0, 'mandi': 1.5, 'weather': 1.0, 'help': 0.8}
+MARKET_WORDS = {'en': ['mandi', 'market', 'markets', 'bazaar'], 'hi': ['मंडी', 'बाजार', 'बाज़ार'],
+                'mr': ['मंडई', 'बाजार'], 'pa': ['ਮੰਡੀ'], 'gu': ['બજાર'], 'bn': ['বাজার'], 'te': ['మార్కెట్'],
+                'ta': ['சந்தை'], 'kn': ['ಮಾರುಕಟ್ಟೆ'], 'ml': ['ചന്ത', 'മാർക്കറ്റ്']}
+MARKET_WEIGHT = 0.6
+
+# Crop names keyed by the pricing engine's crop names; the first entry per
+# language is the display name used in replies
+CROP_LEXICON = {
+    'Wheat': {'en': ['wheat', 'gehun', 'gehu', 'kanak'], 'hi': ['गेहूं', 'गेहूँ', 'गेहुं'], 'mr': ['गहू'],
+              'pa': ['ਕਣਕ'], 'gu': ['ઘઉં'], 'bn': ['গম'], 'te': ['గోధుమ'], 'ta': ['கோதுமை'], 'kn': ['ಗೋಧಿ'],
+              'ml': ['ഗോതമ്പ്']},
+    'Rice': {'en': ['rice', 'paddy', 'chawal', 'dhan'], 'hi': ['धान', 'चावल'], 'mr': ['भात', 'तांदूळ'],
+             'pa': ['ਝੋਨਾ', 'ਚਾਵਲ', 'ਧਾਨ'], 'gu': ['ડાંગર', 'ચોખા'], 'bn': ['ধান', 'চাল'], 'te': ['వరి', 'బియ్యం'],
+             'ta': ['நெல்', 'அரிசி'], 'kn': ['ಭತ್ತ', 'ಅಕ್ಕಿ'], 'ml': ['നെല്ല്', 'അരി']},
+    'Maize': {'en': ['maize', 'corn', 'makka', 'makki'], 'hi': ['मक्का'], 'mr': ['मका'], 'pa': ['ਮੱਕੀ'],
+              'gu': ['મકાઈ'], 'bn': ['ভুট্টা'], 'te': ['మొక్కజొన్న'], 'ta': ['மக்காச்சோளம்'], 'kn': ['ಮೆಕ್ಕೆಜೋಳ'],
+              'ml': ['ചോളം']},
+    'Sugarcane': {'en': ['sugarcane', 'ganna'], 'hi': ['गन्ना', 'गन्ने'], 'mr': ['ऊस'], 'pa': ['ਗੰਨਾ'],
+                  'gu': ['શેરડી'], 'bn': ['আখ'], 'te': ['చెరకు'], 'ta': ['கரும்பு'], 'kn': ['ಕಬ್ಬು'],
+                  'ml': ['കരിമ്പ്']},
+    'Cotton': {'en': ['cotton', 'kapas'], 'hi': ['कपास'], 'mr': ['कापूस'], 'pa': ['ਕਪਾਹ', 'ਨਰਮਾ'], 'gu': ['કપાસ'],
+               'bn': ['তুলা'], 'te': ['పత్తి'], 'ta': ['பருத்தி'], 'kn': ['ಹತ್ತಿ'], 'ml': ['പരുത്തി']},
+    'Soybean': {'en': ['soybean', 'soyabean', 'soya'], 'hi': ['सोयाबीन'], 'mr': ['सोयाबीन'], 'pa': ['ਸੋਇਆਬੀਨ'],
+                'gu': ['સોયાબીન'], 'bn': ['সয়াবিন'], 'te': ['సోయాబీన్'], 'ta': ['சோயா'], 'kn': ['ಸೋಯಾ'],
+                'ml': ['സോയാബീൻ']},
+    'Onion': {'en': ['onion', 'onions', 'pyaz', 'pyaaz', 'kanda'], 'hi': ['प्याज', 'प्याज़'], 'mr': ['कांदा'],
+              'pa': ['ਪਿਆਜ਼', 'ਪਿਆਜ'], 'gu': ['ડુંગળી'], 'bn': ['পেঁয়াজ'], 'te': ['ఉల్లిపాయ', 'ఉల్లి'],
+              'ta': ['வெங்காயம்'], 'kn': ['ಈರುಳ್ಳಿ'], 'ml': ['ഉള്ളി']},
+    'Potato': {'en': ['potato', 'potatoes', 'aloo', 'alu'], 'hi': ['आलू'], 'mr': ['बटाटा'], 'pa': ['ਆਲੂ'],
+               'gu': ['બટાકા', 'બટાટા'], 'bn': ['আলু'], 'te': ['బంగాళాదుంప'], 'ta': ['உருளைக்கிழங்கு'],
+               'kn': ['ಆಲೂಗಡ್ಡೆ'], 'ml': ['ഉരുളക്കിഴങ്ങ്']},
+    'Tomato': {'en': ['tomato', 'tomatoes', 'tamatar'], 'hi': ['टमाटर'], 'mr': ['टोमॅटो'], 'pa': ['ਟਮਾਟਰ'],
+               'gu': ['ટામેટા', 'ટમેટા'], 'bn': ['টমেটো'], 'te': ['టమాటా', 'టమోటా'], 'ta': ['தக்காளி'],
+               'kn': ['ಟೊಮೆಟೊ'], 'ml': ['തക്കാളി']},
+    'Chili': {'en': ['chili', 'chilli', 'chilly', 'chillies', 'mirch', 'mirchi'], 'hi': ['मिर्च', 'मिर्ची'],
+              'mr': ['मिरची'], 'pa': ['ਮਿਰਚ'], 'gu': ['મરચું', 'મરચા'], 'bn': ['লঙ্কা', 'মরিচ'], 'te': ['మిర్చి', 'మిరప'],
+              'ta': ['மிளகாய்'], 'kn': ['ಮೆಣಸಿನಕಾಯಿ'], 'ml': ['മുളക്']},
+}
+
+# States keyed by the pricing engine's market names
+STATE_LEXICON = {
+    'Punjab': ['punjab', 'पंजाब', 'ਪੰਜਾਬ'],
+    'Haryana': ['haryana', 'हरियाणा', 'ਹਰਿਆਣਾ'],
+    'Uttar Pradesh': ['uttar pradesh', 'उत्तर प्रदेश', 'यूपी'],
+    'Maharashtra': ['maharashtra', 'महाराष्ट्र'],
+    'Karnataka': ['karnataka', 'कर्नाटक', 'ಕರ್ನಾಟಕ'],
+    'Tamil Nadu': ['tamil nadu', 'tamilnadu', 'तमिलनाडु', 'தமிழ்நாடு', 'தமிழகம்'],
+    'Gujarat': ['gujarat', 'गुजरात', 'ગુજરાત'],
+    'Rajasthan': ['rajasthan', 'राजस्थान'],
+}
+# Gazetteer places (backend.geo_alerts) with the state whose mandi prices apply
+PLACE_LEXICON = {
+    'pune': ('Maharashtra', ['पुणे']), 'mumbai': ('Maharashtra', ['मुंबई']), 'nashik': ('Maharashtra', ['नाशिक']),
+    'aurangabad': ('Maharashtra', ['औरंगाबाद']), 'nagpur': ('Maharashtra', ['नागपुर', 'नागपूर']),
+    'ahmednagar': ('Maharashtra', ['अहमदनगर']), 'beed': ('Maharashtra', ['बीड']),
+    'osmanabad': ('Maharashtra', ['उस्मानाबाद']), 'latur': ('Maharashtra', ['लातूर']),
+    'solapur': ('Maharashtra', ['सोलापूर', 'सोलापुर']), 'kolhapur': ('Maharashtra', ['कोल्हापूर', 'कोल्हापुर']),
+    'sangli': ('Maharashtra', ['सांगली']), 'satara': ('Maharashtra', ['सातारा']), 'thane': ('Maharashtra', ['ठाणे']),
+    'raigad': ('Maharashtra', ['रायगड']), 'ratnagiri': ('Maharashtra', ['रत्नागिरी']),
+    'sindhudurg': ('Maharashtra', ['सिंधुदुर्ग']), 'ludhiana': ('Punjab', ['लुधियाना', 'ਲੁਧਿਆਣਾ']),
+    'amritsar': ('Punjab', ['अमृतसर', 'ਅੰਮ੍ਰਿਤਸਰ']), 'jaipur': ('Rajasthan', ['जयपुर']),
+    'ahmedabad': ('Gujarat', ['अहमदाबाद', 'અમદાવાદ']), 'bengaluru': ('Karnataka', ['bangalore', 'ಬೆಂಗಳೂರು']),
+    'mysuru': ('Karnataka', ['mysore', 'ಮೈಸೂರು']),
+}
+
+# Quantity units, as quintals per unit
+UNIT_LEXICON = {
+    'quintal': (1.0, ['quintal', 'quintals', 'qtl', 'क्विंटल', 'ਕੁਇੰਟਲ', 'ક્વિન્ટલ', 'কুইন্টাল', 'క్వింటాల్',
+                      'குவிண்டால்', 'ಕ್ವಿಂಟಲ್', 'ക്വിന്റൽ']),
+    'ton': (10.0, ['ton', 'tons', 'tonne', 'tonnes', 'टन', 'ਟਨ', 'ટન', 'টন', 'టన్', 'டன்', 'ಟನ್', 'ടൺ']),
+    'kg': (0.01, ['kg', 'kgs', 'kilo', 'kilogram', 'किलो', 'ਕਿੱਲੋ', 'કિલો', 'কেজি', 'కిలో', 'கிலோ', 'ಕೆಜಿ', 'കിലോ']),
+}
+
+# Example utterances for the fallback classifier
+TRAINING_UTTERANCES = {
+    'price': ['what is the price of wheat today', 'rate of onion', 'how much is cotton selling for',
+              'gehun ka bhav kya hai', 'आज प्याज का भाव क्या है', 'टमाटर का दाम', 'கோதுமை விலை என்ன',
+              'పత్తి ధర ఎంత', 'ਕਣਕ ਦਾ ਭਾਅ', 'কত দাম আলুর'],
+    'mandi': ['where should i sell my rice', 'best mandi for onion', 'find buyers for my cotton',
+              'which market gives more money', 'धान कहां बेचूं', 'सबसे अच्छी मंडी कौन सी है',
+              'मला कांदा कुठे विकायचा', 'ਕਣਕ ਕਿੱਥੇ ਵੇਚਾਂ', 'பருத்தி எங்கே விற்பது'],
+    'weather': ['show me weather forecast', 'will it rain tomorrow', 'is rain coming this week',
+                'how hot will it be', 'कल बारिश होगी क्या', 'आज मौसम कैसा है', 'उद्या पाऊस पडेल का',
+                'நாளை மழை வருமா', 'రేపు వర్షం పడుతుందా'],
+    'help': ['help', 'what can you do', 'how do i use this', 'मेरी मदद करो', 'आप क्या कर सकते हो'],
+}
+
+SCRIPT_LANGUAGES = (
+    (0x0900, 0x097F, 'hi'), (0x0980, 0x09FF, 'bn'), (0x0A00, 0x0A7F, 'pa'), (0x0A80, 0x0AFF, 'gu'),
+    (0x0B80, 0x0BFF, 'ta'), (0x0C00, 0x0C7F, 'te'), (0x0C80, 0x0CFF, 'kn'), (0x0D00, 0x0D7F, 'ml'),
+)
+SUPPORTED_LANGUAGES = ('en', 'hi', 'bn', 'te', 'ta', 'mr', 'gu', 'kn', 'ml', 'pa')
+SHARED_SCRIPTS = {'mr': 'hi'}  # Marathi is written in Devanagari
+
+_SEPARATORS = re.compile(r"[\s।॥.,!?;:\"'()\[\]{}/\\|-]+")
+_NUMBER = re.compile(r'^\d+(?:\.\d+)?$')
+_END = '\0'
+
+
+def normalize(text: str) -> str:
+    """NFC, case-folded, punctuation (incl. danda) collapsed to single spaces"""
+    text = unicodedata.normalize('NFC', str(text or '')).casefold()
+    return _SEPARATORS.sub(' ', text).strip()
+
+
+def detect_script(text: str) -> Optional[str]:
+    """Language code of the first Indic script character, 'en' for Latin text, None if neither"""
+    for char in text:
+        code = ord(char)
+        for start, end, language in SCRIPT_LANGUAGES:
+            if start <= code <= end:
+                return language
+        if char.isascii() and char.isalpha():
+            return 'en'
+    return None
+
+
+class KeywordTrie:
+    """Character trie over normalized lexicon entries, matched longest-first from token starts"""
+
+    def __init__(self):
+        self.root: Dict = {}
+        self.entries = 0
+
+    def add(self, phrase: str, payload: Tuple) -> None:
+        node = self.root
+        for char in normalize(phrase):
+            node = node.setdefault(char, {})
+        node.setdefault(_END, []).append(payload)
+        self.entries += 1
+
+    def scan(self, text: str) -> List[Tuple[int, int, List[Tuple]]]:
+        """(start, end, payloads) for each non-overlapping longest match in normalized text"""
+        matches = []
+        length = len(text)
+        i = 0
+        while i < length:
+            node = self.root
+            best = None
+            j = i
+            while j < length and text[j] in node:
+                node = node[text[j]]
+                j += 1
+                if _END in node:
+                    at_boundary = j == length or text[j] == ' '
+                    # Native-script words take case suffixes; romanized ones must end cleanly
+                    if at_boundary or not text[j - 1].isascii():
+                        best = (j, node[_END])
+            if best is not None:
+                end, payloads = best
+                matches.append((i, end, payloads))
+                i = end
+            next_space = text.find(' ', i)
+            if next_space < 0:
+                break
+            i = next_space + 1
+        return matches
+
+
+class CentroidClassifier:
+    """Hashed character n-gram vectors, one L2-normalized centroid per intent"""
+
+    def __init__(self, examples: Dict[str, Iterable[str]], dimensions: int = HASH_DIMENSIONS):
+        self.dimensions = dimensions
+        self.labels = list(examples)
+        centroids = np.zeros((len(self.labels), dimensions), dtype=np.float32)
+        for row, label in enumerate(self.labels):
+            for utterance in examples[label]:
+                centroids[row] += self.vectorize(normalize(utterance))
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids / np.maximum(norms, 1e-9)
+
+    def vectorize(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        indices = [zlib.crc32(gram.encode('utf-8')) % self.dimensions
+                   for token in text.split() for padded in (f' {token} ',)
+                   for size in NGRAM_SIZES for k in range(len(padded) - size + 1)
+                   for gram in (padded[k:k + size],)]
+        if indices:
+            np.add.at(vector, indices, 1.0)
+            vector /= np.linalg.norm(vector)
+        return vector
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        scores = self.centroids @ self.vectorize(text)
+        best = int(np.argmax(scores))
+        return self.labels[best], float(scores[best])
+
+
+class VoiceNLU:
+    """Intent + slot parser with an LRU cache of recent utterances"""
+
+    def __init__(self, extra_examples: Optional[Dict[str, Iterable[str]]] = None, classifier: bool = True,
+                 cache_size: int = CACHE_SIZE):
+        self.trie = self._compile()
+        examples = {intent: list(utterances) for intent, utterances in TRAINING_UTTERANCES.items()}
+        for intent, utterances in (extra_examples or {}).items():
+            examples.setdefault(intent, []).extend(utterances)
+        self.classifier = CentroidClassifier(examples) if classifier else None
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple[str, str], Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _compile() -> KeywordTrie:
+        trie = KeywordTrie()
+        for intent, languages in INTENT_LEXICON.items():
+            for language, phrases in languages.items():
+                for phrase in phrases:
+                    trie.add(phrase, ('intent', intent, INTENT_WEIGHTS[intent], language))
+        for language, phrases in MARKET_WORDS.items():
+            for phrase in phrases:
+                trie.add(phrase, ('intent', 'mandi', MARKET_WEIGHT, language))
+        for crop, languages in CROP_LEXICON.items():
+            for language, phrases in languages.items():
+                for phrase in phrases:
+                    trie.add(phrase, ('crop', crop, 1.0, language))
+        for state, phrases in STATE_LEXICON.items():
+            for phrase in phrases:
+                trie.add(phrase, ('state', state, 1.0, None))
+        for place, (state, aliases) in PLACE_LEXICON.items():
+            for phrase in [place] + aliases:
+                trie.add(phrase, ('place', place, 1.0, state))
+        for unit, (quintals, phrases) in UNIT_LEXICON.items():
+            for phrase in phrases:
+                trie.add(phrase, ('unit', unit, quintals, None))
+        return trie
+
+    def parse(self, utterance: str, language: str = 'en') -> Dict:
+        """{'intent', 'confidence', 'method', 'slots', 'detected_language', 'cached'} for one utterance"""
+        text = normalize(utterance)
+        key = (text, language)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+        if cached is not None:
+            return dict(cached, slots=dict(cached['slots']), cached=True)
+
+        parsed = self._parse(text, language)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = parsed
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(parsed, slots=dict(parsed['slots']), cached=False)
+
+    def _parse(self, text: str, language: str) -> Dict:
+        scores = dict.fromkeys(INTENTS, 0.0)
+        slots: Dict = {}
+        matched_languages = set()
+        tokens = text.split(' ') if text else []
+        offsets = [0]
+        for token in tokens[:-1]:
+            offsets.append(offsets[-1] + len(token) + 1)
+
+        for start, end, payloads in self.trie.scan(text):
+            for kind, value, weight, extra in payloads:
+                if kind in ('intent', 'crop'):
+                    matched_languages.add(extra)
+                if kind == 'intent':
+                    scores[value] += weight
+                elif kind == 'crop':
+                    slots.setdefault('crop', value)
+                elif kind == 'state':
+                    slots.setdefault('state', value)
+                elif kind == 'place':
+                    slots.setdefault('place', value)
+                    slots.setdefault('state', extra)
+                elif kind == 'unit' and 'quantity' not in slots:
+                    number = self._number_before(tokens, offsets, start)
+                    if number is not None:
+                        slots['quantity'] = number
+                        slots['unit'] = value
+                        slots['quantity_quintals'] = round(number * weight, 4)
+        if 'quantity' not in slots:
+            numbers = [float(token) for token in tokens if _NUMBER.match(token)]
+            if numbers:
+                slots['quantity'] = numbers[0]
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], INTENTS.index(item[0])))
+        (intent, top), (_, runner_up) = ranked[0], ranked[1]
+        if top > 0:
+            method = 'keyword'
+            confidence = top / (top + runner_up + 0.25)
+        elif self.classifier is not None and text:
+            method = 'classifier'
+            intent, confidence = self.classifier.predict(text)
+            if confidence < MIN_CLASSIFIER_SCORE:
+                intent = 'unknown'
+        else:
+            method, intent, confidence = 'none', 'unknown', 0.0
+        # A crop on its own ("wheat?") is almost always a price question
+        if intent == 'unknown' and 'crop' in slots:
+            method, intent, confidence = 'slot', 'price', 0.6
+
+        return {
+            'intent': intent,
+            'confidence': round(confidence, 3),
+            'method': method,
+            'slots': slots,
+            'detected_language': self._detect_language(text, language, matched_languages),
+        }
+
+    @staticmethod
+    def _detect_language(text: str, hint: str, matched_languages: set) -> str:
+        script = detect_script(text)
+        if script is None or script == SHARED_SCRIPTS.get(hint, hint):
+            return hint
+        for language, shared in SHARED_SCRIPTS.items():
+            if shared == script and language in matched_languages and script not in matched_languages:
+                return language
+        return script
+
+    @staticmethod
+    def _number_before(tokens: List[str], offsets: List[int], start: int) -> Optional[float]:
+        """Numeric token directly before the unit word starting at `start`"""
+        index = offsets.index(start)
+        if index > 0 and _NUMBER.match(tokens[index - 1]):
+            return float(tokens[index - 1])
+        return None
+
+    def display_name(self, crop: str, language: str) -> str:
+        """Crop name in the reply language, falling back to English"""
+        names = CROP_LEXICON.get(crop, {}).get(language)
+        return names[0] if names and language != 'en' else crop
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'lexicon_entries': self.trie.entries,
+            'languages': list(SUPPORTED_LANGUAGES),
+            'classifier': self.classifier is not None,
+            'cache_size': len(self._cache),
+            'cache_hits': self.hits,
+            'cache_misses': self.misses,
+            'cache_hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -1,11 +1,12 @@
 import json
 import random
 from datetime import datetime, timedelta
+from backend.shared_reference import load_reference
 
 class YieldPredictionEngine:
     def __init__(self, data_folder='data'):
         # Massive yield prediction data
-        self.historical_yields = self._generate_historical_data()
+        self.historical_yields = load_reference('yield_history', self._generate_historical_data)
         self.weather_factors = {
             "temperature": {"optimal_min": 20, "optimal_max": 30, "impact_weight": 0.25},
             "rainfall": {"optimal_min": 600, "optimal_max": 1200, "impact_weight": 0.30},
@@ -83,6 +84,15 @@ class YieldPredictionEngine:
         ])
         return recommendations
     
+    def get_expected_yield(self, crop):
+        """Average yield per hectare from the crop table, else the yield history"""
+        if crop in self.crop_yield_data:
+            return self.crop_yield_data[crop]["avg_yield"]
+        if crop in self.historical_yields:
+            history = self.historical_yields[crop]
+            return sum(d["yield_per_hectare"] for d in history) / len(history)
+        return None
+    
     def _get_historical_comparison(self, crop):
         if crop in self.historical_yields:
             recent_data = self.historical_yields[crop][-12:]  # Last 12 months
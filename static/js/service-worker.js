@@ -27,6 +27,20 @@ const API_CACHE_ENDPOINTS = [
   '/api/elearning/courses'
 ];
 
+// Incremental sync: collections mirrored into IndexedDB from /api/sync
+const SYNC_ENDPOINT = '/api/sync';
+const SYNC_COLLECTIONS = ['forum_questions', 'courses', 'prices', 'alerts'];
+const SYNC_BATCH_SIZE = 50;
+
+// Writes that are queued while offline and replayed through /api/sync
+const OFFLINE_WRITE_ENDPOINTS = {
+  '/api/forum/ask': 'forum_question',
+  '/api/farmer-trade/post': 'trade_listing'
+};
+
+const DB_NAME = 'agrisuper-sync';
+const DB_VERSION = 1;
+
 // Install event - cache critical assets
 self.addEventListener('install', (event) => {
   console.log('[ServiceWorker] Installing...');
@@ -75,6 +89,12 @@ self.addEventListener('fetch', (event) => {
   const { request } = event;
   const url = new URL(request.url);
 
+  // Queue offline-capable writes when the network is unavailable
+  if (request.method === 'POST' && OFFLINE_WRITE_ENDPOINTS[url.pathname]) {
+    event.respondWith(networkOrQueueWrite(request, OFFLINE_WRITE_ENDPOINTS[url.pathname]));
+    return;
+  }
+
   // Skip non-GET requests
   if (request.method !== 'GET') {
     return;
@@ -198,30 +218,49 @@ self.addEventListener('sync', (event) => {
 });
 
 /**
- * Sync offline data when connection is restored
+ * Sync offline data when connection is restored:
+ * replay queued writes in batches and apply change-feed deltas to IndexedDB
  */
 async function syncOfflineData() {
   try {
-    // Get pending offline actions from IndexedDB or localStorage
-    const pendingActions = await getPendingActions();
-    
-    // Process each pending action
-    for (const action of pendingActions) {
-      try {
-        const response = await fetch(action.url, {
-          method: action.method,
-          headers: action.headers,
-          body: action.body
-        });
-        
-        if (response.ok) {
-          // Remove from pending queue
-          await removePendingAction(action.id);
-          console.log('[ServiceWorker] Synced offline action:', action.id);
-        }
-      } catch (error) {
-        console.error('[ServiceWorker] Failed to sync action:', action.id, error);
+    let pendingActions = await getPendingActions();
+    let cursor = await getSyncCursor();
+    let hasMore = true;
+
+    while (hasMore || pendingActions.length > 0) {
+      const batch = pendingActions.slice(0, SYNC_BATCH_SIZE);
+      pendingActions = pendingActions.slice(SYNC_BATCH_SIZE);
+
+      const response = await fetch(SYNC_ENDPOINT, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          cursor: cursor,
+          collections: SYNC_COLLECTIONS,
+          writes: batch.map((action) => ({
+            client_write_id: action.client_write_id,
+            type: action.type,
+            payload: action.payload
+          }))
+        })
+      });
+
+      if (!response.ok) {
+        throw new Error(`Sync failed with status ${response.status}`);
       }
+
+      const feed = await response.json();
+      await applyChanges(feed);
+
+      // Writes are acknowledged (or permanently rejected) once the server answers
+      for (const action of batch) {
+        await removePendingAction(action.id);
+        console.log('[ServiceWorker] Synced offline action:', action.id);
+      }
+
+      cursor = feed.cursor;
+      await setSyncCursor(cursor);
+      hasMore = feed.has_more;
     }
   } catch (error) {
     console.error('[ServiceWorker] Sync failed:', error);
@@ -229,6 +268,36 @@ async function syncOfflineData() {
   }
 }
 
+/**
+ * Try a write against the network; if offline, queue it for background sync
+ */
+async function networkOrQueueWrite(request, writeType) {
+  const queuedRequest = request.clone();
+  try {
+    return await fetch(request);
+  } catch (error) {
+    const payload = await queuedRequest.json();
+    const clientWriteId = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    await addPendingAction({ client_write_id: clientWriteId, type: writeType, payload: payload });
+
+    if (self.registration.sync) {
+      await self.registration.sync.register('sync-offline-data');
+    }
+
+    return new Response(
+      JSON.stringify({
+        status: 'queued',
+        client_write_id: clientWriteId,
+        message: 'आप ऑफ़लाइन हैं। कनेक्शन मिलते ही भेजा जाएगा। Saved offline, will be sent when you reconnect.'
+      }),
+      {
+        status: 202,
+        headers: new Headers({ 'Content-Type': 'application/json' })
+      }
+    );
+  }
+}
+
 /**
  * Push notification handler
  */
@@ -288,6 +357,10 @@ self.addEventListener('message', (event) => {
     self.skipWaiting();
   }
   
+  if (event.data && event.data.type === 'SYNC_NOW') {
+    event.waitUntil(syncOfflineData());
+  }
+  
   if (event.data && event.data.type === 'CACHE_URLS') {
     event.waitUntil(
       caches.open(CACHE_NAME)
@@ -297,13 +370,64 @@ self.addEventListener('message', (event) => {
 });
 
 // Helper functions for IndexedDB operations
+function openSyncDB() {
+  return new Promise((resolve, reject) => {
+    const open = indexedDB.open(DB_NAME, DB_VERSION);
+    open.onupgradeneeded = () => {
+      const db = open.result;
+      db.createObjectStore('records', { keyPath: ['collection', 'id'] });
+      db.createObjectStore('meta');
+      db.createObjectStore('outbox', { keyPath: 'id', autoIncrement: true });
+    };
+    open.onsuccess = () => resolve(open.result);
+    open.onerror = () => reject(open.error);
+  });
+}
+
+async function withStore(storeName, mode, callback) {
+  const db = await openSyncDB();
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(storeName, mode);
+    const result = callback(tx.objectStore(storeName));
+    tx.oncomplete = () => resolve(result && 'result' in result ? result.result : result);
+    tx.onerror = () => reject(tx.error);
+  });
+}
+
+async function getSyncCursor() {
+  const cursor = await withStore('meta', 'readonly', (store) => store.get('cursor'));
+  return cursor || 0;
+}
+
+async function setSyncCursor(cursor) {
+  return withStore('meta', 'readwrite', (store) => store.put(cursor, 'cursor'));
+}
+
+async function applyChanges(feed) {
+  return withStore('records', 'readwrite', (store) => {
+    for (const [collection, records] of Object.entries(feed.changes || {})) {
+      for (const change of records) {
+        store.put({ collection: collection, id: change.id, version: change.version, record: change.record });
+      }
+    }
+    for (const [collection, ids] of Object.entries(feed.deleted || {})) {
+      for (const id of ids) {
+        store.delete([collection, id]);
+      }
+    }
+  });
+}
+
+async function addPendingAction(action) {
+  return withStore('outbox', 'readwrite', (store) => store.add(action));
+}
+
 async function getPendingActions() {
-  // Placeholder - implement IndexedDB logic
-  return [];
+  return withStore('outbox', 'readonly', (store) => store.getAll());
 }
 
 async function removePendingAction(actionId) {
-  // Placeholder - implement IndexedDB logic
+  await withStore('outbox', 'readwrite', (store) => store.delete(actionId));
   return true;
 }
 
@@ -0,0 +1,178 @@
+"""
+SMS gateway pipeline against the in-process FakeGateway: priority order,
+per-operator rate limits (per dispatcher and shared across processes),
+retry with exponential backoff, rejections and delivery receipts.
+
+    python -m pytest tests/test_sms_gateway.py
+"""
+
+import multiprocessing
+import time
+
+from backend.sms_gateway import (PRIORITY_ALERT, PRIORITY_BROADCAST, PRIORITY_REPLY, FakeGateway,
+                                 SMSDispatcher)
+
+JIO = '7000000001'
+
+
+class RecordingGateway(FakeGateway):
+    """FakeGateway that remembers every submission attempt"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submissions = []
+
+    def submit_batch(self, operator, messages):
+        self.submissions.append((time.monotonic(), operator, [m['text'] for m in messages]))
+        return super().submit_batch(operator, messages)
+
+
+class ManualReceiptGateway(RecordingGateway):
+    """Receipts only arrive through the DLR webhook"""
+    poll_receipts = None
+
+
+def make_dispatcher(gateway, **kwargs):
+    return SMSDispatcher(gateway, background=False, **kwargs)
+
+
+def run_until_idle(dispatcher, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while dispatcher.pending() and time.monotonic() < deadline:
+        time.sleep(min(dispatcher.run_once(), 0.01))
+    dispatcher.run_once()
+
+
+def test_alerts_go_before_replies_before_broadcasts():
+    gateway = RecordingGateway(seed=1)
+    dispatcher = make_dispatcher(gateway)
+    dispatcher.enqueue_many([JIO] * 3, 'broadcast', priority=PRIORITY_BROADCAST)
+    dispatcher.enqueue(JIO, 'reply 1', priority=PRIORITY_REPLY)
+    dispatcher.enqueue(JIO, 'alert', priority=PRIORITY_ALERT)
+    dispatcher.enqueue(JIO, 'reply 2', priority=PRIORITY_REPLY)
+
+    dispatcher.run_once()
+
+    texts = [text for _, _, batch in gateway.submissions for text in batch]
+    assert texts == ['alert', 'reply 1', 'reply 2', 'broadcast', 'broadcast', 'broadcast']
+
+
+def test_operator_rate_limit_caps_each_drain():
+    gateway = RecordingGateway(seed=1)
+    dispatcher = make_dispatcher(gateway, rate_limits={'jio': 10}, batch_size=100)
+    dispatcher.enqueue_many([JIO] * 25, 'reply', priority=PRIORITY_REPLY)
+
+    dispatcher.run_once()
+    assert gateway.accepted == 10
+    wait = dispatcher.run_once()
+    assert gateway.accepted == 10
+    assert 0 < wait <= 0.1 + 1e-6
+
+    time.sleep(0.35)
+    dispatcher.run_once()
+    assert 12 <= gateway.accepted <= 15
+
+
+def test_broadcast_waits_for_a_full_batch_of_tokens():
+    gateway = RecordingGateway(seed=1)
+    dispatcher = make_dispatcher(gateway, rate_limits={'jio': 20}, batch_size=20)
+    dispatcher.enqueue_many([JIO] * 40, 'broadcast', priority=PRIORITY_BROADCAST)
+
+    dispatcher.run_once()
+    time.sleep(0.1)
+    dispatcher.run_once()
+
+    assert [len(batch) for _, _, batch in gateway.submissions] == [20]
+
+
+def _take_tokens(directory, results):
+    dispatcher = make_dispatcher(RecordingGateway(seed=2), rate_limits={'jio': 50}, rate_limit_dir=directory)
+    dispatcher.enqueue_many([JIO] * 50, 'reply', priority=PRIORITY_REPLY)
+    dispatcher.run_once()
+    results.put(dispatcher.gateway.accepted)
+
+
+def test_rate_limit_dir_shares_one_budget_across_processes(tmp_path):
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_take_tokens, args=(str(tmp_path), results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+    accepted = [results.get(timeout=5) for _ in workers]
+
+    # One second of burst for the operator in total, not one per process
+    assert 50 <= sum(accepted) < 60
+
+
+def test_failed_submission_retries_with_exponential_backoff():
+    gateway = RecordingGateway(failure_rate=1.0, seed=1)
+    dispatcher = make_dispatcher(gateway, max_attempts=3, retry_base=0.05)
+    message_id = dispatcher.enqueue(JIO, 'reply')
+
+    dispatcher.run_once()
+    status = dispatcher.status(message_id)
+    assert status['status'] == 'retrying'
+    assert status['attempts'] == 1
+
+    run_until_idle(dispatcher)
+    status = dispatcher.status(message_id)
+    assert status['status'] == 'failed'
+    assert status['attempts'] == 3
+    assert 'timed out' in status['error']
+
+    times = [submitted for submitted, _, _ in gateway.submissions]
+    assert len(times) == 3
+    assert times[1] - times[0] >= 0.05
+    assert times[2] - times[1] >= 0.1
+    stats = dispatcher.get_stats()
+    assert stats['gateway_errors'] == 3
+    assert stats['retried'] == 2
+
+
+def test_rejected_number_fails_without_retry():
+    gateway = RecordingGateway(seed=1)
+    dispatcher = make_dispatcher(gateway)
+    message_id = dispatcher.enqueue('12345', 'reply')
+
+    run_until_idle(dispatcher)
+
+    status = dispatcher.status(message_id)
+    assert status['status'] == 'failed'
+    assert status['attempts'] == 1
+    assert status['error'] == 'invalid number'
+    assert dispatcher.get_stats()['rejected'] == 1
+
+
+def test_polled_receipts_mark_messages_delivered():
+    gateway = RecordingGateway(seed=1)
+    dispatcher = make_dispatcher(gateway)
+    ids = dispatcher.enqueue_many([JIO, '9800000001'], 'broadcast', priority=PRIORITY_REPLY)
+
+    dispatcher.run_once()
+
+    assert [dispatcher.status(message_id)['status'] for message_id in ids] == ['delivered', 'delivered']
+    assert dispatcher.get_stats()['awaiting_receipt'] == 0
+
+
+def test_delivery_receipt_webhook():
+    gateway = ManualReceiptGateway(seed=1)
+    dispatcher = make_dispatcher(gateway)
+    delivered_id, undelivered_id = dispatcher.enqueue_many([JIO, JIO], 'reply', priority=PRIORITY_REPLY)
+
+    dispatcher.run_once()
+    assert dispatcher.status(delivered_id)['status'] == 'submitted'
+    assert dispatcher.get_stats()['awaiting_receipt'] == 2
+
+    receipt = dispatcher.on_delivery_receipt(dispatcher.status(delivered_id)['gateway_id'], 'DELIVRD')
+    assert receipt['status'] == 'delivered'
+    undelivered_gateway_id = dispatcher.status(undelivered_id)['gateway_id']
+    receipt = dispatcher.on_delivery_receipt(undelivered_gateway_id, 'UNDELIV')
+    assert receipt['status'] == 'failed'
+    assert receipt['error'] == 'UNDELIV'
+
+    # Duplicate and unknown receipts are ignored
+    assert dispatcher.on_delivery_receipt(undelivered_gateway_id, 'DELIVRD') is None
+    assert dispatcher.on_delivery_receipt('FG-unknown', 'DELIVRD') is None
+    assert dispatcher.status(undelivered_id)['status'] == 'failed'
+    assert dispatcher.get_stats()['awaiting_receipt'] == 0